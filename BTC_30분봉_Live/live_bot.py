@@ -4,7 +4,7 @@ import pandas as pd
 import time
 import os
 import sys
-import logging
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
 from strategy_30m import Strategy30m
@@ -12,23 +12,23 @@ from strategy_30m import Strategy30m
 # BaseBot 임포트를 위한 경로 추가
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from bots.base_bot import BaseBot
+from bots.rate_limiter import wrap_exchange, get_public_exchange
+from bots.market_stream import get_market_stream, INTERVAL_MS
+from bots.exchange_metadata import metadata
+from bots.account_state import get_account_state
+from bots.metrics import metrics
+from bots.order_pipeline import OrderPipeline, OrderIntent
+from bots.tick_triggers import TriggerBook, Trigger
+from bots.stop_manager import StopManager
+from bots.log_setup import setup_logging
 
 # 로그 설정 (전용 핸들러 사용으로 격리)
 
 log_dir = os.path.dirname(os.path.abspath(__file__))
 log_file = os.path.join(log_dir, 'bot.log')
 
-logger = logging.getLogger("BTC_30M_Bot")
-logger.setLevel(logging.INFO)
-logger.propagate = True  # 상위 로거로 전파 허용 (대시보드 노출 위해)
-
-# 파일 핸들러가 없으면 추가
-has_file_handler = any(isinstance(h, logging.FileHandler) for h in logger.handlers)
-if not has_file_handler:
-    # 파일 핸들러
-    fh = logging.FileHandler(log_file, mode='a', encoding='utf-8')
-    fh.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logger.addHandler(fh)
+# 상위 로거로 전파 허용 (대시보드 노출 위해), 파일 기록은 공용 기록 스레드가 처리
+logger = setup_logging("BTC_30M_Bot", log_file, bot='Bot_30M', symbol='BTC/USDT', propagate=True)
 
 logger.info(f"Log file path: {log_file}")
 
@@ -77,13 +77,38 @@ class BinanceLiveBot(BaseBot):
             exchange_config['secret'] = None
             
         if self.mode != 'paper':
-            self.exchange = ccxt.bybit(exchange_config)
+            self.exchange = wrap_exchange(ccxt.bybit(exchange_config))
+            try:
+                metadata.prime_markets(self.exchange)  # 봇들이 같은 마켓 목록 공유
+            except Exception as e:
+                logger.warning(f"마켓 목록 로드 실패 (첫 호출 때 다시 시도): {e}")
         else:
             class MockExchange:
                 def __getattr__(self, name):
                     raise NotImplementedError(f"CCXT method '{name}' called in paper mode without proper mocking. Check 'if self.mode == \"paper\"' guards.")
             self.exchange = MockExchange()
         self.strat = Strategy30m(initial_leverage=10, mode='extreme_growth')
+
+        # 실거래: 비공개 WebSocket 계정 캐시 (포지션/잔고를 매 루프 REST로 조회하지 않음)
+        self.account = None
+        if self.mode != 'paper':
+            self.account = get_account_state(self.api_key, self.api_secret, exchange=self.exchange, symbols=[self.symbol])
+        # 실거래 주문은 비동기 파이프라인으로 전송 (체결은 계정 스트림으로 확인)
+        self.orders = OrderPipeline(self.exchange, account=self.account, name='b30m') if self.mode != 'paper' else None
+        # 손절은 거래소에 보관 (체결 확인 후 설정, stop_price가 바뀔 때마다 정정)
+        self.stops = StopManager(self.exchange, name='b30m') if self.mode != 'paper' else None
+
+        # 공개 시세 스트림: 30분봉을 WebSocket으로 받아 매초 REST 캔들 조회를 대체 (끊기면 REST로 대체)
+        self.market_stream = get_market_stream()
+        if self.market_stream:
+            self.market_stream.subscribe_kline(self.symbol, self.timeframe, history=200)
+
+        # 돌파 진입은 봉 마감 때 레벨/수량/손절을 계산해 장전 → 틱이 레벨을 넘는 즉시 주문
+        self.trade_lock = threading.RLock()  # 틱 스레드와 메인 루프가 포지션 상태를 함께 바꿈
+        self.triggers = TriggerBook('b30m')
+        self.armed_bar = None
+        if self.market_stream:
+            self.triggers.attach(self.market_stream, self.symbol)
         
         # Trading State Attributes
         self.current_position = None # 'long', 'short', None
@@ -96,56 +121,76 @@ class BinanceLiveBot(BaseBot):
         
         logger.info(f"봇 초기화 완료: BTC/USDT (30m). Mode: {self.mode}, Exchange type: {type(self.exchange).__name__} (Bybit)")
 
-    def log(self, message):
-        logger.info(message)
+    def log(self, message, status=False):
+        # status=True: 반복 상태 줄 (기록 간격 제한)
+        logger.info(message, extra={'throttle': 'status'} if status else None)
 
     def run(self):
-        """메인 실행 루프"""
+        """메인 실행 루프: 봉 마감(서버 시각 기준 + settle)마다 execute_logic 한 번, 그 사이에는 check_intrabar만"""
         self.is_running = True  # 루프 시작 전에 True로 설정
         self.log(f"🚀 Bot started... Waiting for next candle.")
         self.status = "실행 중"
-        last_log_time = time.time()
         
         while self.is_running:
             try:
-                self.last_run = datetime.now()
-                self.execute_logic()
-                
-                # 10초마다 상태 로그 출력
-                current_time = time.time()
-                if current_time - last_log_time >= 10:
-                    balance = self.get_balance()
-                    pos_status = f"{self.current_position.upper()}" if self.current_position else "NONE"
-                    
-                    # recent_candles가 있는지 확인
-                    if hasattr(self, 'recent_candles') and self.recent_candles and len(self.recent_candles) > 0:
-                        current_price = self.recent_candles[-1]['y'][3]
-                        if self.current_position:
-                            roi_unleveraged = (current_price - self.entry_price) / self.entry_price if self.current_position == 'long' else (self.entry_price - current_price) / self.entry_price
-                            leveraged_roi = roi_unleveraged * self.trade_leverage
-                            self.log(f"📊 Status | Price: {current_price:,.1f} | Pos: {pos_status} | Entry: {self.entry_price:,.1f} | ROI: {leveraged_roi*100:.2f}% | Balance: {balance:.2f} USDT")
-                        else:
-                            self.log(f"📊 Status | Price: {current_price:,.1f} | Pos: {pos_status} | Balance: {balance:.2f} USDT")
-                    else:
-                        self.log(f"📊 Status | Pos: {pos_status} | Balance: {balance:.2f} USDT (데이터 로딩 중...)")
-                    
-                    last_log_time = current_time
-                
-                time.sleep(1)
+                self.step()
             except Exception as e:
                 self.log(f"Error in main loop: {e}")
                 time.sleep(5)
+                continue
+            self._wait_for_next_tick()
         
         # 루프 종료 시 중지 메시지
         self.log(f"⛔ Bot stopped.")
         self.status = "Stopped"
 
+    def check_intrabar(self):
+        """봉 사이 점검 (intrabar_interval마다): 현재가로 손절 확인 + 상태 로그, 캔들/지표 조회 없음"""
+        price = self.last_price()
+        with self.trade_lock:
+            self.sync_position()
+            if price is not None and self.current_position and self.stop_price:
+                if (self.current_position == 'long' and price < self.stop_price) or \
+                        (self.current_position == 'short' and price > self.stop_price):
+                    self.exit_position(price, "Stop Loss (intrabar)")
+
+        balance = self.get_balance()
+        pos_status = f"{self.current_position.upper()}" if self.current_position else "NONE"
+        if price is None:
+            self.log(f"📊 Status | Pos: {pos_status} | Balance: {balance:.2f} USDT (데이터 로딩 중...)", status=True)
+        elif self.current_position:
+            self.log(f"📊 Status | Price: {price:,.1f} | Pos: {pos_status} | Entry: {self.entry_price:,.1f} | ROI: {self.leveraged_roi(price)*100:.2f}% | Balance: {balance:.2f} USDT", status=True)
+        else:
+            self.log(f"📊 Status | Price: {price:,.1f} | Pos: {pos_status} | Balance: {balance:.2f} USDT", status=True)
+
+    def last_price(self):
+        """현재가: 시세 스트림 → REST 티커 (실패하면 None)"""
+        price = self.market_stream.last_price(self.symbol, max_age=5) if self.market_stream else None
+        if price is not None:
+            return price
+        try:
+            source = get_public_exchange('bybit') if self.mode == 'paper' else self.exchange
+            return float(source.fetch_ticker(self.symbol)['last'])
+        except Exception as e:
+            logger.debug(f"현재가 조회 실패: {e}")
+            return None
+
+    def leveraged_roi(self, price):
+        roi_unleveraged = (price - self.entry_price) / self.entry_price if self.current_position == 'long' else (self.entry_price - price) / self.entry_price
+        return roi_unleveraged * self.trade_leverage
+
     def execute_logic(self):
         try:
-            self.sync_position()
+            with self.trade_lock:
+                self.sync_position()
             
             # --- Data Fetching Logic (Unified) ---
-            if self.mode != 'paper':
+            ohlcv = self.market_stream.get_ohlcv(self.symbol, self.timeframe, limit=200) if self.market_stream else None
+            if ohlcv is not None:
+                df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+                df.set_index('timestamp', inplace=True)
+            elif self.mode != 'paper':
                 ohlcv = self.exchange.fetch_ohlcv(self.symbol, self.timeframe, limit=200)
                 df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
                 df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -154,8 +199,8 @@ class BinanceLiveBot(BaseBot):
                 # Paper trading mode: Use REAL data for chart, but don't trade on exchange
                 # self.log("Paper trading mode: Fetching REAL OHLCV data from Bybit.")
                 try:
-                    # Fetch real data using a temporary public instance
-                    public_exchange = ccxt.bybit()
+                    # Fetch real data using the shared public instance
+                    public_exchange = get_public_exchange('bybit')
                     ohlcv = public_exchange.fetch_ohlcv(self.symbol, self.timeframe, limit=200)
                     df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
                     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -177,7 +222,8 @@ class BinanceLiveBot(BaseBot):
                 for idx, row in df.tail(100).iterrows()
             ]
             
-            df_with_ind = self.strat.populate_indicators(df)
+            with metrics.time('bot_30m', 'indicators'):
+                df_with_ind = self.strat.populate_indicators(df)
             curr = df_with_ind.iloc[-1]
             current_price = curr['close']
             balance = self.get_balance()
@@ -194,7 +240,8 @@ class BinanceLiveBot(BaseBot):
 
             # 3. 매매 전략 판정
             if hasattr(self.strat, 'get_current_signal'):
-                signal_data = self.strat.get_current_signal(df_with_ind)
+                with metrics.time('bot_30m', 'signal'):
+                    signal_data = self.strat.get_current_signal(df_with_ind)
             else:
                 # Fallback Signal Logic (Simple Donchian)
                 d_high = curr.get('donchian_high')
@@ -216,7 +263,9 @@ class BinanceLiveBot(BaseBot):
                 }
 
             # 4. 진입/종료 로직 실행
-            self.trade_strategy(curr, signal_data)
+            with self.trade_lock:
+                self.trade_strategy(curr, signal_data)
+                self.arm_entry_triggers(df_with_ind, balance)
             
         except Exception:
             import traceback
@@ -225,6 +274,8 @@ class BinanceLiveBot(BaseBot):
     def get_balance(self):
         if self.mode == 'paper':
             return self.paper_balance
+        if self.account and self.account.is_live():
+            return self.account.balance('USDT')
         try:
             balance = self.exchange.fetch_balance()
             return float(balance['total']['USDT'])
@@ -245,6 +296,17 @@ class BinanceLiveBot(BaseBot):
             return
         else:
             # self.log(f"DEBUG: Live mode detected in sync_position. Attempting to fetch positions from real exchange.")
+            if self.orders is not None and self.orders.pending(self.symbol):
+                return  # 체결 확인 전에는 낙관적으로 갱신한 상태 유지
+            if self.account and self.account.is_live():
+                pos = self.account.position(self.symbol)
+                if pos:
+                    self.current_position, self.total_position_size, self.entry_price = pos['type'], abs(pos['amount']), pos['entry']
+                else:
+                    self.current_position, self.total_position_size, self.entry_price = None, 0, 0
+                    if self.stops is not None and self.stops.current(self.symbol):
+                        self.stops.clear(self.symbol)  # 거래소 손절로 청산됨
+                return
             try:
                 positions = self.exchange.fetch_positions([self.symbol])
                 for pos in positions:
@@ -265,6 +327,8 @@ class BinanceLiveBot(BaseBot):
 
         # 1. 진입
         if self.current_position is None:
+            if self.triggers_active():
+                return  # 틱 트리거가 진입 담당 (스트림이 끊기면 아래 폴링 판정으로 대체)
             action = signal_data.get('action')
             if action in ['long', 'short']:
                 # 지표 유효성 체크
@@ -300,13 +364,11 @@ class BinanceLiveBot(BaseBot):
                 if order:
                     self.current_position, self.total_position_size, self.peak_price = action, amount, self.entry_price
                     self.partial_hits = {'0': False, '1': False, '2': False}
+                    self.protect_position(order)
                     self.log(f"🚀 {action.upper()} 진입 완료 (가격: {self.entry_price:,.1f}, 수량: {amount:.4f})")
 
         # 2. 유지 및 종료
         else:
-            roi_unleveraged = (current_price - self.entry_price) / self.entry_price if self.current_position == 'long' else (self.entry_price - current_price) / self.entry_price
-            leveraged_roi = roi_unleveraged * self.trade_leverage
-            
             # --- Trailing Stop & Partial Profit (Simplified for focus) ---
             # ... (전략 로직)
             
@@ -329,14 +391,84 @@ class BinanceLiveBot(BaseBot):
                  exit_reason = "Stop Loss"
 
             if should_exit:
-                side = 'sell' if self.current_position == 'long' else 'buy'
-                order = self.execute_order(side, self.total_position_size, current_price)
-                if order:
-                    self.log(f"👋 포지션 종료: {exit_reason} (ROI: {leveraged_roi*100:.2f}%)")
-                    self.current_position = None
-                    self.total_position_size = 0
+                self.exit_position(current_price, exit_reason)
+
+    def exit_position(self, current_price, exit_reason):
+        leveraged_roi = self.leveraged_roi(current_price)
+        side = 'sell' if self.current_position == 'long' else 'buy'
+        order = self.execute_order(side, self.total_position_size, current_price, reduce_only=True)
+        if order:
+            self.log(f"👋 포지션 종료: {exit_reason} (ROI: {leveraged_roi*100:.2f}%)")
+            self.current_position = None
+            self.total_position_size = 0
+            if self.stops is not None:
+                self.stops.clear(self.symbol)
+
+    def triggers_active(self):
+        return bool(self.triggers.armed(self.symbol)) and self.market_stream is not None \
+            and self.market_stream.last_price(self.symbol, max_age=5) is not None
+
+    def arm_entry_triggers(self, df, balance):
+        """새 봉이 마감될 때마다 한 번: 다음 봉의 돌파 레벨/수량/손절을 계산해 트리거 장전"""
+        if self.market_stream is None or len(df) < 2:
+            return
+        step = INTERVAL_MS[self.timeframe]
+        last_start = int(df.index[-1].timestamp() * 1000)
+        # 마지막 행이 진행 중인 봉이면 그 앞까지가 마감된 데이터
+        closed = df.iloc[:-1] if last_start + step > time.time() * 1000 else df
+        closed_start = int(closed.index[-1].timestamp() * 1000)
+        if self.current_position is not None:
+            self.triggers.disarm(self.symbol, group='entry')
+            self.armed_bar = None  # 청산 후 바로 다시 장전
+            return
+        if closed_start == self.armed_bar:
+            return
+        self.armed_bar = closed_start
+        self.triggers.disarm(self.symbol, group='entry')
+
+        levels = self.strat.get_entry_triggers(closed)
+        expires = (closed_start + 2 * step) / 1000  # 다음 봉 마감 시 새 레벨로 교체
+        for action, p in levels.items():
+            # 레벨 가격 기준으로 손절/수량 미리 계산 (실행 시에는 체결가로 손절만 다시 맞춤)
+            stop_dist = p['atr'] * p['stop_atr']
+            stop_dist_pct = max(stop_dist / p['level'], 0.005)
+            amount = (balance * p['risk_pct']) / stop_dist_pct / p['level']
+            payload = {'action': action, 'amount': amount, 'stop_dist': stop_dist, 'leverage': p['leverage']}
+            self.triggers.arm(Trigger(f"{action}_breakout", self.symbol, 'above' if action == 'long' else 'below',
+                                      p['level'], self.on_entry_trigger, payload, group='entry', expires=expires))
+
+    def on_entry_trigger(self, trigger, price, event):
+        """틱 스레드에서 실행: 계산 없이 미리 정한 수량으로 주문만 넣음"""
+        p = trigger.payload
+        with self.trade_lock:
+            if self.current_position is not None:
+                return
+            self.trade_leverage = p['leverage']
+            self.entry_price = price
+            self.stop_price = price - p['stop_dist'] if p['action'] == 'long' else price + p['stop_dist']
+            side = 'buy' if p['action'] == 'long' else 'sell'
+            order = self.execute_order(side, p['amount'], price)
+            if order:
+                self.current_position, self.total_position_size, self.peak_price = p['action'], p['amount'], price
+                self.partial_hits = {'0': False, '1': False, '2': False}
+                self.protect_position(order)
+                self.log(f"⚡ {p['action'].upper()} 틱 돌파 진입 (레벨: {trigger.level:,.1f}, 체결가: {price:,.1f}, 수량: {p['amount']:.4f})")
+
+    def protect_position(self, order):
+        """진입 주문이 체결되면 거래소 손절 설정 (포지션이 생기기 전에는 설정할 수 없음)"""
+        if self.stops is None:
+            return
+        side, stop = self.current_position, self.stop_price
+
+        def on_done(ticket):
+            if ticket.result().status == 'filled':
+                self.stops.update(self.symbol, side, stop_loss=stop)
+        if hasattr(order, 'add_done_callback'):
+            order.add_done_callback(on_done)
+        else:
+            self.stops.update(self.symbol, side, stop_loss=stop)
 
-    def execute_order(self, side, amount, price):
+    def execute_order(self, side, amount, price, reduce_only=False):
         if self.mode == 'paper':
             # 가상 매매 체결
             fee = (price * amount) * 0.0005
@@ -359,8 +491,14 @@ class BinanceLiveBot(BaseBot):
             return True
         
         try:
-            self.exchange.set_leverage(int(self.trade_leverage), self.symbol)
-            return self.exchange.create_market_order(self.symbol, side, amount)
+            if self.orders is not None:
+                # 큐에 넣고 바로 반환 (레버리지 확인 + 전송 + 체결 확인은 파이프라인 스레드에서)
+                return self.orders.submit(OrderIntent(self.symbol, side, amount, leverage=int(self.trade_leverage),
+                                                      reduce_only=reduce_only, tag='30m'))
+            # 레버리지가 바뀐 경우에만 API 호출 (주문 지연 감소)
+            metadata.ensure_leverage(self.exchange, self.symbol, int(self.trade_leverage))
+            return self.exchange.create_market_order(self.symbol, side, amount,
+                                                     params={'reduceOnly': True} if reduce_only else {})
         except Exception as e:
             self.log(f"주문 실패: {e}")
             return None
@@ -1,14 +1,14 @@
 import pandas as pd
 import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.perf_stats import max_drawdown
 from strategy import Strategy30m, resample_to_30m
 import matplotlib.pyplot as plt
 
 def get_mdd(equity_series):
-    if len(equity_series) == 0: return 0
-    equity_series = pd.Series(equity_series)
-    roll_max = equity_series.cummax()
-    drawdown = (equity_series - roll_max) / roll_max
-    return drawdown.min() * 100
+    return -max_drawdown(equity_series) * 100
 
 def run_live_simulation():
     # 데이터 경로 설정 (부모 디렉토리의 데이터 사용)
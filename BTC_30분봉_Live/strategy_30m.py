@@ -2,6 +2,9 @@ import pandas as pd
 import pandas_ta as ta
 import numpy as np
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.perf_stats import max_drawdown
 
 class Strategy30m:
     """
@@ -966,18 +969,8 @@ class Strategy30m:
             
         return balance, trades, equity_curve
 
-    def get_current_signal(self, df):
-        """
-        실시간 데이터에 대한 현재 신호 및 파라미터 반환
-        """
-        if len(df) < 200:
-            return {'action': 'hold', 'reason': 'insufficient_data'}
-            
-        # 최신 데이터 및 지표
-        curr = df.iloc[-1]
-        prev = df.iloc[-2]
-        
-        # Regime Detection (백테스트와 동일)
+    def _entry_params(self, curr):
+        """레짐 판정 + 레버리지/손절/진입 임계값 (get_current_signal, get_entry_triggers 공용)"""
         is_bull_strict = (curr['ema_50'] > curr['ema_200']) and (curr['ema_200'] > curr['ema_1000'])
         is_bull_regime = (curr['ema_50'] > curr['ema_200'])
         is_trending = curr['adx'] > 25
@@ -1027,48 +1020,109 @@ class Strategy30m:
         else:
             ad_th = 32 if self.mode == 'extreme_growth' else 25
             eq_th = 0.9 if self.mode == 'extreme_growth' else 0.0
+
+        # Long: 가격 조건을 뺀 나머지 (추세/품질)
+        if is_bull_regime:
+            long_gate = curr['adx'] > ad_th and curr['ema_quality'] >= eq_th
+        else:
+            long_gate = curr['adx'] > 40 and curr['ema_quality'] >= 0.95
+
+        # Short: 가격 조건을 뺀 나머지
+        if is_low_vol and self.mode == 'extreme_growth':
+            short_ad_th = 35
+            short_eq_th = 0.95
+        else:
+            short_ad_th = 26 if self.mode == 'extreme_growth' else 25 
+            short_eq_th = 0.8 if self.mode == 'extreme_growth' else 0.0
+        short_gate = False
+        if curr['adx'] > short_ad_th and curr['ema_quality'] >= short_eq_th:
+            if self.mode == 'extreme_growth':
+                if not (curr['rsi'] < 25 and curr['adx'] < 45) and not (not trend_strengthening and curr['adx'] < 32):
+                    short_gate = True
+            else:
+                short_gate = True
+
+        return {
+            'is_bull_regime': is_bull_regime,
+            'is_strong_bull': is_strong_bull,
+            'is_low_vol': is_low_vol,
+            'leverage': current_leverage,
+            'stop_atr': current_stop_atr,
+            'risk_pct': risk_per_trade_pct,
+            'long_gate': long_gate,
+            'short_gate': short_gate,
+        }
+
+    def get_current_signal(self, df):
+        """
+        실시간 데이터에 대한 현재 신호 및 파라미터 반환
+        """
+        if len(df) < 200:
+            return {'action': 'hold', 'reason': 'insufficient_data'}
+            
+        # 최신 데이터 및 지표
+        curr = df.iloc[-1]
+        p = self._entry_params(curr)
+        is_bull_regime = p['is_bull_regime']
             
         # Long Signal
         long_entry = False
-        if curr['close'] > curr['donchian_high'] and curr['close'] > curr['ema_50']:
-            if is_bull_regime:
-                if curr['adx'] > ad_th and curr['ema_quality'] >= eq_th:
-                    long_entry = True
-            else:
-                if curr['adx'] > 40 and curr['ema_quality'] >= 0.95 and curr['close'] > curr['ema_200']:
-                    long_entry = True
+        if curr['close'] > curr['donchian_high'] and curr['close'] > curr['ema_50'] and p['long_gate']:
+            if is_bull_regime or curr['close'] > curr['ema_200']:
+                long_entry = True
                     
         # Short Signal
         short_entry = False
         bear_entry_sig = curr['bear_low_entry']
         if (not is_bull_regime or curr['close'] < curr['ema_200']) and curr['close'] < curr['ema_50'] and curr['close'] < bear_entry_sig:
-            if is_low_vol and self.mode == 'extreme_growth':
-                short_ad_th = 35
-                short_eq_th = 0.95
-            else:
-                short_ad_th = 26 if self.mode == 'extreme_growth' else 25 
-                short_eq_th = 0.8 if self.mode == 'extreme_growth' else 0.0
-            
-            if curr['adx'] > short_ad_th and curr['ema_quality'] >= short_eq_th:
-                if self.mode == 'extreme_growth':
-                    if not (curr['rsi'] < 25 and curr['adx'] < 45) and not (not trend_strengthening and curr['adx'] < 32):
-                        short_entry = True
-                else:
-                    short_entry = True
+            short_entry = p['short_gate']
 
         return {
             'action': 'long' if long_entry else ('short' if short_entry else 'hold'),
-            'leverage': current_leverage,
-            'stop_atr': current_stop_atr,
-            'risk_pct': risk_per_trade_pct,
-            'is_strong_bull': is_strong_bull,
-            'is_low_vol': is_low_vol,
+            'leverage': p['leverage'],
+            'stop_atr': p['stop_atr'],
+            'risk_pct': p['risk_pct'],
+            'is_strong_bull': p['is_strong_bull'],
+            'is_low_vol': p['is_low_vol'],
             'donchian_low': curr['donchian_low'],
             'bull_exit_slow': curr['bull_exit_slow'],
             'super_exit_long': curr['super_exit_long'],
             'bear_low_exit': curr['bear_low_exit']
         }
 
+    def get_entry_triggers(self, df):
+        """
+        마감된 봉까지의 데이터(df 마지막 행 = 마감 봉)로 다음 봉의 돌파 진입 레벨 계산
+        - 가격 조건은 레벨로 변환: close > donchian_high 이고 close > ema_50 ⇔ 가격 > max(두 값)
+          (EMA는 새 가격과 직전 EMA 사이에 있으므로 '가격 > 직전 EMA'와 '가격 > 갱신된 EMA'가 같음)
+        - ADX/EMA 품질 등 나머지 조건은 마감 봉 기준으로 미리 판정 → 통과한 방향만 반환
+        반환: {'long': {'level', 'atr', ...params}, 'short': {...}} (조건 불충족 방향은 없음)
+        """
+        if len(df) < 200:
+            return {}
+        curr = df.iloc[-1]
+        p = self._entry_params(curr)
+        atr = curr['atr']
+        if not atr or pd.isna(atr):
+            return {}
+
+        # 다음 봉의 donchian_high / bear_low_entry (shift(1) 이므로 마감 봉까지의 고가/저가)
+        d_high = df['high'].iloc[-self.entry_window:].max()
+        bear_low = df['low'].iloc[-self.bear_entry_window:].min()
+
+        triggers = {}
+        if p['long_gate']:
+            level = max(d_high, curr['ema_50'])
+            if not p['is_bull_regime']:
+                level = max(level, curr['ema_200'])
+            triggers['long'] = {**p, 'level': float(level), 'atr': float(atr)}
+        if p['short_gate']:
+            level = min(bear_low, curr['ema_50'])
+            if p['is_bull_regime']:
+                level = min(level, curr['ema_200'])
+            triggers['short'] = {**p, 'level': float(level), 'atr': float(atr)}
+        return triggers
+
     def _slice_data(self, df, start_date, end_date):
         backtest_df = df.copy()
         if start_date:
@@ -1109,10 +1163,8 @@ def print_result(title, final_bal, initial, mdd, trades):
     print(f"[{title}] Final: ${final_bal:,.2f} | ROI: {roi:,.2f}% | MDD: {mdd:.2f}% | Trades: {len(trades)} | WinRate: {win_rate:.2f}%")
 
 def get_mdd(equity_series):
-    if len(equity_series) == 0: return 0
-    roll_max = equity_series.cummax()
-    drawdown = (equity_series - roll_max) / roll_max
-    return drawdown.min() * 100
+    # 한 번 순회하며 최고점/낙폭 갱신 (cummax 배열을 만들지 않음), 기존처럼 음수 %로 반환
+    return -max_drawdown(equity_series) * 100
 
 
 # ============================================================================
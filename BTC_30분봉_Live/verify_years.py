@@ -1,13 +1,13 @@
 import pandas as pd
 import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.perf_stats import max_drawdown
 from strategy import Strategy30m, resample_to_30m
 
 def get_mdd(equity_series):
-    if len(equity_series) == 0: return 0
-    equity_series = pd.Series(equity_series)
-    roll_max = equity_series.cummax()
-    drawdown = (equity_series - roll_max) / roll_max
-    return drawdown.min() * 100
+    return -max_drawdown(equity_series) * 100
 
 def final_test():
     path_17_19 = "../btc_2015_2019_5m.csv"
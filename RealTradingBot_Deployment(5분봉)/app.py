@@ -1,12 +1,16 @@
 from flask import Flask, jsonify, render_template, request
 import os
 import json
-import time
-import subprocess
-import signal
+import sys
 import ccxt
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.rate_limiter import wrap_exchange, DASHBOARD
+from bots.exchange_metadata import metadata
+from bots.process_registry import ProcessRegistry
+from bots.account_snapshot import start_account_snapshot, read_snapshot
+
 app = Flask(__name__)
 
 # Base directory where live_trading_bot.py is located (one level up)
@@ -15,73 +19,49 @@ LOG_FILE = os.path.join(BASE_DIR, 'bot.log')
 STATE_FILE = os.path.join(BASE_DIR, 'paper_trade_state.json')
 PID_FILE = os.path.join(BASE_DIR, 'bot.pid')
 MAIN_SCRIPT = os.path.join(BASE_DIR, 'live_trading_bot.py')
+BOT_NAME = 'bot_5m'
 
-cached_balance = {
-    "balance": 0.0,
-    "currency": "USDT",
-    "timestamp": 0
-}
+# 봇 PID/하트비트 (요청마다 pgrep 하지 않음)
+registry = ProcessRegistry()
 
-def get_real_balance():
-    global cached_balance
-    if time.time() - cached_balance['timestamp'] < 10:
-        return cached_balance
-    
-    try:
-        # Load .env
-        env_path = os.path.join(BASE_DIR, '.env')
-        load_dotenv(env_path)
+ACCOUNT_NAME = 'binance_5m'
 
-        api_key = os.getenv('BINANCE_API_KEY')
-        api_secret = os.getenv('BINANCE_SECRET')
-        
-        if api_key and api_secret:
-            # Use Binance as per user's setup
-            exchange = ccxt.binance({
-                'apiKey': api_key,
-                'secret': api_secret,
-                'options': {'defaultType': 'future'},
-            })
-            # Fetch balance
-            balance_data = exchange.fetch_balance()
-            usdt = balance_data['total'].get('USDT', 0.0)
-            
-            cached_balance = {
-                "balance": float(usdt),
-                "currency": "USDT",
-                "timestamp": time.time()
-            }
-        else:
-            cached_balance["currency"] = "USDT" # Default
-            
-    except Exception as e:
-        print(f"Error fetching balance: {e}")
-    
-    return cached_balance
+def make_exchange():
+    """스냅샷 생산자가 한 번 호출 (키가 없으면 None → 다음 주기에 다시 확인)"""
+    load_dotenv(os.path.join(BASE_DIR, '.env'))
+    api_key = os.getenv('BINANCE_API_KEY')
+    api_secret = os.getenv('BINANCE_SECRET')
+    if not (api_key and api_secret):
+        return None
+    # Use Binance as per user's setup
+    exchange = wrap_exchange(ccxt.binance({
+        'apiKey': api_key,
+        'secret': api_secret,
+        'options': {'defaultType': 'future'},
+    }), priority=DASHBOARD)
+    # 마켓 목록은 캐시에서 주입 (load_markets 재호출 방지)
+    metadata.prime_markets(exchange)
+    return exchange
+
+# 잔고는 공용 스냅샷에서 읽음 (조회는 생산자 스레드 하나가 10초마다, 다른 프로세스가 생산 중이면 읽기만)
+start_account_snapshot(ACCOUNT_NAME, make_exchange, interval=10)
+
+def get_real_balance():
+    snap = read_snapshot(ACCOUNT_NAME)
+    if snap is None:
+        return {"balance": 0.0, "currency": "USDT", "timestamp": 0}
+    return {
+        "balance": snap['balance'],
+        "currency": snap['currency'],
+        "timestamp": snap['ts'],
+        "stale": snap['stale'],
+        "error": snap['error'],
+    }
 
 def is_bot_running():
-    # 1. Check PID file
-    if os.path.exists(PID_FILE):
-        try:
-            with open(PID_FILE, 'r') as f:
-                pid = int(f.read().strip())
-            # Check if process exists
-            os.kill(pid, 0)
-            return True, pid
-        except (OSError, ValueError):
-            # PID file exists but process doesn't, or invalid content
-            pass
-            
-    # 2. Check for any running live_trading_bot.py process using pgrep
-    try:
-        result = subprocess.check_output(['pgrep', '-f', 'python3.*live_trading_bot.py'])
-        pids = [int(p) for p in result.split()]
-        if pids:
-            return True, pids[0]
-    except subprocess.CalledProcessError:
-        pass
-
-    return False, None
+    # 레지스트리 항목(없으면 PID 파일)으로 확인 - 프로세스 목록은 뒤지지 않음
+    status = registry.status(BOT_NAME, pid_file=PID_FILE)
+    return status['running'], status['pid']
 
 @app.route('/')
 def index():
@@ -124,20 +104,9 @@ def control_bot():
         
         # Start the bot
         try:
-            # Run in background, detached
-            # Using nohup to keep it running
-            # We must use the python executable that has the dependencies installed
-            # Assuming 'python3' is the correct one in this env
-            cmd = f'nohup python3 "{MAIN_SCRIPT}" > "{LOG_FILE}" 2>&1 & echo $!'
-            process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=BASE_DIR)
-            stdout, stderr = process.communicate()
-            
-            # The pid is printed to stdout because of 'echo $!'
-            # But live_trading_bot.py should also write to PID_FILE
-            
-            # Let's wait a moment for PID file creation
-            time.sleep(2)
-            
+            # Run in background, detached (new session, output -> LOG_FILE)
+            # Assuming 'python3' is the interpreter with the dependencies installed
+            registry.launch(BOT_NAME, ['python3', MAIN_SCRIPT], cwd=BASE_DIR, log_file=LOG_FILE)
             return jsonify({"status": "success", "message": "Bot started"})
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)})
@@ -147,10 +116,8 @@ def control_bot():
             return jsonify({"status": "error", "message": "Bot is not running"})
         
         try:
-            os.kill(pid, signal.SIGTERM)
-            # Clean up PID file if it exists (bot should do it, but just in case)
-            if os.path.exists(PID_FILE):
-                os.remove(PID_FILE)
+            # SIGTERM 후 종료 대기 (안 끝나면 SIGKILL), 항목/PID 파일 정리
+            registry.stop(BOT_NAME, pid_file=PID_FILE)
             return jsonify({"status": "success", "message": "Bot stopped"})
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)})
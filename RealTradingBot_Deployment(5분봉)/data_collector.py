@@ -1,30 +1,18 @@
 import ccxt
 import pandas as pd
-import time
 from datetime import datetime, timedelta
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.kline_downloader import KlineDownloader, merge_klines
 
 def fetch_ohlcv(symbol, timeframe, since, limit=1000):
-    exchange = ccxt.binance()
-    all_ohlcv = []
-    
-    while since < exchange.milliseconds():
-        try:
-            ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since, limit)
-            if not ohlcv:
-                break
-            all_ohlcv.extend(ohlcv)
-            since = ohlcv[-1][0] + 1
-            # Convert timestamp to datetime for progress tracking
-            current_date = datetime.fromtimestamp(ohlcv[-1][0] / 1000)
-            print(f"Collected up to: {current_date}")
-            time.sleep(0.5) # Rate limit
-        except Exception as e:
-            print(f"Error: {e}")
-            time.sleep(5)
-            continue
-            
-    df = pd.DataFrame(all_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    # 구간 병렬 다운로드 (레이트 리미터 공유, 중단되면 아카이브에서 이어받음)
+    downloader = KlineDownloader.for_ccxt(ccxt.binance(), symbol, timeframe, limit=limit)
+    df = downloader.download(since)
+    if not df.empty:
+        print(f"Collected up to: {datetime.fromtimestamp(df['timestamp'].iloc[-1] / 1000)}")
     df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
     return df
 
@@ -35,14 +23,12 @@ def update_data(symbol, timeframe, filename):
         existing_df = pd.read_csv(filename)
         existing_df['datetime'] = pd.to_datetime(existing_df['datetime'])
         last_timestamp = existing_df['timestamp'].max()
-        since = int(last_timestamp) + 1 # Fetch data after the last recorded timestamp
+        since = int(last_timestamp) # 마지막 봉은 진행 중이었을 수 있으므로 다시 받아 덮어씀 (merge_klines)
         print(f"Appending new data for {symbol} {timeframe} since {datetime.fromtimestamp(last_timestamp / 1000)}...")
         
         new_df = fetch_ohlcv(symbol, timeframe, since)
         if not new_df.empty:
-            updated_df = pd.concat([existing_df, new_df], ignore_index=True)
-            updated_df.drop_duplicates(subset=['timestamp'], inplace=True)
-            updated_df.sort_values('timestamp', inplace=True)
+            updated_df = merge_klines(existing_df, new_df)
             updated_df.to_csv(filename, index=False)
             print(f"Appended {len(new_df)} new rows to {filename}")
         else:
@@ -1,14 +1,10 @@
-import schedule
 import random
-import subprocess
 import threading
 import os
 import sys
 import time
 import ccxt
-import joblib
 import pandas as pd
-import logging
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -18,6 +14,20 @@ load_dotenv(dotenv_path=env_path)
 
 from strategy_5m import add_indicators
 
+# bots 공용 모듈 임포트를 위한 경로 추가
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.job_scheduler import JobScheduler, JobSpec
+from bots.model_store import load_model_bundle, model_mtime
+from bots.rate_limiter import wrap_exchange, get_public_exchange
+from bots.market_stream import get_market_stream
+from bots.exchange_metadata import metadata
+from bots.account_state import get_account_state
+from bots.metrics import metrics
+from bots.order_pipeline import OrderPipeline, OrderIntent
+from bots.log_setup import setup_logging
+from bots.process_registry import register, beat
+from bots.bar_clock import BarClock, INTRABAR_INTERVAL
+
 # Define Regime Settings (Default)
 REGIME_SETTINGS = {
     0: {'name': 'SIDEWAYS', 'skip': True},
@@ -29,19 +39,8 @@ REGIME_SETTINGS = {
 log_dir = os.path.dirname(os.path.abspath(__file__))
 log_file = os.path.join(log_dir, 'bot.log')
 
-logger = logging.getLogger("BTC_5M_Bot")
-logger.setLevel(logging.INFO)
-if not logger.handlers:
-    # 파일 핸들러
-    fh = logging.FileHandler(log_file, encoding='utf-8')
-    fh.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logger.addHandler(fh)
-    # 콘솔 핸들러
-    sh = logging.StreamHandler(sys.stdout)
-    sh.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logger.addHandler(sh)
-    # 다른 로거로 전파되지 않도록 설정
-    logger.propagate = False
+# 파일 + 콘솔, 다른 로거로 전파되지 않도록 설정 (기록은 공용 기록 스레드)
+logger = setup_logging("BTC_5M_Bot", log_file, bot='Bot_5M', symbol='BTC/USDT', console=True, propagate=False)
 
 class LiveTradingBot:
     def execute_logic(self):
@@ -50,6 +49,7 @@ class LiveTradingBot:
 
     def stop(self):
         self.is_running = False
+        self.stop_event.set()  # 재시도 대기 중이면 즉시 깨움
         self.status = "Stopped"
         logger.info("Stopping 5M Bot...")
 
@@ -60,6 +60,9 @@ class LiveTradingBot:
         self.mode = os.getenv('TRADING_MODE', 'paper').lower()
         self.symbol = os.getenv('SYMBOL', 'BTC/USDT')
         self.timeframe = '5m'
+        self.clock = BarClock(self.timeframe, name='Bot_5M')  # 봉 마감(서버 시각) 정렬 대기
+        self.retry_delay = 60  # 데이터 수집 실패/오류 후 재시도 대기 (초)
+        self.stop_event = threading.Event()
         
         # 가상 거래 상태 변수
         self.paper_balance = 100.0
@@ -109,8 +112,8 @@ class LiveTradingBot:
                 def fetch_ohlcv(self, symbol, timeframe, limit):
                     # Fetch REAL OHLCV data even in paper mode
                     try:
-                        # Create a temporary public instance for fetching data
-                        public_exchange = ccxt.bybit()
+                        # 공용 public 인스턴스 재사용 (레이트 리밋 공유)
+                        public_exchange = get_public_exchange('bybit')
                         ohlcv = public_exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
                         self.ohlcv_data = ohlcv
                         self.ticker_price = ohlcv[-1][4] # Sync ticker with last close
@@ -142,7 +145,24 @@ class LiveTradingBot:
 
             self.exchange = MockExchange()
         else:
-            self.exchange = ccxt.bybit(exchange_config)
+            self.exchange = wrap_exchange(ccxt.bybit(exchange_config))
+            try:
+                metadata.prime_markets(self.exchange)  # 봇들이 같은 마켓 목록 공유
+            except Exception as e:
+                logger.warning(f"마켓 목록 로드 실패 (첫 호출 때 다시 시도): {e}")
+
+        # 실거래: 비공개 WebSocket 계정 캐시 (포지션/잔고 조회를 메모리에서 처리)
+        self.account = None
+        if self.mode != 'paper':
+            self.account = get_account_state(self.api_key, self.secret, exchange=self.exchange, symbols=[self.symbol])
+
+        # 실거래 주문은 비동기 파이프라인으로 전송 (판단 루프가 거래소 응답을 기다리지 않음)
+        self.orders = OrderPipeline(self.exchange, account=self.account, name='b5m') if self.mode != 'paper' else None
+
+        # 공개 시세 스트림 (상태 로그용 현재가, 끊기면 REST로 대체)
+        self.market_stream = get_market_stream()
+        if self.market_stream:
+            self.market_stream.subscribe_ticker(self.symbol)
         
         # ... (기존 모드 체크)
         
@@ -158,6 +178,9 @@ class LiveTradingBot:
                 return {'amount': pos['positionAmt'], 'entry': pos['entryPrice'], 'type': 'long' if pos['positionAmt'] > 0 else 'short'}
             return None
 
+        if self.account and self.account.is_live():
+            return self.account.position(self.symbol)
+
         try:
             balance = self.exchange.fetch_balance()
             if 'info' not in balance or 'positions' not in balance['info']:
@@ -184,12 +207,9 @@ class LiveTradingBot:
             return True
         
         try:
-            # 레버리지 설정
-            self.exchange.set_leverage(leverage, self.symbol)
-            
             side = 'buy' if signal == 'long' else 'sell'
-            order = self.exchange.create_market_order(self.symbol, side, amount)
-            logger.info(f"✅ 주문 체결: {side} {amount} {self.symbol}")
+            order = self.submit_order(side, amount, leverage=leverage)
+            logger.info(f"📨 주문 전송: {side} {amount} {self.symbol}")
             return order
         except Exception as e:
             logger.error(f"주문 실패: {e}")
@@ -210,26 +230,21 @@ class LiveTradingBot:
 
             side = 'sell' if pos['type'] == 'long' else 'buy'
             try:
-                self.exchange.create_market_order(self.symbol, side, amount)
-                logger.info("✅ 포지션 종료 완료")
+                self.submit_order(side, amount, reduce_only=True)
+                logger.info("📨 포지션 종료 주문 전송")
             except Exception as e:
                 logger.error(f"포지션 종료 실패: {e}")
 
     def start_scheduler(self):
-        def job():
-            logger.info("⏰ 00:00 정기 재학습 시작...")
-            subprocess.Popen([sys.executable, "retrain.py"])
-            
-        schedule.every().day.at("00:00").do(job)
-        
-        def run_schedule():
-            while True:
-                schedule.run_pending()
-                time.sleep(60)
-                
+        if os.getenv('CENTRAL_JOB_SCHEDULER') == '1':
+            logger.info("📅 재학습은 통합 매니저의 중앙 스케줄러가 담당합니다")
+            return
+
         try:
-            t = threading.Thread(target=run_schedule, daemon=True)
-            t.start()
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            self.job_scheduler = JobScheduler(timeframes=(self.timeframe,))
+            self.job_scheduler.register(JobSpec("retrain_5m", "retrain.py", base_dir, at="00:00"))
+            self.job_scheduler.start()
             logger.info("📅 자동 재학습 스케줄러 가동 (매일 00:00)")
         except Exception as e:
             logger.error(f"스케줄러 시작 실패: {e}")
@@ -239,7 +254,7 @@ class LiveTradingBot:
             base_dir = os.path.dirname(os.path.abspath(__file__))
             path = os.path.join(base_dir, 'short_model.pkl')
             if os.path.exists(path):
-                mtime = os.path.getmtime(path)
+                mtime = model_mtime(path)
                 if mtime > self.model_ts:
                     logger.info("🔄 새로운 모델 파일 감지! 다시 로드합니다.")
                     self.load_models()
@@ -253,11 +268,11 @@ class LiveTradingBot:
             
             path = os.path.join(base_dir, 'short_model.pkl')
             if os.path.exists(path):
-                self.model_ts = os.path.getmtime(path)
+                self.model_ts = model_mtime(path)
                 
-            self.short_model_data = joblib.load(os.path.join(base_dir, 'short_model.pkl'))
-            self.long_model_data = joblib.load(os.path.join(base_dir, 'long_model.pkl'))
-            self.regime_model_data = joblib.load(os.path.join(base_dir, 'regime_model.pkl'))
+            self.short_model_data = load_model_bundle(os.path.join(base_dir, 'short_model.pkl'))
+            self.long_model_data = load_model_bundle(os.path.join(base_dir, 'long_model.pkl'))
+            self.regime_model_data = load_model_bundle(os.path.join(base_dir, 'regime_model.pkl'))
             
             self.short_model = self.short_model_data['model']
             self.long_model = self.long_model_data['model']
@@ -341,6 +356,9 @@ class LiveTradingBot:
             if self.mode == 'paper':
                 return self.paper_position
 
+            if self.account and self.account.is_live():
+                return self.account.position(self.symbol)
+
             balance = self.exchange.fetch_balance()
             if 'info' not in balance or 'positions' not in balance['info']:
                 logger.warning("Balance info or positions not found in exchange response.")
@@ -379,12 +397,9 @@ class LiveTradingBot:
             return True
         
         try:
-            # 레버리지 설정
-            self.exchange.set_leverage(leverage, self.symbol)
-            
             side = 'buy' if signal == 'long' else 'sell'
-            order = self.exchange.create_market_order(self.symbol, side, amount)
-            logger.info(f"✅ 주문 체결: {side} {amount} {self.symbol}")
+            order = self.submit_order(side, amount, leverage=leverage)
+            logger.info(f"📨 주문 전송: {side} {amount} {self.symbol}")
             return order
         except Exception as e:
             logger.error(f"주문 실패: {e}")
@@ -414,138 +429,165 @@ class LiveTradingBot:
                 logger.info(f"🧪 [PAPER] 포지션 종료 시뮬레이션: {side} {amount} | 잔고: {self.current_balance:.2f}")
             else:
                 try:
-                    self.exchange.create_market_order(self.symbol, side, amount)
-                    logger.info("✅ 포지션 종료 완료")
+                    self.submit_order(side, amount, reduce_only=True)
+                    logger.info("📨 포지션 종료 주문 전송")
                 except Exception as e:
                     logger.error(f"포지션 종료 실패: {e}")
 
+    def submit_order(self, side, amount, leverage=None, reduce_only=False):
+        """실거래 주문: 파이프라인이 있으면 큐에 넣고 티켓 반환, 없으면 기존 동기 호출"""
+        if self.orders is None:
+            if leverage:
+                metadata.ensure_leverage(self.exchange, self.symbol, leverage)
+            return self.exchange.create_market_order(self.symbol, side, amount)
+        return self.orders.submit(OrderIntent(self.symbol, side, amount, leverage=leverage,
+                                              reduce_only=reduce_only, tag='5m'))
+
     def wait_while_running(self, seconds):
-        # 10초마다 상태 로그 출력하며 대기
+        # 오류 후 재시도 대기 (10초마다 점검), stop()이 이벤트를 세우면 바로 종료
         end_time = time.time() + seconds
-        next_log_time = time.time()
-        
-        while time.time() < end_time:
-            if not self.is_running: 
+        while self.is_running:
+            self.check_intrabar()
+            remaining = end_time - time.time()
+            if remaining <= 0 or self.stop_event.wait(min(10, remaining)):
                 break
+
+    def wait_for_bar_close(self):
+        # 다음 5분봉 마감 + settle까지 대기 (작업 시간만큼 밀리지 않음), 그 사이 상태 로그만
+        self.clock.wait(lambda: self.is_running, on_idle=self.check_intrabar, idle_interval=INTRABAR_INTERVAL)
+
+    def check_intrabar(self):
+        # 봉 사이 점검: 하트비트 + 상태 로그 (청산은 전략에 맡김)
+        beat('bot_5m')
+        try:
+            current_price = self.market_stream.last_price(self.symbol) if self.market_stream else None
+            if current_price is None:
+                current_price = self.exchange.fetch_ticker(self.symbol)['last']
             
-            if time.time() >= next_log_time:
-                try:
-                    ticker = self.exchange.fetch_ticker(self.symbol)
-                    current_price = ticker['last']
-                    
-                    # Position String
-                    if self.mode == 'paper':
-                        pos_str = f"{self.paper_position['type'].upper()} ({self.paper_position['amount']})" if self.paper_position else "NONE"
-                        bal = self.paper_balance
-                    else:
-                        pos = self.get_position()
-                        pos_str = f"{pos['type'].upper()} ({pos['amount']})" if pos else "NONE"
-                        bal = float(self.exchange.fetch_balance()['USDT']['total'])
-                        
-                    logger.info(f"📊 Status | Price: {current_price:,.1f} | Pos: {pos_str} | Balance: {bal:.2f} USDT")
-                except Exception as e:
-                    logger.debug(f"Status Log Error: {e}")
-                    
-                next_log_time = time.time() + 10 # 10초 주기
+            # Position String
+            if self.mode == 'paper':
+                pos_str = f"{self.paper_position['type'].upper()} ({self.paper_position['amount']})" if self.paper_position else "NONE"
+                bal = self.paper_balance
+            else:
+                pos = self.get_position()
+                pos_str = f"{pos['type'].upper()} ({pos['amount']})" if pos else "NONE"
+                if self.account and self.account.is_live():
+                    bal = self.account.balance('USDT')
+                else:
+                    bal = float(self.exchange.fetch_balance()['USDT']['total'])
+                
+            logger.info(f"📊 Status | Price: {current_price:,.1f} | Pos: {pos_str} | Balance: {bal:.2f} USDT",
+                        extra={'throttle': 'status'})
+        except Exception as e:
+            logger.debug(f"Status Log Error: {e}")
 
-            time.sleep(0.1)
+    def step(self):
+        """봉 마감마다 한 번: 데이터 수집 → 레짐/신호 → 진입 (데이터 수집 실패 시 False)"""
+        beat('bot_5m')
+        self.last_run = datetime.now()
+        
+        self.status = "실행 중"
+        # 1. 데이터 수집
+        with metrics.time('bot_5m', 'fetch_data'):
+            df = self.fetch_data()
+        if df is None:
+            self.status = "오류 (데이터 수집 실패)"
+            return False
+        
+        current = df.iloc[-1]
+        price = current['close']
+        
+        # 2. 포지션 확인
+        position = self.get_position()
+        
+        # 차트용 데이터 저장 (최근 100개)
+        self.recent_candles = [
+            {'x': int(row.name.timestamp() * 1000) if hasattr(row.name, 'timestamp') else int(row.name), 
+             'y': [row['open'], row['high'], row['low'], row['close']]}
+            for idx, row in df.tail(100).iterrows()
+        ]
+
+        # 3. 신호 생성
+        with metrics.time('bot_5m', 'predict_regime'):
+            regime = self.predict_regime(current)
+        settings = REGIME_SETTINGS.get(regime, {'skip': True})
+        
+        settings_name = settings.get('name', 'UNKNOWN')
+        logger.info(f"📊 현재 시장 레짐: {settings_name} (가격: {price:,.2f})")
+        
+        # Update Status for Manager
+        if position:
+             self.status = f"{position.get('type','').upper()} 보유 중 (진입가: {position.get('entry', 0):,.0f})"
+        else:
+             self.status = "실행 중"
+        
+        if position:
+            logger.info(f"🔥 포지션 보유 중: {position['type']} {position['amount']}")
+            # 여기서 청산 로직 추가 가능 (SL/TP 등)
+            # 현재는 전략에 맡김
+        
+        elif not settings.get('skip'):
+            with metrics.time('bot_5m', 'predict_probs'):
+                l_prob, s_prob = self.predict_probs(current)
+            direction = settings['direction']
+            threshold = settings['threshold']
+            
+            signal = None
+            if direction == 'long' and l_prob > threshold:
+                signal = 'long'
+                logger.info(f"🔍 Long 신호 감지! (확률: {l_prob:.2%})")
+            elif direction == 'short' and s_prob > threshold:
+                signal = 'short'
+                logger.info(f"🔍 Short 신호 감지! (확률: {s_prob:.2%})")
+            
+            if signal:
+                # 자금 관리
+                if self.account and self.account.is_live():
+                    balance = self.account.balance('USDT', kind='free')
+                else:
+                    balance = self.exchange.fetch_balance()['USDT']['free']
+                risk = settings['risk']
+                leverage = settings['leverage']
+                
+                # ATR 기반 포지션 사이징
+                atr = current['atr'] if not pd.isna(current['atr']) else price * 0.01
+                sl_pct = (atr * settings['sl_mult']) / price
+                
+                risk_amt = balance * risk
+                target_size = risk_amt / sl_pct
+                max_size = balance * leverage
+                
+                final_size_usd = min(target_size, max_size)
+                amount = final_size_usd / price
+                
+                # Calculate Prices
+                sl_price_val = price * (1 - sl_pct) if signal == 'long' else price * (1 + sl_pct)
+                liq_price_val = price * (1 - 1/leverage) if signal == 'long' else price * (1 + 1/leverage)
+                
+                logger.info(f"🚀 진입 결정: {signal} | 크기: ${final_size_usd:.2f} ({amount:.4f} BTC)")
+                self.execute_trade(signal, amount, leverage, sl_price=sl_price_val, liq_price=liq_price_val)
+        else:
+            logger.info("⏸️ 횡보장 또는 스킵 구간 - 관망")
+        
+        logger.info("💤 다음 캔들 마감 대기...")
+        
+        # 모델 업데이트 체크
+        self.check_model_reload()
+        return True
 
     def run(self):
         logger.info("🚀 라이브 트레이딩 봇 시작 (다중 ML 모델)")
         self.status = "신호 대기 중 (시작)"
         self.is_running = True
+        self.stop_event.clear()
         
         while self.is_running:
             try:
-                from datetime import datetime
-                self.last_run = datetime.now()
-                
-                self.last_run = datetime.now()
-                
-                self.status = "실행 중"
-                # 1. 데이터 수집
-                df = self.fetch_data()
-                if df is None:
-                    self.status = "오류 (데이터 수집 실패)"
-                    self.wait_while_running(60)
+                if self.step() is False:
+                    self.wait_while_running(self.retry_delay)
                     continue
                 
-                current = df.iloc[-1]
-                price = current['close']
-                
-                # 2. 포지션 확인
-                position = self.get_position()
-                
-                # 차트용 데이터 저장 (최근 100개)
-                self.recent_candles = [
-                    {'x': int(row.name.timestamp() * 1000) if hasattr(row.name, 'timestamp') else int(row.name), 
-                     'y': [row['open'], row['high'], row['low'], row['close']]}
-                    for idx, row in df.tail(100).iterrows()
-                ]
-
-                # 3. 신호 생성
-                regime = self.predict_regime(current)
-                settings = REGIME_SETTINGS.get(regime, {'skip': True})
-                
-                settings_name = settings.get('name', 'UNKNOWN')
-                logger.info(f"📊 현재 시장 레짐: {settings_name} (가격: {price:,.2f})")
-                
-                # Update Status for Manager
-                if position:
-                     self.status = f"{position.get('type','').upper()} 보유 중 (진입가: {position.get('entry', 0):,.0f})"
-                else:
-                     self.status = "실행 중"
-                
-                if position:
-                    logger.info(f"🔥 포지션 보유 중: {position['type']} {position['amount']}")
-                    # 여기서 청산 로직 추가 가능 (SL/TP 등)
-                    # 현재는 전략에 맡김
-                
-                elif not settings.get('skip'):
-                    l_prob, s_prob = self.predict_probs(current)
-                    direction = settings['direction']
-                    threshold = settings['threshold']
-                    
-                    signal = None
-                    if direction == 'long' and l_prob > threshold:
-                        signal = 'long'
-                        logger.info(f"🔍 Long 신호 감지! (확률: {l_prob:.2%})")
-                    elif direction == 'short' and s_prob > threshold:
-                        signal = 'short'
-                        logger.info(f"🔍 Short 신호 감지! (확률: {s_prob:.2%})")
-                    
-                    if signal:
-                        # 자금 관리
-                        balance = self.exchange.fetch_balance()['USDT']['free']
-                        risk = settings['risk']
-                        leverage = settings['leverage']
-                        
-                        # ATR 기반 포지션 사이징
-                        atr = current['atr'] if not pd.isna(current['atr']) else price * 0.01
-                        sl_pct = (atr * settings['sl_mult']) / price
-                        
-                        risk_amt = balance * risk
-                        target_size = risk_amt / sl_pct
-                        max_size = balance * leverage
-                        
-                        final_size_usd = min(target_size, max_size)
-                        amount = final_size_usd / price
-                        
-                        # Calculate Prices
-                        sl_price_val = price * (1 - sl_pct) if signal == 'long' else price * (1 + sl_pct)
-                        liq_price_val = price * (1 - 1/leverage) if signal == 'long' else price * (1 + 1/leverage)
-                        
-                        logger.info(f"🚀 진입 결정: {signal} | 크기: ${final_size_usd:.2f} ({amount:.4f} BTC)")
-                        self.execute_trade(signal, amount, leverage, sl_price=sl_price_val, liq_price=liq_price_val)
-                else:
-                    logger.info("⏸️ 횡보장 또는 스킵 구간 - 관망")
-                
-                logger.info("💤 다음 캔들 대기 (5분)...")
-                
-                # 모델 업데이트 체크
-                self.check_model_reload()
-                
-                self.wait_while_running(300)  # 5분 대기
+                self.wait_for_bar_close()
                 
             except KeyboardInterrupt:
                 logger.info("⏹️ 봇 중지")
@@ -553,11 +595,13 @@ class LiveTradingBot:
             except Exception as e:
                 logger.error(f"예기치 않은 오류: {e}")
                 self.status = f"오류 ({str(e)[:20]}...)"
-                self.wait_while_running(60)
+                self.wait_while_running(self.retry_delay)
         
         self.status = "Stopped"
         logger.info("5M Bot Stopped Loop.")
 
 if __name__ == "__main__":
+    # 단독 실행 시에만 레지스트리 등록 (대시보드가 PID/하트비트로 상태 확인)
+    register('bot_5m', interval=10)
     bot = LiveTradingBot()
     bot.run()
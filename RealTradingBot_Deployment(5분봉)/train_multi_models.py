@@ -6,13 +6,28 @@
 """
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
 import xgboost as xgb
 import joblib
 import os
+import sys
 from strategy import add_indicators
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.parallel_trainer import SharedFeatureMatrix, ModelTask, train_parallel, valid_rows
+from bots.model_store import export_compact
+
+TRADE_FEATURES = [
+    'rsi', 'rsi_change', 'adx', 'adx_pos', 'adx_neg', 'adx_change',
+    'dist_ema20', 'dist_ema60', 'dist_ema200', 'atr', 'vol_change',
+    'macd_hist', 'stoch_k', 'stoch_d', 'stoch_diff',
+    'bb_width', 'vol_ratio', 'ema_slope'
+]
+
+REGIME_FEATURES = [
+    'rsi', 'adx', 'dist_ema20', 'dist_ema60', 'dist_ema200',
+    'bb_width', 'vol_ratio', 'ema_slope', 'macd_hist'
+]
+
 def load_and_prepare_data(data_path='data/btc_usdt_5m_5y.csv'):
     """데이터 로드 및 전처리"""
     print(f"📊 데이터 로딩: {data_path}")
@@ -62,86 +77,31 @@ def load_and_prepare_data(data_path='data/btc_usdt_5m_5y.csv'):
     return df_1h
 
 
-def create_short_training_data(df):
-    """Short 거래 훈련 데이터 생성"""
-    print("\n📉 Short 훈련 데이터 생성...")
-    
-    feature_cols = [
-        'rsi', 'rsi_change', 'adx', 'adx_pos', 'adx_neg', 'adx_change',
-        'dist_ema20', 'dist_ema60', 'dist_ema200', 'atr', 'vol_change',
-        'macd_hist', 'stoch_k', 'stoch_d', 'stoch_diff',
-        'bb_width', 'vol_ratio', 'ema_slope'
-    ]
-    
-    # Short 진입 조건
-    df['short_signal'] = (
+def short_labels(df):
+    """Short 진입 조건 / 성공 여부 (가격 하락)"""
+    signal = (
         (df['supertrend_direction'] == -1) | 
         (df['rsi'] > 65) |
         (df['close'] < df['ema_60'])
-    ).astype(int)
-    
-    # Short 성공 여부 (가격 하락)
-    df['short_success'] = (df['future_return_8h'] < -0.01).astype(int)
-    
-    # 필터: Short 신호가 있는 경우만
-    short_data = df[df['short_signal'] == 1].copy()
-    short_data = short_data.dropna(subset=feature_cols + ['short_success'])
-    
-    X = short_data[feature_cols]
-    y = short_data['short_success']
-    
-    print(f"   Short 샘플: {len(X):,}개")
-    print(f"   성공률: {y.mean()*100:.1f}%")
-    
-    return X, y, feature_cols
+    )
+    success = (df['future_return_8h'] < -0.01).astype(int)
+    return signal, success
 
 
-def create_long_training_data(df):
-    """Long 거래 훈련 데이터 생성"""
-    print("\n📈 Long 훈련 데이터 생성...")
-    
-    feature_cols = [
-        'rsi', 'rsi_change', 'adx', 'adx_pos', 'adx_neg', 'adx_change',
-        'dist_ema20', 'dist_ema60', 'dist_ema200', 'atr', 'vol_change',
-        'macd_hist', 'stoch_k', 'stoch_d', 'stoch_diff',
-        'bb_width', 'vol_ratio', 'ema_slope'
-    ]
-    
-    # Long 진입 조건
-    df['long_signal'] = (
+def long_labels(df):
+    """Long 진입 조건 / 성공 여부 (가격 상승)"""
+    signal = (
         (df['supertrend_direction'] == 1) & 
         (df['close'] > df['ema_60']) &
         (df['adx'] > 20)
-    ).astype(int)
-    
-    # Long 성공 여부 (가격 상승)
-    df['long_success'] = (df['future_return_8h'] > 0.01).astype(int)
-    
-    # 필터
-    long_data = df[df['long_signal'] == 1].copy()
-    long_data = long_data.dropna(subset=feature_cols + ['long_success'])
-    
-    X = long_data[feature_cols]
-    y = long_data['long_success']
-    
-    print(f"   Long 샘플: {len(X):,}개")
-    print(f"   성공률: {y.mean()*100:.1f}%")
-    
-    return X, y, feature_cols
+    )
+    success = (df['future_return_8h'] > 0.01).astype(int)
+    return signal, success
 
 
-def create_regime_training_data(df):
-    """시장 레짐 분류 훈련 데이터 생성"""
-    print("\n🔄 시장 레짐 훈련 데이터 생성...")
-    
-    feature_cols = [
-        'rsi', 'adx', 'dist_ema20', 'dist_ema60', 'dist_ema200',
-        'bb_width', 'vol_ratio', 'ema_slope', 'macd_hist'
-    ]
-    
-    # 레짐 레이블
-    # 0: SIDEWAYS, 1: BULL, 2: BEAR
-    df['regime'] = 0  # 기본값 SIDEWAYS
+def regime_labels(df):
+    """시장 레짐 레이블 (0: SIDEWAYS, 1: BULL, 2: BEAR)"""
+    regime = pd.Series(0, index=df.index)  # 기본값 SIDEWAYS
     
     # BULL: 가격 상승 중
     bull_mask = (
@@ -149,7 +109,7 @@ def create_regime_training_data(df):
         (df['ema_20'] > df['ema_60']) &
         (df['future_return_24h'] > 0.02)
     )
-    df.loc[bull_mask, 'regime'] = 1
+    regime[bull_mask] = 1
     
     # BEAR: 가격 하락 중
     bear_mask = (
@@ -157,29 +117,12 @@ def create_regime_training_data(df):
         (df['ema_20'] < df['ema_60']) &
         (df['future_return_24h'] < -0.02)
     )
-    df.loc[bear_mask, 'regime'] = 2
-    
-    regime_data = df.dropna(subset=feature_cols + ['regime'])
-    
-    X = regime_data[feature_cols]
-    y = regime_data['regime']
-    
-    print(f"   총 샘플: {len(X):,}개")
-    print(f"   SIDEWAYS: {(y==0).sum():,}개 ({(y==0).mean()*100:.1f}%)")
-    print(f"   BULL: {(y==1).sum():,}개 ({(y==1).mean()*100:.1f}%)")
-    print(f"   BEAR: {(y==2).sum():,}개 ({(y==2).mean()*100:.1f}%)")
-    
-    return X, y, feature_cols
+    regime[bear_mask] = 2
+    return regime
 
 
-def train_model(X, y, model_name, n_classes=2):
-    """모델 훈련"""
-    print(f"\n🤖 {model_name} 모델 훈련...")
-    
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
-    
+def build_model(n_classes=2):
+    """XGBoost 분류기 생성 (학습 전)"""
     if n_classes == 2:
         model = xgb.XGBClassifier(
             n_estimators=200,
@@ -204,15 +147,7 @@ def train_model(X, y, model_name, n_classes=2):
             use_label_encoder=False,
             eval_metric='mlogloss'
         )
-    
-    model.fit(X_train, y_train)
-    
-    y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    
-    print(f"   정확도: {accuracy*100:.1f}%")
-    
-    return model, accuracy
+    return model
 
 
 def main():
@@ -224,17 +159,42 @@ def main():
     # 데이터 로드
     df = load_and_prepare_data()
     
-    # 1. Short 모델 훈련
-    X_short, y_short, short_features = create_short_training_data(df.copy())
-    short_model, short_acc = train_model(X_short, y_short, "Short", n_classes=2)
+    # 피처 행렬을 한 번만 만들어 공유 (모델별 df.copy() 제거)
+    short_signal, short_success = short_labels(df)
+    long_signal, long_success = long_labels(df)
+    regime = regime_labels(df)
+    
+    short_rows = valid_rows(df, TRADE_FEATURES, short_signal)
+    long_rows = valid_rows(df, TRADE_FEATURES, long_signal)
+    regime_rows = valid_rows(df, REGIME_FEATURES)
+    
+    print(f"\n📉 Short 샘플: {len(short_rows):,}개 (성공률 {short_success.to_numpy()[short_rows].mean()*100:.1f}%)")
+    print(f"📈 Long 샘플: {len(long_rows):,}개 (성공률 {long_success.to_numpy()[long_rows].mean()*100:.1f}%)")
+    print(f"🔄 Regime 샘플: {len(regime_rows):,}개")
+    
+    tasks = [
+        ModelTask("Short", build_model(2), TRADE_FEATURES, short_rows,
+                  short_success.to_numpy()[short_rows], stratify=True),
+        ModelTask("Long", build_model(2), TRADE_FEATURES, long_rows,
+                  long_success.to_numpy()[long_rows], stratify=True),
+        ModelTask("Regime", build_model(3), REGIME_FEATURES, regime_rows,
+                  regime.to_numpy()[regime_rows], stratify=True),
+    ]
+    
+    # 압축 모델 검증용 샘플 (최근 구간)
+    samples = {
+        "Short": df[TRADE_FEATURES].iloc[short_rows[-2000:]],
+        "Long": df[TRADE_FEATURES].iloc[long_rows[-2000:]],
+        "Regime": df[REGIME_FEATURES].iloc[regime_rows[-2000:]],
+    }
     
-    # 2. Long 모델 훈련
-    X_long, y_long, long_features = create_long_training_data(df.copy())
-    long_model, long_acc = train_model(X_long, y_long, "Long", n_classes=2)
+    with SharedFeatureMatrix(df, TRADE_FEATURES + REGIME_FEATURES) as matrix:
+        del df
+        results = train_parallel(matrix, tasks)
     
-    # 3. 레짐 분류 모델 훈련
-    X_regime, y_regime, regime_features = create_regime_training_data(df.copy())
-    regime_model, regime_acc = train_model(X_regime, y_regime, "Regime", n_classes=3)
+    short_model, short_acc, short_features = results["Short"].model, results["Short"].accuracy, results["Short"].features
+    long_model, long_acc, long_features = results["Long"].model, results["Long"].accuracy, results["Long"].features
+    regime_model, regime_acc, regime_features = results["Regime"].model, results["Regime"].accuracy, results["Regime"].features
     
     # 모델 저장
     print("\n💾 모델 저장...")
@@ -245,6 +205,8 @@ def main():
         'accuracy': short_acc
     }, 'short_model.pkl')
     print("   ✅ short_model.pkl 저장")
+    if export_compact(short_model, short_features, 'short_model.pkl', short_acc, sample=samples["Short"]):
+        print("   📦 short_model.trees.npy 저장")
     
     joblib.dump({
         'model': long_model,
@@ -252,6 +214,8 @@ def main():
         'accuracy': long_acc
     }, 'long_model.pkl')
     print("   ✅ long_model.pkl 저장")
+    if export_compact(long_model, long_features, 'long_model.pkl', long_acc, sample=samples["Long"]):
+        print("   📦 long_model.trees.npy 저장")
     
     joblib.dump({
         'model': regime_model,
@@ -259,6 +223,8 @@ def main():
         'accuracy': regime_acc
     }, 'regime_model.pkl')
     print("   ✅ regime_model.pkl 저장")
+    if export_compact(regime_model, regime_features, 'regime_model.pkl', regime_acc, sample=samples["Regime"]):
+        print("   📦 regime_model.trees.npy 저장")
     
     print("\n" + "="*60)
     print("📊 훈련 결과 요약")
@@ -266,6 +232,8 @@ def main():
     print(f"   Short 모델 정확도: {short_acc*100:.1f}%")
     print(f"   Long 모델 정확도: {long_acc*100:.1f}%")
     print(f"   Regime 모델 정확도: {regime_acc*100:.1f}%")
+    for name, res in results.items():
+        print(f"   {name} 소요 시간: fit {res.timings['fit']:.1f}s / 총 {res.timings['total']:.1f}s (스레드 {res.n_jobs})")
     print("="*60)
 
 if __name__ == "__main__":
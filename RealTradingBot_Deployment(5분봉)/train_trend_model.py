@@ -1,12 +1,15 @@
 import pandas as pd
 import numpy as np
-import xgboost as xgb
-from sklearn.model_selection import RandomizedSearchCV, TimeSeriesSplit
+import os
+import sys
 from sklearn.metrics import accuracy_score, precision_score, classification_report
 import joblib
 import pandas_ta as ta
 from strategy import add_indicators
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.xgb_search import QuantizedCVSearch
+
 def prepare_trend_data(df, max_hold=48):
     """
     데이터 준비 및 메타 라벨링 (1시간봉 기준)
@@ -157,14 +160,6 @@ def train_trend_model(data_path, model_path='trend_xgb.pkl'):
     X_train, X_test = X.iloc[:train_size], X.iloc[train_size:]
     y_train, y_test = y.iloc[:train_size], y.iloc[train_size:]
     
-    # XGBoost
-    model = xgb.XGBClassifier(
-        objective='binary:logistic',
-        eval_metric='logloss',
-        use_label_encoder=False,
-        n_jobs=-1
-    )
-    
     # Hyperparameter Tuning
     param_dist = {
         'n_estimators': [100, 200, 300],
@@ -176,18 +171,19 @@ def train_trend_model(data_path, model_path='trend_xgb.pkl'):
         'gamma': [0, 0.1, 0.2]
     }
     
-    tscv = TimeSeriesSplit(n_splits=3)
-    random_search = RandomizedSearchCV(
-        model, param_distributions=param_dist, n_iter=20,
-        scoring='precision', # Maximize Precision (Win Rate)
-        cv=tscv, verbose=1, random_state=42, n_jobs=-1
+    # 폴드별 양자화 행렬은 한 번만 만들고, 결과는 (데이터 해시, 파라미터)로 캐시
+    # early stopping은 각 학습 폴드 안의 내부 분할로 → X_test와 CV 검증 폴드는 round 선택에 쓰이지 않음
+    search = QuantizedCVSearch(
+        X_train, y_train, n_splits=3, scoring='precision', # Maximize Precision (Win Rate)
+        early_stopping_rounds=30, n_jobs=-1,
+        cache_path=os.path.splitext(model_path)[0] + '_search_cache.json'
     )
     
     print("Starting Hyperparameter Tuning...")
-    random_search.fit(X_train, y_train)
+    best = search.search(param_dist, n_iter=20, random_state=42)
     
-    best_model = random_search.best_estimator_
-    print(f"Best Parameters: {random_search.best_params_}")
+    best_model = search.refit(best)
+    print(f"Best Parameters: {best['params']} (rounds: {best['best_rounds']}, CV precision: {best['mean_score']:.4f})")
     
     # Evaluate
     y_pred = best_model.predict(X_test)
@@ -0,0 +1,297 @@
+"""
+ML 모델 추론 벤치마크
+- 모델 세트: 5분봉(XGB short/long/regime), 15분봉(LGBM), 1시간봉(XGB *_1h)
+- 측정: 콜드 로드 시간(새 프로세스), 단일 행 지연 p50/p99(현재 봇 코드 경로 / numpy 직접 경로),
+        배치 처리량, 메모리(RSS)
+- 결과는 JSON 리포트로 저장, --compare로 이전 리포트와 비교
+
+사용법:
+    python benchmark_models.py
+    python benchmark_models.py --sets 1h --iterations 2000 --output bench_1h.json
+    python benchmark_models.py --compare bench_prev.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import joblib
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+from bots.model_store import compact_paths, load_compact
+
+MODEL_SETS = {
+    '5m': ('RealTradingBot_Deployment(5분봉)', {
+        'short': 'short_model.pkl', 'long': 'long_model.pkl', 'regime': 'regime_model.pkl'}),
+    '15m': ('deploy_package--15분봉', {
+        'short': 'lgbm_short.pkl', 'long': 'lgbm_long.pkl', 'regime': 'lgbm_regime.pkl'}),
+    '1h': ('bybit_bot_usb(1시간-통합)', {
+        'short': 'xgb_short_1h.pkl', 'long': 'xgb_long_1h.pkl', 'regime': 'xgb_regime_1h.pkl'}),
+}
+
+BATCH_SIZES = [1, 64, 1024, 8192]
+
+_COLD_LOAD_SNIPPET = """
+import sys, time, json
+t0 = time.perf_counter()
+import joblib
+t1 = time.perf_counter()
+obj = joblib.load(sys.argv[1])
+t2 = time.perf_counter()
+rss = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1]) / 1024
+print(json.dumps({'import_s': t1 - t0, 'load_s': t2 - t1, 'rss_mb': rss}))
+"""
+
+
+def rss_mb():
+    """현재 프로세스 RSS (MB), /proc 없으면 ru_maxrss"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(samples):
+    arr = np.asarray(samples) * 1e6  # us
+    return {
+        'p50_us': round(float(np.percentile(arr, 50)), 2),
+        'p99_us': round(float(np.percentile(arr, 99)), 2),
+        'mean_us': round(float(arr.mean()), 2),
+        'n': len(samples),
+    }
+
+
+def unpack(obj):
+    """{'model', 'features'} 딕셔너리 / 모델 단독 저장 형식 모두 지원"""
+    if isinstance(obj, dict):
+        return obj['model'], list(obj['features'])
+    if hasattr(obj, 'feature_names_in_'):
+        return obj, list(obj.feature_names_in_)
+    return obj, list(obj.get_booster().feature_names)
+
+
+def fast_path(model, kind):
+    """DataFrame 검증을 건너뛰고 부스터에 numpy 배열을 바로 넣는 경로"""
+    if hasattr(model, 'get_booster'):  # XGBoost
+        booster = model.get_booster()
+
+        def run(arr):
+            out = booster.inplace_predict(arr)
+            if kind == 'predict':
+                return out.argmax(axis=1) if out.ndim == 2 else out
+            return out[:, 1] if out.ndim == 2 else out
+        return 'xgb.inplace_predict', run
+
+    if hasattr(model, 'booster_'):  # LightGBM
+        booster = model.booster_
+
+        def run(arr):
+            out = booster.predict(arr)
+            if kind == 'predict':
+                return out.argmax(axis=1) if out.ndim == 2 else (out > 0.5).astype(int)
+            return out[:, 1] if out.ndim == 2 else out
+        return 'lgbm.booster_.predict', run
+
+    if kind == 'predict':
+        return 'model.predict(ndarray)', model.predict
+    return 'model.predict_proba(ndarray)', lambda arr: model.predict_proba(arr)[:, 1]
+
+
+def time_calls(fn, iterations, warmup=20):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def cold_load(path, repeats):
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, '-c', _COLD_LOAD_SNIPPET, path],
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        'import_s': round(min(r['import_s'] for r in runs), 4),
+        'load_s': round(min(r['load_s'] for r in runs), 4),
+        'load_s_max': round(max(r['load_s'] for r in runs), 4),
+        'rss_mb': round(max(r['rss_mb'] for r in runs), 1),
+        'repeats': repeats,
+    }
+
+
+def bench_model(name, path, iterations, cold_repeats, rng):
+    kind = 'predict' if name == 'regime' else 'proba'
+    result = {'file': os.path.relpath(path, BASE_DIR), 'size_kb': round(os.path.getsize(path) / 1024, 1),
+              'call': kind}
+
+    result['cold_load'] = cold_load(path, cold_repeats)
+
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    model, features = unpack(joblib.load(path))
+    result['warm_load_s'] = round(time.perf_counter() - t0, 4)
+    result['rss_delta_mb'] = round(rss_mb() - rss_before, 1)
+    result['model_type'] = type(model).__name__
+    result['n_features'] = len(features)
+
+    # 봇이 쓰는 행과 비슷하게: 피처 외 컬럼도 섞인 한 행
+    row = {f: float(v) for f, v in zip(features, rng.normal(size=len(features)))}
+    row.update({'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0})
+    arr1 = np.asarray([[row[f] for f in features]], dtype=np.float32)
+
+    # 1) 현재 경로: pd.DataFrame([row])[features] → predict / predict_proba
+    if kind == 'predict':
+        current = lambda: int(model.predict(pd.DataFrame([row])[features])[0])
+    else:
+        current = lambda: model.predict_proba(pd.DataFrame([row])[features])[0][1]
+    result['single_row_current'] = percentiles(time_calls(current, iterations))
+
+    # 2) 빠른 경로: numpy → 부스터 직접 호출
+    fast_name, fast_fn = fast_path(model, kind)
+    result['single_row_fast'] = percentiles(time_calls(lambda: fast_fn(arr1), iterations))
+    result['single_row_fast']['path'] = fast_name
+    result['speedup_p50'] = round(result['single_row_current']['p50_us'] /
+                                  max(result['single_row_fast']['p50_us'], 1e-9), 2)
+
+    # 두 경로 결과 일치 여부
+    batch = rng.normal(size=(max(BATCH_SIZES), len(features))).astype(np.float32)
+    check = batch[:256]
+    check_df = pd.DataFrame(check, columns=features)
+    ref = model.predict(check_df) if kind == 'predict' else model.predict_proba(check_df)[:, 1]
+    result['fast_max_abs_diff'] = float(np.max(np.abs(np.asarray(ref, dtype=np.float64) -
+                                                      np.asarray(fast_fn(check), dtype=np.float64))))
+
+    # 3) 배치 처리량 (rows/s)
+    throughput = {}
+    for size in BATCH_SIZES:
+        chunk = batch[:size]
+        reps = max(5, min(200, 20000 // size))
+        samples = time_calls(lambda: fast_fn(chunk), reps, warmup=3)
+        throughput[str(size)] = round(size / float(np.median(samples)), 1)
+    result['batch_rows_per_s'] = throughput
+
+    # 4) 압축 형식(.trees.npy)이 있으면 로드/지연 비교
+    if all(os.path.exists(p) for p in compact_paths(path)):
+        t0 = time.perf_counter()
+        compact = load_compact(path)
+        load_s = time.perf_counter() - t0
+        call = (lambda: compact.predict(arr1)) if kind == 'predict' else (lambda: compact.predict_proba(arr1)[0][1])
+        result['compact'] = {
+            'load_s': round(load_s, 4),
+            'single_row': percentiles(time_calls(call, iterations)),
+            'max_abs_diff': float(np.max(np.abs(
+                np.asarray(ref, dtype=np.float64) -
+                (compact.predict(check) if kind == 'predict' else compact.predict_proba(check)[:, 1])))),
+        }
+
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def package_versions():
+    versions = {'numpy': np.__version__, 'pandas': pd.__version__, 'joblib': joblib.__version__}
+    for mod in ('xgboost', 'lightgbm', 'sklearn'):
+        try:
+            versions[mod] = __import__(mod).__version__
+        except ImportError:
+            versions[mod] = None
+    return versions
+
+
+def compare(report, previous_path):
+    with open(previous_path) as f:
+        prev = json.load(f)
+    print(f"\n📊 이전 리포트와 비교 ({previous_path}, rev {prev.get('meta', {}).get('git_rev')})")
+    for set_name, models in report['results'].items():
+        for name, cur in models.items():
+            old = prev.get('results', {}).get(set_name, {}).get(name)
+            if not old or 'error' in cur or 'error' in old:
+                continue
+            for key in ('single_row_current', 'single_row_fast'):
+                a, b = old[key]['p50_us'], cur[key]['p50_us']
+                print(f"   {set_name}/{name} {key:<19} p50 {a:>9.1f}us → {b:>9.1f}us ({(b - a) / a * 100:+.1f}%)")
+            a, b = old['cold_load']['load_s'], cur['cold_load']['load_s']
+            print(f"   {set_name}/{name} cold_load           {a:>9.3f}s  → {b:>9.3f}s  ({(b - a) / a * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ML 모델 추론 벤치마크")
+    parser.add_argument('--sets', nargs='+', default=list(MODEL_SETS), choices=list(MODEL_SETS))
+    parser.add_argument('--iterations', type=int, default=1000, help="단일 행 측정 반복 횟수")
+    parser.add_argument('--cold-repeats', type=int, default=3, help="콜드 로드 측정 횟수")
+    parser.add_argument('--output', default=f"benchmark_models_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument('--compare', help="비교할 이전 리포트 JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_rev': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'packages': package_versions(),
+            'iterations': args.iterations,
+        },
+        'results': {},
+    }
+
+    for set_name in args.sets:
+        folder, files = MODEL_SETS[set_name]
+        report['results'][set_name] = {}
+        for name, filename in files.items():
+            path = os.path.join(BASE_DIR, folder, filename)
+            if not os.path.exists(path):
+                print(f"⚠️ {set_name}/{name}: 파일 없음 ({path})")
+                continue
+            print(f"⏱️ {set_name}/{name} ({filename}) 측정 중...")
+            try:
+                res = bench_model(name, path, args.iterations, args.cold_repeats, rng)
+            except Exception as e:
+                print(f"   ❌ 실패: {e}")
+                res = {'file': filename, 'error': str(e)}
+            else:
+                print(f"   cold {res['cold_load']['load_s']*1000:.1f}ms | "
+                      f"현재 p50 {res['single_row_current']['p50_us']:.0f}us / p99 {res['single_row_current']['p99_us']:.0f}us | "
+                      f"빠른 경로 p50 {res['single_row_fast']['p50_us']:.0f}us (x{res['speedup_p50']}) | "
+                      f"배치 8192 {res['batch_rows_per_s']['8192']:,.0f} rows/s")
+            report['results'][set_name][name] = res
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 리포트 저장: {args.output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
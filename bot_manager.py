@@ -1,7 +1,8 @@
 import os
 import sys
-import threading
 import time
+import asyncio
+import threading
 import importlib.util
 import logging
 import pandas as pd
@@ -10,13 +11,28 @@ from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import JSONResponse
 import uvicorn
-import ccxt
 
-# 로깅 설정
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 로깅 설정 (콘솔 출력도 공용 기록 스레드가 처리 → 봇 스레드에서 stdout 쓰기 없음)
+from bots.log_setup import setup_logging, stats as log_stats
+setup_logging(None, console=True)
 logger = logging.getLogger("BotManager")
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 재학습/최적화 작업은 매니저의 중앙 스케줄러가 담당 (봇 개별 스케줄러 비활성화)
+os.environ['CENTRAL_JOB_SCHEDULER'] = '1'
+from bots.job_scheduler import JobScheduler, JobSpec
+from bots.rate_limiter import get_public_exchange, DASHBOARD
+from bots.market_stream import get_market_stream
+from bots.account_state import account_status
+from bots.metrics import metrics
+from bots.rate_limiter import stats as rate_limit_stats
+from bots.tick_triggers import triggers_status
+from bots.perf_stats import PerfStats
+from bots.log_index import get_log_index
+from bots.account_snapshot import snapshot_status
+from bots.bar_clock import clocks_status
+from bots.async_runtime import BotSpec, get_runtime
 
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
@@ -48,22 +64,35 @@ class BotManager:
     def __init__(self):
         self.bots = {}
         self.current_price = 90000.0
+        # 봇/주기 작업은 공용 이벤트 루프의 태스크로 실행 (블로킹 작업은 런타임의 스레드 풀)
+        self.runtime = get_runtime()
         self.setup_bots()
+        self.setup_jobs()
         # Initialize data immediately in background
-        threading.Thread(target=self.initialize_data, daemon=True).start()
+        self.runtime.spawn('initialize_data', self.initialize_data)
         # Start background price updater
-        threading.Thread(target=self.price_updater, daemon=True).start()
+        self.runtime.spawn('price_updater', self.price_updater)
+
+    def on_tick(self, tick):
+        self.current_price = tick.price
 
-    def price_updater(self):
+    async def price_updater(self):
         """Fetch real-time BTC price in background loop."""
-        exchange = ccxt.binance()
+        # 시세 스트림이 살아 있으면 틱으로 갱신, 끊겼을 때만 REST 폴링 (조회는 스레드 풀에서)
+        self.market_stream = get_market_stream()
+        if self.market_stream:
+            self.market_stream.subscribe_ticker('BTC/USDT', self.on_tick)
+        exchange = get_public_exchange('binance', priority=DASHBOARD)
         while True:
+            if self.market_stream and self.market_stream.last_price('BTC/USDT', max_age=5) is not None:
+                await asyncio.sleep(1)
+                continue
             try:
-                ticker = exchange.fetch_ticker('BTC/USDT')
+                ticker = await self.runtime.offload(exchange.fetch_ticker, 'BTC/USDT')
                 self.current_price = float(ticker['last'])
             except Exception as e:
                 logger.error(f"Price update error: {e}")
-            time.sleep(1) # Refresh every 1 second
+            await asyncio.sleep(1) # Refresh every 1 second
 
     def setup_bots(self):
         # 1. 30분봉
@@ -128,23 +157,46 @@ class BotManager:
             self.bots["Bot_15M"] = PlaceholderBot("Bot_15M", "15m")
         self.bots["Bot_15M"].interval = "15m"
 
-    def initialize_data(self):
+    def setup_jobs(self):
+        """봇별 일일 재학습(retrain.py, 기존에 각 봇이 00:00에 띄우던 것)을 중앙 스케줄러에 등록
+        데이터 갱신(update_and_retrain.py, 재학습 포함)과 1h 파라미터 최적화는 수동 작업으로만 등록
+        (/api/jobs/run/{name}으로 실행, 00:00 재학습과 겹치지 않도록 시각 지정 없음)"""
+        self.jobs = JobScheduler(
+            max_concurrent=int(os.getenv('JOB_MAX_CONCURRENT', '1')),
+            log_dir=os.path.join(BASE_DIR, "logs", "jobs"),
+        )
+        dir_5m = os.path.join(BASE_DIR, "RealTradingBot_Deployment(5분봉)")
+        dir_15m = os.path.join(BASE_DIR, "deploy_package--15분봉")
+        dir_1h = os.path.join(BASE_DIR, "bybit_bot_usb(1시간-통합)")
+        specs = [
+            JobSpec("retrain_5m", "retrain.py", dir_5m, at="00:00"),
+            JobSpec("retrain_15m", "retrain.py", dir_15m, at="00:00"),
+            JobSpec("retrain_1h", "retrain.py", dir_1h, at="00:00"),
+            JobSpec("data_update_5m", "update_and_retrain.py", dir_5m),
+            JobSpec("optimize_1h", "auto_optimizer.py", dir_1h),
+        ]
+        for spec in specs:
+            if os.path.exists(os.path.join(spec.cwd, spec.script)):
+                self.jobs.register(spec)
+        self.jobs.start()
+
+    async def initialize_data(self):
         """Pre-populate data for all bots to avoid empty charts."""
-        time.sleep(2) # Wait for imports and startups
+        await asyncio.sleep(2) # Wait for imports and startups
         logger.info("Initializing bot data...")
         
         # Bot 30M
         try:
             if hasattr(self.bots["Bot_30M"], 'execute_logic'):
                 logger.info("Triggering Bot_30M logic for initial data...")
-                self.bots["Bot_30M"].execute_logic()
+                await self.runtime.offload(self.bots["Bot_30M"].execute_logic)
         except Exception as e: logger.error(f"Bot_30M init error: {e}")
 
         # Bot 1H
         try:
             if hasattr(self.bots["Bot_1H"], 'fetch_data'):
                 logger.info("Triggering Bot_1H fetch for initial data...")
-                self.bots["Bot_1H"].fetch_data()
+                await self.runtime.offload(self.bots["Bot_1H"].fetch_data)
         except Exception as e: logger.error(f"Bot_1H init error: {e}")
 
         # Bots 5M and 15M usually self-init or we can add logic if needed
@@ -160,12 +212,25 @@ class BotManager:
         bot.is_running = True
         bot.status = "실행 중"
         
-        # 15분봉 특수 처리
-        if name == "Bot_15M":
+        # 15분봉 특수 처리 (모듈 함수 + 모듈 수준 dashboard 객체)
+        if name == "Bot_15M" and hasattr(bot, 'clock'):
             import main
-            t = threading.Thread(target=main.main, daemon=True)
-            bot.thread = t
-            t.start()
+            ctx = {}
+            self.runtime.start(BotSpec(name, step=lambda: main.step(ctx), clock=bot.clock,
+                                       intrabar=lambda: main.intrabar(ctx),
+                                       intrabar_interval=bot.intrabar_interval,
+                                       setup=lambda: ctx.update(main.setup()), bot=bot))
+            logger.info(f"Started {name}")
+            return
+
+        # 봉 단위 봇: step()을 봉 마감마다, check_intrabar()를 봉 사이에 런타임이 호출
+        if hasattr(bot, 'step') and hasattr(bot, 'clock'):
+            spec = BotSpec(name, step=bot.step, clock=bot.clock, intrabar=getattr(bot, 'check_intrabar', None),
+                           bot=bot)
+            spec.intrabar_interval = getattr(bot, 'intrabar_interval', spec.intrabar_interval)
+            spec.retry_delay = getattr(bot, 'retry_delay', spec.retry_delay)
+            self.runtime.start(spec)
+            logger.info(f"Started {name}")
             return
 
         # 실행 메서드 찾기
@@ -184,6 +249,7 @@ class BotManager:
         
         bot.is_running = False
         bot.status = "Stopped"
+        self.runtime.stop(name)  # 태스크 취소 → 대기 중이면 즉시 종료
         if hasattr(bot, 'stop'): bot.stop()
         logger.info(f"Stopped {name}")
 
@@ -193,8 +259,6 @@ manager = BotManager()
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-import ccxt
-
 @app.get("/api/data")
 async def get_data():
     bot_list = []
@@ -279,6 +343,59 @@ async def stop_bot_api(name: str):
     manager.stop_bot(name)
     return {"success": True}
 
+@app.get("/api/jobs")
+async def get_jobs():
+    return JSONResponse(content=manager.jobs.status())
+
+@app.post("/api/jobs/run/{name}")
+async def run_job_api(name: str):
+    return {"success": manager.jobs.submit(name)}
+
+@app.get("/api/market_stream")
+async def get_market_stream_status():
+    stream = getattr(manager, 'market_stream', None)
+    return JSONResponse(content=stream.status() if stream else {"enabled": False})
+
+@app.get("/api/accounts")
+async def get_account_status():
+    return JSONResponse(content=account_status())
+
+@app.get("/api/triggers")
+async def get_triggers():
+    """봇별 장전된 틱 트리거 / 최근 실행"""
+    return JSONResponse(content=triggers_status())
+
+@app.get("/api/performance")
+async def get_performance():
+    """봇별 누적 성과 통계 + 전체 합산 (각 봇이 거래마다 갱신한 통계를 합치기만 함)"""
+    result = {}
+    total = PerfStats(period='month')
+    for name, bot in manager.bots.items():
+        try:
+            store = getattr(bot, 'trade_store', None)
+            perf = store.perf() if store is not None else getattr(bot, 'perf', None)
+        except Exception as e:
+            logger.error(f"Performance stats error for {name}: {e}")
+            continue
+        if perf is None:
+            continue
+        result[name] = perf.summary()
+        total.merge(perf)
+    result['total'] = total.summary()
+    result['monthly'] = total.periods()
+    return JSONResponse(content=result)
+
+@app.get("/api/metrics")
+async def get_metrics(source: str = None):
+    """엔드포인트별 지연/오류/응답 코드 + 레이트 리밋 대기"""
+    data = metrics.snapshot(source)
+    data['rate_limits'] = rate_limit_stats()
+    data['logging'] = log_stats()
+    data['account_snapshots'] = snapshot_status()
+    data['bar_clocks'] = clocks_status()
+    data['runtime'] = manager.runtime.status()
+    return JSONResponse(content=data)
+
 def get_log_tail(file_path, lines=50):
     """Read last N lines from a log file."""
     if not os.path.exists(file_path):
@@ -295,23 +412,38 @@ def get_log_tail(file_path, lines=50):
     except Exception as e:
         return [f"Error reading log: {e}"]
 
+LOG_FILES = {
+    "Bot_30M": os.path.join(BASE_DIR, "BTC_30분봉_Live", "bot.log"),
+    "Bot_5M": os.path.join(BASE_DIR, "RealTradingBot_Deployment(5분봉)", "bot.log"),
+    "Bot_1H": os.path.join(BASE_DIR, "bybit_bot_usb(1시간-통합)", "bot_1h.log"),
+    "Bot_15M": os.path.join(BASE_DIR, "deploy_package--15분봉", "bot.log"),
+}
+
 @app.get("/api/logs/{name}")
 async def get_bot_logs(name: str):
     """Return the last 50 lines of logs for the specified bot."""
-    log_map = {
-        "Bot_30M": os.path.join(BASE_DIR, "BTC_30분봉_Live", "bot.log"),
-        "Bot_5M": os.path.join(BASE_DIR, "RealTradingBot_Deployment(5분봉)", "bot.log"),
-        "Bot_1H": os.path.join(BASE_DIR, "bybit_bot_usb(1시간-통합)", "bot_1h.log"),
-        "Bot_15M": os.path.join(BASE_DIR, "deploy_package--15분봉", "bot.log"),
-    }
-    
-    path = log_map.get(name)
+    path = LOG_FILES.get(name)
     if not path:
         return {"logs": ["Unknown bot name."]}
         
     logs = get_log_tail(path, lines=50)
     return {"logs": logs}
 
+@app.get("/api/logs/{name}/search")
+def search_bot_logs(name: str, start: str = None, end: str = None, level: str = None,
+                    keyword: str = None, limit: int = 500, newest_first: bool = False):
+    """시간 범위/레벨/키워드로 로그 조회 (사이드카 인덱스로 해당 구간만 읽음)
+    예: /api/logs/Bot_1H/search?start=2025-06-01&end=2025-06-01&keyword=TS 발동"""
+    path = LOG_FILES.get(name)
+    if not path:
+        return {"logs": ["Unknown bot name."]}
+    if not os.path.exists(path):
+        return {"logs": ["Log file not found."]}
+    index = get_log_index(path)
+    logs = index.search(start=start, end=end, level=level, keyword=keyword,
+                        limit=min(limit, 5000), newest_first=newest_first)
+    return {"logs": logs, "count": len(logs), "index": index.status()}
+
 if __name__ == "__main__":
     # 서버 시작 시 모든 봇 자동 실행
     logger.info("Auto-starting all bots...")
@@ -0,0 +1,205 @@
+"""
+계정 스냅샷 (잔고/포지션을 주기적으로 한 곳에서 조회해 파일로 공유)
+- 생산자: 계정 이름별 스레드 하나가 interval마다 잔고/포지션 조회 → run/account_<이름>.json (임시 파일 + rename)
+- 같은 계정을 여러 프로세스가 생산하려 하면 잠금 파일(flock)을 잡은 쪽만 조회, 나머지는 읽기만 함
+  (봇과 대시보드가 둘 다 시작해도 거래소 조회는 한 번)
+- AccountState(비공개 WebSocket)가 살아 있으면 메모리 값 사용 → REST 호출 없음
+- 소비자(대시보드): read_snapshot()은 파일 mtime이 바뀔 때만 다시 읽음 → 요청당 거래소 비용 0
+- 키가 없거나 조회에 실패하면 error를 기록하고 마지막 정상 값은 유지
+
+사용:
+    start_account_snapshot('bybit_15m', make_exchange, symbols=['BTC/USDT'], interval=10)
+    snap = read_snapshot('bybit_15m')     # {'balance', 'free', 'currency', 'positions', 'ts', 'age', 'stale', ...}
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: 잠금 없이 각자 생산
+    fcntl = None
+
+logger = logging.getLogger("AccountSnapshot")
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'run')
+DEFAULT_INTERVAL = 10.0
+
+
+def snapshot_path(name, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, f"account_{name}.json")
+
+
+def _position_row(symbol, amount, entry, **extra):
+    return {'symbol': symbol, 'side': 'long' if amount > 0 else 'short', 'amount': amount, 'entry': entry, **extra}
+
+
+class AccountSnapshotProducer:
+    def __init__(self, name, make_exchange, symbols=(), interval=DEFAULT_INTERVAL, account=None,
+                 currency='USDT', directory=SNAPSHOT_DIR):
+        self.name = name
+        self.make_exchange = make_exchange  # 처음 필요할 때 한 번 호출 (키가 없으면 None 반환)
+        self.exchange = None
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.account = account
+        self.currency = currency
+        self.path = snapshot_path(name, directory)
+        self.lock_path = self.path + '.lock'
+        self.lock_file = None
+        self.snapshot = {'name': name, 'balance': 0.0, 'free': 0.0, 'currency': currency, 'positions': [],
+                         'ts': 0.0, 'updated_at': None, 'interval': interval, 'source': None, 'error': None}
+        self.stats = {'refreshes': 0, 'errors': 0, 'leader': False}
+        self.is_running = False
+        self.thread = None
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"AccountSnapshot-{self.name}")
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+
+    def _run(self):
+        while self.is_running:
+            if self._acquire():
+                self.refresh()
+            time.sleep(self.interval)
+        if self.lock_file is not None:
+            self.lock_file.close()  # 잠금 해제 → 다른 프로세스가 이어받음
+            self.lock_file = None
+
+    def _acquire(self):
+        """이 프로세스가 생산자인지 (잠금을 못 잡으면 다른 프로세스가 생산 중, 다음 주기에 다시 시도)"""
+        if self.lock_file is not None or fcntl is None:
+            self.stats['leader'] = True
+            return True
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        f = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self.lock_file = f
+        self.stats['leader'] = True
+        logger.info(f"[{self.name}] 계정 스냅샷 생산 시작 (PID {os.getpid()})")
+        return True
+
+    def refresh(self):
+        try:
+            if self.account is not None and self.account.is_live():
+                data = self._from_account()
+            else:
+                if self.exchange is None:
+                    self.exchange = self.make_exchange()
+                if self.exchange is None:
+                    raise RuntimeError("API 키 없음")
+                data = self._from_exchange()
+            now = time.time()
+            self.snapshot.update(data, ts=now, updated_at=time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now)),
+                                 error=None)
+            self.stats['refreshes'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.snapshot['error'] = str(e)
+            logger.warning(f"[{self.name}] 계정 조회 실패 (이전 값 유지): {e}")
+        self._publish()
+
+    def _from_account(self):
+        positions = []
+        for symbol in self.symbols:
+            pos = self.account.position(symbol)
+            if pos:
+                positions.append(_position_row(symbol, pos['amount'], pos.get('entry'),
+                                               leverage=pos.get('leverage')))
+        return {'balance': self.account.balance(self.currency), 'free': self.account.balance(self.currency, 'free'),
+                'positions': positions, 'source': 'stream'}
+
+    def _from_exchange(self):
+        balance = self.exchange.fetch_balance()
+        data = {'balance': float(balance.get('total', {}).get(self.currency) or 0.0),
+                'free': float(balance.get('free', {}).get(self.currency) or 0.0), 'source': 'rest'}
+        if self.symbols and hasattr(self.exchange, 'fetch_positions'):
+            positions = []
+            for p in self.exchange.fetch_positions(self.symbols):
+                contracts = float(p.get('contracts') or 0.0)
+                if contracts:
+                    amount = contracts if p.get('side') != 'short' else -contracts
+                    positions.append(_position_row(p.get('symbol'), amount, p.get('entryPrice'),
+                                                   leverage=p.get('leverage'),
+                                                   unrealized_pnl=p.get('unrealizedPnl'),
+                                                   liquidation=p.get('liquidationPrice')))
+            data['positions'] = positions
+        return data
+
+    def _publish(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot, f, default=str)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"[{self.name}] 스냅샷 기록 실패: {e}")
+
+    def status(self):
+        return {'path': self.path, 'interval': self.interval, 'ts': self.snapshot['ts'],
+                'error': self.snapshot['error'], **self.stats}
+
+
+_producers = {}
+_producers_lock = threading.Lock()
+
+
+def start_account_snapshot(name, make_exchange, symbols=(), interval=DEFAULT_INTERVAL, account=None,
+                           currency='USDT'):
+    """계정 이름별 생산자 (프로세스 내 하나, 프로세스 간에는 잠금 파일로 하나)"""
+    with _producers_lock:
+        producer = _producers.get(name)
+        if producer is None:
+            producer = _producers[name] = AccountSnapshotProducer(name, make_exchange, symbols, interval,
+                                                                  account, currency)
+            producer.start()
+        else:
+            for s in symbols:
+                if s not in producer.symbols:
+                    producer.symbols.append(s)
+            if producer.account is None:
+                producer.account = account
+        return producer
+
+
+_cache = {}
+
+
+def read_snapshot(name, max_age=None, directory=SNAPSHOT_DIR):
+    """마지막으로 게시된 스냅샷 (없으면 None), age/stale 추가
+    max_age 기본값: 생산 주기의 3배 (생산자가 멈추면 stale)"""
+    path = snapshot_path(name, directory)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _cache.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = _cache[path] = (mtime, json.load(f))
+        except (OSError, ValueError):
+            return cached[1] if cached else None
+    snap = dict(cached[1])
+    age = time.time() - snap['ts'] if snap.get('ts') else None
+    limit = max_age or (snap.get('interval') or DEFAULT_INTERVAL) * 3
+    snap['age'] = round(age, 1) if age is not None else None
+    snap['stale'] = age is None or age > limit
+    return snap
+
+
+def snapshot_status():
+    with _producers_lock:
+        return {name: p.status() for name, p in _producers.items()}
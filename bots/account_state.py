@@ -0,0 +1,331 @@
+"""
+계정 상태 캐시 (Bybit V5 비공개 WebSocket + 주기적 REST 대조)
+- position / wallet / order / execution 토픽을 받아 메모리에 유지 → 봇의 포지션/잔고 조회는 메모리 조회
+- 연결 직후와 reconcile_interval마다 ccxt REST로 대조 (끊긴 동안 놓친 이벤트 보정, 차이는 경고 로그)
+- REST 응답보다 최신인 WebSocket 갱신은 덮어쓰지 않음
+- 연결이 끊겼거나 대조가 오래되면 is_live() = False → 호출 측은 기존 REST 경로 사용
+- order / execution 이벤트는 subscribe()로 콜백 등록 가능
+
+사용:
+    account = get_account_state(api_key, secret, exchange=self.exchange, symbols=['BTC/USDT'])
+    if account.is_live():
+        pos = account.position('BTC/USDT')      # {'amount': ±수량, 'entry', 'type', 'leverage', ...} 또는 None
+        usdt = account.balance('USDT')          # total (kind='free'면 주문 가능 금액)
+"""
+import os
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import deque
+
+import aiohttp
+
+from bots.rate_limiter import bucket_key
+from bots.market_stream import normalize_symbol
+
+logger = logging.getLogger("AccountState")
+
+MAINNET_WS = "wss://stream.bybit.com/v5/private"
+TESTNET_WS = "wss://stream-testnet.bybit.com/v5/private"
+TOPICS = ['position', 'wallet', 'order', 'execution']
+OPEN_ORDER_STATUS = ('New', 'PartiallyFilled', 'Untriggered')
+
+
+class AccountState:
+    """한 계정(API 키)의 포지션 / 잔고 / 미체결 주문 캐시"""
+
+    def __init__(self, api_key, api_secret, exchange=None, symbols=(), testnet=False, ws_url=None,
+                 reconcile_interval=60, max_stale=None, ping_interval=20):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.exchange = exchange  # REST 대조용 ccxt 인스턴스 (레이트 리미터로 감싼 것)
+        self.ws_url = ws_url or os.getenv('BYBIT_PRIVATE_WS_URL') or (TESTNET_WS if testnet else MAINNET_WS)
+        self.reconcile_interval = reconcile_interval
+        self.max_stale = max_stale or reconcile_interval * 3
+        self.ping_interval = ping_interval
+
+        self.lock = threading.RLock()
+        self.symbols = {normalize_symbol(s): s for s in symbols}
+        self.positions = {}          # 'BTCUSDT' -> dict
+        self.position_ts = {}        # 'BTCUSDT' -> 마지막 WebSocket 갱신 시각 (로컬)
+        self.wallet = {}             # 'USDT' -> {'total', 'free'}
+        self.wallet_ts = 0.0
+        self.orders = {}             # orderId -> 미체결 주문
+        self.executions = deque(maxlen=200)
+        self.callbacks = {topic: [] for topic in TOPICS}
+
+        self.stats = {'connected': False, 'authenticated': False, 'messages': 0, 'reconnects': 0,
+                      'reconciles': 0, 'drift': 0, 'last_reconcile': 0.0, 'last_message': 0.0}
+        self.loop = None
+        self.thread = None
+        self.ws = None
+        self.is_running = False
+
+    # ------------------------------------------------------------------
+    # 조회 (봇 스레드)
+    # ------------------------------------------------------------------
+    def track(self, symbol):
+        with self.lock:
+            self.symbols.setdefault(normalize_symbol(symbol), symbol)
+
+    def is_live(self):
+        """WebSocket 인증 상태 + 최근 REST 대조가 있어야 캐시를 신뢰"""
+        return (self.stats['authenticated']
+                and time.time() - self.stats['last_reconcile'] < self.max_stale)
+
+    def position(self, symbol):
+        with self.lock:
+            pos = self.positions.get(normalize_symbol(symbol))
+            return dict(pos) if pos and pos['amount'] != 0 else None
+
+    def balance(self, asset='USDT', kind='total'):
+        with self.lock:
+            return float(self.wallet.get(asset, {}).get(kind, 0.0))
+
+    def open_orders(self, symbol=None):
+        sym = normalize_symbol(symbol) if symbol else None
+        with self.lock:
+            return [dict(o) for o in self.orders.values() if sym is None or o.get('symbol') == sym]
+
+    def subscribe(self, topic, callback):
+        """topic: position / wallet / order / execution (콜백은 원본 이벤트 dict를 받음)"""
+        self.callbacks[topic].append(callback)
+
+    def status(self):
+        with self.lock:
+            return dict(self.stats, live=self.is_live(), positions=list(self.positions),
+                        open_orders=len(self.orders))
+
+    # ------------------------------------------------------------------
+    # 실행
+    # ------------------------------------------------------------------
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True, name="AccountState")
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        if self.loop and self.ws is not None:
+            asyncio.run_coroutine_threadsafe(self.ws.close(), self.loop)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._main())
+
+    async def _main(self):
+        backoff = 1
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
+            reconciler = asyncio.ensure_future(self._reconcile_loop())
+            try:
+                while self.is_running:
+                    try:
+                        await self._connect_once(session)
+                        backoff = 1
+                    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                        logger.warning(f"계정 스트림 연결 끊김: {e!r}")
+                    except Exception as e:
+                        logger.error(f"계정 스트림 오류: {e!r}")
+                    self.stats['connected'] = self.stats['authenticated'] = False
+                    if not self.is_running:
+                        break
+                    self.stats['reconnects'] += 1
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30)
+            finally:
+                reconciler.cancel()
+
+    def _auth_message(self):
+        expires = int((time.time() + 10) * 1000)
+        signature = hmac.new(self.api_secret.encode(), f"GET/realtime{expires}".encode(),
+                             hashlib.sha256).hexdigest()
+        return {'op': 'auth', 'args': [self.api_key, expires, signature]}
+
+    async def _connect_once(self, session):
+        async with session.ws_connect(self.ws_url, heartbeat=None) as ws:
+            self.ws = ws
+            self.stats['connected'] = True
+            await ws.send_str(json.dumps(self._auth_message()))
+            pinger = asyncio.ensure_future(self._ping_loop(ws))
+            try:
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        await self._handle(ws, json.loads(msg.data))
+                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+            finally:
+                pinger.cancel()
+                self.ws = None
+
+    async def _ping_loop(self, ws):
+        while not ws.closed:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send_str(json.dumps({'op': 'ping'}))
+            if time.time() - self.stats['last_message'] > self.ping_interval * 3:
+                logger.warning("계정 스트림 응답 없음, 재연결")
+                await ws.close()
+                return
+
+    async def _handle(self, ws, msg):
+        self.stats['messages'] += 1
+        self.stats['last_message'] = time.time()
+        op = msg.get('op')
+        if op == 'auth':
+            if msg.get('success'):
+                self.stats['authenticated'] = True
+                logger.info("🔐 계정 스트림 인증 완료")
+                await ws.send_str(json.dumps({'op': 'subscribe', 'args': TOPICS}))
+                # 끊긴 동안 놓친 변경 보정
+                await self._reconcile()
+            else:
+                logger.error(f"계정 스트림 인증 실패: {msg.get('ret_msg')}")
+                await ws.close()
+            return
+        topic = msg.get('topic')
+        if topic in self.callbacks:
+            for item in msg.get('data', []):
+                getattr(self, f"_apply_{topic}")(item)
+                for cb in self.callbacks[topic]:
+                    try:
+                        cb(item)
+                    except Exception as e:
+                        logger.error(f"계정 이벤트 콜백 오류 ({topic}): {e}")
+
+    # ------------------------------------------------------------------
+    # 이벤트 반영
+    # ------------------------------------------------------------------
+    def _apply_position(self, p):
+        sym = p.get('symbol')
+        size = float(p.get('size') or 0)
+        amount = size if p.get('side') == 'Buy' else -size if p.get('side') == 'Sell' else 0.0
+        with self.lock:
+            self.positions[sym] = {
+                'amount': amount,
+                'entry': float(p.get('entryPrice') or p.get('avgPrice') or 0),
+                'type': 'long' if amount > 0 else 'short' if amount < 0 else None,
+                'leverage': float(p.get('leverage') or 0),
+                'unrealized_pnl': float(p.get('unrealisedPnl') or 0),
+                'stop_loss': float(p.get('stopLoss') or 0),
+                'take_profit': float(p.get('takeProfit') or 0),
+            }
+            self.position_ts[sym] = time.time()
+
+    def _apply_wallet(self, w):
+        with self.lock:
+            for coin in w.get('coin', []):
+                total = float(coin.get('walletBalance') or coin.get('equity') or 0)
+                free = coin.get('availableToWithdraw') or w.get('totalAvailableBalance') or total
+                self.wallet[coin['coin']] = {'total': total, 'free': float(free or 0)}
+            self.wallet_ts = time.time()
+
+    def _apply_order(self, o):
+        with self.lock:
+            if o.get('orderStatus') in OPEN_ORDER_STATUS:
+                self.orders[o['orderId']] = o
+            else:
+                self.orders.pop(o.get('orderId'), None)
+
+    def _apply_execution(self, e):
+        with self.lock:
+            self.executions.append(e)
+
+    # ------------------------------------------------------------------
+    # REST 대조
+    # ------------------------------------------------------------------
+    async def _reconcile_loop(self):
+        while self.is_running:
+            await self._reconcile()
+            await asyncio.sleep(self.reconcile_interval)
+
+    async def _reconcile(self):
+        if self.exchange is None:
+            self.stats['last_reconcile'] = time.time()
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.reconcile)
+        except Exception as e:
+            logger.warning(f"계정 상태 REST 대조 실패: {e}")
+
+    def reconcile(self):
+        """ccxt REST로 포지션/잔고를 다시 읽어 캐시 보정 (요청 이후 WebSocket 갱신이 있으면 그쪽 우선)"""
+        started = time.time()
+        with self.lock:
+            symbols = list(self.symbols.values())
+        positions = self.exchange.fetch_positions(symbols) if symbols else []
+        balance = self.exchange.fetch_balance()
+
+        with self.lock:
+            seen = set()
+            for p in positions:
+                sym = normalize_symbol(p['symbol'])
+                seen.add(sym)
+                if self.position_ts.get(sym, 0) > started:
+                    continue
+                contracts = float(p.get('contracts') or 0)
+                amount = contracts if p.get('side') == 'long' else -contracts
+                fresh = {
+                    'amount': amount,
+                    'entry': float(p.get('entryPrice') or 0),
+                    'type': 'long' if amount > 0 else 'short' if amount < 0 else None,
+                    'leverage': float(p.get('leverage') or 0),
+                    'unrealized_pnl': float(p.get('unrealizedPnl') or 0),
+                    'stop_loss': float(p.get('stopLossPrice') or 0),
+                    'take_profit': float(p.get('takeProfitPrice') or 0),
+                }
+                self._check_drift(sym, fresh)
+                self.positions[sym] = fresh
+            # REST에 없는 추적 심볼 = 포지션 없음
+            for sym in self.symbols:
+                if sym not in seen and self.position_ts.get(sym, 0) <= started:
+                    self._check_drift(sym, {'amount': 0.0})
+                    self.positions[sym] = {'amount': 0.0, 'entry': 0.0, 'type': None, 'leverage': 0.0,
+                                           'unrealized_pnl': 0.0, 'stop_loss': 0.0, 'take_profit': 0.0}
+
+            if self.wallet_ts <= started:
+                for asset, entry in balance.items():
+                    if isinstance(entry, dict) and 'total' in entry and entry.get('total') is not None:
+                        self.wallet[asset] = {'total': float(entry['total'] or 0),
+                                              'free': float(entry.get('free') or 0)}
+            self.stats['reconciles'] += 1
+            self.stats['last_reconcile'] = time.time()
+
+    def _check_drift(self, sym, fresh):
+        cached = self.positions.get(sym)
+        if cached is not None and abs(cached['amount'] - fresh['amount']) > 1e-12:
+            self.stats['drift'] += 1
+            logger.warning(f"포지션 캐시 불일치 {sym}: 캐시 {cached['amount']} → REST {fresh['amount']}")
+
+
+_accounts = {}
+_accounts_lock = threading.Lock()
+
+
+def get_account_state(api_key, api_secret, exchange=None, symbols=(), testnet=False):
+    """계정별 공용 인스턴스 (ACCOUNT_STREAM=0이거나 키가 없으면 None → 호출 측은 REST 사용)"""
+    if os.getenv('ACCOUNT_STREAM', '1') == '0' or not api_key or not api_secret:
+        return None
+    key = bucket_key('bybit', api_key)
+    with _accounts_lock:
+        state = _accounts.get(key)
+        if state is None:
+            state = _accounts[key] = AccountState(api_key, api_secret, exchange, symbols, testnet)
+            state.start()
+        else:
+            for s in symbols:
+                state.track(s)
+            if state.exchange is None:
+                state.exchange = exchange
+        return state
+
+
+def account_status():
+    """모니터링용: 계정별 스트림 상태"""
+    with _accounts_lock:
+        return {key: state.status() for key, state in _accounts.items()}
@@ -0,0 +1,186 @@
+"""
+봇 런타임 (이벤트 루프 하나에서 모든 봇을 asyncio 태스크로 실행)
+- 봇 태스크: step() → 다음 봉 마감까지 BarClock.wait_async() → step() ...
+  대기는 목표 시각까지 asyncio.sleep 한 번 (0.1초마다 is_running을 확인하며 깨어나는 루프 없음)
+- 블로킹 작업(REST 조회, 지표 계산, 모델 추론, 봉 사이 점검, 서버 시각 보정)은 크기가 제한된 스레드 풀에서 실행
+  → 동시에 마감되는 봇이 많아도 풀 크기 이상은 줄을 서서 실행
+- 중지 = 태스크 취소: 대기 중이면 바로 끝남, 실행 중인 step은 스레드에서 끝까지 돌고 결과만 버림
+  (같은 봇을 다시 시작하면 그 step이 끝난 뒤에 시작 → 한 봇의 step이 겹치지 않음)
+- 봇 객체의 is_running/status는 대시보드 표시용으로만 갱신
+- 봇이 아닌 주기 작업(시세 갱신 등)도 spawn()으로 같은 루프에서 실행
+
+사용:
+    runtime = get_runtime()
+    runtime.start(BotSpec('Bot_30M', step=bot.step, clock=bot.clock, intrabar=bot.check_intrabar, bot=bot))
+    runtime.stop('Bot_30M')
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from bots.bar_clock import BarClock, INTRABAR_INTERVAL
+
+logger = logging.getLogger("BotRuntime")
+
+MAX_WORKERS = int(os.getenv('BOT_RUNTIME_WORKERS', '0')) or min(4, os.cpu_count() or 1)
+RETRY_DELAY = 10.0
+
+
+@dataclass
+class BotSpec:
+    name: str
+    step: Callable[[], Any]                 # 봉마다 한 번 (블로킹 가능), False를 반환하면 retry_delay 뒤 재시도
+    clock: BarClock
+    intrabar: Optional[Callable[[], Any]] = None
+    intrabar_interval: float = INTRABAR_INTERVAL
+    setup: Optional[Callable[[], Any]] = None       # 시작할 때 한 번 (예외가 나면 시작 실패)
+    on_stop: Optional[Callable[[], Any]] = None
+    bot: Any = None                                 # is_running/status를 갱신할 객체
+    retry_delay: float = RETRY_DELAY
+    run_first: bool = True                          # 시작하자마자 step 한 번 (False면 첫 마감까지 대기)
+
+
+class BotRuntime:
+    def __init__(self, max_workers=MAX_WORKERS, name="BotRuntime"):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="bot-step")
+        self.loop = asyncio.new_event_loop()
+        self.tasks = {}         # name -> asyncio.Task (루프 스레드에서만 변경)
+        self.inflight = {}      # name -> concurrent Future (실행기에서 돌고 있는 step)
+        self.stats = {}         # name -> {'state', 'steps', 'errors', 'last_step', 'step_time'}
+        self.stopping = set()   # 취소를 요청했지만 아직 끝나지 않은 태스크
+        self.thread = threading.Thread(target=self._run_loop, daemon=True, name=name)
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    # ------------------------------------------------------------------
+    # 제어 (어느 스레드에서 호출해도 됨)
+    # ------------------------------------------------------------------
+    def start(self, spec):
+        self.loop.call_soon_threadsafe(self._start, spec)
+
+    def stop(self, name):
+        self.loop.call_soon_threadsafe(self._cancel, name)
+
+    def spawn(self, name, coro_fn):
+        """봇이 아닌 상주 코루틴 (예: 시세 갱신), stop(name)으로 취소"""
+        self.loop.call_soon_threadsafe(self._spawn, name, coro_fn)
+
+    def offload(self, fn, *args):
+        """블로킹 함수를 실행기에서 실행하는 awaitable (루프 안에서 사용)"""
+        return self.loop.run_in_executor(self.executor, fn, *args)
+
+    def is_active(self, name):
+        task = self.tasks.get(name)
+        return task is not None and not task.done()
+
+    def _start(self, spec):
+        if self.is_active(spec.name):
+            if spec.name in self.stopping:  # 중지 직후 재시작 → 이전 태스크가 끝나면 시작
+                self.tasks[spec.name].add_done_callback(lambda _: self._start(spec))
+            return
+        self.tasks[spec.name] = self.loop.create_task(self._run_bot(spec), name=spec.name)
+
+    def _spawn(self, name, coro_fn):
+        if not self.is_active(name):
+            task = self.tasks[name] = self.loop.create_task(coro_fn(), name=name)
+            task.add_done_callback(lambda _: self.stopping.discard(name))
+
+    def _cancel(self, name):
+        task = self.tasks.get(name)
+        if task is not None and not task.done():
+            self.stopping.add(name)
+            task.cancel()
+
+    # ------------------------------------------------------------------
+    # 봇 태스크
+    # ------------------------------------------------------------------
+    async def _run_bot(self, spec):
+        st = self.stats[spec.name] = {'state': 'starting', 'steps': 0, 'errors': 0, 'last_step': None,
+                                      'step_time': None, 'started': time.time()}
+        self._mark(spec.bot, True, "실행 중")
+        try:
+            prev = self.inflight.get(spec.name)
+            if prev is not None and not prev.done():
+                st['state'] = 'waiting_previous'
+                await asyncio.wrap_future(prev)  # 취소 전에 돌던 step이 끝날 때까지
+            if spec.setup is not None:
+                await self._call(spec, spec.setup)
+            st['state'] = 'running'
+            logger.info(f"[{spec.name}] 시작 ({spec.clock.timeframe}, 실행기 {self.max_workers})")
+            first = spec.run_first
+            while True:
+                if not first:
+                    await spec.clock.wait_async(
+                        on_idle=(lambda: self._call(spec, spec.intrabar)) if spec.intrabar else None,
+                        idle_interval=spec.intrabar_interval, offload=self.offload)
+                first = False
+                while await self._step(spec) is False:
+                    await asyncio.sleep(spec.retry_delay)
+        except asyncio.CancelledError:
+            logger.info(f"[{spec.name}] 중지")
+        except Exception as e:
+            st['errors'] += 1
+            logger.error(f"[{spec.name}] 시작 실패: {e}", exc_info=True)
+        finally:
+            self.stopping.discard(spec.name)
+            st['state'] = 'stopped'
+            self._mark(spec.bot, False, "Stopped")
+            if spec.on_stop is not None:
+                try:
+                    spec.on_stop()
+                except Exception as e:
+                    logger.error(f"[{spec.name}] 정리 오류: {e}")
+
+    def _call(self, spec, fn):
+        future = self.executor.submit(fn)
+        self.inflight[spec.name] = future
+        return asyncio.wrap_future(future)
+
+    async def _step(self, spec):
+        st = self.stats[spec.name]
+        started = time.perf_counter()
+        try:
+            result = await self._call(spec, spec.step)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            st['errors'] += 1
+            logger.error(f"[{spec.name}] step 오류: {e}", exc_info=True)
+            return False
+        st['steps'] += 1
+        st['last_step'] = time.time()
+        st['step_time'] = round(time.perf_counter() - started, 3)
+        return result
+
+    @staticmethod
+    def _mark(bot, running, status):
+        if bot is not None:
+            bot.is_running = running
+            bot.status = status
+
+    def status(self):
+        tasks = {name: {'active': not task.done(), **self.stats.get(name, {})}
+                 for name, task in list(self.tasks.items())}
+        return {'workers': self.max_workers, 'queued': self.executor._work_queue.qsize(), 'tasks': tasks}
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime():
+    """프로세스 공용 런타임 (처음 호출할 때 루프 스레드 시작)"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = BotRuntime()
+        return _runtime
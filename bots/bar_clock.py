@@ -0,0 +1,196 @@
+"""
+봉 마감 정렬 스케줄러
+- 다음 봉 마감 시각 = (서버 시각 // 봉 길이 + 1) * 봉 길이 → 작업 시간과 무관하게 드리프트 없음
+- 서버 시각: 거래소 fetch_time()으로 로컬 시계와의 차이(offset)를 주기적으로 보정 (왕복 지연의 절반 보정)
+- 마감 후 settle 초 뒤에 깨움 (거래소가 마감 봉을 확정할 시간)
+- 대기 중에는 idle_interval마다 가벼운 작업(on_idle: 손절 확인, 상태 로그)만 실행
+- 깨어난 시각 - 목표 시각(지터), 놓친 봉(작업이 한 봉 이상 걸린 경우) 기록 → status()
+
+사용:
+    clock = BarClock('30m', settle=2.0, name='bot_30m')
+    while self.is_running:
+        self.execute_logic()                     # 봉마다 한 번
+        clock.wait(lambda: self.is_running, on_idle=self.check_intrabar, idle_interval=10)
+"""
+import time
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger("BarClock")
+
+SETTLE_DELAY = 2.0          # 봉 마감 후 대기 (초)
+INTRABAR_INTERVAL = 10.0    # 봉 사이 가벼운 점검 주기 (초)
+SYNC_INTERVAL = 600.0       # 서버 시각 재보정 주기 (초)
+_SLICE = 0.5                # 대기 중 중지 확인 간격 (초)
+
+
+def timeframe_seconds(timeframe):
+    """'30s' / '5m' / '1h' / '1d' → 초"""
+    unit, value = timeframe[-1], int(timeframe[:-1])
+    return value * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}.get(unit, 60)
+
+
+def _default_time_source():
+    from bots.rate_limiter import get_public_exchange
+    return get_public_exchange('bybit').fetch_time()
+
+
+class ServerClock:
+    """거래소 서버 시각 (로컬 시계 + 보정값), 프로세스 내 모든 봇이 공유"""
+
+    def __init__(self, time_source=_default_time_source, sync_interval=SYNC_INTERVAL):
+        self.time_source = time_source      # 서버 시각(ms) 반환, 실패하면 예외
+        self.sync_interval = sync_interval
+        self.offset = 0.0                   # 서버 - 로컬 (초)
+        self.rtt = None
+        self.synced_at = 0.0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def sync(self):
+        t0 = time.time()
+        server = self.time_source() / 1000.0
+        t1 = time.time()
+        with self.lock:
+            self.offset = server - (t0 + t1) / 2
+            self.rtt = t1 - t0
+            self.synced_at = t1
+        if abs(self.offset) > 1.0:
+            logger.warning(f"로컬 시계가 서버와 {self.offset:+.2f}초 차이 (보정해서 사용)")
+
+    def due(self):
+        return time.time() - self.synced_at >= self.sync_interval
+
+    def refresh(self):
+        """보정 시도 (실패해도 마지막 보정값 사용, 다음 재시도는 1분 뒤)"""
+        try:
+            self.sync()
+        except Exception as e:
+            self.errors += 1
+            self.synced_at = time.time() - self.sync_interval + 60
+            logger.debug(f"서버 시각 보정 실패: {e}")
+
+    def now(self, sync=True):
+        # sync=False: 이벤트 루프처럼 블로킹하면 안 되는 곳 (보정은 호출 측이 따로 실행)
+        if sync and self.due():
+            self.refresh()
+        return time.time() + self.offset
+
+    def status(self):
+        return {'offset': round(self.offset, 4), 'rtt': round(self.rtt, 4) if self.rtt is not None else None,
+                'synced_at': self.synced_at, 'errors': self.errors}
+
+
+server_clock = ServerClock()
+
+
+class BarClock:
+    def __init__(self, timeframe, settle=SETTLE_DELAY, name=None, clock=None):
+        self.timeframe = timeframe
+        self.period = timeframe_seconds(timeframe)
+        self.settle = settle
+        self.name = name or timeframe
+        self.clock = clock or server_clock
+        self.last_bar = None                # 마지막으로 깨어난 봉 마감 시각 (서버 기준 초)
+        self.stats = {'bars': 0, 'missed': 0, 'idle_runs': 0, 'idle_errors': 0,
+                      'jitter_last': None, 'jitter_avg': None, 'jitter_max': None}
+        _clocks[self.name] = self
+
+    def next_close(self, now=None):
+        now = self.clock.now() if now is None else now
+        return (now // self.period + 1) * self.period
+
+    def _begin(self, now):
+        """이번 대기의 목표 (마감 시각, 깨울 시각), 놓친 봉 집계"""
+        close = self.next_close(now)
+        if self.last_bar is not None and close - self.last_bar > self.period:
+            missed = int((close - self.last_bar) / self.period) - 1
+            self.stats['missed'] += missed
+            logger.warning(f"[{self.name}] 봉 {missed}개 건너뜀 (작업이 봉 길이보다 오래 걸림)")
+        return close, close + self.settle
+
+    def wait(self, is_running=lambda: True, on_idle=None, idle_interval=INTRABAR_INTERVAL):
+        """다음 봉 마감 + settle까지 대기, 마감 시각(초) 반환 (중지되면 None)
+        작업이 길어져 마감을 지나쳤으면 그 봉은 놓친 것으로 세고 다음 마감을 기다림"""
+        now = self.clock.now()
+        close, target = self._begin(now)
+        next_idle = now + idle_interval if on_idle else None
+
+        while True:
+            if not is_running():
+                return None
+            now = self.clock.now()
+            if now >= target:
+                break
+            if next_idle is not None and now >= next_idle:
+                self._run_idle(on_idle)
+                next_idle = self.clock.now() + idle_interval
+                continue
+            until = min(target, next_idle) if next_idle is not None else target
+            time.sleep(max(0.0, min(_SLICE, until - now)))
+
+        self._record(now - target)
+        self.last_bar = close
+        return close
+
+    async def wait_async(self, on_idle=None, idle_interval=INTRABAR_INTERVAL, offload=None):
+        """wait()의 asyncio 버전: 목표 시각까지 한 번에 잠들고 중지는 태스크 취소로 처리 (주기적 확인 없음)
+        on_idle: 코루틴 함수 (블로킹 작업은 호출 측이 실행기로 넘김)
+        offload: 블로킹 함수를 실행기에서 돌리는 코루틴 함수 - 서버 시각 보정에 사용"""
+        if offload is not None and self.clock.due():
+            await offload(self.clock.refresh)
+        now = self.clock.now(sync=False)
+        close, target = self._begin(now)
+        next_idle = now + idle_interval if on_idle else None
+
+        while True:
+            now = self.clock.now(sync=False)
+            if now >= target:
+                break
+            if next_idle is not None and now >= next_idle:
+                self.stats['idle_runs'] += 1
+                try:
+                    await on_idle()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.stats['idle_errors'] += 1
+                    logger.error(f"[{self.name}] 봉 중간 점검 오류: {e}")
+                next_idle = self.clock.now(sync=False) + idle_interval
+                continue
+            until = min(target, next_idle) if next_idle is not None else target
+            await asyncio.sleep(until - now)
+
+        self._record(now - target)
+        self.last_bar = close
+        return close
+
+    def _run_idle(self, on_idle):
+        self.stats['idle_runs'] += 1
+        try:
+            on_idle()
+        except Exception as e:
+            self.stats['idle_errors'] += 1
+            logger.error(f"[{self.name}] 봉 중간 점검 오류: {e}")
+
+    def _record(self, jitter):
+        s = self.stats
+        s['bars'] += 1
+        s['jitter_last'] = round(jitter, 4)
+        s['jitter_max'] = round(max(s['jitter_max'] or 0.0, jitter), 4)
+        prev = s['jitter_avg'] or 0.0
+        s['jitter_avg'] = round(prev + (jitter - prev) / s['bars'], 4)
+
+    def status(self):
+        return {'timeframe': self.timeframe, 'settle': self.settle,
+                'next_close': self.next_close(self.clock.now(sync=False)),
+                'last_bar': self.last_bar, **self.stats}
+
+
+_clocks = {}
+
+
+def clocks_status():
+    """모니터링용: 봇별 봉 마감 지터/놓친 봉 + 서버 시각 보정 상태"""
+    return {'server': server_clock.status(), 'bots': {name: c.status() for name, c in _clocks.items()}}
@@ -4,6 +4,8 @@ import logging
 from abc import ABC, abstractmethod
 from datetime import datetime
 
+from bots.bar_clock import BarClock, SETTLE_DELAY, INTRABAR_INTERVAL, timeframe_seconds
+
 class BaseBot(ABC):
     def __init__(self, name, interval):
         self.name = name
@@ -22,6 +24,10 @@ class BaseBot(ABC):
         self.balance_history = [] # Historical balance for graphing
         self.max_history = 50 # Maximum data points to keep
         self.recent_candles = [] # OHLCV data for charting: [{'t': timestamp, 'o': open, 'h': high, 'l': low, 'c': close}, ...]
+
+        # 봉 마감 정렬: execute_logic은 봉 마감(+settle)마다 한 번, 그 사이에는 check_intrabar만
+        self.intrabar_interval = INTRABAR_INTERVAL
+        self.clock = BarClock(interval, settle=SETTLE_DELAY, name=name)
         
         # Setup logging
         self.logger = logging.getLogger(self.name)
@@ -55,9 +61,7 @@ class BaseBot(ABC):
     def _run_loop(self):
         while self.is_running:
             try:
-                self.last_run = datetime.now()
-                self.execute_logic()
-                # Interval handling (simplified for this template)
+                self.step()
                 self._wait_for_next_tick()
             except Exception as e:
                 self.logger.error(f"Error in {self.name}: {str(e)}")
@@ -72,20 +76,19 @@ class BaseBot(ABC):
         """This method should be implemented by subclasses to perform the actual trading logic."""
         pass
 
+    def step(self):
+        """봉 마감마다 한 번 실행되는 작업 (스레드 루프와 async 런타임 공용)"""
+        self.last_run = datetime.now()
+        self.execute_logic()
+
+    def check_intrabar(self):
+        """봉 사이 가벼운 점검 (손절 확인, 상태 로그 등) - 필요한 봇만 구현"""
+        pass
+
     def _wait_for_next_tick(self):
-        # Convert interval string to seconds
-        seconds = self._interval_to_seconds(self.interval)
-        time.sleep(seconds)
+        # 작업 시간과 무관하게 다음 봉 마감(서버 시각 기준)까지 대기
+        self.clock.wait(lambda: self.is_running, on_idle=self.check_intrabar,
+                        idle_interval=self.intrabar_interval)
 
     def _interval_to_seconds(self, interval):
-        unit = interval[-1]
-        value = int(interval[:-1])
-        if unit == 's':
-            return value
-        elif unit == 'm':
-            return value * 60
-        elif unit == 'h':
-            return value * 3600
-        elif unit == 'd':
-            return value * 86400
-        return 60
+        return timeframe_seconds(interval)
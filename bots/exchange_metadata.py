@@ -0,0 +1,255 @@
+"""
+거래소 메타데이터 캐시 (프로세스 내 모든 봇 공유)
+- 레버리지: 계정/심볼/방향별 현재 값을 기억해 같은 값이면 set_leverage 호출 생략
+- 심볼 필터: 틱 크기, 수량 단위, 최소 수량/금액, 최대 레버리지 (TTL)
+- ccxt 마켓 목록: load_markets 결과를 TTL 동안 재사용 (파일 캐시 → 새로 만든 인스턴스도 재로드 없음)
+- 설정이 바뀐 게 의심되면 invalidate_*()로 즉시 무효화
+
+사용:
+    from bots.exchange_metadata import metadata
+    metadata.ensure_leverage(self.exchange, self.symbol, 10)    # 바뀔 때만 API 호출
+    filters = metadata.instrument(self.exchange, self.symbol)    # filters.round_price(p), filters.round_qty(q)
+"""
+import os
+import json
+import math
+import time
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass
+
+from bots.rate_limiter import bucket_key
+
+logger = logging.getLogger("ExchangeMetadata")
+
+METADATA_TTL = float(os.getenv('EXCHANGE_METADATA_TTL', str(6 * 3600)))
+LEVERAGE_TTL = float(os.getenv('LEVERAGE_CACHE_TTL', '3600'))  # 웹에서 수동 변경한 경우 대비
+CACHE_DIR = os.getenv('EXCHANGE_METADATA_DIR', os.path.join(tempfile.gettempdir(), 'bot_exchange_metadata'))
+
+# Bybit V5: 110043 = leverage not modified (구버전 110012)
+_NOT_MODIFIED = ('110043', '110012', 'not modified')
+
+
+@dataclass
+class InstrumentFilters:
+    symbol: str
+    tick_size: float
+    qty_step: float
+    min_qty: float = 0.0
+    min_notional: float = 0.0
+    max_leverage: float = 0.0
+
+    def round_price(self, price, direction='nearest'):
+        """틱 크기에 맞춰 가격 반올림 (direction: nearest / down / up)"""
+        if not self.tick_size:
+            return price
+        steps = price / self.tick_size
+        steps = math.floor(steps + 1e-9) if direction == 'down' else \
+            math.ceil(steps - 1e-9) if direction == 'up' else round(steps)
+        return round(steps * self.tick_size, 12)
+
+    def round_qty(self, qty):
+        """수량 단위로 내림 (주문 가능 수량 초과 방지)"""
+        if not self.qty_step:
+            return qty
+        return round(math.floor(qty / self.qty_step + 1e-9) * self.qty_step, 12)
+
+    def is_tradable(self, qty, price):
+        return qty >= self.min_qty and qty * price >= self.min_notional
+
+    @classmethod
+    def from_bybit(cls, symbol, info):
+        """Bybit V5 /v5/market/instruments-info 항목"""
+        price = info.get('priceFilter', {})
+        lot = info.get('lotSizeFilter', {})
+        lev = info.get('leverageFilter', {})
+        return cls(symbol, float(price.get('tickSize') or 0), float(lot.get('qtyStep') or 0),
+                   float(lot.get('minOrderQty') or 0), float(lot.get('minNotionalValue') or 0),
+                   float(lev.get('maxLeverage') or 0))
+
+    @classmethod
+    def from_ccxt(cls, symbol, market, tick_mode=True):
+        """ccxt market 항목 (precision이 소수 자릿수 방식이면 tick_mode=False)"""
+        precision = market.get('precision', {})
+        limits = market.get('limits', {})
+
+        def step(p):
+            if p is None:
+                return 0.0
+            return float(p) if tick_mode else 10 ** -float(p)
+        return cls(symbol, step(precision.get('price')), step(precision.get('amount')),
+                   float((limits.get('amount') or {}).get('min') or 0),
+                   float((limits.get('cost') or {}).get('min') or 0),
+                   float((limits.get('leverage') or {}).get('max') or 0))
+
+
+class ExchangeMetadata:
+    """레버리지 / 심볼 필터 / 마켓 목록 캐시"""
+
+    def __init__(self, ttl=METADATA_TTL, leverage_ttl=LEVERAGE_TTL, cache_dir=CACHE_DIR):
+        self.ttl = ttl
+        self.leverage_ttl = leverage_ttl
+        self.cache_dir = cache_dir
+        self.lock = threading.RLock()
+        self.leverage = {}      # (account, symbol, side) -> (leverage, ts)
+        self.instruments = {}   # (source, symbol) -> (raw info, ts)
+        self.markets = {}       # markets key -> (markets, currencies, ts)
+        self.stats = {'leverage_calls': 0, 'leverage_skipped': 0, 'instrument_hits': 0,
+                      'instrument_loads': 0, 'markets_hits': 0, 'markets_loads': 0}
+
+    # ------------------------------------------------------------------
+    # 레버리지
+    # ------------------------------------------------------------------
+    def current_leverage(self, account, symbol, side=None):
+        """기억하고 있는 레버리지 (모르거나 만료됐으면 None). side=None이면 양방향이 같을 때만"""
+        now = time.time()
+        with self.lock:
+            values = []
+            for s in ((side,) if side else ('buy', 'sell')):
+                entry = self.leverage.get((account, symbol, s))
+                if entry is None or now - entry[1] > self.leverage_ttl:
+                    return None
+                values.append(entry[0])
+        return values[0] if len(set(values)) == 1 else None
+
+    def record_leverage(self, account, symbol, leverage, side=None):
+        now = time.time()
+        with self.lock:
+            for s in ((side,) if side else ('buy', 'sell')):
+                self.leverage[(account, symbol, s)] = (float(leverage), now)
+
+    def invalidate_leverage(self, account=None, symbol=None):
+        with self.lock:
+            for key in [k for k in self.leverage
+                        if (account is None or k[0] == account) and (symbol is None or k[1] == symbol)]:
+                del self.leverage[key]
+
+    @staticmethod
+    def account_of(exchange):
+        return bucket_key(getattr(exchange, 'id', 'exchange'), getattr(exchange, 'apiKey', None))
+
+    @staticmethod
+    def is_not_modified(error):
+        msg = str(error).lower()
+        return any(code in msg for code in _NOT_MODIFIED)
+
+    def ensure_leverage(self, exchange, symbol, leverage):
+        """ccxt 거래소에 레버리지 설정 (이미 같은 값이면 호출 생략). 실제로 호출했으면 True"""
+        account = self.account_of(exchange)
+        if self.current_leverage(account, symbol) == float(leverage):
+            self.stats['leverage_skipped'] += 1
+            return False
+        self.stats['leverage_calls'] += 1
+        try:
+            exchange.set_leverage(leverage, symbol)
+        except Exception as e:
+            if not self.is_not_modified(e):
+                self.invalidate_leverage(account, symbol)
+                raise
+        self.record_leverage(account, symbol, leverage)
+        return True
+
+    # ------------------------------------------------------------------
+    # 심볼 필터
+    # ------------------------------------------------------------------
+    def instrument_info(self, source, symbol, loader):
+        """원본 심볼 정보 캐시 (loader()가 빈 값을 돌려주면 저장하지 않음)"""
+        key = (source, symbol)
+        with self.lock:
+            entry = self.instruments.get(key)
+            if entry is not None and time.time() - entry[1] < self.ttl:
+                self.stats['instrument_hits'] += 1
+                return entry[0]
+        info = loader()
+        if info:
+            self.stats['instrument_loads'] += 1
+            with self.lock:
+                self.instruments[key] = (info, time.time())
+        return info
+
+    def instrument(self, exchange, symbol):
+        """ccxt 거래소의 심볼 필터 (마켓 목록 캐시에서 계산)"""
+        markets = self.prime_markets(exchange)
+        market = markets.get(symbol) or exchange.market(symbol)
+        tick_mode = getattr(exchange, 'precisionMode', 4) == 4  # ccxt.TICK_SIZE
+        return InstrumentFilters.from_ccxt(symbol, market, tick_mode)
+
+    def invalidate_instruments(self, symbol=None):
+        with self.lock:
+            for key in [k for k in self.instruments if symbol is None or k[1] == symbol]:
+                del self.instruments[key]
+
+    # ------------------------------------------------------------------
+    # ccxt 마켓 목록
+    # ------------------------------------------------------------------
+    @staticmethod
+    def markets_key(exchange):
+        options = getattr(exchange, 'options', None) or {}
+        sandbox = 'sandbox' if getattr(exchange, 'isSandboxModeEnabled', False) else 'live'
+        return f"{getattr(exchange, 'id', 'exchange')}-{options.get('defaultType', 'default')}-{sandbox}"
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.markets.json")
+
+    def _load_file(self, key):
+        path = self._cache_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.ttl:
+                return None
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return data['markets'], data.get('currencies'), os.path.getmtime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store_file(self, key, markets, currencies):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(key)
+            with open(path + '.tmp', 'w') as f:
+                json.dump({'markets': markets, 'currencies': currencies}, f, default=str)
+            os.replace(path + '.tmp', path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.debug(f"마켓 캐시 파일 저장 실패: {e}")
+
+    def prime_markets(self, exchange, reload=False):
+        """캐시된 마켓 목록을 인스턴스에 주입 (없거나 만료됐으면 load_markets 1회 후 저장)"""
+        key = self.markets_key(exchange)
+        with self.lock:
+            entry = None if reload else self.markets.get(key)
+            if entry is None or time.time() - entry[2] >= self.ttl:
+                entry = None if reload else self._load_file(key)
+                if entry is not None:
+                    self.markets[key] = entry
+            if entry is not None:
+                self.stats['markets_hits'] += 1
+                if getattr(exchange, 'markets', None) is not entry[0]:
+                    exchange.set_markets(entry[0], entry[1])
+                return entry[0]
+
+            markets = exchange.load_markets(reload=True)
+            currencies = getattr(exchange, 'currencies', None)
+            self.stats['markets_loads'] += 1
+            self.markets[key] = (markets, currencies, time.time())
+        self._store_file(key, markets, currencies)
+        return markets
+
+    def invalidate_markets(self, exchange=None):
+        with self.lock:
+            keys = [self.markets_key(exchange)] if exchange is not None else list(self.markets)
+            for key in keys:
+                self.markets.pop(key, None)
+                try:
+                    os.remove(self._cache_path(key))
+                except OSError:
+                    pass
+
+    def status(self):
+        with self.lock:
+            return dict(self.stats, leverage={f"{k[1]}:{k[2]}": v[0] for k, v in self.leverage.items()},
+                        instruments=len(self.instruments), markets=list(self.markets))
+
+
+# 프로세스 공용 인스턴스
+metadata = ExchangeMetadata()
@@ -0,0 +1,253 @@
+"""
+중앙 작업 스케줄러 (재학습 / 데이터 갱신 / 파라미터 최적화)
+- 봇마다 00:00에 retrain.py를 직접 띄우던 방식을 대체
+- 동시 실행 개수 제한, nice / CPU affinity / 작업별 메모리 제한 적용 (JOB_MAX_MEMORY_MB)
+- 봉 마감 직전/직후에는 새 작업을 시작하지 않음 (봇이 CPU를 써야 하는 시점)
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import subprocess
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("JobScheduler")
+
+# 봇이 사용하는 타임프레임 (초)
+BAR_SECONDS = {'5m': 300, '15m': 900, '30m': 1800, '1h': 3600}
+
+# 작업별 메모리 제한 (MB, 기본 4096, 0 = 제한 없음). RLIMIT_DATA로 적용 (힙/익명 mmap 기준)
+# RLIMIT_AS는 스레드 스택 예약까지 세어 xgboost/lightgbm 멀티스레드 학습이 실패하므로 쓰지 않음
+DEFAULT_MAX_MEMORY_MB = int(os.getenv('JOB_MAX_MEMORY_MB', '4096'))
+
+
+@dataclass
+class JobSpec:
+    name: str
+    script: str
+    cwd: str
+    args: List[str] = field(default_factory=list)
+    at: Optional[str] = None        # 매일 실행 시각 "HH:MM" (로컬 시간), None이면 수동 실행만
+    timeout: int = 3 * 3600         # 초
+    nice: int = 10
+    max_memory_mb: int = DEFAULT_MAX_MEMORY_MB  # 0이면 제한 없음 (RLIMIT_DATA, 자식 프로세스도 상속)
+    cpus: Optional[List[int]] = None  # None이면 기본 affinity 사용
+
+
+@dataclass
+class JobRun:
+    name: str
+    queued_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    duration: float = 0.0
+    returncode: Optional[int] = None
+    status: str = "queued"  # queued, running, success, failed, timeout
+    log_file: Optional[str] = None
+
+
+def default_job_cpus():
+    """CPU 0번은 봇용으로 남겨두고 나머지 코어를 작업에 할당"""
+    if not hasattr(os, 'sched_getaffinity'):
+        return None
+    cpus = sorted(os.sched_getaffinity(0))
+    return cpus[1:] if len(cpus) > 2 else None
+
+
+class JobScheduler:
+    """작업 큐 + 워커 (서브프로세스 실행, 상태/소요시간 기록)"""
+
+    def __init__(self, max_concurrent=1, timeframes=('5m', '15m', '30m', '1h'),
+                 guard_before=20, guard_after=90, log_dir=None, history_size=100):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.bar_seconds = [BAR_SECONDS[tf] for tf in timeframes if tf in BAR_SECONDS]
+        self.guard_before = guard_before
+        self.guard_after = guard_after
+        self.log_dir = log_dir
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+        self.specs: Dict[str, JobSpec] = {}
+        self.queue = deque()
+        self.running = {}  # name -> (Popen, JobRun, deadline, log handle)
+        self.history = deque(maxlen=history_size)
+        self.last_fired = {}  # name -> 'YYYY-MM-DD'
+        self.lock = threading.Lock()
+        self.thread = None
+        self.is_running = False
+
+    # ------------------------------------------------------------------
+    # 등록 / 제출
+    # ------------------------------------------------------------------
+    def register(self, spec: JobSpec):
+        with self.lock:
+            self.specs[spec.name] = spec
+            # 등록 시점에 이미 지난 시각이면 오늘은 건너뜀 (재시작 시 중복 실행 방지)
+            if spec.at and datetime.now().strftime('%H:%M') > spec.at:
+                self.last_fired[spec.name] = datetime.now().strftime('%Y-%m-%d')
+        logger.info(f"📅 작업 등록: {spec.name} ({spec.script}, 매일 {spec.at or '수동'})")
+
+    def submit(self, name):
+        """작업을 큐에 추가 (이미 대기/실행 중이면 무시)"""
+        with self.lock:
+            if name not in self.specs:
+                return False
+            if name in self.running or any(r.name == name for r in self.queue):
+                return False
+            self.queue.append(JobRun(name=name, queued_at=datetime.now().isoformat(timespec='seconds')))
+        logger.info(f"⏳ 작업 대기열 추가: {name}")
+        return True
+
+    # ------------------------------------------------------------------
+    # 봉 마감 보호 구간
+    # ------------------------------------------------------------------
+    def in_bar_guard(self, now=None):
+        """어떤 타임프레임이든 봉 마감 전후 보호 구간이면 True"""
+        ts = time.time() if now is None else now
+        for sec in self.bar_seconds:
+            pos = ts % sec
+            if pos < self.guard_after or sec - pos < self.guard_before:
+                return True
+        return False
+
+    # ------------------------------------------------------------------
+    # 실행 루프
+    # ------------------------------------------------------------------
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        logger.info(f"📅 중앙 작업 스케줄러 가동 (동시 실행 {self.max_concurrent}개)")
+
+    def stop(self):
+        self.is_running = False
+
+    def _loop(self):
+        while self.is_running:
+            try:
+                self._fire_due()
+                self._reap()
+                self._dispatch()
+            except Exception as e:
+                logger.error(f"스케줄러 오류: {e}")
+            time.sleep(5)
+
+    def _fire_due(self):
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        hhmm = now.strftime('%H:%M')
+        for name, spec in list(self.specs.items()):
+            if spec.at and hhmm >= spec.at and self.last_fired.get(name) != today:
+                self.last_fired[name] = today
+                self.submit(name)
+
+    def _dispatch(self):
+        if self.in_bar_guard():
+            return
+        while True:
+            with self.lock:
+                if not self.queue or len(self.running) >= self.max_concurrent:
+                    return
+                run = self.queue.popleft()
+                spec = self.specs[run.name]
+            self._launch(spec, run)
+
+    def _preexec(self, spec: JobSpec):
+        def apply_limits():
+            if spec.nice:
+                os.nice(spec.nice)
+            cpus = spec.cpus if spec.cpus is not None else default_job_cpus()
+            if cpus and hasattr(os, 'sched_setaffinity'):
+                os.sched_setaffinity(0, cpus)
+            if spec.max_memory_mb and resource is not None:
+                limit = spec.max_memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+        return apply_limits if os.name == 'posix' else None
+
+    def _launch(self, spec: JobSpec, run: JobRun):
+        log_handle = None
+        stdout = None  # 로그 디렉토리가 없으면 부모 프로세스 출력 상속
+        if self.log_dir:
+            run.log_file = os.path.join(self.log_dir, f"{spec.name}.log")
+            log_handle = open(run.log_file, 'a', encoding='utf-8')
+            log_handle.write(f"\n===== {datetime.now().isoformat(timespec='seconds')} {spec.name} =====\n")
+            log_handle.flush()
+            stdout = log_handle
+
+        try:
+            proc = subprocess.Popen(
+                [sys.executable, spec.script] + list(spec.args),
+                cwd=spec.cwd,
+                stdout=stdout,
+                stderr=subprocess.STDOUT,
+                preexec_fn=self._preexec(spec),
+                start_new_session=True,
+            )
+        except Exception as e:
+            run.status = "failed"
+            run.finished_at = datetime.now().isoformat(timespec='seconds')
+            self.history.append(run)
+            if log_handle:
+                log_handle.close()
+            logger.error(f"❌ 작업 시작 실패: {spec.name} ({e})")
+            return
+
+        run.status = "running"
+        run.started_at = datetime.now().isoformat(timespec='seconds')
+        with self.lock:
+            self.running[spec.name] = (proc, run, time.time() + spec.timeout, log_handle, time.time())
+        logger.info(f"🚀 작업 시작: {spec.name} (PID {proc.pid})")
+
+    def _reap(self):
+        with self.lock:
+            items = list(self.running.items())
+        for name, (proc, run, deadline, log_handle, started) in items:
+            rc = proc.poll()
+            if rc is None and time.time() > deadline:
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except Exception:
+                    proc.kill()
+                rc = proc.wait()
+                run.status = "timeout"
+            elif rc is None:
+                continue
+            else:
+                run.status = "success" if rc == 0 else "failed"
+
+            run.returncode = rc
+            run.finished_at = datetime.now().isoformat(timespec='seconds')
+            run.duration = round(time.time() - started, 1)
+            if log_handle:
+                log_handle.close()
+            with self.lock:
+                self.running.pop(name, None)
+                self.history.append(run)
+            log = logger.info if run.status == "success" else logger.error
+            log(f"🏁 작업 종료: {name} | {run.status} (rc={rc}) | {run.duration:.1f}s")
+
+    # ------------------------------------------------------------------
+    # 상태 조회 (매니저 API)
+    # ------------------------------------------------------------------
+    def status(self):
+        with self.lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'in_bar_guard': self.in_bar_guard(),
+                'jobs': {name: asdict(spec) for name, spec in self.specs.items()},
+                'queued': [asdict(r) for r in self.queue],
+                'running': [asdict(r) for (_, r, _, _, _) in self.running.values()],
+                'history': [asdict(r) for r in reversed(self.history)],
+            }
@@ -0,0 +1,208 @@
+"""
+과거 캔들 다운로더 (구간 병렬 + 체크포인트 재개)
+- 요청 범위를 '요청 1회 분량(limit개)' 구간으로 나눠 스레드 풀에서 동시에 받음
+  (모든 요청은 공용 레이트 리미터 버킷을 거치므로 고정 sleep 불필요)
+- 완료된 구간은 바로 로컬 아카이브(.npy)에 저장하고 manifest.json에 기록
+  → 중간에 죽어도 다음 실행에서 남은 구간만 받음, 이미 받은 과거 구간은 재사용
+- 구간은 타임스탬프 격자에 맞춰 겹치지 않으므로 합칠 때 전체 중복 제거가 필요 없음
+- 기존 CSV와 합칠 때는 merge_klines()로 겹치는 꼬리만 잘라내고 이어붙임
+
+사용:
+    dl = KlineDownloader.for_ccxt(ccxt.binance(), 'BTC/USDT', '5m')
+    df = dl.download(since_ms)                   # columns: timestamp(ms), open, high, low, close, volume
+    df = merge_klines(df_old, df)                # 새 데이터 우선
+"""
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from bots.rate_limiter import acquire, wrap_exchange, MARKET
+from bots.metrics import metrics
+
+logger = logging.getLogger("KlineDownloader")
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+ARCHIVE_DIR = os.getenv('KLINE_ARCHIVE_DIR', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'kline_archive'))
+MANIFEST_VERSION = 1
+
+
+class KlineDownloader:
+    """fetch(start_ms, end_ms, limit) → 행 리스트 [[ts, o, h, l, c, v, ...], ...] 를 구간 단위로 호출"""
+
+    def __init__(self, fetch, name, step_ms, columns=OHLCV_COLUMNS, limit=1000,
+                 max_workers=None, archive_dir=None, retries=3):
+        self.fetch = fetch
+        self.name = name
+        self.step = int(step_ms)
+        self.columns = list(columns)
+        self.limit = limit
+        self.span = self.step * limit
+        self.max_workers = max_workers or int(os.getenv('KLINE_WORKERS', '4'))
+        self.retries = retries
+        self.dir = os.path.join(archive_dir or ARCHIVE_DIR, name)
+        self.manifest_path = os.path.join(self.dir, 'manifest.json')
+        self.lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    # ------------------------------------------------------------------
+    # 생성 헬퍼
+    # ------------------------------------------------------------------
+    @classmethod
+    def for_ccxt(cls, exchange, symbol, timeframe, **kwargs):
+        """ccxt 거래소 (레이트 리미터로 감싸서 사용)"""
+        exchange = wrap_exchange(exchange)
+        step = exchange.parse_timeframe(timeframe) * 1000
+
+        def fetch(start, end, limit):
+            return exchange.fetch_ohlcv(symbol, timeframe, since=start, limit=limit)
+
+        ex_id = getattr(exchange, 'id', 'ccxt')
+        # 같은 심볼이라도 현물/선물 캔들은 다름 → 시장 구분을 아카이브 이름에 포함
+        market_type = (getattr(exchange, 'options', None) or {}).get('defaultType') or 'spot'
+        if ':' in symbol and market_type == 'spot':
+            market_type = 'swap'
+        name = f"{ex_id}_{market_type}_{symbol.split(':')[0].replace('/', '')}_{timeframe}"
+        return cls(fetch, name, step, **kwargs)
+
+    @classmethod
+    def for_bybit(cls, symbol, interval, step_ms, session=None, **kwargs):
+        """Bybit V5 /v5/market/kline 직접 호출 (turnover 포함)"""
+        import requests
+        session = session or requests.Session()
+        url = "https://api.bybit.com/v5/market/kline"
+
+        def fetch(start, end, limit):
+            acquire('bybit', None, MARKET)
+            params = {"category": "linear", "symbol": symbol, "interval": interval,
+                      "start": start, "end": end, "limit": limit}
+            data = session.get(url, params=params, timeout=10).json()
+            if data.get("retCode") != 0:
+                raise RuntimeError(f"Bybit API Error: {data.get('retMsg')}")
+            return [[float(x) for x in r[:7]] for r in data.get("result", {}).get("list", [])]
+
+        columns = OHLCV_COLUMNS + ['turnover']
+        return cls(fetch, f"bybit_{symbol}_{interval}", step_ms, columns=columns, **kwargs)
+
+    # ------------------------------------------------------------------
+    # manifest
+    # ------------------------------------------------------------------
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION and manifest.get('step') == self.step \
+                    and manifest.get('span') == self.span and manifest.get('columns') == self.columns:
+                return manifest
+            logger.warning(f"[{self.name}] 아카이브 설정이 달라 manifest를 새로 만듭니다")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"[{self.name}] manifest 읽기 실패 ({e}), 새로 시작")
+        return {'version': MANIFEST_VERSION, 'step': self.step, 'span': self.span,
+                'columns': self.columns, 'windows': {}}
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    def _window_path(self, start):
+        return os.path.join(self.dir, f"{start}.npy")
+
+    # ------------------------------------------------------------------
+    # 다운로드
+    # ------------------------------------------------------------------
+    def windows(self, start_ms, end_ms):
+        """[start_ms, end_ms) 범위를 덮는 격자 정렬 구간 시작 시각 목록"""
+        first = (int(start_ms) // self.span) * self.span
+        return list(range(first, int(end_ms), self.span))
+
+    def _fetch_window(self, start):
+        end = start + self.span
+        for attempt in range(self.retries):
+            try:
+                rows = self.fetch(start, end - 1, self.limit) or []
+                arr = np.asarray(rows, dtype=np.float64).reshape(-1, len(self.columns)) if rows \
+                    else np.empty((0, len(self.columns)))
+                # 구간 밖 행 제거 + 구간 내부 정렬/중복 제거 (작은 배열)
+                arr = arr[(arr[:, 0] >= start) & (arr[:, 0] < end)]
+                _, idx = np.unique(arr[:, 0], return_index=True)
+                return arr[idx]
+            except Exception as e:
+                wait = 2 ** attempt
+                metrics.record_retry('kline_downloader', self.name)
+                logger.warning(f"[{self.name}] 구간 {start} 실패 ({e}), {wait}초 후 재시도")
+                time.sleep(wait)
+        raise RuntimeError(f"[{self.name}] 구간 {start} 다운로드 실패")
+
+    def _store_window(self, start, arr, fetched_at):
+        path = self._window_path(start)
+        np.save(path + '.tmp.npy', arr)
+        os.replace(path + '.tmp.npy', path)
+        # 마지막 봉까지 마감된 구간만 완료 처리 (진행 중인 구간은 다음 실행에서 다시 받음)
+        complete = start + self.span <= fetched_at - self.step
+        with self.lock:
+            self.manifest['windows'][str(start)] = {'rows': int(len(arr)), 'complete': complete}
+            self._save_manifest()
+
+    def download(self, start_ms, end_ms=None):
+        """범위 다운로드 후 DataFrame 반환 (timestamp 오름차순, 중복 없음)"""
+        end_ms = int(end_ms if end_ms is not None else time.time() * 1000)
+        windows = self.windows(start_ms, end_ms)
+        done = self.manifest['windows']
+        todo = [w for w in windows
+                if not done.get(str(w), {}).get('complete') or not os.path.exists(self._window_path(w))]
+
+        if todo:
+            logger.info(f"[{self.name}] 구간 {len(windows)}개 중 {len(todo)}개 다운로드 "
+                        f"(아카이브 재사용 {len(windows) - len(todo)}개, workers={self.max_workers})")
+            failed = []
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {pool.submit(self._fetch_window, w): w for w in todo}
+                for n, fut in enumerate(as_completed(futures), 1):
+                    w = futures[fut]
+                    try:
+                        self._store_window(w, fut.result(), time.time() * 1000)
+                    except Exception as e:
+                        logger.error(str(e))
+                        failed.append(w)
+                    if n % 20 == 0 or n == len(todo):
+                        logger.info(f"[{self.name}] 진행 {n}/{len(todo)}")
+            if failed:
+                # 받은 구간은 manifest에 남아 있으므로 다시 실행하면 실패한 구간만 받음
+                raise RuntimeError(f"[{self.name}] {len(failed)}개 구간 실패, 재실행하면 이어서 받습니다")
+
+        return self.load(start_ms, end_ms, windows)
+
+    def load(self, start_ms, end_ms, windows=None):
+        """아카이브에서 범위 읽기 (구간은 서로 겹치지 않으므로 이어붙이기만 하면 됨)"""
+        windows = windows if windows is not None else self.windows(start_ms, end_ms)
+        parts = [np.load(self._window_path(w)) for w in windows if os.path.exists(self._window_path(w))]
+        arr = np.concatenate(parts) if parts else np.empty((0, len(self.columns)))
+        arr = arr[(arr[:, 0] >= start_ms) & (arr[:, 0] <= end_ms)]
+        df = pd.DataFrame(arr, columns=self.columns)
+        df['timestamp'] = df['timestamp'].astype(np.int64)
+        return df
+
+
+def merge_klines(old, new, ts_col='timestamp'):
+    """기존 데이터(정렬됨) 뒤에 새 데이터를 붙임. 겹치는 꼬리는 새 데이터 우선
+
+    두 프레임 모두 ts_col 기준 오름차순이라고 가정 → 전체 drop_duplicates 대신
+    기존 데이터에서 새 데이터 시작 시각 이후만 잘라냄
+    """
+    if old is None or old.empty:
+        return new.reset_index(drop=True)
+    if new is None or new.empty:
+        return old.reset_index(drop=True)
+    cut = old[ts_col].searchsorted(new[ts_col].iloc[0], side='left')
+    return pd.concat([old.iloc[:cut], new], ignore_index=True)
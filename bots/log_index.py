@@ -0,0 +1,277 @@
+"""
+로그 파일 시간 인덱스 (사이드카 <로그>.idx)
+- 분 단위 첫 줄의 바이트 오프셋 → 시간 범위 조회 시 해당 구간만 seek 해서 읽음
+- 레벨/키워드 포스팅: 해당 레벨/키워드가 나온 '분' 번호 목록 → 조건이 있으면 후보 분만 읽음
+- 파일이 커지면 늘어난 부분만 읽어서 인덱스에 추가 (조회 때마다 자동 갱신), 로테이션/잘림은 감지해서 재구축
+- 저장: 갱신분만 <인덱스>.delta에 한 줄씩 추가, 델타가 CHECKPOINT_EVERY개 쌓이면 전체 인덱스를 다시 씀
+  (로그가 커져도 조회 때마다 인덱스 전체를 다시 쓰지 않음)
+- 인덱스에 없는 키워드도 조회 가능 (시간 범위 안에서 문자열 검색)
+- 대상: '%(asctime)s - ...' 텍스트 로그 (타임스탬프 없는 줄은 앞 줄의 연속, 예: traceback)
+  레벨 조회는 '%(asctime)s - %(levelname)s - ...' 형식(log_setup.TEXT_FORMAT)에서만 가능
+
+사용:
+    index = get_log_index('BTC_30분봉_Live/bot.log')
+    index.search(start='2025-06-01', end='2025-06-01', keyword='TS 발동')
+    index.search(start='2025-06-01 09:00', end='2025-06-01 10:30', level='ERROR', limit=200)
+"""
+import os
+import re
+import json
+import logging
+import threading
+from bisect import bisect_left
+
+logger = logging.getLogger("LogIndex")
+
+# 자주 찾는 문구 (포스팅 유지), 그 외 키워드는 시간 범위 스캔으로 처리
+KEYWORDS = ('TS 발동', '주문 실패', '주문 rejected', '주문 timeout', '청산', '진입', 'SIGNAL', 'Error', '오류',
+            '실패', '트리거 실행', '보호 주문', '재연결', 'Traceback')
+
+_TS = re.compile(rb'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}):\d{2}')
+_TS_TEXT = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+_LEVEL = re.compile(r' - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - ')
+_HEAD = 64          # 로테이션 감지용 파일 앞부분 길이
+_CHUNK = 4 << 20    # 처음 구축할 때 큰 파일도 4MB씩 읽음
+CHECKPOINT_EVERY = 256
+
+
+def _normalize_time(value, upper=False):
+    """'2025-06-01', '2025-06-01T09:30', '2025-06-01 09:30:15' → 문자열 비교용 키
+    upper=True면 해당 날짜/분 전체를 포함하도록 끝을 늘림"""
+    if not value:
+        return None
+    value = str(value).strip().replace('T', ' ')[:19]
+    return value + '\uffff' if upper else value
+
+
+class LogIndex:
+    def __init__(self, log_path, index_path=None, keywords=KEYWORDS):
+        self.log_path = log_path
+        self.index_path = index_path or log_path + '.idx'
+        self.delta_path = self.index_path + '.delta'
+        self.keywords = tuple(keywords)
+        self.lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.size = 0
+        self.head = ''
+        self.minutes = []       # ['YYYY-mm-dd HH:MM', ...] (오름차순)
+        self.offsets = []       # 각 분의 첫 줄 바이트 오프셋
+        self.postings = {}      # 'level:ERROR' / 'kw:TS 발동' -> [분 번호, ...]
+        self.deltas = None      # 마지막 체크포인트 이후 델타 수 (None이면 다음 저장 때 전체 기록)
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if tuple(data.get('keywords', ())) != self.keywords:
+                return  # 키워드 목록이 바뀌면 재구축
+            self.size, self.head = data['size'], data['head']
+            self.minutes, self.offsets, self.postings = data['minutes'], data['offsets'], data['postings']
+            self.deltas = 0
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"로그 인덱스 손상, 재구축: {self.index_path} ({e})")
+            self._reset()
+            return
+        self._replay()
+
+    def _replay(self):
+        """체크포인트 뒤에 쌓인 델타 적용 (이어지지 않는 델타가 나오면 거기서 멈추고 다음 저장 때 전체 기록)"""
+        try:
+            f = open(self.delta_path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    delta = json.loads(line)
+                except ValueError:
+                    delta = None  # 쓰다 만 마지막 줄
+                if not delta or delta.get('from') != self.size:
+                    self.deltas = None
+                    return
+                self._apply(delta)
+                self.deltas += 1
+
+    def _apply(self, delta):
+        self.size, self.head = delta['size'], delta['head']
+        self.minutes.extend(delta['minutes'])
+        self.offsets.extend(delta['offsets'])
+        for key, items in delta['postings'].items():
+            self.postings.setdefault(key, []).extend(items)
+
+    def _mark(self):
+        """갱신 전 상태 (델타 계산용)"""
+        return self.size, len(self.minutes), {k: len(v) for k, v in self.postings.items()}
+
+    def _save(self, mark):
+        if self.deltas is None or self.deltas >= CHECKPOINT_EVERY:
+            self._checkpoint()
+            return
+        size, n_minutes, n_posts = mark
+        postings = {k: v[n_posts.get(k, 0):] for k, v in self.postings.items() if len(v) > n_posts.get(k, 0)}
+        delta = {'from': size, 'size': self.size, 'head': self.head, 'minutes': self.minutes[n_minutes:],
+                 'offsets': self.offsets[n_minutes:], 'postings': postings}
+        with open(self.delta_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(delta) + '\n')
+        self.deltas += 1
+
+    def _checkpoint(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'size': self.size, 'head': self.head, 'keywords': list(self.keywords),
+                       'minutes': self.minutes, 'offsets': self.offsets, 'postings': self.postings}, f)
+        os.replace(tmp, self.index_path)
+        # 체크포인트에 모두 들어갔으므로 델타는 비움 (여기서 죽어도 남은 델타는 'from'이 맞지 않아 무시됨)
+        open(self.delta_path, 'w').close()
+        self.deltas = 0
+
+    # ------------------------------------------------------------------
+    # 인덱스 갱신 (늘어난 부분만)
+    # ------------------------------------------------------------------
+    def update(self):
+        with self.lock:
+            return self._update()
+
+    def _update(self):
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            return 0
+        added = 0
+        mark = self._mark()
+        with open(self.log_path, 'rb') as f:
+            head = f.read(_HEAD).hex()
+            n = min(len(head), len(self.head))
+            if size < self.size or head[:n] != self.head[:n]:
+                logger.info(f"로그 파일 교체/잘림 감지, 인덱스 재구축: {self.log_path}")
+                self._reset()
+            if len(head) > len(self.head):
+                self.head = head
+            f.seek(self.size)
+            while self.size < size:
+                chunk = f.read(min(_CHUNK, size - self.size))
+                end = chunk.rfind(b'\n') + 1  # 쓰는 중인 마지막 줄은 다음에
+                if end == 0:
+                    break
+                added += self._index_chunk(chunk[:end])
+                f.seek(self.size)
+        if added:
+            self._save(mark)
+        return added
+
+    def _index_chunk(self, chunk):
+        added = 0
+        offset = self.size
+        current = len(self.minutes) - 1
+        for line in chunk.splitlines(keepends=True):
+            text = line.decode('utf-8', errors='replace')
+            m = _TS.match(line)
+            if m:
+                minute = m.group(1).decode()
+                if not self.minutes or minute > self.minutes[-1]:
+                    self.minutes.append(minute)
+                    self.offsets.append(offset)
+                    current = len(self.minutes) - 1
+                lv = _LEVEL.search(text[:48])
+                if lv:
+                    self._post('level:' + lv.group(1), current)
+                added += 1
+            if current >= 0:
+                for kw in self.keywords:
+                    if kw in text:
+                        self._post('kw:' + kw, current)
+            offset += len(line)
+        self.size = offset
+        return added
+
+    def _post(self, key, minute_no):
+        items = self.postings.setdefault(key, [])
+        if not items or items[-1] != minute_no:
+            items.append(minute_no)
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    def search(self, start=None, end=None, level=None, keyword=None, limit=500, newest_first=False):
+        """시간 범위/레벨/키워드로 로그 레코드(연속 줄 포함) 조회"""
+        lo, hi = _normalize_time(start), _normalize_time(end, upper=True)
+        level = level.upper() if level else None
+        with self.lock:
+            self._update()
+            first = bisect_left(self.minutes, lo[:16]) if lo else 0
+            last = bisect_left(self.minutes, hi[:16] + '\uffff') if hi else len(self.minutes)
+            candidates = set(range(first, last))
+            if level:
+                candidates &= set(self.postings.get('level:' + level, ()))
+            if keyword and keyword in self.keywords:
+                candidates &= set(self.postings.get('kw:' + keyword, ()))
+            ranges = self._ranges(sorted(candidates))
+            size = self.size
+
+        results = []
+        order = reversed(ranges) if newest_first else ranges
+        for begin, stop in order:
+            records = self._read(begin, stop or size)
+            if newest_first:
+                records.reverse()
+            for record in records:
+                stamp = record[:19]
+                if (lo and stamp < lo) or (hi and stamp > hi):
+                    continue
+                if level and f" - {level} - " not in record[:48]:
+                    continue
+                if keyword and keyword not in record:
+                    continue
+                results.append(record.rstrip('\n'))
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def _ranges(self, minute_nos):
+        """연속된 분 번호를 (시작 오프셋, 끝 오프셋) 구간으로 묶음 (끝이 None이면 파일 끝까지)"""
+        ranges = []
+        for no in minute_nos:
+            begin = self.offsets[no]
+            stop = self.offsets[no + 1] if no + 1 < len(self.offsets) else None
+            if ranges and ranges[-1][1] == begin:
+                ranges[-1] = (ranges[-1][0], stop)
+            else:
+                ranges.append((begin, stop))
+        return ranges
+
+    def _read(self, begin, stop):
+        with open(self.log_path, 'rb') as f:
+            f.seek(begin)
+            data = f.read(stop - begin).decode('utf-8', errors='replace')
+        records = []
+        for line in data.splitlines(keepends=True):
+            if _TS_TEXT.match(line) or not records:
+                records.append(line)
+            else:
+                records[-1] += line  # traceback 등 연속 줄
+        return records
+
+    def status(self):
+        with self.lock:
+            return {'log': self.log_path, 'indexed_bytes': self.size, 'minutes': len(self.minutes),
+                    'first': self.minutes[0] if self.minutes else None,
+                    'last': self.minutes[-1] if self.minutes else None,
+                    'postings': {k: len(v) for k, v in self.postings.items()}}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_log_index(log_path):
+    """로그 파일별 인덱스 (프로세스 내 공유)"""
+    path = os.path.abspath(log_path)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = LogIndex(path)
+        return _indexes[path]
@@ -0,0 +1,211 @@
+"""
+공용 로깅 설정 (비동기 배치 기록 + JSON lines)
+- 봇 스레드는 레코드를 큐에 넣기만 함 (포맷/파일 쓰기/flush는 전용 기록 스레드) → 판단 루프에 로깅 지연 없음
+- 기록 스레드는 쌓인 레코드를 묶어서 한 번에 쓰고 flush (레코드마다 write/flush 하지 않음)
+- 싱크: 기존 텍스트 로그 (대시보드 tail 호환) + <로그>.jsonl 구조화 기록 {ts, level, bot, symbol, logger, msg, ...}
+- 반복 상태 줄은 extra={'throttle': 'status'}로 표시 → 키별 간격(STATUS_INTERVAL) 안의 줄은 건너뛰고 건너뛴 수만 다음 줄에 기록
+- 큐가 가득 차면 버림 (봇 스레드는 절대 기다리지 않음), 버린 수는 stats()로 확인
+
+사용:
+    logger = setup_logging('BTC_30M_Bot', os.path.join(log_dir, 'bot.log'), bot='Bot_30M', symbol='BTC/USDT')
+    logger.info(f"📊 Status | ...", extra={'throttle': 'status'})
+    logger.info("주문 접수", extra={'fields': {'cid': cid}})
+"""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+STATUS_INTERVAL = float(os.getenv('LOG_STATUS_INTERVAL', '60'))
+QUEUE_SIZE = 20000
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 500
+
+
+class LogWriter:
+    """모든 봇이 공유하는 기록 스레드 (프로세스당 하나)"""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.sinks = {}             # key -> (stream, formatter, kind)
+        self.lock = threading.Lock()
+        self.counts = {'records': 0, 'batches': 0, 'dropped': 0, 'throttled': 0, 'errors': 0}
+        self.thread = threading.Thread(target=self._run, daemon=True, name="LogWriter")
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def add_sink(self, key, open_stream, formatter, kind):
+        with self.lock:
+            if key not in self.sinks:
+                self.sinks[key] = (open_stream(), formatter, kind)
+
+    def put(self, sink_keys, record):
+        try:
+            self.queue.put_nowait((sink_keys, record))
+        except queue.Full:
+            self.counts['dropped'] += 1
+
+    def flush(self, timeout=2.0):
+        """남은 레코드 기록 (종료 시)"""
+        done = threading.Event()
+        try:
+            self.queue.put((None, done), timeout=timeout)
+            done.wait(timeout)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get()]
+            except Exception:
+                continue
+            deadline = time.time() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        lines = {}                  # sink key -> [str]
+        events = []
+        with self.lock:
+            sinks = dict(self.sinks)
+        for sink_keys, record in batch:
+            if sink_keys is None:
+                events.append(record)
+                continue
+            self.counts['records'] += 1
+            for key in sink_keys:
+                stream, formatter, kind = sinks[key]
+                try:
+                    lines.setdefault(key, []).append(_to_json(record) if kind == 'json' else formatter.format(record))
+                except Exception:
+                    self.counts['errors'] += 1
+        for key, items in lines.items():
+            stream = sinks[key][0]
+            try:
+                stream.write('\n'.join(items) + '\n')
+                stream.flush()
+            except Exception:
+                self.counts['errors'] += 1
+        self.counts['batches'] += 1
+        for event in events:
+            event.set()
+
+
+def _to_json(record):
+    data = {
+        'ts': round(record.created, 3),
+        'level': record.levelname,
+        'bot': getattr(record, 'bot', None),
+        'symbol': getattr(record, 'symbol', None),
+        'logger': record.name,
+        'msg': record.getMessage(),
+    }
+    fields = getattr(record, 'fields', None)
+    if fields:
+        data.update(fields)
+    if getattr(record, 'suppressed', 0):
+        data['suppressed'] = record.suppressed
+    if record.exc_text:
+        data['exc'] = record.exc_text
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class QueueLogHandler(logging.Handler):
+    """봇 스레드 쪽 핸들러: 상태 줄 간격 제한 + bot/symbol 부착 후 큐에 넣기만 함"""
+
+    def __init__(self, sink_keys, bot=None, symbol=None, status_interval=STATUS_INTERVAL):
+        super().__init__()
+        self.sink_keys = tuple(sink_keys)
+        self.bot = bot
+        self.symbol = symbol
+        self.status_interval = status_interval
+        self.throttle = {}          # key -> [다음 허용 시각, 건너뛴 수]
+
+    def emit(self, record):
+        key = getattr(record, 'throttle', None)
+        if key is not None:
+            # 루트 로거처럼 여러 봇의 레코드가 모이는 핸들러도 있으므로 로거별로 구분
+            slot = self.throttle.setdefault((record.name, key), [0.0, 0])
+            if record.created < slot[0]:
+                slot[1] += 1
+                _writer().counts['throttled'] += 1
+                return
+            record.suppressed = slot[1]
+            slot[0], slot[1] = record.created + self.status_interval, 0
+        # 먼저 거친 핸들러(봇 전용 로거)가 붙인 값 우선
+        if getattr(record, 'bot', None) is None:
+            record.bot = self.bot
+        if getattr(record, 'symbol', None) is None:
+            record.symbol = self.symbol
+        if record.args:
+            # 인자가 나중에 바뀔 수 있으므로 메시지는 지금 확정
+            record.msg, record.args = record.getMessage(), None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        _writer().put(self.sink_keys, record)
+
+
+_writer_instance = None
+_writer_lock = threading.Lock()
+
+
+def _writer():
+    global _writer_instance
+    if _writer_instance is None:
+        with _writer_lock:
+            if _writer_instance is None:
+                _writer_instance = LogWriter()
+    return _writer_instance
+
+
+def setup_logging(name, log_file=None, bot=None, symbol=None, level=logging.INFO, text_format=TEXT_FORMAT,
+                  json_file=True, console=False, console_formatter=None, propagate=None):
+    """name 로거(None이면 루트)에 비동기 핸들러 연결 (같은 싱크로 다시 호출해도 중복 연결 안 함)
+    log_file=None이면 콘솔만"""
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    if propagate is not None:
+        logger.propagate = propagate
+
+    writer = _writer()
+    keys = []
+    if log_file:
+        log_file = os.path.abspath(log_file)
+        keys.append(log_file)
+        if json_file:
+            # 기본값: bot.log -> bot.jsonl
+            keys.append(os.path.splitext(log_file)[0] + '.jsonl' if json_file is True else os.path.abspath(json_file))
+    if console:
+        keys.append(f"console:{name}")
+    if any(isinstance(h, QueueLogHandler) and h.sink_keys == tuple(keys) for h in logger.handlers):
+        return logger
+
+    if log_file:
+        writer.add_sink(keys[0], lambda: open(keys[0], 'a', encoding='utf-8'), logging.Formatter(text_format), 'text')
+        if json_file:
+            writer.add_sink(keys[1], lambda: open(keys[1], 'a', encoding='utf-8'), None, 'json')
+    if console:
+        writer.add_sink(keys[-1], lambda: sys.stdout, console_formatter or logging.Formatter(text_format), 'text')
+
+    logger.addHandler(QueueLogHandler(keys, bot=bot, symbol=symbol))
+    return logger
+
+
+def stats():
+    """기록 스레드 상태 (큐 길이, 버린/건너뛴 레코드 수)"""
+    writer = _writer()
+    return {'queued': writer.queue.qsize(), 'sinks': list(writer.sinks), **writer.counts}
@@ -0,0 +1,373 @@
+"""
+Bybit V5 공개 WebSocket 시세 스트림 (kline / tickers)
+- 백그라운드 스레드의 asyncio 루프에서 연결 유지 (ping, 자동 재연결 + 지수 백오프)
+- 캔들 시작 시각으로 누락 구간 감지 → REST로 보충 (재연결 시에도 보충)
+- 구독 콜백으로 봉 갱신(BarEvent) / 체결가(TickEvent) 이벤트 전달
+- 주소는 환경변수 BYBIT_WS_URL / BYBIT_REST_URL로 바꿀 수 있음 (로컬 테스트 서버 등)
+
+사용:
+    stream = get_market_stream()
+    stream.subscribe_ticker('BTC/USDT', on_tick)
+    stream.subscribe_kline('BTC/USDT', '30m', on_bar, history=200)
+    price = stream.last_price('BTC/USDT', max_age=5)   # 오래됐으면 None → REST로 대체
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from bots.rate_limiter import acquire_async, MARKET
+
+logger = logging.getLogger("MarketStream")
+
+MAINNET_WS = "wss://stream.bybit.com/v5/public/linear"
+TESTNET_WS = "wss://stream-testnet.bybit.com/v5/public/linear"
+MAINNET_REST = "https://api.bybit.com"
+TESTNET_REST = "https://api-testnet.bybit.com"
+
+INTERVALS = {'1m': '1', '3m': '3', '5m': '5', '15m': '15', '30m': '30', '1h': '60', '4h': '240', '1d': 'D'}
+INTERVAL_MS = {'1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+               '1h': 3_600_000, '4h': 14_400_000, '1d': 86_400_000}
+
+
+def normalize_symbol(symbol):
+    """'BTC/USDT', 'BTC/USDT:USDT' → 'BTCUSDT'"""
+    return symbol.split(':')[0].replace('/', '').upper()
+
+
+@dataclass
+class BarEvent:
+    symbol: str
+    interval: str
+    start: int          # ms
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    confirm: bool       # True면 마감된 봉
+    backfill: bool = False
+
+
+@dataclass
+class TickEvent:
+    symbol: str
+    price: float
+    ts: int             # ms (거래소 시각)
+    seq: Optional[int] = None
+
+
+class MarketStream:
+    """공개 시세 WebSocket 클라이언트 (스레드 안전한 조회 + 콜백 구독)"""
+
+    def __init__(self, ws_url=None, rest_url=None, testnet=False, ping_interval=20, max_bars=1000):
+        self.ws_url = ws_url or os.getenv('BYBIT_WS_URL') or (TESTNET_WS if testnet else MAINNET_WS)
+        self.rest_url = rest_url or os.getenv('BYBIT_REST_URL') or (TESTNET_REST if testnet else MAINNET_REST)
+        self.ping_interval = ping_interval
+        self.max_bars = max_bars
+
+        self.lock = threading.Lock()
+        self.kline_subs: Dict[tuple, List[Callable]] = {}
+        self.ticker_subs: Dict[str, List[Callable]] = {}
+        self.history: Dict[tuple, int] = {}
+        self.bars: Dict[tuple, Dict[int, BarEvent]] = {}
+        self.tickers: Dict[str, dict] = {}
+        self.ticker_seq: Dict[str, int] = {}
+        self.last_tick: Dict[str, float] = {}  # 로컬 수신 시각
+
+        self.stats = {'messages': 0, 'reconnects': 0, 'gaps': 0, 'backfills': 0, 'stale_ticks': 0,
+                      'connected': False, 'last_message': 0.0}
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread = None
+        self.ws = None
+        self.session = None
+        self.is_running = False
+
+    # ------------------------------------------------------------------
+    # 구독
+    # ------------------------------------------------------------------
+    def subscribe_kline(self, symbol, interval, callback=None, history=200):
+        sym = normalize_symbol(symbol)
+        key = (sym, interval)
+        if interval not in INTERVALS:
+            raise ValueError(f"지원하지 않는 타임프레임: {interval}")
+        with self.lock:
+            new = key not in self.kline_subs
+            self.kline_subs.setdefault(key, [])
+            if callback:
+                self.kline_subs[key].append(callback)
+            self.history[key] = max(self.history.get(key, 0), history)
+        if new:
+            self._on_new_topic(f"kline.{INTERVALS[interval]}.{sym}", key)
+
+    def subscribe_ticker(self, symbol, callback=None):
+        sym = normalize_symbol(symbol)
+        with self.lock:
+            new = sym not in self.ticker_subs
+            self.ticker_subs.setdefault(sym, [])
+            if callback:
+                self.ticker_subs[sym].append(callback)
+        if new:
+            self._on_new_topic(f"tickers.{sym}")
+
+    def _topics(self):
+        with self.lock:
+            kl = [f"kline.{INTERVALS[iv]}.{sym}" for sym, iv in self.kline_subs]
+            tk = [f"tickers.{sym}" for sym in self.ticker_subs]
+        return kl + tk
+
+    def _on_new_topic(self, topic, kline_key=None):
+        """실행 중에 구독이 추가되면 바로 전송 + 과거 캔들 로드"""
+        if self.loop is None or not self.is_running:
+            return
+        asyncio.run_coroutine_threadsafe(self._send_subscribe([topic]), self.loop)
+        # 아직 연결 전이면 연결 직후 전체 보충에서 처리됨
+        if kline_key and self.stats['connected']:
+            asyncio.run_coroutine_threadsafe(self._backfill(kline_key), self.loop)
+
+    # ------------------------------------------------------------------
+    # 조회 (봇 스레드에서 호출)
+    # ------------------------------------------------------------------
+    def last_price(self, symbol, max_age=10.0):
+        """최근 체결가 (max_age초 이상 갱신이 없으면 None)"""
+        sym = normalize_symbol(symbol)
+        with self.lock:
+            t = self.tickers.get(sym)
+            if not t or time.time() - self.last_tick.get(sym, 0) > max_age:
+                return None
+            try:
+                return float(t['lastPrice'])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+    def get_ohlcv(self, symbol, interval, limit=200, max_age=None):
+        """ccxt fetch_ohlcv 형식 [[ts, o, h, l, c, v], ...] (진행 중인 봉 포함). 데이터가 부족하면 None"""
+        key = (normalize_symbol(symbol), interval)
+        max_age = max_age if max_age is not None else 2 * INTERVAL_MS.get(interval, 60_000) / 1000
+        with self.lock:
+            bars = self.bars.get(key)
+            if not bars or len(bars) < limit or not self.stats['connected']:
+                return None
+            starts = sorted(bars)[-limit:]
+            if time.time() * 1000 - starts[-1] > max_age * 1000 + INTERVAL_MS.get(interval, 0):
+                return None
+            return [[s, bars[s].open, bars[s].high, bars[s].low, bars[s].close, bars[s].volume] for s in starts]
+
+    def status(self):
+        with self.lock:
+            return dict(self.stats, url=self.ws_url, topics=self._topics_unlocked())
+
+    def _topics_unlocked(self):
+        return [f"kline.{INTERVALS[iv]}.{sym}" for sym, iv in self.kline_subs] + \
+               [f"tickers.{sym}" for sym in self.ticker_subs]
+
+    # ------------------------------------------------------------------
+    # 실행
+    # ------------------------------------------------------------------
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True, name="MarketStream")
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        if self.loop and self.ws is not None:
+            asyncio.run_coroutine_threadsafe(self.ws.close(), self.loop)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._main())
+
+    async def _main(self):
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        backoff = 1
+        try:
+            while self.is_running:
+                try:
+                    await self._connect_once()
+                    backoff = 1
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                    logger.warning(f"시세 스트림 연결 끊김: {e!r}")
+                except Exception as e:
+                    logger.error(f"시세 스트림 오류: {e!r}")
+                self.stats['connected'] = False
+                if not self.is_running:
+                    break
+                self.stats['reconnects'] += 1
+                logger.info(f"🔌 {backoff}초 후 재연결...")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+        finally:
+            await self.session.close()
+
+    async def _connect_once(self):
+        async with self.session.ws_connect(self.ws_url, heartbeat=None, autoping=True) as ws:
+            self.ws = ws
+            self.stats['connected'] = True
+            logger.info(f"📡 시세 스트림 연결: {self.ws_url}")
+            await self._send_subscribe(self._topics())
+
+            # 재연결 포함: 끊긴 동안 빠진 캔들 보충
+            with self.lock:
+                keys = list(self.kline_subs)
+            for key in keys:
+                asyncio.ensure_future(self._backfill(key))
+
+            pinger = asyncio.ensure_future(self._ping_loop(ws))
+            try:
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        self._handle(json.loads(msg.data))
+                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+            finally:
+                pinger.cancel()
+                self.ws = None
+
+    async def _ping_loop(self, ws):
+        while not ws.closed:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send_str(json.dumps({'op': 'ping'}))
+            # 응답이 너무 오래 없으면 끊고 재연결
+            if time.time() - self.stats['last_message'] > self.ping_interval * 3:
+                logger.warning("시세 스트림 응답 없음, 재연결")
+                await ws.close()
+                return
+
+    async def _send_subscribe(self, topics):
+        if self.ws is None or self.ws.closed or not topics:
+            return
+        for i in range(0, len(topics), 10):  # Bybit 요청당 최대 10개
+            await self.ws.send_str(json.dumps({'op': 'subscribe', 'args': topics[i:i + 10]}))
+
+    # ------------------------------------------------------------------
+    # 메시지 처리
+    # ------------------------------------------------------------------
+    def _handle(self, msg):
+        self.stats['messages'] += 1
+        self.stats['last_message'] = time.time()
+        topic = msg.get('topic')
+        if not topic:
+            if msg.get('op') == 'subscribe' and not msg.get('success', True):
+                logger.error(f"구독 실패: {msg}")
+            return
+        if topic.startswith('kline.'):
+            _, iv_code, sym = topic.split('.', 2)
+            interval = next((k for k, v in INTERVALS.items() if v == iv_code), iv_code)
+            for k in msg.get('data', []):
+                self._apply_bar(sym, interval, k, backfill=False)
+        elif topic.startswith('tickers.'):
+            self._apply_ticker(topic.split('.', 1)[1], msg)
+
+    def _apply_bar(self, sym, interval, k, backfill):
+        key = (sym, interval)
+        step = INTERVAL_MS.get(interval, 0)
+        bar = BarEvent(sym, interval, int(k['start']), float(k['open']), float(k['high']), float(k['low']),
+                       float(k['close']), float(k['volume']), bool(k.get('confirm', True)), backfill)
+        gap_from = None
+        with self.lock:
+            bars = self.bars.setdefault(key, {})
+            if bars and not backfill:
+                last = max(bars)
+                if step and bar.start - last > step:
+                    gap_from = last
+            bars[bar.start] = bar
+            if len(bars) > self.max_bars:
+                for s in sorted(bars)[:len(bars) - self.max_bars]:
+                    del bars[s]
+            callbacks = list(self.kline_subs.get(key, []))
+
+        if gap_from is not None:
+            self.stats['gaps'] += 1
+            logger.warning(f"캔들 누락 감지 {sym} {interval}: {gap_from} → {bar.start}, REST 보충")
+            asyncio.ensure_future(self._backfill(key, since=gap_from))
+        if not backfill:
+            self._dispatch(callbacks, bar)
+
+    def _apply_ticker(self, sym, msg):
+        data = msg.get('data', {})
+        seq = data.get('cs') or msg.get('cs')
+        with self.lock:
+            prev_seq = self.ticker_seq.get(sym)
+            if seq is not None and prev_seq is not None and seq < prev_seq:
+                self.stats['stale_ticks'] += 1  # 순서가 뒤바뀐 메시지는 버림
+                return
+            if msg.get('type') == 'snapshot' or sym not in self.tickers:
+                self.tickers[sym] = dict(data)
+            else:
+                self.tickers[sym].update(data)  # delta는 바뀐 필드만 옴
+            if seq is not None:
+                self.ticker_seq[sym] = seq
+            self.last_tick[sym] = time.time()
+            price = self.tickers[sym].get('lastPrice')
+            callbacks = list(self.ticker_subs.get(sym, []))
+        if 'lastPrice' in data and price is not None:
+            self._dispatch(callbacks, TickEvent(sym, float(price), int(msg.get('ts', 0)), seq))
+
+    def _dispatch(self, callbacks, event):
+        for cb in callbacks:
+            try:
+                cb(event)
+            except Exception as e:
+                logger.error(f"시세 콜백 오류 ({getattr(cb, '__name__', cb)}): {e}")
+
+    # ------------------------------------------------------------------
+    # REST 보충
+    # ------------------------------------------------------------------
+    async def _backfill(self, key, since=None):
+        sym, interval = key
+        step = INTERVAL_MS[interval]
+        with self.lock:
+            bars = self.bars.get(key, {})
+            want = self.history.get(key, 200)
+            if since is None and bars:
+                since = max(bars)  # 마지막으로 받은 봉부터 (진행 중이던 봉도 갱신)
+        now = int(time.time() * 1000)
+        start = since if since is not None else now - want * step
+        limit = min(1000, max(2, (now - start) // step + 2))
+        params = {'category': 'linear', 'symbol': sym, 'interval': INTERVALS[interval],
+                  'start': start, 'limit': limit}
+        try:
+            await acquire_async('bybit', None, MARKET)
+            async with self.session.get(f"{self.rest_url}/v5/market/kline", params=params) as resp:
+                data = await resp.json(content_type=None)
+        except Exception as e:
+            logger.error(f"캔들 보충 실패 {sym} {interval}: {e!r}")
+            return
+        if data.get('retCode') != 0:
+            logger.error(f"캔들 보충 실패 {sym} {interval}: {data.get('retMsg')}")
+            return
+
+        rows = sorted(data.get('result', {}).get('list', []), key=lambda r: int(r[0]))
+        for i, r in enumerate(rows):
+            confirm = int(r[0]) + step <= now
+            self._apply_bar(sym, interval, {'start': r[0], 'open': r[1], 'high': r[2], 'low': r[3],
+                                            'close': r[4], 'volume': r[5], 'confirm': confirm}, backfill=True)
+        self.stats['backfills'] += 1
+        logger.info(f"📥 캔들 보충 {sym} {interval}: {len(rows)}개")
+
+
+_stream = None
+_stream_lock = threading.Lock()
+
+
+def get_market_stream():
+    """프로세스 공용 스트림 (MARKET_STREAM=0이면 None → 호출 측은 REST 사용)"""
+    global _stream
+    if os.getenv('MARKET_STREAM', '1') == '0':
+        return None
+    with _stream_lock:
+        if _stream is None:
+            _stream = MarketStream(testnet=os.getenv('BYBIT_WS_TESTNET') == '1')
+            _stream.start()
+        return _stream
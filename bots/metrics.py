@@ -0,0 +1,147 @@
+"""
+프로세스 내 지표 레지스트리 (엔드포인트별 지연 히스토그램 / 오류 / 응답 코드 / 전송량)
+- 고정 버킷 히스토그램: 기록은 bisect 한 번 + 카운터 증가 (핫패스 부담 최소)
+- BybitClient._request, ccxt 래퍼(RateLimitedExchange), 봇 내부 구간(time())에서 기록
+- snapshot()은 버킷에서 p50/p90/p99를 추정 → 매니저 /api/metrics로 노출
+
+사용:
+    from bots.metrics import metrics
+    with metrics.time('bot_30m', 'indicators'):
+        df = strat.populate_indicators(df)
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# 지연 버킷 상한 (ms). 마지막 버킷은 그 이상 전부
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 300, 500, 750, 1000, 2000, 5000, 10000, 30000)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q):
+        """버킷 상한으로 근사한 분위수 (ms)"""
+        if not self.total:
+            return 0.0
+        target = q * self.total
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(float(BUCKETS_MS[i]), self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.total,
+            'mean_ms': round(self.sum / self.total, 3) if self.total else 0.0,
+            'p50_ms': self.quantile(0.5),
+            'p90_ms': self.quantile(0.9),
+            'p99_ms': self.quantile(0.99),
+            'max_ms': round(self.max, 3),
+            'buckets': {(f"le_{b}" if i < len(BUCKETS_MS) else 'inf'): c
+                        for i, (b, c) in enumerate(zip(BUCKETS_MS + (None,), self.counts)) if c},
+        }
+
+
+class EndpointStats:
+    __slots__ = ('lock', 'latency', 'errors', 'retries', 'status', 'ret_codes', 'bytes_in', 'bytes_out')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = Histogram()
+        self.errors = {}
+        self.retries = 0
+        self.status = {}
+        self.ret_codes = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'latency': self.latency.snapshot(),
+                'errors': dict(self.errors),
+                'retries': self.retries,
+                'status': dict(self.status),
+                'ret_codes': dict(self.ret_codes),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+            }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.started = time.time()
+
+    def endpoint(self, source, name):
+        key = (source, name)
+        stats = self.endpoints.get(key)
+        if stats is None:
+            with self.lock:
+                stats = self.endpoints.setdefault(key, EndpointStats())
+        return stats
+
+    def record(self, source, name, seconds, status=None, ret_code=None, bytes_in=0, bytes_out=0, error=None):
+        stats = self.endpoint(source, name)
+        with stats.lock:
+            stats.latency.observe(seconds * 1000.0)
+            if status is not None:
+                stats.status[status] = stats.status.get(status, 0) + 1
+            if ret_code is not None:
+                stats.ret_codes[ret_code] = stats.ret_codes.get(ret_code, 0) + 1
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+
+    def record_retry(self, source, name, n=1):
+        stats = self.endpoint(source, name)
+        with stats.lock:
+            stats.retries += n
+
+    @contextmanager
+    def time(self, source, name):
+        """코드 구간 소요 시간 기록 (예외가 나면 예외 이름을 오류로 집계)"""
+        t0 = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record(source, name, time.perf_counter() - t0, error=error)
+
+    def snapshot(self, source=None):
+        out = {}
+        for (src, name), stats in list(self.endpoints.items()):
+            if source is None or src == source:
+                out.setdefault(src, {})[name] = stats.snapshot()
+        return {'uptime_s': round(time.time() - self.started, 1), 'sources': out}
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+            self.started = time.time()
+
+
+# 프로세스 공용 레지스트리
+metrics = MetricsRegistry()
@@ -0,0 +1,300 @@
+"""
+경량 모델 저장 형식 (트리 평탄화 + JSON 사이드카)
+- 학습 스크립트: joblib.dump 후 export_compact()로 <이름>.trees.npy / <이름>.trees.json 저장
+- 봇: load_model_bundle()로 로드 → 압축 형식이 있으면 np.load(mmap_mode='r')로 열기
+      (sklearn/xgboost/lightgbm 래퍼를 불러오지 않고, 여러 봇 프로세스가 같은 페이지 캐시를 공유)
+- 내보낼 때 원본 모델과 예측값을 비교해 다르면 내보내지 않음 (봇은 기존 pkl 사용)
+  비교 샘플에는 NaN / 0 / 0에 아주 가까운 값이 섞인 행을 추가 (결측 분기까지 확인)
+- LightGBM 범주형 분할('==')은 지원하지 않음 → 내보내지 않음
+
+노드 행렬 컬럼: feature, threshold, left, right, missing, value, zero_missing
+  (리프는 feature = -1, 자식 = 자기 자신 / zero_missing = 1이면 |x| <= 1e-35도 결측 방향, LightGBM 'Zero')
+"""
+import os
+import json
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger("ModelStore")
+
+FORMAT_VERSION = 2
+SUPPORTED_FORMATS = (1, 2)     # 1: zero_missing 컬럼 없음
+COL_FEATURE, COL_THRESHOLD, COL_LEFT, COL_RIGHT, COL_MISSING, COL_VALUE, COL_ZERO_MISSING = range(7)
+ZERO_THRESHOLD = 1e-35          # LightGBM kZeroThreshold
+
+
+def compact_paths(pkl_path):
+    stem = os.path.splitext(pkl_path)[0]
+    return stem + '.trees.npy', stem + '.trees.json'
+
+
+def model_mtime(pkl_path):
+    """pkl / 압축 형식 중 가장 최근 수정 시각 (봇의 모델 재로드 감지용)"""
+    times = [os.path.getmtime(p) for p in (pkl_path, *compact_paths(pkl_path)) if os.path.exists(p)]
+    return max(times) if times else 0
+
+
+# ----------------------------------------------------------------------
+# 내보내기 (학습 스크립트)
+# ----------------------------------------------------------------------
+def _flatten_xgb(model, features):
+    booster = model.get_booster()
+    names = booster.feature_names or features
+    index = {name: i for i, name in enumerate(names)}
+    nodes, roots, max_depth = [], [], 0
+
+    for tree_json in booster.get_dump(dump_format='json'):
+        tree = json.loads(tree_json)
+        base = len(nodes)
+        roots.append(base)
+        # 노드 번호 → 행 위치
+        flat = []
+        stack = [(tree, 0)]
+        while stack:
+            node, depth = stack.pop()
+            flat.append(node)
+            max_depth = max(max_depth, depth)
+            for child in node.get('children', []):
+                stack.append((child, depth + 1))
+        pos = {n['nodeid']: base + i for i, n in enumerate(flat)}
+        for n in flat:
+            if 'leaf' in n:
+                me = pos[n['nodeid']]
+                nodes.append([-1, 0.0, me, me, me, float(n['leaf']), 0])
+            else:
+                split = n['split']
+                feat = index[split] if split in index else int(split.lstrip('f'))
+                nodes.append([feat, float(np.float32(n['split_condition'])),
+                              pos[n['yes']], pos[n['no']], pos[n['missing']], 0.0, 0])
+    return nodes, roots, max_depth, '<', 'float32'
+
+
+def _flatten_lgbm(model):
+    dump = model.booster_.dump_model()
+    nodes, roots, max_depth = [], [], 0
+
+    for info in dump['tree_info']:
+        roots.append(len(nodes))
+        stack = [(info['tree_structure'], None, 0)]
+        while stack:
+            node, parent_slot, depth = stack.pop()
+            me = len(nodes)
+            if parent_slot is not None:
+                nodes[parent_slot[0]][parent_slot[1]] = me
+            max_depth = max(max_depth, depth)
+            if 'leaf_value' in node:
+                nodes.append([-1, 0.0, me, me, me, float(node['leaf_value']), 0])
+                continue
+            if node.get('decision_type', '<=') != '<=':
+                raise ValueError(f"범주형 분할은 지원하지 않음 (decision_type={node.get('decision_type')})")
+            thr = float(node['threshold'])
+            missing_type = node.get('missing_type', 'None')
+            # LightGBM 규칙: NaN 타입이면 NaN → default_left 방향
+            #               Zero 타입이면 NaN과 |x| <= 1e-35 → default_left 방향
+            #               None이면 NaN을 0으로 바꿔 비교 (0 <= thr)
+            if missing_type in ('NaN', 'Zero'):
+                missing_left = node.get('default_left', True)
+            else:
+                missing_left = 0.0 <= thr
+            nodes.append([int(node['split_feature']), thr, -1, -1, -1, 0.0, int(missing_type == 'Zero')])
+            stack.append((node['right_child'], (me, COL_RIGHT), depth + 1))
+            stack.append((node['left_child'], (me, COL_LEFT), depth + 1))
+            nodes[me][COL_MISSING] = ('L' if missing_left else 'R')
+        # 결측 자식 위치 채우기
+        for row in nodes[roots[-1]:]:
+            if row[COL_MISSING] == 'L':
+                row[COL_MISSING] = row[COL_LEFT]
+            elif row[COL_MISSING] == 'R':
+                row[COL_MISSING] = row[COL_RIGHT]
+    return nodes, roots, max_depth, '<=', 'float64'
+
+
+def _raw_margin(model, X):
+    """원본 모델의 raw margin (n, n_groups)"""
+    if hasattr(model, 'get_booster'):
+        import xgboost as xgb
+        booster = model.get_booster()
+        out = booster.predict(xgb.DMatrix(X, feature_names=booster.feature_names), output_margin=True)
+    else:
+        out = model.booster_.predict(X, raw_score=True)
+    out = np.asarray(out, dtype=np.float64)
+    return out.reshape(len(X), -1)
+
+
+def _with_missing_cases(sample, n=64):
+    """검증 샘플 + 결측 분기용 행 (무작위 위치에 NaN / 0 / ±1e-40, 전부 NaN, 전부 0)"""
+    rng = np.random.default_rng(1)
+    edge = np.repeat(sample[:n], 3, axis=0)
+    r = rng.random(edge.shape)
+    edge[r < 0.2] = np.nan
+    edge[(r >= 0.2) & (r < 0.4)] = 0.0
+    edge[(r >= 0.4) & (r < 0.5)] = 1e-40 * np.sign(rng.normal(size=int(((r >= 0.4) & (r < 0.5)).sum())))
+    width = sample.shape[1]
+    return np.vstack([sample, edge, np.full((1, width), np.nan), np.zeros((1, width))])
+
+
+def export_compact(model, features, pkl_path, accuracy=None, sample=None, tol=1e-4):
+    """sklearn 래퍼 모델을 평탄화된 트리 배열로 저장. 성공 시 True"""
+    try:
+        t0 = time.perf_counter()
+        if hasattr(model, 'get_booster'):
+            nodes, roots, max_depth, decision, dtype = _flatten_xgb(model, list(features))
+        elif hasattr(model, 'booster_'):
+            nodes, roots, max_depth, decision, dtype = _flatten_lgbm(model)
+        else:
+            logger.warning(f"압축 형식 미지원 모델: {type(model).__name__}")
+            return False
+
+        n_classes = int(getattr(model, 'n_classes_', 2))
+        n_groups = 1 if n_classes <= 2 else n_classes
+        tree_group = [i % n_groups for i in range(len(roots))]
+        table = np.asarray(nodes, dtype=np.float64)
+
+        meta = {
+            'format': FORMAT_VERSION,
+            'model_type': type(model).__name__,
+            'features': list(features),
+            'accuracy': accuracy,
+            'classes': [int(c) for c in getattr(model, 'classes_', range(n_classes))],
+            'n_groups': n_groups,
+            'roots': roots,
+            'tree_group': tree_group,
+            'max_depth': max_depth,
+            'decision': decision,
+            'input_dtype': dtype,
+            'base_margin': [0.0] * n_groups,
+        }
+
+        compact = CompactTreeModel(table, meta)
+        if sample is None:
+            sample = np.random.default_rng(0).normal(size=(256, len(features)))
+        sample = _with_missing_cases(np.asarray(sample, dtype=np.float64)[:2000])
+
+        # base_score 등 상수 항은 원본 raw margin과의 차이로 측정
+        raw = _raw_margin(model, sample)
+        meta['base_margin'] = (raw - compact.margin(sample)).mean(axis=0).tolist()
+        compact = CompactTreeModel(table, meta)
+
+        diff = float(np.max(np.abs(compact.margin(sample) - raw)))
+        if diff > tol:
+            logger.warning(f"압축 모델 검증 실패 ({os.path.basename(pkl_path)}): 최대 오차 {diff:.2e}")
+            return False
+        meta['verified_max_abs_diff'] = diff
+
+        npy_path, json_path = compact_paths(pkl_path)
+        np.save(npy_path + '.tmp.npy', table)
+        os.replace(npy_path + '.tmp.npy', npy_path)
+        with open(json_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(json_path + '.tmp', json_path)
+        logger.info(f"📦 압축 모델 저장: {os.path.basename(npy_path)} "
+                    f"(트리 {len(roots)}개, 노드 {len(table):,}개, {time.perf_counter() - t0:.2f}s)")
+        return True
+    except Exception as e:
+        logger.warning(f"압축 모델 저장 실패 ({pkl_path}): {e}")
+        return False
+
+
+# ----------------------------------------------------------------------
+# 로드 / 추론 (봇)
+# ----------------------------------------------------------------------
+class CompactTreeModel:
+    """평탄화된 트리 배열을 numpy로 일괄 평가 (predict / predict_proba 호환)"""
+
+    def __init__(self, table, meta):
+        self.table = table
+        self.meta = meta
+        self.features = meta['features']
+        self.classes_ = np.asarray(meta['classes'])
+        self.n_groups = meta['n_groups']
+        self.roots = np.asarray(meta['roots'], dtype=np.int64)
+        self.max_depth = int(meta['max_depth'])
+        self.dtype = np.float32 if meta['input_dtype'] == 'float32' else np.float64
+        self.le = meta['decision'] == '<='
+        self.base_margin = np.asarray(meta['base_margin'], dtype=np.float64)
+
+        # 작은 보조 배열만 메모리에 복사 (노드 행렬 자체는 mmap 유지)
+        self._feature = np.asarray(table[:, COL_FEATURE], dtype=np.int64)
+        self._zero_missing = (np.asarray(table[:, COL_ZERO_MISSING], dtype=bool)
+                              if table.shape[1] > COL_ZERO_MISSING and table[:, COL_ZERO_MISSING].any() else None)
+        self._group_onehot = np.zeros((len(self.roots), self.n_groups))
+        self._group_onehot[np.arange(len(self.roots)), meta['tree_group']] = 1.0
+
+    def _as_array(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.features].to_numpy()
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        # XGBoost는 float32로 비교하므로 같은 정밀도로 맞춤
+        return X.astype(self.dtype).astype(np.float64)
+
+    def margin(self, X):
+        X = self._as_array(X)
+        n = len(X)
+        table = self.table
+        node = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+        rows = np.arange(n)[:, None]
+        for _ in range(self.max_depth):
+            feat = self._feature[node]
+            inner = feat >= 0
+            if not inner.any():
+                break
+            x = X[rows, np.where(inner, feat, 0)]
+            thr = table[node, COL_THRESHOLD]
+            go_left = (x <= thr) if self.le else (x < thr)
+            missing = np.isnan(x)
+            if self._zero_missing is not None:
+                missing |= self._zero_missing[node] & (np.abs(x) <= ZERO_THRESHOLD)
+            nxt = np.where(missing, table[node, COL_MISSING],
+                           np.where(go_left, table[node, COL_LEFT], table[node, COL_RIGHT]))
+            node = np.where(inner, nxt, node).astype(np.int64)
+        leaves = table[node, COL_VALUE]
+        return leaves @ self._group_onehot + self.base_margin
+
+    def predict_proba(self, X):
+        m = self.margin(X)
+        if self.n_groups == 1:
+            p = 1.0 / (1.0 + np.exp(-m[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        m = m - m.max(axis=1, keepdims=True)
+        e = np.exp(m)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def load_compact(pkl_path, mmap=True):
+    npy_path, json_path = compact_paths(pkl_path)
+    with open(json_path, 'r') as f:
+        meta = json.load(f)
+    if meta.get('format') not in SUPPORTED_FORMATS:
+        raise ValueError(f"지원하지 않는 형식 버전: {meta.get('format')}")
+    table = np.load(npy_path, mmap_mode='r' if mmap else None)
+    return CompactTreeModel(table, meta)
+
+
+def load_model_bundle(pkl_path, prefer_compact=True):
+    """{'model', 'features', 'accuracy'} 반환. pkl보다 오래되지 않은 압축 형식이 있으면 그것을 사용"""
+    npy_path, json_path = compact_paths(pkl_path)
+    if prefer_compact and os.path.exists(npy_path) and os.path.exists(json_path):
+        fresh = not os.path.exists(pkl_path) or os.path.getmtime(json_path) >= os.path.getmtime(pkl_path)
+        if fresh:
+            try:
+                model = load_compact(pkl_path)
+                bundle = {'model': model, 'features': model.features, 'format': 'compact'}
+                if model.meta.get('accuracy') is not None:
+                    bundle['accuracy'] = model.meta['accuracy']
+                return bundle
+            except Exception as e:
+                logger.warning(f"압축 모델 로드 실패, pkl 사용 ({os.path.basename(pkl_path)}): {e}")
+
+    import joblib
+    data = joblib.load(pkl_path)
+    if not isinstance(data, dict):
+        data = {'model': data, 'features': list(getattr(data, 'feature_names_in_', []))}
+    data.setdefault('format', 'pickle')
+    return data
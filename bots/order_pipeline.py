@@ -0,0 +1,277 @@
+"""
+비동기 주문 파이프라인
+- 전략은 OrderIntent를 submit()으로 큐에 넣고 바로 OrderTicket(concurrent.futures.Future)을 받음
+  → 판단 루프는 거래소 지연에 묶이지 않음 (필요하면 ticket.result(timeout) / asyncio.wrap_future)
+- 전송은 전용 스레드가 담당: 레버리지 확인(캐시) → create_order (clientOrderId = 멱등 키)
+- 타임아웃/네트워크 오류는 같은 clientOrderId로 재전송 → 거래소가 중복으로 거절하므로 이중 주문 불가
+- 접수/체결은 비공개 스트림(AccountState의 order 이벤트)으로 확인, 스트림이 없으면 fetch_order 폴링
+  (중복 거절 등으로 거래소 주문 ID를 모르면 clientOrderId / orderLinkId로 미체결·체결 주문에서 찾음)
+- 같은 key의 주문이 진행 중이면 새로 보내지 않고 기존 티켓 반환
+
+사용:
+    pipeline = OrderPipeline(self.exchange, account=self.account, name='b30m')
+    ticket = pipeline.submit(OrderIntent(self.symbol, 'buy', 0.01, leverage=10))
+    ticket.add_done_callback(lambda t: ...)   # t.result().status == 'filled'
+"""
+import time
+import queue
+import logging
+import threading
+import itertools
+from dataclasses import dataclass, field
+from concurrent.futures import Future
+from typing import Optional
+
+from bots.exchange_metadata import metadata
+from bots.market_stream import normalize_symbol
+from bots.metrics import metrics
+
+logger = logging.getLogger("OrderPipeline")
+
+# 중복 clientOrderId 거절 (Bybit: 10014 / 110072 "OrderLinkedID is duplicate")
+_DUPLICATE = ('duplicate', '110072', '10014')
+_DONE_STATUS = {'Filled': 'filled', 'Cancelled': 'canceled', 'Rejected': 'rejected', 'Deactivated': 'canceled',
+                'PartiallyFilledCanceled': 'filled'}
+
+
+@dataclass
+class OrderIntent:
+    symbol: str
+    side: str                       # 'buy' / 'sell'
+    amount: float
+    order_type: str = 'market'
+    price: Optional[float] = None
+    leverage: Optional[int] = None
+    reduce_only: bool = False
+    key: Optional[str] = None       # 같은 key가 진행 중이면 중복 제출 무시
+    tag: str = ''
+
+
+@dataclass
+class OrderResult:
+    client_id: str
+    intent: OrderIntent
+    status: str = 'queued'          # queued / submitted / acknowledged / filled / canceled / rejected / failed / timeout
+    order_id: Optional[str] = None
+    filled: float = 0.0
+    average: Optional[float] = None
+    error: Optional[str] = None
+    timings: dict = field(default_factory=dict)
+
+
+class OrderTicket(Future):
+    """OrderResult로 완료되는 Future (진행 상황은 .state 로 확인)"""
+
+    def __init__(self, state):
+        super().__init__()
+        self.state = state
+
+    @property
+    def client_id(self):
+        return self.state.client_id
+
+
+class OrderPipeline:
+    def __init__(self, exchange, account=None, name='bot', retries=3, fill_timeout=30.0, poll_interval=0.5):
+        self.exchange = exchange
+        self.account = account
+        self.name = name
+        self.retries = retries
+        self.fill_timeout = fill_timeout
+        self.poll_interval = poll_interval
+
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.inflight = {}          # client_id -> ticket
+        self.by_key = {}            # intent.key -> ticket
+        self.counter = itertools.count(1)
+        self.is_running = True
+
+        if account is not None:
+            account.subscribe('order', self._on_order_event)
+        threading.Thread(target=self._sender, daemon=True, name=f"OrderSender-{name}").start()
+        threading.Thread(target=self._watcher, daemon=True, name=f"OrderWatcher-{name}").start()
+
+    # ------------------------------------------------------------------
+    # 전략 측 API
+    # ------------------------------------------------------------------
+    def new_client_id(self):
+        # Bybit orderLinkId 최대 36자
+        return f"{self.name}-{int(time.time() * 1000)}-{next(self.counter)}"[:36]
+
+    def submit(self, intent):
+        with self.lock:
+            if intent.key and intent.key in self.by_key and not self.by_key[intent.key].done():
+                logger.info(f"[{self.name}] 진행 중인 주문과 같은 key, 재제출 생략: {intent.key}")
+                return self.by_key[intent.key]
+            ticket = OrderTicket(OrderResult(self.new_client_id(), intent))
+            ticket.state.timings['queued'] = time.time()
+            self.inflight[ticket.client_id] = ticket
+            if intent.key:
+                self.by_key[intent.key] = ticket
+        self.queue.put(ticket)
+        return ticket
+
+    def pending(self, symbol=None):
+        """아직 끝나지 않은 주문 (포지션 동기화 전에 확인)"""
+        sym = normalize_symbol(symbol) if symbol else None
+        with self.lock:
+            return [t for t in self.inflight.values()
+                    if sym is None or normalize_symbol(t.state.intent.symbol) == sym]
+
+    def stop(self):
+        self.is_running = False
+        self.queue.put(None)
+
+    # ------------------------------------------------------------------
+    # 전송
+    # ------------------------------------------------------------------
+    def _sender(self):
+        while self.is_running:
+            ticket = self.queue.get()
+            if ticket is None:
+                break
+            try:
+                self._send(ticket)
+            except Exception as e:
+                self._finish(ticket, 'failed', error=str(e))
+
+    def _send(self, ticket):
+        state = ticket.state
+        intent = state.intent
+        if intent.leverage:
+            metadata.ensure_leverage(self.exchange, intent.symbol, intent.leverage)
+
+        params = {'clientOrderId': state.client_id}
+        if intent.reduce_only:
+            params['reduceOnly'] = True
+
+        state.status = 'submitted'
+        t0 = time.perf_counter()
+        for attempt in range(self.retries):
+            try:
+                order = self.exchange.create_order(intent.symbol, intent.order_type, intent.side,
+                                                   intent.amount, intent.price, params)
+                state.order_id = order.get('id')
+                break
+            except Exception as e:
+                msg = str(e).lower()
+                if any(code in msg for code in _DUPLICATE):
+                    # 앞선 시도가 실제로는 접수된 경우
+                    logger.info(f"[{self.name}] {state.client_id} 이미 접수됨 (중복 거절, clientOrderId로 조회)")
+                    break
+                if not self._is_transient(e) or attempt == self.retries - 1:
+                    metrics.record('orders', f"{self.name}.submit", time.perf_counter() - t0,
+                                   error=type(e).__name__)
+                    self._finish(ticket, 'rejected', error=str(e))
+                    return
+                metrics.record_retry('orders', f"{self.name}.submit")
+                logger.warning(f"[{self.name}] 주문 전송 오류 ({e}), 같은 ID로 재전송 {attempt + 1}/{self.retries}")
+                time.sleep(0.2 * (attempt + 1))
+
+        metrics.record('orders', f"{self.name}.submit", time.perf_counter() - t0)
+        with self.lock:
+            if state.client_id not in self.inflight:
+                return  # REST 응답보다 체결 이벤트가 먼저 도착한 경우
+            # watcher는 status를 보고 timings를 읽으므로 시각을 먼저 기록
+            state.timings['acknowledged'] = time.time()
+            state.status = 'acknowledged'
+        logger.info(f"✅ [{self.name}] 주문 접수: {intent.side} {intent.amount} {intent.symbol} "
+                    f"(id={state.order_id}, cid={state.client_id})")
+
+    @staticmethod
+    def _is_transient(error):
+        name = type(error).__name__
+        return name in ('RequestTimeout', 'NetworkError', 'ExchangeNotAvailable', 'DDoSProtection') \
+            or isinstance(error, (TimeoutError, ConnectionError))
+
+    # ------------------------------------------------------------------
+    # 체결 확인
+    # ------------------------------------------------------------------
+    def _on_order_event(self, event):
+        """AccountState order 토픽 (Bybit V5)"""
+        cid = event.get('orderLinkId')
+        with self.lock:
+            ticket = self.inflight.get(cid)
+        if ticket is None:
+            return
+        ticket.state.order_id = ticket.state.order_id or event.get('orderId')
+        status = _DONE_STATUS.get(event.get('orderStatus'))
+        if status:
+            filled = float(event.get('cumExecQty') or 0)
+            if status == 'canceled' and filled > 0:
+                status = 'filled'  # 시장가 IOC 부분 체결 후 잔량 취소
+            self._finish(ticket, status, filled=filled, average=float(event.get('avgPrice') or 0) or None)
+
+    def _watcher(self):
+        """스트림으로 확인되지 않은 주문은 fetch_order로 확인, fill_timeout 지나면 timeout 처리"""
+        while self.is_running:
+            time.sleep(self.poll_interval)
+            now = time.time()
+            with self.lock:
+                waiting = [t for t in self.inflight.values() if t.state.status == 'acknowledged']
+            for ticket in waiting:
+                try:
+                    self._check(ticket, now)
+                except Exception as e:
+                    # 주문 하나의 오류로 watcher 스레드가 죽지 않도록 (다음 주기에 다시 확인)
+                    logger.error(f"[{self.name}] 주문 확인 오류 {ticket.state.client_id}: {e}", exc_info=True)
+
+    def _check(self, ticket, now):
+        state = ticket.state
+        age = now - state.timings['acknowledged']
+        stream_ok = self.account is not None and self.account.is_live()
+        if not stream_ok or age > 2.0:
+            try:
+                if state.order_id:
+                    order = self.exchange.fetch_order(state.order_id, state.intent.symbol)
+                else:
+                    order = self._find_by_client_id(state)
+                    if order is not None:
+                        state.order_id = order.get('id')
+                if order is not None and order.get('status') in ('closed', 'canceled', 'rejected', 'expired'):
+                    filled = float(order.get('filled') or 0)
+                    status = 'filled' if filled > 0 else ('rejected' if order['status'] == 'rejected' else 'canceled')
+                    self._finish(ticket, status, filled=filled, average=order.get('average'))
+                    return
+            except Exception as e:
+                logger.debug(f"[{self.name}] 주문 조회 실패 {state.client_id}: {e}")
+        if age > self.fill_timeout:
+            self._finish(ticket, 'timeout', error='체결 확인 시간 초과')
+
+    def _find_by_client_id(self, state):
+        """거래소 주문 ID 없이 clientOrderId로 주문 찾기 (미체결 → 최근 종료 순, 없으면 None)"""
+        cid = state.client_id
+        # Bybit은 orderLinkId로 서버에서 거름, 그 외는 받아온 목록에서 비교
+        params = {'orderLinkId': cid} if getattr(self.exchange, 'id', '') == 'bybit' else {}
+        for method in ('fetch_open_orders', 'fetch_closed_orders'):
+            fetch = getattr(self.exchange, method, None)
+            if fetch is None:
+                continue
+            for order in fetch(state.intent.symbol, params=params) or []:
+                if order.get('clientOrderId') == cid:
+                    return order
+        return None
+
+    def _finish(self, ticket, status, filled=0.0, average=None, error=None):
+        state = ticket.state
+        with self.lock:
+            if self.inflight.pop(state.client_id, None) is None:
+                return
+            if state.intent.key and self.by_key.get(state.intent.key) is ticket:
+                del self.by_key[state.intent.key]
+        state.status = status
+        state.filled = filled
+        state.average = average
+        state.error = error
+        state.timings['done'] = time.time()
+        if 'acknowledged' in state.timings and status == 'filled':
+            metrics.record('orders', f"{self.name}.fill", state.timings['done'] - state.timings['acknowledged'])
+        if status in ('rejected', 'failed', 'timeout'):
+            logger.error(f"❌ [{self.name}] 주문 {status}: {state.intent.side} {state.intent.amount} "
+                         f"{state.intent.symbol} ({error})")
+            # 실패 원인이 레버리지 설정일 수 있으므로 캐시 무효화
+            metadata.invalidate_leverage(metadata.account_of(self.exchange), state.intent.symbol)
+        else:
+            logger.info(f"📬 [{self.name}] 주문 {status}: {filled} @ {average} (cid={state.client_id})")
+        ticket.set_result(state)
@@ -0,0 +1,150 @@
+"""
+병렬 다중 모델 훈련
+- 전처리된 피처 행렬을 한 번만 만들어 float32 연속 배열(.npy)로 저장
+- 워커 프로세스는 np.load(mmap_mode='r')로 같은 파일을 공유 (모델마다 df.copy() 하지 않음)
+- Short / Long / Regime 모델을 동시에 훈련, 모델별 스레드(n_jobs) 배분
+- 모델별 소요 시간 리포트
+- 모델은 피처 이름과 함께 학습 (봇에서 DataFrame으로 예측할 때 이름/순서 검사)
+"""
+import os
+import time
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class SharedFeatureMatrix:
+    """DataFrame의 피처 컬럼을 float32 C-연속 배열로 디스크에 저장 (워커는 mmap으로 읽음)"""
+
+    def __init__(self, df, columns, path=None):
+        self.columns = list(dict.fromkeys(columns))
+        self._tmpdir = None
+        if path is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="features_")
+            path = os.path.join(self._tmpdir, "features.npy")
+        self.path = path
+
+        matrix = np.ascontiguousarray(df[self.columns].to_numpy(dtype=np.float32))
+        np.save(self.path, matrix)
+        self.shape = matrix.shape
+        self.nbytes = matrix.nbytes
+        del matrix
+
+    def col_index(self, columns):
+        return [self.columns.index(c) for c in columns]
+
+    def close(self):
+        if self._tmpdir:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def valid_rows(df, columns, mask=None):
+    """피처에 NaN이 없는 (그리고 mask가 True인) 행의 위치 인덱스"""
+    ok = df[list(columns)].notna().all(axis=1).to_numpy()
+    if mask is not None:
+        ok &= np.asarray(mask, dtype=bool)
+    return np.flatnonzero(ok)
+
+
+@dataclass
+class ModelTask:
+    name: str
+    estimator: object               # 아직 학습 안 된 sklearn 호환 모델 (XGBClassifier, LGBMClassifier ...)
+    features: List[str]
+    rows: np.ndarray                # 공유 행렬에서 사용할 행 위치
+    target: np.ndarray              # rows와 같은 길이의 레이블
+    test_size: float = 0.2
+    stratify: bool = False
+    n_jobs: Optional[int] = None    # None이면 코어를 작업 수로 균등 배분
+
+
+@dataclass
+class TrainResult:
+    name: str
+    model: object
+    accuracy: float
+    features: List[str]
+    n_rows: int
+    n_jobs: int
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def _train_task(matrix_path, col_idx, task: ModelTask, n_jobs):
+    """워커 프로세스: 공유 행렬에서 필요한 행/열만 뽑아 학습"""
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import accuracy_score
+
+    t0 = time.perf_counter()
+    shared = np.load(matrix_path, mmap_mode='r')
+    # 행/열 선택 결과는 이미 복사본이므로 DataFrame은 복사 없이 이름만 붙임
+    X = pd.DataFrame(shared[np.ix_(task.rows, col_idx)], columns=list(task.features), copy=False)
+    y = task.target
+    t1 = time.perf_counter()
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=task.test_size, random_state=42,
+        stratify=y if task.stratify else None
+    )
+    model = task.estimator
+    model.set_params(n_jobs=n_jobs)
+    model.fit(X_train, y_train)
+    t2 = time.perf_counter()
+
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    t3 = time.perf_counter()
+
+    return TrainResult(
+        name=task.name, model=model, accuracy=float(accuracy), features=list(task.features),
+        n_rows=len(task.rows), n_jobs=n_jobs,
+        timings={'load': round(t1 - t0, 3), 'fit': round(t2 - t1, 3),
+                 'eval': round(t3 - t2, 3), 'total': round(t3 - t0, 3)},
+    )
+
+
+def _thread_budget(tasks, total_threads):
+    """명시된 n_jobs는 그대로, 나머지 작업은 남은 코어를 균등 배분"""
+    fixed = sum(t.n_jobs for t in tasks if t.n_jobs)
+    auto = [t for t in tasks if not t.n_jobs]
+    share = max(1, (total_threads - fixed) // len(auto)) if auto else 0
+    return {t.name: (t.n_jobs or share) for t in tasks}
+
+
+def train_parallel(matrix: SharedFeatureMatrix, tasks: List[ModelTask], max_workers=None, total_threads=None):
+    """여러 모델을 프로세스 풀에서 동시에 훈련, {name: TrainResult} 반환"""
+    if total_threads is None:
+        total_threads = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    max_workers = max_workers or int(os.getenv('TRAIN_WORKERS', len(tasks)))
+    budget = _thread_budget(tasks, total_threads)
+
+    print(f"⚙️ 병렬 훈련: 모델 {len(tasks)}개, 워커 {max_workers}개, 스레드 {total_threads}개 "
+          f"(공유 행렬 {matrix.shape[0]:,}x{matrix.shape[1]}, {matrix.nbytes / 1024**2:.1f}MB)")
+
+    start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_train_task, matrix.path, matrix.col_index(t.features), t, budget[t.name]): t.name
+            for t in tasks
+        }
+        for fut in as_completed(futures):
+            res = fut.result()
+            results[res.name] = res
+            print(f"   ✅ {res.name}: 정확도 {res.accuracy*100:.1f}% | {res.n_rows:,}행 | "
+                  f"스레드 {res.n_jobs} | fit {res.timings['fit']:.1f}s, 총 {res.timings['total']:.1f}s")
+
+    elapsed = time.perf_counter() - start
+    serial = sum(r.timings['total'] for r in results.values())
+    print(f"⏱️ 전체 {elapsed:.1f}s (모델별 합계 {serial:.1f}s)")
+    return results
@@ -0,0 +1,191 @@
+"""
+누적 성과 통계 (거래/자산 한 건마다 O(1) 갱신)
+- 평균/분산: Welford 방식 → 거래 이력을 다시 읽지 않고 승률/평균/샤프 계산
+- 자산 곡선: 최고점/최대 낙폭을 진행하면서 갱신 (cummax 배열 불필요)
+- 누적 손익 기준 낙폭, 연승/연패, 기간별(월/연) 버킷
+- merge(): 여러 봇/구간 통계 합산 (분산은 Chan 병렬 공식)
+- to_dict()/from_dict(): 상태 파일·DB에 체크포인트
+
+사용:
+    stats = PerfStats(period='month')
+    stats.add_trade(pnl, ts=exit_time)
+    stats.add_equity(balance)
+    stats.summary()
+"""
+import math
+from datetime import datetime
+
+_PERIOD_FORMATS = {'day': '%Y-%m-%d', 'month': '%Y-%m', 'year': '%Y'}
+
+
+def _period_key(ts, period):
+    if ts is None:
+        return None
+    if isinstance(ts, (int, float)):
+        ts = datetime.fromtimestamp(ts / 1000 if ts > 1e11 else ts)  # ms/초 모두 허용
+    if hasattr(ts, 'strftime'):
+        return ts.strftime(_PERIOD_FORMATS[period])
+    # ISO 문자열은 앞부분만 잘라서 사용
+    return str(ts)[:{'day': 10, 'month': 7, 'year': 4}[period]]
+
+
+def max_drawdown(values):
+    """자산 곡선의 최대 낙폭 (비율, 0~1) - 한 번 순회"""
+    stats = PerfStats()
+    for v in values:
+        stats.add_equity(v)
+    return stats.max_dd
+
+
+class PerfStats:
+    def __init__(self, period=None):
+        self.period = period            # None / 'day' / 'month' / 'year'
+        # 거래
+        self.n = 0
+        self.wins = 0
+        self.losses = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0                   # 편차 제곱합 (Welford)
+        self.max_profit = 0.0
+        self.max_loss = 0.0
+        self.win_streak = 0
+        self.loss_streak = 0
+        self.max_win_streak = 0
+        self.max_loss_streak = 0
+        # 누적 손익 기준 낙폭 (금액)
+        self.cum_peak = 0.0
+        self.max_dd_abs = 0.0
+        # 자산 곡선 기준 낙폭 (비율)
+        self.equity = None
+        self.peak = None
+        self.max_dd = 0.0
+        self.buckets = {}               # 기간 키 -> PerfStats
+
+    # ------------------------------------------------------------------
+    # 갱신
+    # ------------------------------------------------------------------
+    def add_trade(self, pnl, ts=None):
+        pnl = float(pnl)
+        self.n += 1
+        delta = pnl - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (pnl - self.mean)
+        self.total += pnl
+        if pnl > 0:
+            self.wins += 1
+            self.max_profit = max(self.max_profit, pnl)
+            self.win_streak += 1
+            self.loss_streak = 0
+            self.max_win_streak = max(self.max_win_streak, self.win_streak)
+        else:
+            self.losses += 1
+            self.max_loss = min(self.max_loss, pnl)
+            self.loss_streak += 1
+            self.win_streak = 0
+            self.max_loss_streak = max(self.max_loss_streak, self.loss_streak)
+        self.cum_peak = max(self.cum_peak, self.total)
+        self.max_dd_abs = max(self.max_dd_abs, self.cum_peak - self.total)
+        key = _period_key(ts, self.period) if self.period else None
+        if key is not None:
+            self._bucket(key).add_trade(pnl)
+
+    def add_equity(self, value, ts=None):
+        value = float(value)
+        self.equity = value
+        if self.peak is None or value > self.peak:
+            self.peak = value
+        if self.peak > 0:
+            self.max_dd = max(self.max_dd, (self.peak - value) / self.peak)
+        key = _period_key(ts, self.period) if self.period else None
+        if key is not None:
+            self._bucket(key).add_equity(value)
+
+    def _bucket(self, key):
+        if key not in self.buckets:
+            self.buckets[key] = PerfStats()
+        return self.buckets[key]
+
+    # ------------------------------------------------------------------
+    # 합산 / 체크포인트
+    # ------------------------------------------------------------------
+    def merge(self, other):
+        """다른 통계를 합침 (봇별 합계, 구간별 결과 합계)
+        연승/연패와 낙폭은 순서를 알 수 없으므로 각 최대값을 사용"""
+        if other.n:
+            n = self.n + other.n
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.n * other.n / n
+            self.mean += delta * other.n / n
+            self.n = n
+            self.wins += other.wins
+            self.losses += other.losses
+            self.total += other.total
+            self.max_profit = max(self.max_profit, other.max_profit)
+            self.max_loss = min(self.max_loss, other.max_loss)
+            self.win_streak, self.loss_streak = other.win_streak, other.loss_streak
+            self.max_win_streak = max(self.max_win_streak, other.max_win_streak)
+            self.max_loss_streak = max(self.max_loss_streak, other.max_loss_streak)
+            self.cum_peak = max(self.cum_peak, self.total)
+            self.max_dd_abs = max(self.max_dd_abs, other.max_dd_abs)
+        if other.peak is not None:
+            self.equity = other.equity
+            self.peak = other.peak if self.peak is None else max(self.peak, other.peak)
+            self.max_dd = max(self.max_dd, other.max_dd)
+        for key, bucket in other.buckets.items():
+            self._bucket(key).merge(bucket)
+        return self
+
+    def to_dict(self):
+        data = {k: v for k, v in self.__dict__.items() if k != 'buckets'}
+        data['buckets'] = {k: b.to_dict() for k, b in self.buckets.items()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for key, value in (data or {}).items():
+            if key == 'buckets':
+                stats.buckets = {k: cls.from_dict(b) for k, b in value.items()}
+            elif key in stats.__dict__:
+                setattr(stats, key, value)
+        return stats
+
+    # ------------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------------
+    @property
+    def std(self):
+        # 표본 표준편차 (pandas std와 동일, ddof=1)
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 and self.m2 > 0 else 0.0
+
+    @property
+    def win_rate(self):
+        return self.wins / self.n if self.n else 0.0
+
+    @property
+    def sharpe(self):
+        """거래당 샤프 (평균 / 표준편차, 연율화하지 않음)"""
+        std = self.std
+        return self.mean / std if std > 0 else 0.0
+
+    def summary(self):
+        return {
+            'total_trades': self.n,
+            'wins': self.wins,
+            'losses': self.losses,
+            'win_rate': round(self.win_rate * 100, 2),
+            'total_pnl': round(self.total, 2),
+            'avg_pnl': round(self.mean, 4),
+            'std_pnl': round(self.std, 4),
+            'sharpe_ratio': round(self.sharpe, 2),
+            'max_profit': round(self.max_profit, 2),
+            'max_loss': round(self.max_loss, 2),
+            'max_win_streak': self.max_win_streak,
+            'max_loss_streak': self.max_loss_streak,
+            'max_drawdown_pnl': round(self.max_dd_abs, 2),
+            'max_drawdown': round(self.max_dd * 100, 2),
+        }
+
+    def periods(self):
+        return {key: self.buckets[key].summary() for key in sorted(self.buckets)}
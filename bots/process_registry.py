@@ -0,0 +1,266 @@
+"""
+프로세스 레지스트리 (run/<이름>.json)
+- 대시보드(감독자)가 봇을 띄울 때 PID/시작 시각/명령을 기록, 봇은 자기 항목에 하트비트를 남김
+- 대시보드의 실행 여부 확인은 항목 파일 하나 + O(1) 생존 확인 → 요청마다 pgrep/프로세스 목록 순회 없음
+    직접 띄운 자식: Popen.poll()
+    그 외 (Linux): pidfd (종료되면 읽기 가능), 처음 열 때 /proc 시작 시각으로 PID 재사용 확인
+    그 외: os.kill(pid, 0)
+- 하트비트: 봇 루프는 beat()로 시각만 갱신 (I/O 없음), 파일 기록은 백그라운드 스레드가 interval마다
+  → 프로세스는 살아 있지만 루프가 멈춘 경우 'stalled'로 구분
+- 레지스트리 항목이 없으면 기존 PID 파일로 확인 (수동 실행 호환)
+
+사용 (봇):
+    register('bot_15m', pid_file=os.path.join(BASE_DIR, 'bot.pid'))
+    beat('bot_15m')                                   # 루프마다
+사용 (대시보드):
+    registry = ProcessRegistry()
+    registry.launch('bot_15m', ['python3', MAIN_SCRIPT], cwd=BASE_DIR)
+    registry.status('bot_15m', pid_file=PID_FILE)      # {'running': True, 'pid': ..., 'state': 'running', ...}
+    registry.stop('bot_15m')
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import select
+import signal
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger("ProcessRegistry")
+
+RUN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'run')
+HEARTBEAT_INTERVAL = 5.0
+STALE_AFTER = 3         # 하트비트 간격의 몇 배가 지나면 멈춘 것으로 볼지
+
+
+def _entry_path(name, run_dir=RUN_DIR):
+    return os.path.join(run_dir, f"{name}.json")
+
+
+def _read_entry(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_entry(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(tmp, path)
+
+
+def _proc_start(pid):
+    """프로세스 시작 시각 (부팅 후 clock tick, /proc 없으면 None) - PID 재사용 구분용"""
+    try:
+        with open(f"/proc/{pid}/stat", 'rb') as f:
+            stat = f.read()
+        return int(stat[stat.rindex(b')') + 2:].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# ----------------------------------------------------------------------
+# 봇 쪽: 등록 + 하트비트
+# ----------------------------------------------------------------------
+class Heartbeat:
+    def __init__(self, name, interval=HEARTBEAT_INTERVAL, pid_file=None, run_dir=RUN_DIR):
+        self.name = name
+        self.interval = interval
+        self.pid_file = pid_file
+        self.path = _entry_path(name, run_dir)
+        self.last_beat = time.time()
+        self.is_running = True
+
+        pid = os.getpid()
+        entry = _read_entry(self.path) or {}
+        if entry.get('pid') != pid:
+            entry = {'name': name, 'pid': pid, 'started': time.time(), 'cmd': ' '.join(sys.argv)}
+        entry.update({'proc_start': _proc_start(pid), 'heartbeat': self.last_beat, 'interval': interval,
+                      'state': 'running'})
+        self.entry = entry
+        _write_entry(self.path, entry)
+        if pid_file:
+            with open(pid_file, 'w') as f:
+                f.write(str(pid))
+        atexit.register(self.close)
+        threading.Thread(target=self._run, daemon=True, name=f"Heartbeat-{name}").start()
+
+    def beat(self):
+        self.last_beat = time.time()
+
+    def _run(self):
+        while self.is_running:
+            time.sleep(self.interval)
+            if not self.is_running:
+                break
+            self.entry['heartbeat'] = self.last_beat
+            try:
+                _write_entry(self.path, self.entry)
+            except OSError as e:
+                logger.warning(f"하트비트 기록 실패 ({self.name}): {e}")
+
+    def close(self):
+        if not self.is_running:
+            return
+        self.is_running = False
+        try:
+            _write_entry(self.path, {**self.entry, 'state': 'stopped', 'stopped': time.time()})
+            if self.pid_file and os.path.exists(self.pid_file):
+                os.remove(self.pid_file)
+        except OSError:
+            pass
+
+
+_heartbeats = {}
+
+
+def register(name, interval=HEARTBEAT_INTERVAL, pid_file=None, run_dir=RUN_DIR):
+    """현재 프로세스를 레지스트리에 등록 (이미 등록돼 있으면 기존 하트비트 반환)"""
+    if name not in _heartbeats or not _heartbeats[name].is_running:
+        _heartbeats[name] = Heartbeat(name, interval, pid_file, run_dir)
+    return _heartbeats[name]
+
+
+def beat(name):
+    hb = _heartbeats.get(name)
+    if hb is not None:
+        hb.beat()
+
+
+def unregister(name):
+    hb = _heartbeats.pop(name, None)
+    if hb is not None:
+        hb.close()
+
+
+# ----------------------------------------------------------------------
+# 감독자(대시보드) 쪽
+# ----------------------------------------------------------------------
+class ProcessRegistry:
+    def __init__(self, run_dir=RUN_DIR):
+        self.run_dir = run_dir
+        self.lock = threading.Lock()
+        self.children = {}      # name -> Popen (직접 띄운 프로세스)
+        self.pidfds = {}        # (pid, proc_start) -> fd
+        self.cache = {}         # name -> (mtime, entry)
+
+    def entry(self, name):
+        """항목 파일 (mtime이 같으면 다시 파싱하지 않음)"""
+        path = _entry_path(name, self.run_dir)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.cache.pop(name, None)
+            return None
+        cached = self.cache.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        entry = _read_entry(path)
+        self.cache[name] = (mtime, entry)
+        return entry
+
+    def launch(self, name, args, cwd=None, log_file=None, **popen_kwargs):
+        """봇 실행 + 항목 기록 (봇이 뜨면 register()가 같은 항목에 하트비트를 이어 씀)"""
+        stdout = open(log_file, 'a') if log_file else subprocess.DEVNULL
+        proc = subprocess.Popen(args, cwd=cwd, stdout=stdout, stderr=subprocess.STDOUT,
+                                start_new_session=True, **popen_kwargs)
+        if log_file:
+            stdout.close()
+        with self.lock:
+            self.children[name] = proc
+        _write_entry(_entry_path(name, self.run_dir), {
+            'name': name, 'pid': proc.pid, 'started': time.time(), 'proc_start': _proc_start(proc.pid),
+            'cmd': args if isinstance(args, str) else ' '.join(args), 'heartbeat': None,
+            'state': 'starting', 'supervisor': os.getpid(),
+        })
+        logger.info(f"{name} 실행 (PID {proc.pid})")
+        return proc.pid
+
+    def status(self, name, pid_file=None):
+        entry = self.entry(name)
+        if entry is None or entry.get('state') == 'stopped':
+            return self._status_from_pid_file(pid_file)
+        pid = entry.get('pid')
+        if not self._alive(name, pid, entry.get('proc_start')):
+            return {'running': False, 'pid': None, 'state': 'stopped', 'last_pid': pid}
+        now = time.time()
+        result = {'running': True, 'pid': pid, 'state': entry.get('state', 'running'),
+                  'started': entry.get('started'), 'cmd': entry.get('cmd'),
+                  'uptime': int(now - entry['started']) if entry.get('started') else None}
+        if entry.get('heartbeat'):
+            age = now - entry['heartbeat']
+            result['heartbeat_age'] = round(age, 1)
+            if age > entry.get('interval', HEARTBEAT_INTERVAL) * STALE_AFTER:
+                result['state'] = 'stalled'
+        return result
+
+    def _status_from_pid_file(self, pid_file):
+        if not pid_file or not os.path.exists(pid_file):
+            return {'running': False, 'pid': None, 'state': 'stopped'}
+        try:
+            with open(pid_file, 'r') as f:
+                pid = int(f.read().strip())
+            os.kill(pid, 0)
+            return {'running': True, 'pid': pid, 'state': 'running', 'source': 'pid_file'}
+        except (OSError, ValueError):
+            return {'running': False, 'pid': None, 'state': 'stopped'}
+
+    def _alive(self, name, pid, proc_start):
+        if not pid:
+            return False
+        with self.lock:
+            proc = self.children.get(name)
+        if proc is not None and proc.pid == pid:
+            return proc.poll() is None
+        if hasattr(os, 'pidfd_open'):
+            key = (pid, proc_start)
+            fd = self.pidfds.get(key)
+            if fd is None:
+                if proc_start is not None and _proc_start(pid) != proc_start:
+                    return False  # 같은 PID를 다른 프로세스가 재사용
+                try:
+                    fd = self.pidfds[key] = os.pidfd_open(pid)
+                except OSError:
+                    return False
+            readable, _, _ = select.select([fd], [], [], 0)
+            if readable:
+                os.close(self.pidfds.pop(key))
+                return False
+            return True
+        try:
+            os.kill(pid, 0)
+            return True
+        except OSError:
+            return False
+
+    def stop(self, name, timeout=5.0, pid_file=None):
+        status = self.status(name, pid_file=pid_file)
+        pid = status.get('pid')
+        if not status['running'] or not pid:
+            return False
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            return False
+        deadline = time.time() + timeout
+        while time.time() < deadline and self._alive(name, pid, (self.entry(name) or {}).get('proc_start')):
+            time.sleep(0.1)
+        if self._alive(name, pid, (self.entry(name) or {}).get('proc_start')):
+            os.kill(pid, signal.SIGKILL)
+        with self.lock:
+            proc = self.children.pop(name, None)
+        if proc is not None:
+            proc.poll()
+        entry = self.entry(name)
+        if entry is not None:
+            _write_entry(_entry_path(name, self.run_dir), {**entry, 'state': 'stopped', 'stopped': time.time()})
+        if pid_file and os.path.exists(pid_file):
+            os.remove(pid_file)
+        return True
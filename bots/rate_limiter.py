@@ -0,0 +1,281 @@
+"""
+거래소 API 공용 레이트 리미터 (토큰 버킷)
+- 키: 거래소 + API 키 (공개 엔드포인트는 'public' 버킷 공유)
+- 프로세스 간 공유: 버킷 상태를 작은 파일에 두고 fcntl 잠금으로 갱신
+- 우선순위: 주문 > 포지션/잔고 > 캔들/시세 > 대시보드
+  낮은 우선순위는 버킷에 일정 비율 이상 토큰이 남아 있을 때만 사용 → 주문은 차트 갱신 뒤에 밀리지 않음
+- 대기 시간을 넘기면 RateLimitTimeout (요청을 보내지 않음, 한도를 넘겨 호출하지 않음)
+"""
+import os
+import re
+import time
+import struct
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 내부에서만 제한
+    fcntl = None
+
+from bots.metrics import metrics
+
+logger = logging.getLogger("RateLimiter")
+
+# 우선순위 (숫자가 작을수록 높음)
+ORDER = 0
+POSITION = 1
+MARKET = 2
+DASHBOARD = 3
+
+# 우선순위별로 남겨둬야 하는 버킷 비율 (이 아래로는 해당 우선순위가 토큰을 쓰지 못함)
+RESERVE = {ORDER: 0.0, POSITION: 0.10, MARKET: 0.25, DASHBOARD: 0.40}
+
+# 거래소별 기본 한도 (초당 요청 수, 버스트). 환경변수 RATE_LIMIT_BYBIT="10:20" 형식으로 변경 가능
+DEFAULT_LIMITS = {
+    'bybit': (10.0, 20.0),
+    'binance': (15.0, 30.0),
+}
+FALLBACK_LIMIT = (5.0, 10.0)
+
+STATE_DIR = os.getenv('RATE_LIMIT_DIR', os.path.join(tempfile.gettempdir(), 'bot_rate_limits'))
+_STATE = struct.Struct('dd')  # tokens, last_refill
+
+
+def _limits_for(exchange):
+    env = os.getenv(f"RATE_LIMIT_{exchange.upper()}")
+    if env:
+        try:
+            rate, burst = env.split(':')
+            return float(rate), float(burst)
+        except ValueError:
+            logger.warning(f"잘못된 RATE_LIMIT_{exchange.upper()} 값: {env}")
+    return DEFAULT_LIMITS.get(exchange, FALLBACK_LIMIT)
+
+
+class RateLimitTimeout(TimeoutError):
+    """timeout 안에 토큰을 얻지 못함 → 호출하지 않고 실패 (재시도 가능한 오류로 취급)"""
+
+
+def bucket_key(exchange, api_key=None):
+    owner = hashlib.sha1(api_key.encode()).hexdigest()[:12] if api_key else 'public'
+    return f"{exchange}-{owner}"
+
+
+class TokenBucket:
+    """파일 기반 토큰 버킷 (같은 키를 쓰는 모든 프로세스가 공유)"""
+
+    def __init__(self, key, rate, burst):
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.fd = None
+        self.tokens = burst
+        self.last = time.time()
+        self.waited = 0.0
+        self.granted = 0
+        self.rejected = 0
+        if fcntl is not None:
+            try:
+                os.makedirs(STATE_DIR, exist_ok=True)
+                self.fd = os.open(os.path.join(STATE_DIR, f"{key}.bucket"), os.O_RDWR | os.O_CREAT, 0o600)
+            except OSError as e:
+                logger.warning(f"레이트 리밋 상태 파일 사용 불가 ({e}), 프로세스 내부 제한만 적용")
+                self.fd = None
+
+    def _load(self):
+        if self.fd is None:
+            return self.tokens, self.last
+        raw = os.pread(self.fd, _STATE.size, 0)
+        if len(raw) < _STATE.size:
+            return self.burst, time.time()
+        return _STATE.unpack(raw)
+
+    def _store(self, tokens, last):
+        self.tokens, self.last = tokens, last
+        if self.fd is not None:
+            os.pwrite(self.fd, _STATE.pack(tokens, last), 0)
+
+    def try_acquire(self, priority=MARKET, cost=1.0):
+        """토큰을 얻으면 0, 아니면 다시 시도할 때까지 기다릴 시간(초)"""
+        floor = RESERVE.get(priority, RESERVE[DASHBOARD]) * self.burst
+        with self.lock:
+            if self.fd is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                tokens, last = self._load()
+                now = time.time()
+                tokens = min(self.burst, tokens + max(0.0, now - last) * self.rate)
+                if tokens - cost >= floor:
+                    self._store(tokens - cost, now)
+                    self.granted += 1
+                    return 0.0
+                self._store(tokens, now)
+                return (cost + floor - tokens) / self.rate
+            finally:
+                if self.fd is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _timed_out(self, priority):
+        self.rejected += 1
+        logger.warning(f"레이트 리밋 대기 시간 초과, 요청 거부: {self.key} (priority={priority})")
+        raise RateLimitTimeout(f"rate limit wait exceeded: {self.key} (priority={priority})")
+
+    def acquire(self, priority=MARKET, cost=1.0, timeout=30.0):
+        deadline = time.time() + timeout
+        while True:
+            wait = self.try_acquire(priority, cost)
+            if wait <= 0:
+                return True
+            if time.time() + wait > deadline:
+                self._timed_out(priority)
+            self.waited += wait
+            time.sleep(min(wait, 0.25))
+
+    async def acquire_async(self, priority=MARKET, cost=1.0, timeout=30.0):
+        deadline = time.time() + timeout
+        while True:
+            wait = self.try_acquire(priority, cost)
+            if wait <= 0:
+                return True
+            if time.time() + wait > deadline:
+                self._timed_out(priority)
+            self.waited += wait
+            await asyncio.sleep(min(wait, 0.25))
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(exchange, api_key=None):
+    key = bucket_key(exchange, api_key)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            rate, burst = _limits_for(exchange)
+            bucket = _buckets[key] = TokenBucket(key, rate, burst)
+        return bucket
+
+
+def acquire(exchange, api_key=None, priority=MARKET, cost=1.0, timeout=30.0):
+    """요청 전에 호출 (필요하면 대기, timeout 초과 시 RateLimitTimeout)"""
+    return get_bucket(exchange, api_key).acquire(priority, cost, timeout)
+
+
+async def acquire_async(exchange, api_key=None, priority=MARKET, cost=1.0, timeout=30.0):
+    return await get_bucket(exchange, api_key).acquire_async(priority, cost, timeout)
+
+
+def stats():
+    """프로세스 내 버킷별 통계 (모니터링용)"""
+    with _buckets_lock:
+        return {k: {'rate': b.rate, 'burst': b.burst, 'granted': b.granted, 'rejected': b.rejected,
+                    'waited_s': round(b.waited, 3)}
+                for k, b in _buckets.items()}
+
+
+# ----------------------------------------------------------------------
+# ccxt 래퍼
+# ----------------------------------------------------------------------
+_CAMEL = re.compile(r'([a-z0-9])([A-Z])')
+
+
+def snake_name(name):
+    """ccxt camelCase 별칭을 snake_case로 (fetchOHLCV → fetch_ohlcv, createOrder → create_order)"""
+    return _CAMEL.sub(r'\1_\2', name).lower()
+
+
+def method_priority(name):
+    """ccxt 메서드 이름(snake_case)으로 우선순위 분류"""
+    if name.startswith('fetch_order_book'):
+        return MARKET
+    if name.startswith(('create_', 'cancel_', 'edit_', 'set_')):
+        return ORDER
+    if name.startswith(('fetch_position', 'fetch_balance', 'fetch_open_orders', 'fetch_order', 'fetch_my_trades')):
+        return POSITION
+    return MARKET
+
+
+def endpoint_priority(endpoint):
+    """Bybit V5 REST 경로로 우선순위 분류 (BybitClient용)"""
+    if endpoint.startswith(('/v5/order/', '/v5/position/set-', '/v5/position/trading-stop')):
+        return ORDER
+    if endpoint.startswith(('/v5/position/', '/v5/account/', '/v5/execution/')):
+        return POSITION
+    return MARKET
+
+
+class RateLimitedExchange:
+    """ccxt 거래소 인스턴스를 감싸 모든 API 메서드 호출이 공용 버킷을 거치도록 함"""
+
+    _WRAPPED_PREFIXES = ('fetch_', 'create_', 'cancel_', 'edit_', 'set_', 'load_markets')
+    _LOCAL_ONLY = ('set_sandbox_mode', 'set_markets')
+
+    def __init__(self, exchange, api_key=None, priority=None):
+        self._exchange = exchange
+        self._name = getattr(exchange, 'id', type(exchange).__name__).lower()
+        self._bucket = get_bucket(self._name, api_key or getattr(exchange, 'apiKey', None))
+        self._priority = priority  # 지정하면 모든 호출에 적용 (예: 대시보드)
+        # ccxt 자체 스로틀(인스턴스 단위 sleep)은 공용 버킷으로 대체
+        exchange.enableRateLimit = False
+
+    @property
+    def raw(self):
+        return self._exchange
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        # ccxt는 같은 메서드를 camelCase 별칭으로도 제공 (fetchOHLCV, createOrder ...) → 같은 규칙 적용
+        name = snake_name(name)
+        if not callable(attr) or not name.startswith(self._WRAPPED_PREFIXES) or name in self._LOCAL_ONLY:
+            return attr
+        priority = self._priority if self._priority is not None else method_priority(name)
+        bucket = self._bucket
+
+        exchange = self._exchange
+        source = self._name
+
+        def call(*args, **kwargs):
+            try:
+                bucket.acquire(priority)
+            except RateLimitTimeout:
+                metrics.record(source, name, 0.0, error='RateLimitTimeout')
+                raise
+            t0 = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                metrics.record(source, name, time.perf_counter() - t0, error=type(e).__name__)
+                raise
+            body = getattr(exchange, 'last_http_response', None)
+            metrics.record(source, name, time.perf_counter() - t0, bytes_in=len(body) if isinstance(body, str) else 0)
+            return result
+        call.__name__ = name
+        return call
+
+
+def wrap_exchange(exchange, api_key=None, priority=None):
+    if isinstance(exchange, RateLimitedExchange):
+        return exchange
+    return RateLimitedExchange(exchange, api_key, priority)
+
+
+_public = {}
+_public_lock = threading.Lock()
+
+
+def get_public_exchange(name='bybit', priority=None, **options):
+    """공개 데이터용 ccxt 인스턴스 (프로세스 내 재사용, 호출마다 새로 만들지 않음)"""
+    key = (name, priority, tuple(sorted(options.items())))
+    with _public_lock:
+        ex = _public.get(key)
+        if ex is None:
+            import ccxt
+            config = {'options': options} if options else {}
+            ex = _public[key] = RateLimitedExchange(getattr(ccxt, name)(config), None, priority)
+        return ex
@@ -0,0 +1,108 @@
+"""
+대시보드 응답 캐시 (TTL + 요청 합치기 + ETag)
+- 키별 TTL 동안은 거래소를 다시 부르지 않고 직렬화해둔 JSON 본문을 그대로 반환
+- 만료 후 동시에 들어온 요청은 한 번만 거래소에 요청하고 나머지는 그 결과를 기다림 (single flight)
+- ETag는 본문 해시로 채울 때 한 번 계산 → 브라우저 If-None-Match가 같으면 304
+- 갱신이 실패하면 stale_ttl 안의 이전 값을 대신 반환 (거래소 장애 시 대시보드 유지)
+→ 대시보드 탭 수와 무관하게 거래소 요청량은 키 수 / TTL로 고정
+
+사용:
+    cache = ResponseCache('dashboard_1h')
+    entry = cache.get(('ticker', symbol), ttl=2, loader=lambda: fetch_ticker(symbol))
+    entry.body, entry.etag
+"""
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+logger = logging.getLogger("ResponseCache")
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    created: float
+    expires: float
+    ttl: float
+
+
+class ResponseCache:
+    def __init__(self, name='cache', stale_ttl=60.0, max_entries=512, wait_timeout=30.0):
+        self.name = name
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.lock = threading.Lock()
+        self.entries = {}       # key -> CachedResponse
+        self.inflight = {}      # key -> Future (갱신 중)
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'stale': 0, 'errors': 0}
+
+    def get(self, key, ttl, loader):
+        """캐시된 응답 반환, 없거나 만료됐으면 loader()로 채움 (동시 요청은 한 번만 실행)"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now < entry.expires:
+                self.stats['hits'] += 1
+                return entry
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+        if not owner:
+            return future.result(timeout=self.wait_timeout)
+
+        try:
+            fresh = self._make(loader(), ttl)
+        except Exception as e:
+            with self.lock:
+                self.stats['errors'] += 1
+                self.inflight.pop(key, None)
+                if entry is not None and now - entry.created < entry.ttl + self.stale_ttl:
+                    self.stats['stale'] += 1
+                    entry.expires = now + entry.ttl  # 장애 중 재시도도 TTL 간격으로 제한
+                    future.set_result(entry)
+                    logger.warning(f"[{self.name}] 갱신 실패, 이전 응답 사용 ({key}): {e}")
+                    return entry
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self.entries[key] = fresh
+            self.inflight.pop(key, None)
+            if len(self.entries) > self.max_entries:
+                self._prune(now)
+        future.set_result(fresh)
+        return fresh
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def status(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'inflight': len(self.inflight), **self.stats}
+
+    @staticmethod
+    def _make(value, ttl):
+        body = json.dumps(value, ensure_ascii=False, default=str).encode('utf-8')
+        now = time.time()
+        return CachedResponse(body, hashlib.sha1(body).hexdigest(), now, now + ttl, ttl)
+
+    def _prune(self, now):
+        # lock 안에서 호출: stale 기간도 지난 항목부터, 그래도 많으면 오래된 순으로 제거
+        for key in [k for k, e in self.entries.items() if now - e.created >= e.ttl + self.stale_ttl]:
+            del self.entries[key]
+        if len(self.entries) > self.max_entries:
+            for key, _ in sorted(self.entries.items(), key=lambda kv: kv[1].created)[:len(self.entries) - self.max_entries]:
+                del self.entries[key]
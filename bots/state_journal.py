@@ -0,0 +1,197 @@
+"""
+봇 상태 저장: 추가 전용 저널 + 주기적 스냅샷
+- 상태가 바뀔 때마다 전체 JSON을 다시 쓰는 대신 이벤트 한 줄(JSON lines)만 저널 파일 끝에 추가
+- fsync는 묶어서 (fsync_interval마다 한 번) → 이벤트당 비용이 이력 길이와 무관하게 일정
+- 이벤트가 snapshot_every개 쌓이면 스냅샷(임시 파일 + fsync + os.replace)을 쓰고 저널을 비움
+- 시작 시 스냅샷 + 그 이후 저널 꼬리를 재생해 복구 (쓰다 만 마지막 줄은 버림)
+  스냅샷이 손상됐으면 .corrupt-<시각>으로 옮겨 두고 저널만 재생
+- 스냅샷 파일은 기존 상태 파일과 같은 경로/형식 (+ '_seq') → 대시보드는 read_state()로 최신 상태 조회
+
+이벤트는 이름 + 변경 내용으로 기록 (재생은 공용 규칙 하나):
+    set:  {'balance': 101.2, 'position': None}     → 필드 덮어쓰기
+    push: {'trade_history': {...}}                  → 리스트에 추가 (limits로 길이 제한 가능)
+
+사용:
+    journal = StateJournal('paper_trade_state.json', initial={'balance': 100.0, 'position': None})
+    state = journal.load()
+    journal.record('close', set={'balance': 101.2, 'position': None}, push={'trade_history': trade})
+"""
+import os
+import json
+import time
+import copy
+import logging
+import threading
+
+logger = logging.getLogger("StateJournal")
+
+
+def _apply(state, event, limits):
+    for key, value in (event.get('set') or {}).items():
+        state[key] = value
+    for key, item in (event.get('push') or {}).items():
+        items = state.get(key)
+        if not isinstance(items, list):
+            items = state[key] = []
+        items.append(item)
+        limit = limits.get(key)
+        if limit and len(items) > limit:
+            del items[:len(items) - limit]
+    return state
+
+
+def _read_journal(path, after_seq):
+    """저널에서 after_seq 이후 이벤트 (잘린 마지막 줄은 무시)"""
+    events = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    logger.warning(f"저널 끝의 불완전한 기록 무시: {path}")
+                    break
+                if event.get('seq', 0) > after_seq:
+                    events.append(event)
+    except FileNotFoundError:
+        pass
+    return events
+
+
+def read_state(path, initial=None, limits=None):
+    """읽기 전용 복구 (대시보드 등 다른 프로세스에서 최신 상태 조회)"""
+    state = copy.deepcopy(initial) if initial else {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    seq = state.pop('_seq', 0)
+    for event in _read_journal(path + '.journal', seq):
+        _apply(state, event, limits or {})
+    return state
+
+
+class StateJournal:
+    def __init__(self, path, initial=None, limits=None, snapshot_every=200, fsync_interval=1.0):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.initial = initial or {}
+        self.limits = limits or {}
+        self.snapshot_every = snapshot_every
+        self.fsync_interval = fsync_interval
+
+        self.lock = threading.RLock()
+        self.state = copy.deepcopy(self.initial)
+        self.seq = 0
+        self.loaded = False
+        self.since_snapshot = 0
+        self.file = None
+        self.dirty = False
+        self.last_sync = 0.0
+        self.stats = {'events': 0, 'fsyncs': 0, 'snapshots': 0}
+
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name=f"StateJournal-{os.path.basename(path)}")
+        self._flusher.start()
+
+    # ------------------------------------------------------------------
+    # 복구
+    # ------------------------------------------------------------------
+    def load(self):
+        """스냅샷 + 저널 꼬리 재생 → 현재 상태 (이전 형식의 상태 파일도 스냅샷으로 읽음)"""
+        with self.lock:
+            state = copy.deepcopy(self.initial)
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    state.update(json.load(f))
+            except FileNotFoundError:
+                pass
+            except ValueError as e:
+                # 손상된 스냅샷은 새 스냅샷으로 덮어쓰지 않고 옆에 보관 (수동 복구용)
+                corrupt = f"{self.path}.corrupt-{int(time.time())}"
+                os.replace(self.path, corrupt)
+                logger.error(f"스냅샷 손상 ({self.path}): {e}, {corrupt}로 보관하고 저널만으로 복구")
+            seq = state.pop('_seq', 0)
+            events = _read_journal(self.journal_path, seq)
+            for event in events:
+                _apply(state, event, self.limits)
+                seq = event['seq']
+            self.state, self.seq = state, seq
+            self.loaded = True
+            self.since_snapshot = len(events)
+            if events:
+                logger.info(f"상태 복구: 스냅샷 + 저널 {len(events)}건 ({self.path})")
+            # 잘린 줄이 남아 있을 수 있으므로 복구한 내용으로 새로 시작
+            self._write_snapshot()
+            return copy.deepcopy(self.state)
+
+    # ------------------------------------------------------------------
+    # 기록
+    # ------------------------------------------------------------------
+    def record(self, event_type, set=None, push=None):
+        with self.lock:
+            if not self.loaded:
+                self.load()  # 기존 저널 뒤에 이어 쓰려면 seq를 먼저 복구해야 함
+            self.seq += 1
+            event = {'seq': self.seq, 'ts': time.time(), 'type': event_type}
+            if set:
+                event['set'] = set
+            if push:
+                event['push'] = push
+            _apply(self.state, event, self.limits)
+            if self.file is None:
+                self.file = open(self.journal_path, 'a', encoding='utf-8')
+            self.file.write(json.dumps(event, default=str) + '\n')
+            self.file.flush()  # OS 버퍼까지 (프로세스가 죽어도 남음), fsync는 묶어서
+            self.dirty = True
+            self.stats['events'] += 1
+            self.since_snapshot += 1
+            if self.since_snapshot >= self.snapshot_every:
+                self._write_snapshot()
+
+    def snapshot(self):
+        with self.lock:
+            if not self.loaded:
+                self.load()  # 복구 전에 스냅샷을 쓰면 저널이 비워지므로 load가 대신 씀
+                return
+            self._write_snapshot()
+
+    def sync(self):
+        """밀린 fsync 즉시 수행"""
+        with self.lock:
+            if self.dirty and self.file is not None:
+                os.fsync(self.file.fileno())
+                self.dirty = False
+                self.last_sync = time.time()
+                self.stats['fsyncs'] += 1
+
+    def close(self):
+        with self.lock:
+            self.snapshot()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _write_snapshot(self):
+        # lock 안에서 호출: 스냅샷을 원자적으로 교체한 뒤 저널을 비움
+        # (교체 직후 죽어도 저널의 seq가 스냅샷 이하이므로 재생 시 건너뜀)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({**self.state, '_seq': self.seq}, f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        if self.file is not None:
+            self.file.close()
+        self.file = open(self.journal_path, 'w', encoding='utf-8')
+        self.dirty = False
+        self.since_snapshot = 0
+        self.stats['snapshots'] += 1
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.fsync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"저널 fsync 실패 ({self.journal_path}): {e}")
@@ -0,0 +1,283 @@
+"""
+거래소 보관 손절/익절/트레일링 관리
+- 전략은 sl_price가 바뀔 때마다 update()만 호출 (즉시 반환) → 전용 스레드가 거래소 주문을 맞춤
+- 틱 크기로 반올림한 값이 마지막 전송값과 같으면 보내지 않음 (의미 없는 정정 생략)
+- min_interval 안에 들어온 변경은 최신 값 하나로 합쳐 전송 (SL/TP/트레일링도 한 번의 요청으로)
+- 실패하면 백오프 후 재시도 (진입 주문 체결 전이라 포지션이 없을 때 등)
+- clear()는 심볼의 세대 번호를 올림 → 그때 전송 중이던 값은 반영하지 않고 되돌리며, 재시도도 버림
+- 청산 판정이 거래소에서 일어나므로 청산 지연이 봇의 폴링 주기와 무관해짐
+- 실제 거래소 포지션을 보유하는 봇에만 사용 (봇 내부 장부로만 포지션을 관리하는 봇에 쓰면
+  같은 계정의 다른 봇 포지션 SL을 덮어씀)
+
+백엔드:
+    BybitClient          → set_trading_stop (/v5/position/trading-stop)
+    ccxt bybit           → 같은 엔드포인트 (implicit API)
+    그 외 ccxt (binance) → STOP_MARKET / TAKE_PROFIT_MARKET closePosition 주문 취소 후 재생성
+
+사용:
+    stops = StopManager(self.exchange, name='b30m')
+    stops.update('BTC/USDT', 'long', stop_loss=stop)
+    stops.clear('BTC/USDT')    # 청산 후
+"""
+import time
+import logging
+import threading
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from bots.exchange_metadata import metadata
+from bots.market_stream import normalize_symbol
+from bots.metrics import metrics
+from bots.rate_limiter import acquire, ORDER
+
+logger = logging.getLogger("StopManager")
+
+_FIELDS = ('stop_loss', 'take_profit', 'trailing', 'active_price')
+
+
+@dataclass
+class StopState:
+    symbol: str
+    side: str                               # 포지션 방향 'long' / 'short'
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+    trailing: Optional[float] = None        # 트레일링 거리 (가격)
+    active_price: Optional[float] = None    # 트레일링 활성화 가격
+
+    def key(self):
+        return (self.side,) + tuple(getattr(self, f) for f in _FIELDS)
+
+
+class StopManager:
+    def __init__(self, exchange, name='bot', min_interval=1.0, retries=5):
+        self.exchange = exchange
+        self.name = name
+        self.min_interval = min_interval
+        self.retries = retries
+
+        if hasattr(exchange, 'set_trading_stop'):
+            self.backend = 'bybit_client'
+        elif getattr(exchange, 'id', '') == 'bybit':
+            self.backend = 'bybit'
+        else:
+            self.backend = 'orders'
+
+        self.cond = threading.Condition()
+        self.desired = {}       # symbol -> StopState (원하는 상태, 반올림 후)
+        self.placed = {}        # symbol -> StopState (거래소에 반영된 상태)
+        self.orders = {}        # symbol -> {'stop_loss': id, 'take_profit': id} (orders 백엔드)
+        self.next_send = {}     # symbol -> 다음 전송 가능 시각
+        self.failures = {}
+        self.generation = {}    # symbol -> clear() 횟수 (전송 시작 때와 다르면 결과를 버림)
+        self.filters = {}
+        self.stats = {'updates': 0, 'unchanged': 0, 'sent': 0, 'coalesced': 0, 'errors': 0, 'discarded': 0}
+        self.is_running = True
+        threading.Thread(target=self._worker, daemon=True, name=f"StopManager-{name}").start()
+
+    # ------------------------------------------------------------------
+    # 전략 측 API
+    # ------------------------------------------------------------------
+    def update(self, symbol, side, stop_loss=None, take_profit=None, trailing=None, active_price=None):
+        """원하는 보호 주문 상태 기록 (None인 항목은 기존 값 유지)"""
+        f = self._filters(symbol)
+        long = side == 'long'
+        # 반올림은 손실이 커지지 않는 쪽으로 (롱 SL은 올림, 숏 SL은 내림)
+        values = {
+            'stop_loss': self._round(f, stop_loss, 'up' if long else 'down'),
+            'take_profit': self._round(f, take_profit, 'down' if long else 'up'),
+            'trailing': self._round(f, trailing, 'nearest'),
+            'active_price': self._round(f, active_price, 'nearest'),
+        }
+        with self.cond:
+            self.stats['updates'] += 1
+            base = self.desired.get(symbol) or self.placed.get(symbol)
+            if base is None or base.side != side:
+                base = StopState(symbol, side)
+            state = replace(base, **{k: v for k, v in values.items() if v is not None})
+            current = self.desired.get(symbol) or self.placed.get(symbol)
+            if current is not None and current.key() == state.key():
+                self.stats['unchanged'] += 1
+                return
+            if symbol in self.desired:
+                self.stats['coalesced'] += 1  # 아직 안 보낸 변경을 덮어씀
+            self.desired[symbol] = state
+            self.failures[symbol] = 0
+            self.cond.notify()
+
+    def clear(self, symbol):
+        """포지션 청산 후 호출: 남은 보호 주문 정리 (전송 중이던 값은 worker가 끝난 뒤 되돌림)"""
+        with self.cond:
+            self.generation[symbol] = self.generation.get(symbol, 0) + 1
+            self.desired.pop(symbol, None)
+            self.failures.pop(symbol, None)
+            placed = self.placed.pop(symbol, None)
+            order_ids = self.orders.pop(symbol, {})
+        self._undo(symbol, placed, order_ids)
+
+    def _undo(self, symbol, state, order_ids):
+        """반영된 보호 주문 취소: 별도 주문은 취소, Bybit 포지션 SL/TP/트레일링은 0으로 해제"""
+        for oid in order_ids.values():
+            if not oid:
+                continue
+            try:
+                self.exchange.cancel_order(oid, symbol)
+            except Exception as e:
+                logger.debug(f"[{self.name}] 보호 주문 취소 실패 {oid}: {e}")
+        if state is not None and self.backend != 'orders':
+            try:
+                self._send(StopState(symbol, state.side, stop_loss=0.0, take_profit=0.0, trailing=0.0), None, {})
+            except Exception as e:  # 포지션이 이미 없으면 거래소가 거절 (SL/TP도 함께 사라진 상태)
+                logger.debug(f"[{self.name}] 포지션 보호 주문 해제 실패 ({symbol}): {e}")
+
+    def current(self, symbol):
+        with self.cond:
+            return self.placed.get(symbol)
+
+    def stop(self):
+        with self.cond:
+            self.is_running = False
+            self.cond.notify()
+
+    def status(self):
+        with self.cond:
+            return {'backend': self.backend,
+                    'placed': {s: st.__dict__ for s, st in self.placed.items()},
+                    'pending': list(self.desired), **self.stats}
+
+    # ------------------------------------------------------------------
+    # 틱 크기
+    # ------------------------------------------------------------------
+    def _filters(self, symbol):
+        if symbol not in self.filters:
+            try:
+                if self.backend == 'bybit_client':
+                    self.filters[symbol] = self.exchange.get_instrument_filters(normalize_symbol(symbol))
+                else:
+                    self.filters[symbol] = metadata.instrument(self.exchange, symbol)
+            except Exception as e:
+                logger.warning(f"[{self.name}] 틱 크기 조회 실패 ({symbol}), 반올림 없이 진행: {e}")
+                return None
+        return self.filters[symbol]
+
+    @staticmethod
+    def _round(filters, price, direction):
+        if price is None or not price:
+            return None
+        return filters.round_price(price, direction) if filters else price
+
+    # ------------------------------------------------------------------
+    # 전송 스레드
+    # ------------------------------------------------------------------
+    def _worker(self):
+        while True:
+            with self.cond:
+                while self.is_running:
+                    now = time.time()
+                    ready = [s for s in self.desired if self.next_send.get(s, 0) <= now]
+                    if ready:
+                        break
+                    waits = [self.next_send[s] - now for s in self.desired if s in self.next_send]
+                    self.cond.wait(timeout=min(waits) if waits else None)
+                if not self.is_running:
+                    return
+                symbol = ready[0]
+                state = self.desired.pop(symbol)
+                prev = self.placed.get(symbol)
+                gen = self.generation.get(symbol, 0)
+                ids = dict(self.orders.get(symbol, {}))     # 전송 중에는 복사본을 갱신
+                self.next_send[symbol] = time.time() + self.min_interval
+
+            t0 = time.perf_counter()
+            try:
+                self._send(state, prev, ids)
+            except Exception as e:
+                metrics.record('orders', f"{self.name}.stops", time.perf_counter() - t0, error=type(e).__name__)
+                self._on_failure(state, e, gen, ids)
+                continue
+            metrics.record('orders', f"{self.name}.stops", time.perf_counter() - t0)
+            with self.cond:
+                stale = self.generation.get(symbol, 0) != gen
+                if stale:
+                    self.stats['discarded'] += 1
+                else:
+                    self.placed[symbol] = state
+                    if ids:
+                        self.orders[symbol] = ids
+                    self.stats['sent'] += 1
+                    self.failures[symbol] = 0
+            if stale:
+                logger.info(f"[{self.name}] 청산 중 반영된 보호 주문 되돌림: {symbol}")
+                self._undo(symbol, state, ids)
+                continue
+            logger.info(f"🛡️ [{self.name}] 거래소 보호 주문 반영: {symbol} {state.side} "
+                        f"SL={state.stop_loss} TP={state.take_profit} TS={state.trailing}")
+
+    def _on_failure(self, state, error, gen, ids):
+        symbol = state.symbol
+        gave_up = False
+        with self.cond:
+            self.stats['errors'] += 1
+            stale = self.generation.get(symbol, 0) != gen
+            if stale:
+                self.stats['discarded'] += 1
+            else:
+                if ids:
+                    self.orders[symbol] = ids   # 일부만 생성된 주문도 다음 시도에서 정리되도록
+                n = self.failures.get(symbol, 0) + 1
+                self.failures[symbol] = n
+                if n > self.retries:
+                    gave_up = True
+                else:
+                    if symbol not in self.desired:  # 그 사이 새 값이 들어왔으면 그쪽 우선
+                        self.desired[symbol] = state
+                    self.next_send[symbol] = time.time() + min(60.0, self.min_interval * 2 ** n)
+                    self.cond.notify()
+        if stale:  # 청산된 뒤라 재시도하지 않음, 일부 생성된 주문만 취소
+            self._undo(symbol, None, ids)
+        elif gave_up:
+            logger.error(f"❌ [{self.name}] 보호 주문 설정 포기 ({symbol}): {error}")
+        else:
+            logger.warning(f"[{self.name}] 보호 주문 설정 실패 ({symbol}, {n}/{self.retries}): {error}")
+
+    def _send(self, state, prev, ids):
+        if self.backend == 'bybit_client':
+            # 0은 해제 (None인 항목은 보내지 않아 기존 값 유지)
+            result = self.exchange.set_trading_stop(normalize_symbol(state.symbol), state.side,
+                                                    state.stop_loss, state.take_profit,
+                                                    trailing_stop=state.trailing, active_price=state.active_price)
+            if not result:  # BybitClient는 실패 시 빈 dict 반환 (오류 내용은 클라이언트가 로그)
+                raise RuntimeError("set_trading_stop 실패")
+        elif self.backend == 'bybit':
+            params = {'category': 'linear', 'symbol': normalize_symbol(state.symbol), 'positionIdx': 0,
+                      'tpslMode': 'Full'}
+            if state.stop_loss is not None:
+                params['stopLoss'] = str(state.stop_loss)
+            if state.take_profit is not None:
+                params['takeProfit'] = str(state.take_profit)
+            if state.trailing is not None:
+                params['trailingStop'] = str(state.trailing)
+                if state.active_price:
+                    params['activePrice'] = str(state.active_price)
+            acquire('bybit', getattr(self.exchange, 'apiKey', None), ORDER)
+            response = self.exchange.private_post_v5_position_trading_stop(params)
+            if str(response.get('retCode', '0')) not in ('0', '34040'):  # 34040 = not modified
+                raise RuntimeError(f"{response.get('retCode')} {response.get('retMsg')}")
+        else:
+            self._replace_orders(state, prev, ids)
+
+    def _replace_orders(self, state, prev, ids):
+        """별도 조건부 주문 방식: 바뀐 항목만 취소 후 재생성 (ids를 그 자리에서 갱신)"""
+        close_side = 'sell' if state.side == 'long' else 'buy'
+        for field, order_type in (('stop_loss', 'STOP_MARKET'), ('take_profit', 'TAKE_PROFIT_MARKET')):
+            price = getattr(state, field)
+            if prev is not None and prev.side == state.side and getattr(prev, field) == price and field in ids:
+                continue
+            if field in ids:
+                try:
+                    self.exchange.cancel_order(ids.pop(field), state.symbol)
+                except Exception as e:
+                    logger.debug(f"[{self.name}] 기존 {field} 주문 취소 실패: {e}")
+            if price:
+                order = self.exchange.create_order(state.symbol, order_type, close_side, None, None,
+                                                   {'stopPrice': price, 'closePosition': True})
+                ids[field] = order.get('id')
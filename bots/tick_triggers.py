@@ -0,0 +1,153 @@
+"""
+틱 단위 트리거 (봉 마감 때 계산한 진입/청산 가격을 '장전'해두고 체결가가 넘는 순간 실행)
+- 무거운 계산(지표, 레짐 판정, 수량/손절)은 봉 마감 때 봇 스레드에서 한 번만 → 틱 경로에는 가격 비교만 남김
+- MarketStream 틱 콜백(WebSocket 루프 스레드)에서 평가: 심볼별 튜플 스냅샷을 읽기만 하므로 락 없음
+- 트리거는 한 번만 실행 (실행 직전에 락 안에서 제거), 같은 group은 하나가 실행되면 함께 해제 (OCO)
+- expires가 지난 트리거는 실행하지 않고 제거 → 다음 봉에서 새 레벨로 다시 장전
+- 실행 콜백도 틱 경로에서 돌므로 주문 큐에 넣는 정도로 가볍게 유지 (OrderPipeline.submit)
+
+사용:
+    book = TriggerBook('b30m')
+    book.attach(get_market_stream(), 'BTC/USDT')
+    book.arm(Trigger('long_breakout', 'BTC/USDT', 'above', 97250.0, on_fire, group='entry', expires=bar_end))
+"""
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from bots.market_stream import normalize_symbol
+from bots.metrics import metrics
+
+logger = logging.getLogger("TickTriggers")
+
+
+@dataclass
+class Trigger:
+    name: str
+    symbol: str
+    direction: str                  # 'above': 가격 >= level / 'below': 가격 <= level
+    level: float
+    callback: Callable              # callback(trigger, price, tick_event)
+    payload: dict = field(default_factory=dict)   # 미리 계산한 수량/손절/레버리지 등
+    group: Optional[str] = None
+    expires: Optional[float] = None               # epoch 초
+    armed_at: float = field(default_factory=time.time)
+
+    def crossed(self, price):
+        return price >= self.level if self.direction == 'above' else price <= self.level
+
+
+class TriggerBook:
+    def __init__(self, name='bot'):
+        self.name = name
+        self.lock = threading.Lock()
+        self.triggers = {}          # (symbol, name) -> Trigger
+        self.by_symbol = {}         # symbol -> tuple(Trigger) (틱 경로용 스냅샷, 통째로 교체)
+        self.recent = deque(maxlen=50)
+        self.stats = {'ticks': 0, 'fired': 0, 'expired': 0}
+        with _books_lock:
+            _books[name] = self
+
+    def attach(self, stream, symbol):
+        """시세 스트림의 체결가 콜백에 연결"""
+        stream.subscribe_ticker(symbol, self.on_tick)
+
+    # ------------------------------------------------------------------
+    # 장전 / 해제 (봇 스레드)
+    # ------------------------------------------------------------------
+    def arm(self, trigger):
+        sym = normalize_symbol(trigger.symbol)
+        with self.lock:
+            self.triggers[(sym, trigger.name)] = trigger
+            self._rebuild(sym)
+        logger.info(f"🎯 [{self.name}] 트리거 장전: {trigger.name} {trigger.direction} {trigger.level:,.2f}")
+
+    def disarm(self, symbol=None, name=None, group=None):
+        sym = normalize_symbol(symbol) if symbol else None
+        with self.lock:
+            keys = [k for k, t in self.triggers.items()
+                    if (sym is None or k[0] == sym) and (name is None or t.name == name)
+                    and (group is None or t.group == group)]
+            for k in keys:
+                del self.triggers[k]
+            for s in {k[0] for k in keys}:
+                self._rebuild(s)
+        return len(keys)
+
+    def armed(self, symbol=None):
+        sym = normalize_symbol(symbol) if symbol else None
+        with self.lock:
+            return [t for k, t in self.triggers.items() if sym is None or k[0] == sym]
+
+    def _rebuild(self, sym):
+        # lock 안에서 호출
+        snapshot = tuple(t for k, t in self.triggers.items() if k[0] == sym)
+        if snapshot:
+            self.by_symbol[sym] = snapshot
+        else:
+            self.by_symbol.pop(sym, None)
+
+    # ------------------------------------------------------------------
+    # 틱 평가 (WebSocket 루프 스레드)
+    # ------------------------------------------------------------------
+    def on_tick(self, event):
+        snapshot = self.by_symbol.get(event.symbol)
+        if not snapshot:
+            return
+        self.stats['ticks'] += 1
+        now = None
+        for trig in snapshot:
+            if trig.expires is not None:
+                now = now or time.time()
+                if now >= trig.expires:
+                    self._remove(event.symbol, trig, 'expired')
+                    continue
+            if trig.crossed(event.price):
+                self._fire(event.symbol, trig, event)
+
+    def _remove(self, sym, trig, reason):
+        with self.lock:
+            if self.triggers.get((sym, trig.name)) is not trig:
+                return False  # 이미 실행/해제/교체됨
+            del self.triggers[(sym, trig.name)]
+            if reason == 'fired' and trig.group:
+                for k in [k for k, t in self.triggers.items() if k[0] == sym and t.group == trig.group]:
+                    del self.triggers[k]
+            self._rebuild(sym)
+        self.stats[reason] += 1
+        return True
+
+    def _fire(self, sym, trig, event):
+        if not self._remove(sym, trig, 'fired'):
+            return
+        t0 = time.perf_counter()
+        try:
+            trig.callback(trig, event.price, event)
+        except Exception as e:
+            logger.error(f"[{self.name}] 트리거 콜백 오류 ({trig.name}): {e}")
+        metrics.record('triggers', f"{self.name}.fire", time.perf_counter() - t0)
+        if event.ts:
+            # 거래소 체결 시각 → 주문 큐 투입까지 (시계 오차 포함)
+            metrics.record('triggers', f"{self.name}.tick_to_order", max(0.0, time.time() - event.ts / 1000))
+        self.recent.append({'name': trig.name, 'level': trig.level, 'price': event.price, 'ts': event.ts,
+                            'armed_at': trig.armed_at, 'fired_at': time.time()})
+        logger.info(f"⚡ [{self.name}] 트리거 실행: {trig.name} ({trig.direction} {trig.level:,.2f}) @ {event.price:,.2f}")
+
+    def status(self):
+        with self.lock:
+            armed = [{'symbol': k[0], 'name': t.name, 'direction': t.direction, 'level': t.level,
+                      'group': t.group, 'expires': t.expires} for k, t in self.triggers.items()]
+        return {'armed': armed, 'recent': list(self.recent), **self.stats}
+
+
+_books = {}
+_books_lock = threading.Lock()
+
+
+def triggers_status():
+    """모니터링용: 봇별 장전된 트리거 / 최근 실행 내역"""
+    with _books_lock:
+        return {name: book.status() for name, book in _books.items()}
@@ -0,0 +1,183 @@
+"""
+XGBoost 하이퍼파라미터 탐색 (양자화 행렬 재사용 + 폴드 결과 캐시)
+- TimeSeriesSplit 폴드마다 QuantileDMatrix(히스토그램 bin)를 한 번만 만들고 모든 후보가 재사용
+- 후보마다 early stopping: 학습 폴드 끝부분(es_fraction)을 떼어 내부 검증으로 사용
+  → 점수를 매기는 검증 폴드는 round 수 선택에 쓰이지 않음 (CV 점수가 낙관적으로 부풀지 않음)
+- 폴드 결과를 (데이터 해시, 파라미터) 키로 JSON에 캐시 → 같은 데이터로 다시 돌리면 새 후보만 학습
+"""
+import os
+import json
+import time
+import hashlib
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import ParameterSampler, TimeSeriesSplit
+from sklearn.metrics import precision_score, accuracy_score, f1_score
+
+SCORERS = {
+    'precision': lambda y, p: precision_score(y, p, zero_division=0),
+    'accuracy': accuracy_score,
+    'f1': lambda y, p: f1_score(y, p, zero_division=0),
+}
+
+# sklearn 래퍼 파라미터 → xgb.train 파라미터 (n_estimators는 boosting round 수로 사용)
+_ROUND_KEY = 'n_estimators'
+
+
+def _hash_array(h, arr):
+    arr = np.ascontiguousarray(arr)
+    h.update(str(arr.shape).encode())
+    h.update(str(arr.dtype).encode())
+    h.update(arr.tobytes())
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True, default=float)
+
+
+class QuantizedCVSearch:
+    """폴드별 양자화 행렬을 캐시해두고 여러 후보 파라미터를 평가"""
+
+    def __init__(self, X, y, n_splits=3, max_bin=256, scoring='precision',
+                 early_stopping_rounds=30, es_fraction=0.2, n_jobs=-1, cache_path=None,
+                 base_params=None):
+        self.feature_names = list(X.columns) if hasattr(X, 'columns') else None
+        self.X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        self.y = np.asarray(y, dtype=np.float32)
+        self.n_splits = n_splits
+        self.max_bin = max_bin
+        self.scoring = scoring
+        self.scorer = SCORERS[scoring]
+        self.early_stopping_rounds = early_stopping_rounds
+        self.es_fraction = es_fraction
+        self.n_jobs = n_jobs
+        self.cache_path = cache_path
+        self.base_params = {'objective': 'binary:logistic', 'eval_metric': 'logloss'}
+        self.base_params.update(base_params or {})
+
+        h = hashlib.sha1()
+        _hash_array(h, self.X)
+        _hash_array(h, self.y)
+        h.update(f"{n_splits}|{max_bin}|{scoring}|{early_stopping_rounds}|{es_fraction}|"
+                 f"{_params_key(self.base_params)}".encode())
+        self.data_hash = h.hexdigest()[:16]
+
+        self._folds = None
+        self.cache = self._load_cache()
+
+    # ------------------------------------------------------------------
+    # 캐시
+    # ------------------------------------------------------------------
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ 탐색 캐시 로드 실패 ({e}), 새로 시작")
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        tmp = self.cache_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.cache, f, indent=2)
+        os.replace(tmp, self.cache_path)
+
+    # ------------------------------------------------------------------
+    # 폴드 (양자화 행렬은 최초 1회만 생성)
+    # ------------------------------------------------------------------
+    def folds(self):
+        """(학습, early stopping용 내부 검증, 점수용 검증, 검증 라벨) 목록"""
+        if self._folds is None:
+            t0 = time.perf_counter()
+            self._folds = []
+            for train_idx, valid_idx in TimeSeriesSplit(n_splits=self.n_splits).split(self.X):
+                # 시계열 순서 유지: 학습 폴드의 마지막 구간을 내부 검증으로
+                cut = len(train_idx) - max(1, int(len(train_idx) * self.es_fraction))
+                fit_idx, es_idx = train_idx[:cut], train_idx[cut:]
+                dtrain = xgb.QuantileDMatrix(self.X[fit_idx], self.y[fit_idx],
+                                             max_bin=self.max_bin, feature_names=self.feature_names)
+                des = xgb.QuantileDMatrix(self.X[es_idx], self.y[es_idx],
+                                          ref=dtrain, feature_names=self.feature_names)
+                dvalid = xgb.QuantileDMatrix(self.X[valid_idx], self.y[valid_idx],
+                                             ref=dtrain, feature_names=self.feature_names)
+                self._folds.append((dtrain, des, dvalid, self.y[valid_idx]))
+            print(f"🧱 폴드 {self.n_splits}개 양자화 행렬 생성 ({time.perf_counter() - t0:.1f}s, max_bin={self.max_bin})")
+        return self._folds
+
+    def _train_params(self, params):
+        p = dict(self.base_params)
+        p.update({k: v for k, v in params.items() if k != _ROUND_KEY})
+        p.update({'tree_method': 'hist', 'max_bin': self.max_bin, 'nthread': self.n_jobs})
+        return p
+
+    # ------------------------------------------------------------------
+    # 평가 / 탐색
+    # ------------------------------------------------------------------
+    def evaluate(self, params):
+        """후보 하나를 모든 폴드에서 평가 (캐시 적중 시 학습 생략)"""
+        key = _params_key(params)
+        cached = self.cache.get(self.data_hash, {}).get(key)
+        if cached:
+            return cached, True
+
+        num_rounds = int(params.get(_ROUND_KEY, 100))
+        fold_results = []
+        for dtrain, des, dvalid, y_valid in self.folds():
+            booster = xgb.train(
+                self._train_params(params), dtrain, num_boost_round=num_rounds,
+                evals=[(des, 'es')], early_stopping_rounds=self.early_stopping_rounds,
+                verbose_eval=False,
+            )
+            best_iter = booster.best_iteration
+            prob = booster.predict(dvalid, iteration_range=(0, best_iter + 1))
+            fold_results.append({'score': float(self.scorer(y_valid, (prob > 0.5).astype(int))),
+                                 'best_iteration': int(best_iter)})
+
+        result = {
+            'params': params,
+            'folds': fold_results,
+            'mean_score': float(np.mean([f['score'] for f in fold_results])),
+            'best_rounds': int(np.mean([f['best_iteration'] for f in fold_results])) + 1,
+        }
+        self.cache.setdefault(self.data_hash, {})[key] = result
+        self._save_cache()
+        return result, False
+
+    def search(self, param_dist, n_iter=20, random_state=42, verbose=1):
+        """ParameterSampler로 후보를 뽑아 평가, 최고 점수 결과 반환"""
+        candidates = list(ParameterSampler(param_dist, n_iter=n_iter, random_state=random_state))
+        t0 = time.perf_counter()
+        hits = 0
+        best = None
+        for i, params in enumerate(candidates, 1):
+            params = {k: (v.item() if hasattr(v, 'item') else v) for k, v in params.items()}
+            c0 = time.perf_counter()
+            result, hit = self.evaluate(params)
+            hits += hit
+            if verbose:
+                tag = "cache" if hit else f"{time.perf_counter() - c0:.1f}s"
+                print(f"   [{i}/{len(candidates)}] {self.scoring}={result['mean_score']:.4f} "
+                      f"rounds={result['best_rounds']} ({tag}) {params}")
+            if best is None or result['mean_score'] > best['mean_score']:
+                best = result
+        print(f"🔎 탐색 완료: 후보 {len(candidates)}개 (캐시 {hits}개) | {time.perf_counter() - t0:.1f}s")
+        return best
+
+    def refit(self, best, **model_kwargs):
+        """최적 파라미터로 전체 학습 데이터에 XGBClassifier 재학습 (round 수는 early stopping 평균)"""
+        params = {k: v for k, v in best['params'].items() if k != _ROUND_KEY}
+        model = xgb.XGBClassifier(
+            n_estimators=best['best_rounds'], tree_method='hist', max_bin=self.max_bin,
+            n_jobs=self.n_jobs, **self.base_params, **params, **model_kwargs
+        )
+        X = self.X
+        if self.feature_names:
+            import pandas as pd
+            X = pd.DataFrame(X, columns=self.feature_names)
+        model.fit(X, self.y.astype(int))
+        return model
@@ -0,0 +1,302 @@
+"""
+바이비트 비동기 API 클라이언트 (aiohttp)
+- BybitClient와 같은 메서드 구성 (get_klines, get_ticker, get_positions, place_order, ...)
+- keep-alive 연결 풀 재사용 (DNS 캐시, 호스트당 연결 수 제한)
+- 한 사이클에서 캔들/시세/포지션을 동시에 조회 (fetch_cycle)
+"""
+
+import json
+import time
+import hmac
+import asyncio
+import hashlib
+import logging
+import urllib.parse
+from typing import Dict, List, Optional
+
+import os
+import sys
+
+import aiohttp
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.rate_limiter import acquire_async, endpoint_priority, bucket_key, RateLimitTimeout
+from bots.exchange_metadata import metadata, InstrumentFilters
+from bots.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBybitClient:
+    """바이비트 비동기 API 클라이언트"""
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True,
+                 pool_size: int = 10, timeout: float = 10.0, keepalive: float = 60.0,
+                 priority: Optional[int] = None):
+        """
+        초기화
+
+        Args:
+            api_key: 바이비트 API 키
+            api_secret: 바이비트 API 시크릿
+            testnet: 테스트넷 사용 여부
+            pool_size: 호스트당 최대 연결 수
+            timeout: 요청 전체 타임아웃 (초)
+            keepalive: 유휴 연결 유지 시간 (초)
+            priority: 레이트 리밋 우선순위 고정값 (None이면 엔드포인트별 자동 분류)
+        """
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self.base_url = "https://api-testnet.bybit.com" if testnet else "https://api.bybit.com"
+
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=min(3.0, timeout))
+        self.keepalive = keepalive
+        self.recv_window = "5000"
+        self.priority = priority
+
+        self._base_headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            self._base_headers['X-BAPI-API-KEY'] = self.api_key
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """세션은 실행 중인 이벤트 루프 안에서 한 번만 생성"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size * 2,
+                limit_per_host=self.pool_size,
+                ttl_dns_cache=300,
+                keepalive_timeout=self.keepalive,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(
+                base_url=self.base_url, connector=connector,
+                timeout=self.timeout, headers=self._base_headers,
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _generate_signature(self, payload: str, timestamp: str) -> str:
+        """Bybit V5 서명 생성"""
+        message = f"{timestamp}{self.api_key}{self.recv_window}{payload}"
+        return hmac.new(self.api_secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+    def _sign_headers(self, payload: str) -> Dict[str, str]:
+        timestamp = str(int(time.time() * 1000))
+        return {
+            'X-BAPI-TIMESTAMP': timestamp,
+            'X-BAPI-SIGN': self._generate_signature(payload, timestamp),
+            'X-BAPI-RECV-WINDOW': self.recv_window,
+        }
+
+    async def _request(self, method: str, endpoint: str, params: Optional[Dict] = None, public: bool = False) -> Dict:
+        """API 요청 (세션 기본 헤더에 서명 헤더만 추가)"""
+        session = await self._get_session()
+        priority = self.priority if self.priority is not None else endpoint_priority(endpoint)
+        try:
+            await acquire_async('bybit', None if public else self.api_key, priority)
+        except RateLimitTimeout as e:
+            return {"retCode": -1, "retMsg": str(e)}  # 한도 초과 상태에서는 보내지 않음
+        metric_name = f"{method} {endpoint}"
+        payload = ""
+        t0 = time.perf_counter()
+        try:
+            if method == 'GET':
+                # 서명한 쿼리 문자열 그대로 전송
+                payload = urllib.parse.urlencode(params) if params else ""
+                url = f"{endpoint}?{payload}" if payload else endpoint
+                headers = None if public else self._sign_headers(payload)
+                request = session.get(url, headers=headers)
+            elif method == 'POST':
+                payload = json.dumps(params) if params else ""
+                headers = None if public else self._sign_headers(payload)
+                request = session.post(endpoint, data=payload, headers=headers)
+            else:
+                raise ValueError(f"Unsupported method: {method}")
+
+            async with request as response:
+                response.raise_for_status()
+                body = await response.read()
+                data = json.loads(body)
+                metrics.record('bybit', metric_name, time.perf_counter() - t0, status=response.status,
+                               ret_code=data.get('retCode'), bytes_in=len(body), bytes_out=len(payload))
+                return data
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            metrics.record('bybit', metric_name, time.perf_counter() - t0, status=getattr(e, 'status', None),
+                           bytes_out=len(payload), error=type(e).__name__)
+            logger.error(f"Request failed: {e!r}")
+            return {"retCode": -1, "retMsg": str(e) or type(e).__name__}
+        except json.JSONDecodeError as e:
+            metrics.record('bybit', metric_name, time.perf_counter() - t0, bytes_out=len(payload),
+                           error='JSONDecodeError')
+            logger.error(f"Failed to parse response: {e}")
+            return {"retCode": -1, "retMsg": "Parse error"}
+
+    async def _result(self, method, endpoint, params, what, public=False, default=None):
+        response = await self._request(method, endpoint, params, public=public)
+        if response.get('retCode') == 0:
+            return response.get('result', {})
+        logger.error(f"Failed to {what}: {response}")
+        return default
+
+    # ------------------------------------------------------------------
+    # Public
+    # ------------------------------------------------------------------
+    async def get_klines(self, symbol: str, interval: str, limit: int = 200) -> List[Dict]:
+        """캔들 데이터 조회 (Public)"""
+        params = {'category': 'linear', 'symbol': symbol, 'interval': interval, 'limit': limit}
+        result = await self._result('GET', "/v5/market/kline", params, "get klines", public=True)
+        return result.get('list', []) if result else []
+
+    async def get_ticker(self, symbol: str) -> Dict:
+        """현재 시세 조회 (Public)"""
+        params = {'category': 'linear', 'symbol': symbol}
+        result = await self._result('GET', "/v5/market/tickers", params, "get ticker", public=True)
+        tickers = result.get('list', []) if result else []
+        return tickers[0] if tickers else {}
+
+    async def get_instrument_info(self, symbol: str) -> Dict:
+        """심볼 정보 조회 (Public, TTL 캐시는 BybitClient와 공유)"""
+        source = 'bybit-testnet' if self.testnet else 'bybit'
+        cached = metadata.instrument_info(source, symbol, lambda: None)
+        if cached:
+            return cached
+        params = {'category': 'linear', 'symbol': symbol}
+        result = await self._result('GET', "/v5/market/instruments-info", params, "get instrument info", public=True)
+        info = result.get('list', []) if result else []
+        return metadata.instrument_info(source, symbol, lambda: info[0] if info else {})
+
+    async def get_instrument_filters(self, symbol: str) -> InstrumentFilters:
+        """틱 크기 / 수량 단위 / 최소 주문 금액"""
+        return InstrumentFilters.from_bybit(symbol, await self.get_instrument_info(symbol))
+
+    # ------------------------------------------------------------------
+    # Private
+    # ------------------------------------------------------------------
+    async def get_balance(self) -> Dict:
+        """계좌 잔고 조회"""
+        return await self._result('GET', "/v5/account/wallet-balance", {'accountType': 'UNIFIED'},
+                                  "get balance", default={})
+
+    async def get_positions(self, symbol: str) -> List[Dict]:
+        """포지션 조회"""
+        params = {'category': 'linear', 'symbol': symbol}
+        result = await self._result('GET', "/v5/position/list", params, "get positions")
+        return result.get('list', []) if result else []
+
+    async def place_order(self, symbol: str, side: str, qty: float, price: Optional[float] = None,
+                          order_type: str = 'Market', leverage: int = 1) -> Dict:
+        """주문 생성"""
+        params = {
+            'category': 'linear',
+            'symbol': symbol,
+            'side': side,
+            'orderType': order_type,
+            'qty': str(qty),
+            'leverage': str(leverage),
+            'positionIdx': 0  # 양방향 포지션
+        }
+        if order_type == 'Limit' and price:
+            params['price'] = str(price)
+
+        result = await self._result('POST', "/v5/order/create", params, "place order", default={})
+        if result:
+            logger.info(f"Order placed: {result}")
+        return result
+
+    async def close_position(self, symbol: str, side: str, qty: Optional[float] = None) -> Dict:
+        """포지션 청산 (qty를 알고 있으면 포지션 조회 생략)"""
+        if qty is None:
+            positions = await self.get_positions(symbol)
+            if not positions:
+                logger.warning(f"No position found for {symbol}")
+                return {}
+            qty = float(positions[0].get('size', 0))
+
+        if qty == 0:
+            logger.warning(f"Position size is 0 for {symbol}")
+            return {}
+
+        # 반대 방향으로 주문
+        return await self.place_order(symbol, side, qty, order_type='Market')
+
+    async def cancel_order(self, symbol: str, order_id: str) -> Dict:
+        """주문 취소"""
+        params = {'category': 'linear', 'symbol': symbol, 'orderId': order_id}
+        result = await self._result('POST', "/v5/order/cancel", params, "cancel order", default={})
+        if result:
+            logger.info(f"Order cancelled: {order_id}")
+        return result
+
+    async def set_leverage(self, symbol: str, leverage: int) -> Dict:
+        """레버리지 설정 (같은 값이면 호출 생략)"""
+        account = bucket_key('bybit', self.api_key)
+        if metadata.current_leverage(account, symbol) == float(leverage):
+            return {}
+        params = {
+            'category': 'linear',
+            'symbol': symbol,
+            'buyLeverage': str(leverage),
+            'sellLeverage': str(leverage)
+        }
+        response = await self._request('POST', "/v5/position/set-leverage", params)
+        if response.get('retCode') == 0:
+            logger.info(f"Leverage set to {leverage} for {symbol}")
+            metadata.record_leverage(account, symbol, leverage)
+            return response.get('result', {})
+        elif response.get('retCode') in (110043, 110012):  # Leverage not changed
+            metadata.record_leverage(account, symbol, leverage)
+            return {}
+        logger.error(f"Failed to set leverage: {response}")
+        return {}
+
+    async def set_trading_stop(self, symbol: str, side: str, sl_price: Optional[float] = None,
+                               tp_price: Optional[float] = None, trailing_stop: Optional[float] = None,
+                               active_price: Optional[float] = None) -> Dict:
+        """손절/익절/트레일링 설정 (0을 넘기면 해당 항목 해제, None이면 기존 값 유지)"""
+        params = {'category': 'linear', 'symbol': symbol, 'positionIdx': 0, 'tpslMode': 'Full'}
+        if sl_price is not None:
+            params['stopLoss'] = str(sl_price)
+        if tp_price is not None:
+            params['takeProfit'] = str(tp_price)
+        if trailing_stop is not None:
+            params['trailingStop'] = str(trailing_stop)
+            if active_price:
+                params['activePrice'] = str(active_price)
+
+        response = await self._request('POST', "/v5/position/trading-stop", params)
+        if response.get('retCode') in (0, 34040):  # 34040 = not modified
+            logger.info(f"Trading stop set: SL={sl_price}, TP={tp_price}, TS={trailing_stop}")
+            # 성공 응답의 result는 비어 있으므로 실패({})와 구분되게 반환
+            return response.get('result') or {'retCode': response.get('retCode')}
+        logger.error(f"Failed to set trading stop: {response}")
+        return {}
+
+    # ------------------------------------------------------------------
+    # 한 사이클 동시 조회
+    # ------------------------------------------------------------------
+    async def fetch_cycle(self, symbol: str, interval: str, limit: int = 200,
+                          with_positions: bool = True) -> Dict:
+        """캔들 / 시세 / 포지션을 동시에 조회 (가장 느린 요청 하나만큼만 대기)"""
+        tasks = [self.get_klines(symbol, interval, limit), self.get_ticker(symbol)]
+        if with_positions:
+            tasks.append(self.get_positions(symbol))
+        results = await asyncio.gather(*tasks)
+        return {
+            'klines': results[0],
+            'ticker': results[1],
+            'positions': results[2] if with_positions else None,
+        }
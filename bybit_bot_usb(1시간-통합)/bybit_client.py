@@ -10,14 +10,21 @@ import hmac
 import hashlib
 import logging
 from datetime import datetime
+import os
+import sys
 from typing import Dict, List, Optional, Tuple
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.rate_limiter import acquire, endpoint_priority, bucket_key, RateLimitTimeout
+from bots.exchange_metadata import metadata, InstrumentFilters
+from bots.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 class BybitClient:
     """바이비트 API 클라이언트"""
     
-    def __init__(self, api_key: str, api_secret: str, testnet: bool = True):
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True, priority: Optional[int] = None):
         """
         초기화
         
@@ -25,10 +32,12 @@ class BybitClient:
             api_key: 바이비트 API 키
             api_secret: 바이비트 API 시크릿
             testnet: 테스트넷 사용 여부
+            priority: 레이트 리밋 우선순위 고정값 (None이면 엔드포인트별 자동 분류)
         """
         self.api_key = api_key
         self.api_secret = api_secret
         self.testnet = testnet
+        self.priority = priority
         
         if testnet:
             self.base_url = "https://api-testnet.bybit.com"
@@ -61,8 +70,20 @@ class BybitClient:
         
         url = f"{self.base_url}{endpoint}"
         
+        # 공용 레이트 리미터 (public은 IP 단위 버킷, private은 API 키 단위 버킷)
+        priority = self.priority if self.priority is not None else endpoint_priority(endpoint)
+        try:
+            acquire('bybit', None if public else self.api_key, priority)
+        except RateLimitTimeout as e:
+            return {"retCode": -1, "retMsg": str(e)}  # 한도 초과 상태에서는 보내지 않음
+        
+        # 지표: 레이트 리밋 대기를 뺀 실제 요청 시간
+        metric_name = f"{method} {endpoint}"
+        payload = ""
+        t0 = time.perf_counter()
         try:
-            request_headers = self.session.headers.copy()
+            # 세션 기본 헤더는 requests가 병합하므로 서명 헤더만 전달
+            request_headers = None
             
             if method == 'GET':
                 payload = ""
@@ -72,12 +93,11 @@ class BybitClient:
                 
                 if not public:
                     signature = self._generate_signature(payload, timestamp, recv_window)
-                    headers = {
+                    request_headers = {
                         'X-BAPI-TIMESTAMP': timestamp,
                         'X-BAPI-SIGN': signature,
                         'X-BAPI-RECV-WINDOW': recv_window
                     }
-                    request_headers.update(headers)
                 
                 response = self.session.get(url, params=params, headers=request_headers, timeout=10)
                 
@@ -86,23 +106,30 @@ class BybitClient:
                 
                 if not public:
                     signature = self._generate_signature(payload, timestamp, recv_window)
-                    headers = {
+                    request_headers = {
                         'X-BAPI-TIMESTAMP': timestamp,
                         'X-BAPI-SIGN': signature,
                         'X-BAPI-RECV-WINDOW': recv_window
                     }
-                    request_headers.update(headers)
                 
                 response = self.session.post(url, data=payload, headers=request_headers, timeout=10)
             else:
                 raise ValueError(f"Unsupported method: {method}")
             
             response.raise_for_status()
-            return response.json()
+            data = response.json()
+            metrics.record('bybit', metric_name, time.perf_counter() - t0, status=response.status_code,
+                           ret_code=data.get('retCode'), bytes_in=len(response.content), bytes_out=len(payload))
+            return data
         except requests.exceptions.RequestException as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            metrics.record('bybit', metric_name, time.perf_counter() - t0, status=status,
+                           bytes_out=len(payload), error=type(e).__name__)
             logger.error(f"Request failed: {e}")
             return {"retCode": -1, "retMsg": str(e)}
         except json.JSONDecodeError as e:
+            metrics.record('bybit', metric_name, time.perf_counter() - t0, status=response.status_code,
+                           bytes_in=len(response.content), bytes_out=len(payload), error='JSONDecodeError')
             logger.error(f"Failed to parse response: {e}")
             return {"retCode": -1, "retMsg": "Parse error"}
     
@@ -228,26 +255,28 @@ class BybitClient:
             logger.error(f"Failed to place order: {response}")
             return {}
     
-    def close_position(self, symbol: str, side: str) -> Dict:
+    def close_position(self, symbol: str, side: str, qty: Optional[float] = None) -> Dict:
         """
         포지션 청산
         
         Args:
             symbol: 거래 심볼
             side: 청산 방향 ('Buy' 또는 'Sell')
+            qty: 청산 수량 (알고 있으면 포지션 조회 생략)
         
         Returns:
             주문 정보
         """
-        # 현재 포지션 조회
-        positions = self.get_positions(symbol)
-        
-        if not positions:
-            logger.warning(f"No position found for {symbol}")
-            return {}
-        
-        position = positions[0]
-        qty = float(position.get('size', 0))
+        if qty is None:
+            # 현재 포지션 조회
+            positions = self.get_positions(symbol)
+            
+            if not positions:
+                logger.warning(f"No position found for {symbol}")
+                return {}
+            
+            position = positions[0]
+            qty = float(position.get('size', 0))
         
         if qty == 0:
             logger.warning(f"Position size is 0 for {symbol}")
@@ -294,6 +323,11 @@ class BybitClient:
         Returns:
             설정 결과
         """
+        # 같은 값이면 호출 생략 (계정별 레버리지 캐시)
+        account = bucket_key('bybit', self.api_key)
+        if metadata.current_leverage(account, symbol) == float(leverage):
+            return {}
+
         endpoint = "/v5/position/set-leverage"
         params = {
             'category': 'linear',
@@ -306,8 +340,10 @@ class BybitClient:
         
         if response.get('retCode') == 0:
             logger.info(f"Leverage set to {leverage} for {symbol}")
+            metadata.record_leverage(account, symbol, leverage)
             return response.get('result', {})
-        elif response.get('retCode') == 110012: # Leverage not changed
+        elif response.get('retCode') in (110043, 110012): # Leverage not changed
+            metadata.record_leverage(account, symbol, leverage)
             return {}
         else:
             logger.error(f"Failed to set leverage: {response}")
@@ -315,8 +351,16 @@ class BybitClient:
 
     def get_instrument_info(self, symbol: str) -> Dict:
         """
-        심볼 정보 조회 (Public)
+        심볼 정보 조회 (Public, TTL 캐시)
         """
+        source = 'bybit-testnet' if self.testnet else 'bybit'
+        return metadata.instrument_info(source, symbol, lambda: self._fetch_instrument_info(symbol))
+
+    def get_instrument_filters(self, symbol: str) -> InstrumentFilters:
+        """틱 크기 / 수량 단위 / 최소 주문 금액"""
+        return InstrumentFilters.from_bybit(symbol, self.get_instrument_info(symbol))
+
+    def _fetch_instrument_info(self, symbol: str) -> Dict:
         endpoint = "/v5/market/instruments-info"
         params = {
             'category': 'linear',
@@ -332,27 +376,39 @@ class BybitClient:
             logger.error(f"Failed to get instrument info: {response}")
             return {}
 
-    def set_trading_stop(self, symbol: str, side: str, sl_price: Optional[float] = None, tp_price: Optional[float] = None) -> Dict:
+    def set_trading_stop(self, symbol: str, side: str, sl_price: Optional[float] = None, tp_price: Optional[float] = None,
+                         trailing_stop: Optional[float] = None, active_price: Optional[float] = None) -> Dict:
         """
-        손절/익절 설정
+        손절/익절/트레일링 설정 (거래소 보관)
+
+        Args:
+            trailing_stop: 트레일링 거리 (가격)
+            active_price: 트레일링 활성화 가격
+            0을 넘기면 해당 항목 해제, None이면 기존 값 유지
         """
         endpoint = "/v5/position/trading-stop"
         params = {
             'category': 'linear',
             'symbol': symbol,
-            'positionIdx': 0
+            'positionIdx': 0,
+            'tpslMode': 'Full'
         }
         
-        if sl_price:
+        if sl_price is not None:
             params['stopLoss'] = str(sl_price)
-        if tp_price:
+        if tp_price is not None:
             params['takeProfit'] = str(tp_price)
+        if trailing_stop is not None:
+            params['trailingStop'] = str(trailing_stop)
+            if active_price:
+                params['activePrice'] = str(active_price)
             
         response = self._request('POST', endpoint, params)
         
-        if response.get('retCode') == 0:
-            logger.info(f"Trading stop set: SL={sl_price}, TP={tp_price}")
-            return response.get('result', {})
+        if response.get('retCode') in (0, 34040):  # 34040 = not modified
+            logger.info(f"Trading stop set: SL={sl_price}, TP={tp_price}, TS={trailing_stop}")
+            # 성공 응답의 result는 비어 있으므로 실패({})와 구분되게 반환
+            return response.get('result') or {'retCode': response.get('retCode')}
         else:
             logger.error(f"Failed to set trading stop: {response}")
             return {}
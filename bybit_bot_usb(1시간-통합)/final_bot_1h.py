@@ -5,30 +5,37 @@
 - 15분봉 성공 전략 이식
 """
 import ccxt
+import asyncio
 import pandas as pd
 import numpy as np
-import joblib
 import os
 import time
-import logging
-import json
 import sys
 from datetime import datetime
-import subprocess
 import random
 from dotenv import load_dotenv
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+# bots 공용 모듈 임포트를 위한 경로 추가
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.job_scheduler import JobScheduler, JobSpec
+from bots.model_store import load_model_bundle, model_mtime
+from bots.rate_limiter import wrap_exchange, get_public_exchange
+from bots.market_stream import get_market_stream
+from bots.exchange_metadata import metadata
+from bots.state_journal import StateJournal
+from bots.log_setup import setup_logging
+from bots.process_registry import register, beat
+from bots.bar_clock import BarClock, INTRABAR_INTERVAL
+from bots.async_runtime import get_runtime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from trade_store import TradeStore
+from async_bybit_client import AsyncBybitClient
 
 log_dir = os.path.dirname(os.path.abspath(__file__))
 log_file = os.path.join(log_dir, 'bot_1h.log')
 
-log_file_obj = open(log_file, 'a', buffering=1)
-handler = logging.StreamHandler(log_file_obj)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+# 파일 기록은 공용 기록 스레드가 묶어서 처리 (bot_1h.log + bot_1h.jsonl)
+logger = setup_logging(__name__, log_file, bot='Bot_1H', symbol='BTC/USDT')
 
 logger.debug(f"Logging configured. Log file: {log_file}")
 
@@ -38,6 +45,10 @@ class FinalBot1H:
     def __init__(self):
         self.symbol = 'BTC/USDT'
         self.timeframe = '1h'
+        self.market_id = 'BTCUSDT'     # 바이비트 V5 심볼 (비동기 클라이언트용)
+        self.kline_interval = '60'
+        self.clock = BarClock(self.timeframe, name='Bot_1H')  # 분석은 봉 마감(서버 시각)마다 한 번
+        self.last_row = None    # 마지막 분석 봉 (봉 사이 점검/상태 로그용)
         self.initial_balance = 100
         self.balance = self.initial_balance
         self.mode = os.getenv('TRADING_MODE', 'paper').lower()
@@ -48,6 +59,8 @@ class FinalBot1H:
         self.current_balance = self.balance
         self.current_position = "None"
         self.total_roi = 0.0
+        self.last_price = None          # 마지막 사이클의 시세 (실거래)
+        self.liquidation_price = 0.0    # 거래소 포지션의 청산가 (실거래)
         
         self.load_models()
         
@@ -61,27 +74,21 @@ class FinalBot1H:
             'options': {'defaultType': 'future'}
         }
         
+        self.async_client = None
         if self.mode != 'paper':
-            self.exchange = ccxt.bybit(exchange_config)
+            self.exchange = wrap_exchange(ccxt.bybit(exchange_config))
+            # 봉마다 캔들/시세/포지션을 한 번에 동시 조회 (실패하면 ccxt로 캔들만 조회)
+            self.async_client = AsyncBybitClient(self.api_key, self.secret, testnet=False)
+            try:
+                metadata.prime_markets(self.exchange)  # 봇들이 같은 마켓 목록 공유
+            except Exception as e:
+                logger.warning(f"마켓 목록 로드 실패 (첫 호출 때 다시 시도): {e}")
         else:
             class MockExchange:
                 def __init__(self, balance, logger):
                     self.balance = balance
                     self.logger = logger
 
-                def fetch_ohlcv(self, symbol, timeframe, limit):
-                    self.logger.info("Paper trading mode: Fetching REAL OHLCV...")
-                    try:
-                        # Fetch real data using a public instance
-                        public_exchange = ccxt.bybit()
-                        ohlcv = public_exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-                        return ohlcv
-                    except Exception as e:
-                        self.logger.error(f"Error fetching real OHLCV: {e}")
-                        # Fallback
-                        now = int(time.time() * 1000)
-                        return [[now, 90000, 90000, 90000, 90000, 100]] * limit
-                
                 def fetch_balance(self):
                     self.logger.info("Paper trading mode: Mocking fetch_balance.")
                     return {'total': {'USDT': self.balance}}
@@ -94,7 +101,7 @@ class FinalBot1H:
                     """Fetch real OHLCV data from Bybit for paper trading"""
                     self.logger.info("Paper trading mode: Fetching REAL OHLCV...")
                     try:
-                        public_exchange = ccxt.bybit()
+                        public_exchange = get_public_exchange('bybit')
                         return public_exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
                     except Exception as e:
                         self.logger.error(f"Failed to fetch OHLCV: {e}")
@@ -112,6 +119,11 @@ class FinalBot1H:
                 def fetch_ticker(self, symbol):
                     return {'last': 90600} # Mock price for status log
             self.exchange = MockExchange(self.balance, logger)
+
+        # 공개 시세 스트림 (대기 중 상태 로그의 현재가, 끊기면 REST로 대체)
+        self.market_stream = get_market_stream()
+        if self.market_stream:
+            self.market_stream.subscribe_ticker(self.symbol)
         
         # 전략 설정 (초공격적 - 4.1억 승리 플랜)
         self.regime_config = {
@@ -128,6 +140,7 @@ class FinalBot1H:
         
         self.position = 0
         self.entry_price = 0
+        self.entry_time = None
         self.sl_price = 0
         self.tp_price = 0
         self.max_price = 0
@@ -137,6 +150,9 @@ class FinalBot1H:
         
         self.trades = []
         self.state_file = 'bot_1h_state.json'
+        self.journal = StateJournal(self.state_file, limits={'trades': 50})
+        # 전체 거래 기록은 SQLite (대시보드가 기간/최근 N건/통계를 SQL로 조회)
+        self.trade_store = TradeStore(import_dir=None)
         self.load_state()
         
         # FORCE RESET BALANCE as per user request
@@ -146,26 +162,21 @@ class FinalBot1H:
         logger.info(f"🤖 1시간봉 최종 봇 초기화 완료 (잔고: {self.balance})")
 
     def start_scheduler(self):
-        def job():
-            logger.info("⏰ 00:00 정기 재학습 시작...")
-            subprocess.Popen([sys.executable, "retrain.py"])
-            
-        schedule.every().day.at("00:00").do(job)
-        
-        def run_schedule():
-            while True:
-                schedule.run_pending()
-                time.sleep(60)
-                
-        t = threading.Thread(target=run_schedule, daemon=True)
-        t.start()
+        if os.getenv('CENTRAL_JOB_SCHEDULER') == '1':
+            logger.info("📅 재학습은 통합 매니저의 중앙 스케줄러가 담당합니다")
+            return
+
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.job_scheduler = JobScheduler(timeframes=(self.timeframe,))
+        self.job_scheduler.register(JobSpec("retrain_1h", "retrain.py", base_dir, at="00:00"))
+        self.job_scheduler.start()
         logger.info("📅 자동 재학습 스케줄러 가동 (매일 00:00)")
 
     def check_model_reload(self):
         try:
             base_dir = os.path.dirname(os.path.abspath(__file__))
             path = os.path.join(base_dir, 'xgb_short_1h.pkl')
-            mtime = os.path.getmtime(path)
+            mtime = model_mtime(path)
             if mtime > self.model_ts:
                 logger.info("🔄 새로운 모델 파일 감지! 다시 로드합니다.")
                 self.load_models()
@@ -177,11 +188,11 @@ class FinalBot1H:
             short_path = os.path.join(base_dir, 'xgb_short_1h.pkl')
             
             if os.path.exists(short_path):
-                self.model_ts = os.path.getmtime(short_path)
+                self.model_ts = model_mtime(short_path)
             
-            self.short_model_data = joblib.load(short_path)
-            self.long_model_data = joblib.load(os.path.join(base_dir, 'xgb_long_1h.pkl'))
-            self.regime_model_data = joblib.load(os.path.join(base_dir, 'xgb_regime_1h.pkl'))
+            self.short_model_data = load_model_bundle(short_path)
+            self.long_model_data = load_model_bundle(os.path.join(base_dir, 'xgb_long_1h.pkl'))
+            self.regime_model_data = load_model_bundle(os.path.join(base_dir, 'xgb_regime_1h.pkl'))
             
             self.short_model = self.short_model_data['model']
             self.long_model = self.long_model_data['model']
@@ -191,9 +202,42 @@ class FinalBot1H:
             logger.error(f"❌ 모델 로드 실패: {e}")
             # 모델 로드 실패 시 sys.exit(1) 대신 PlaceholderBot 사용하도록 bot_manager.py에서 처리
 
+    def fetch_cycle(self, limit=300):
+        """실거래: 캔들/시세/포지션 동시 조회 → ccxt 형식 캔들 (실패하면 None)"""
+        if self.async_client is None:
+            return None
+        coro = self.async_client.fetch_cycle(self.market_id, self.kline_interval, limit,
+                                             with_positions=bool(self.api_key))
+        # 세션은 공용 런타임 루프 하나에서만 사용 (step은 실행기 스레드에서 호출됨)
+        future = asyncio.run_coroutine_threadsafe(coro, get_runtime().loop)
+        try:
+            cycle = future.result(timeout=30)
+        except Exception as e:
+            future.cancel()
+            logger.warning(f"동시 조회 실패 (ccxt로 조회): {e!r}")
+            return None
+
+        ticker = cycle['ticker']
+        if ticker.get('lastPrice'):
+            self.last_price = float(ticker['lastPrice'])
+        for pos in cycle['positions'] or []:
+            if float(pos.get('size') or 0) > 0:
+                self.liquidation_price = float(pos.get('liqPrice') or 0)
+                break
+        else:
+            self.liquidation_price = 0.0
+
+        # V5 캔들: 최신 봉부터 [start, open, high, low, close, volume, turnover] 문자열
+        klines = cycle['klines']
+        if not klines:
+            return None
+        return [[int(k[0])] + [float(v) for v in k[1:6]] for k in reversed(klines)]
+
     def fetch_data(self):
         try:
-            ohlcv = self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, limit=300)
+            ohlcv = self.fetch_cycle()
+            if ohlcv is None:
+                ohlcv = self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, limit=300)
             df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
             
@@ -249,25 +293,24 @@ class FinalBot1H:
             return None
 
     def save_state(self):
-        state = {
+        """전체 상태 스냅샷 (진입/SL 변경/청산은 발생 시점에 저널로 기록됨)"""
+        self.journal.record('sync', set={
             'balance': self.balance,
             'position': self.position,
             'entry_price': self.entry_price,
             'sl_price': self.sl_price,
             'consecutive_losses': self.consecutive_losses,
-            'trades': self.trades[-50:]
-        }
-        with open(self.state_file, 'w') as f:
-            json.dump(state, f, indent=2, default=str)
+        })
+        self.journal.snapshot()
 
     def load_state(self):
-        if os.path.exists(self.state_file):
+        if os.path.exists(self.state_file) or os.path.exists(self.journal.journal_path):
             try:
-                with open(self.state_file, 'r') as f:
-                    state = json.load(f)
+                state = self.journal.load()
                 self.balance = state.get('balance', 100)
                 self.position = state.get('position', 0)
                 self.entry_price = state.get('entry_price', 0)
+                self.entry_time = state.get('entry_time')
                 self.sl_price = state.get('sl_price', 0)
                 self.consecutive_losses = state.get('consecutive_losses', 0)
                 self.trades = state.get('trades', [])
@@ -294,83 +337,17 @@ class FinalBot1H:
         self.status = "Stopped"
 
     def run(self):
+        """단독 실행 루프 (bot_manager에서는 async 런타임이 step/check_intrabar를 직접 호출)"""
         logger.info("🚀 Bot started... Waiting for next candle.")
         self.status = "Running"
         while self.is_running:
             try:
-                # 1. Update Real-time Status
-                self.status = "실행 중"
-                self.last_run = datetime.now()
-                
-                # Check for model reload (not implemented here but placeholder)
-                # self.check_model_reload()
-                
-                current_ts = time.time()
-                if current_ts < self.rest_until:
-                    wait_min = (self.rest_until - current_ts) / 60
-                    logger.info(f"😴 휴식 중... (남은 시간: {wait_min:.1f}분)")
-                    self.status = f"Resting ({wait_min:.0f}m)"
-                    for _ in range(int(wait_min * 600)): # Check every 0.1 seconds
-                        if not self.is_running: break
-                        time.sleep(0.1)
-                    continue
-
-                logger.debug("Fetching data...")
-                df = self.fetch_data()
-                if df is None:
-                    self.status = "Data Fetch Error"
+                if self.step() is False:
                     time.sleep(10)
                     continue
-                
-                row = df.iloc[-1]
-                current_price = row['close']
-                atr = row['atr']
-                self.current_balance = self.balance # Sync balance for dashboard
-                
-                self.status = "실행 중"
-
-                # 3. manage position
-                if self.position != 0:
-                    self.current_position = "LONG" if self.position > 0 else "SHORT"
-                    # self.status = f"In Position: {self.current_position}"
-                    self.manage_position(current_price, row['high'], row['low'], atr)
-                
-                # 4. entry
-                elif self.position == 0:
-                    self.current_position = "None"
-                    self.status = "실행 중"
-                    self.check_entry(df, row)
-                
-                # self.save_state()
-                # logger.debug("Bot state saved. Waiting 60 seconds.")
-                
-                # Wait loop with frequent status checks (10s log)
-                for i in range(600):
-                    if not self.is_running: break
-                    
-                    if i % 100 == 0:
-                        try:
-                            # Lightweight status check
-                            ticker = self.exchange.fetch_ticker(self.symbol)
-                            current_p = ticker['last']
-                            
-                            p_str = "NONE"
-                            if self.position > 0: p_str = f"LONG"
-                            elif self.position < 0: p_str = f"SHORT"
-                            
-                            # Calculate quick RSI/Trend for log (using last known data if possible)
-                            rsi_str = f"{row['rsi']:.1f}" if 'row' in locals() else "-"
-                            trend_val = row['ema_200'] if 'row' in locals() else 0
-                            trend_str = "UP" if current_p > trend_val else "DOWN"
-                            
-                            msg = f"Price: {current_p:,.1f} | RSI: {rsi_str} | Trend: {trend_str} | Pos: {p_str}"
-                            logger.info(msg)
-                            
-                        except Exception as e:
-                            pass
-
-                    time.sleep(0.1)
-
+                # 다음 봉 마감 + settle까지 대기, 그 사이에는 현재가로 손절/TS만 확인 (10초마다)
+                self.clock.wait(lambda: self.is_running, on_idle=self.check_intrabar,
+                                idle_interval=INTRABAR_INTERVAL)
             except KeyboardInterrupt:
                 logger.info("KeyboardInterrupt received. Exiting bot.")
                 break
@@ -379,8 +356,72 @@ class FinalBot1H:
                 self.status = "Error"
                 time.sleep(10)
         
-        self.status = "Stopped" 
-                
+        self.status = "Stopped"
+
+    def step(self):
+        """봉 마감마다 한 번: 데이터/지표 조회 → 포지션 관리 또는 진입 판단 (데이터 조회 실패 시 False)"""
+        beat('bot_1h')
+        # 1. Update Real-time Status
+        self.status = "실행 중"
+        self.last_run = datetime.now()
+        
+        # Check for model reload (not implemented here but placeholder)
+        # self.check_model_reload()
+        
+        current_ts = time.time()
+        if current_ts < self.rest_until:
+            # 휴식 중에는 봉 마감마다 남은 시간만 확인
+            wait_min = (self.rest_until - current_ts) / 60
+            logger.info(f"😴 휴식 중... (남은 시간: {wait_min:.1f}분)")
+            self.status = f"Resting ({wait_min:.0f}m)"
+            return True
+
+        logger.debug("Fetching data...")
+        df = self.fetch_data()
+        if df is None:
+            self.status = "Data Fetch Error"
+            return False
+        
+        row = df.iloc[-1]
+        self.last_row = row
+        current_price = row['close']
+        atr = row['atr']
+        self.current_balance = self.balance # Sync balance for dashboard
+        
+        self.status = "실행 중"
+
+        # 3. manage position
+        if self.position != 0:
+            self.current_position = "LONG" if self.position > 0 else "SHORT"
+            # self.status = f"In Position: {self.current_position}"
+            self.manage_position(current_price, row['high'], row['low'], atr)
+        
+        # 4. entry
+        elif self.position == 0:
+            self.current_position = "None"
+            self.status = "실행 중"
+            self.check_entry(df, row)
+        return True
+
+    def check_intrabar(self):
+        """봉 사이 점검: 캔들/지표 재계산 없이 현재가로 손절·TS 확인 + 상태 로그"""
+        beat('bot_1h')
+        row = self.last_row
+        current_p = self.market_stream.last_price(self.symbol) if self.market_stream else None
+        if current_p is None:
+            current_p = self.exchange.fetch_ticker(self.symbol)['last']
+        if self.position != 0 and row is not None:
+            # ATR은 마지막 마감 봉 값 사용 (봉 중간에는 바뀌지 않음)
+            self.manage_position(current_p, current_p, current_p, row['atr'])
+
+        p_str = "NONE"
+        if self.position > 0: p_str = f"LONG"
+        elif self.position < 0: p_str = f"SHORT"
+        rsi_str = f"{row['rsi']:.1f}" if row is not None else "-"
+        trend_val = row['ema_200'] if row is not None else 0
+        trend_str = "UP" if current_p > trend_val else "DOWN"
+        msg = f"Price: {current_p:,.1f} | RSI: {rsi_str} | Trend: {trend_str} | Pos: {p_str}"
+        logger.info(msg, extra={'throttle': 'status'})
 
     def manage_position(self, current_price, high, low, atr):
         logger.debug(f"manage_position 호출됨. 현재 가격: {current_price}, 포지션: {self.position}")
@@ -399,6 +440,7 @@ class FinalBot1H:
                         old_sl = self.sl_price
                         self.sl_price = new_sl
                         logger.info(f"📈 TS 발동: SL 상향 -> {old_sl:,.2f} -> {self.sl_price:,.2f}")
+                        self.journal.record('amend_sl', set={'sl_price': self.sl_price})
             else:
                 if low < self.min_price: 
                     self.min_price = low
@@ -409,6 +451,7 @@ class FinalBot1H:
                         old_sl = self.sl_price
                         self.sl_price = new_sl
                         logger.info(f"📉 TS 발동: SL 하향 -> {old_sl:,.2f} -> {self.sl_price:,.2f}")
+                        self.journal.record('amend_sl', set={'sl_price': self.sl_price})
 
         if is_long:
             if low <= self.sl_price: 
@@ -425,6 +468,14 @@ class FinalBot1H:
             
             self.balance += pnl
             self.trades.append({'time': datetime.now().isoformat(), 'pnl': pnl, 'type': 'LONG' if is_long else 'SHORT'})
+            try:
+                self.trade_store.record_trade({
+                    'entry_time': self.entry_time or '', 'exit_time': self.trades[-1]['time'],
+                    'side': 'long' if is_long else 'short', 'entry_price': self.entry_price,
+                    'exit_price': exit_price, 'qty': abs(self.position), 'pnl': pnl, 'pnl_net': pnl,
+                    'reason': 'stop'})
+            except Exception as e:
+                logger.error(f"거래 기록 DB 저장 실패: {e}")
             
             logger.info(f"💰 청산 완료! PnL: {pnl:+,.0f}원 (잔고: {self.balance:,.0f})")
             
@@ -441,6 +492,9 @@ class FinalBot1H:
             self.position = 0
             self.max_price = 0
             self.min_price = 0
+            self.journal.record('close', set={'position': 0, 'balance': self.balance,
+                                              'consecutive_losses': self.consecutive_losses},
+                                push={'trades': self.trades[-1]})
             logger.debug("포지션 초기화 완료.")
 
     def check_entry(self, df, row):
@@ -488,6 +542,7 @@ class FinalBot1H:
                 quantity = pos_value / price
                 self.position = quantity if signal == 'long' else -quantity
                 self.entry_price = price
+                self.entry_time = datetime.now().isoformat()
                 
                 if signal == 'long':
                     self.sl_price = price - atr
@@ -497,9 +552,13 @@ class FinalBot1H:
                     self.sl_price = price + atr
                     self.min_price = price
                     logger.info(f"🚀 숏 진입: 수량={self.position:,.4f}, 진입가={self.entry_price:,.2f}, SL={self.sl_price:,.2f}, 레버리지={leverage}x")
+                self.journal.record('open', set={'position': self.position, 'entry_price': self.entry_price,
+                                                 'entry_time': self.entry_time, 'sl_price': self.sl_price})
         except Exception as e:
             logger.error(f"예측 에러: {e}", exc_info=True)
 
 if __name__ == "__main__":
+    # 단독 실행 시 레지스트리 등록 (대시보드 상태 조회용, bot.pid도 함께 기록)
+    register('bot_1h', interval=10, pid_file=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.pid'))
     bot = FinalBot1H()
     bot.start()
@@ -12,6 +12,10 @@ import sys
 from datetime import datetime
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.model_store import export_compact
+from bots.kline_downloader import KlineDownloader, merge_klines
+
 load_dotenv()
 
 def fetch_and_train():
@@ -41,24 +45,13 @@ def fetch_and_train():
             df_old = pd.DataFrame()
             since = exchange.parse8601('2024-01-01T00:00:00Z')
 
-        all_ohlcv = []
-        while True:
-            ohlcv = exchange.fetch_ohlcv('BTC/USDT', '1h', since=since, limit=1000)
-            if not ohlcv: break
-            last = ohlcv[-1][0]
-            if last == since: break
-            since = last + 1
-            all_ohlcv.extend(ohlcv)
-            print(f"   다운로드 중... {len(all_ohlcv)}건")
-            if len(ohlcv) < 1000: break
-            
-        if all_ohlcv:
-            df_new = pd.DataFrame(all_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        # 구간 병렬 다운로드 (중단되면 로컬 아카이브에서 이어받음)
+        df_new = KlineDownloader.for_ccxt(exchange, 'BTC/USDT', '1h').download(since)
+        print(f"   다운로드 완료: {len(df_new)}건")
+        if not df_new.empty:
             df_new['datetime'] = pd.to_datetime(df_new['timestamp'], unit='ms')
-            if not df_old.empty:
-                df = pd.concat([df_old, df_new]).drop_duplicates(subset='timestamp').reset_index(drop=True)
-            else:
-                df = df_new
+            # 겹치는 꼬리(마지막 봉)만 새 데이터로 교체
+            df = merge_klines(df_old, df_new)
         else:
             df = df_old
             
@@ -141,16 +134,19 @@ def train_models(df):
     model_s = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.05, random_state=42)
     model_s.fit(X_s, y_s)
     joblib.dump({'model': model_s, 'features': feature_cols}, 'xgb_short_1h.pkl')
+    export_compact(model_s, feature_cols, 'xgb_short_1h.pkl', sample=X_s.tail(2000))
     
     X_l, y_l = create_data('long')
     model_l = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.05, random_state=42)
     model_l.fit(X_l, y_l)
     joblib.dump({'model': model_l, 'features': feature_cols}, 'xgb_long_1h.pkl')
+    export_compact(model_l, feature_cols, 'xgb_long_1h.pkl', sample=X_l.tail(2000))
     
     X_r, y_r = create_data('regime')
     model_r = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.05, num_class=3, objective='multi:softmax', random_state=42)
     model_r.fit(X_r, y_r)
     joblib.dump({'model': model_r, 'features': feature_cols}, 'xgb_regime_1h.pkl')
+    export_compact(model_r, feature_cols, 'xgb_regime_1h.pkl', sample=X_r.tail(2000))
     
     print(f"✅ 모델 업데이트 완료: {datetime.now()}")
 
@@ -5,11 +5,13 @@ import os
 import json
 import joblib
 import logging
-import requests
-import time
-from datetime import datetime, timezone
+import sys
 from dataclasses import dataclass, field
-from typing import Dict, Tuple, Optional, List
+from typing import Dict, Tuple, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.kline_downloader import KlineDownloader
+from bots.perf_stats import PerfStats
 
 logger = logging.getLogger('strategy')
 
@@ -219,7 +221,8 @@ class AdaptiveStrategy:
         regime_at_entry = 'unknown'
         
         trades = []
-        equity_curve = []
+        stats = PerfStats(period='year')
+        stats.add_equity(initial_capital)
         
         # 지표 안정화를 위해 100개 이후부터 시작
         for i in range(100, len(df)):
@@ -258,6 +261,7 @@ class AdaptiveStrategy:
                         'return': net_pnl_pct * self.config.leverage,
                         'reason': exit_reason
                     })
+                    stats.add_trade(pnl_amount, ts=current_time)
                     position = None
             
             # 2. Entry Logic
@@ -274,26 +278,18 @@ class AdaptiveStrategy:
                     sl_dist = atr * (self.config.trend_sl_atr if regime_at_entry == 'trending' else self.config.range_sl_atr)
                     stop_loss = entry_price - sl_dist if position == 'buy' else entry_price + sl_dist
 
-            equity_curve.append(capital)
+            stats.add_equity(capital, ts=current_time)
             
-        # 결과 계산
+        # 결과 계산 (승률/MDD는 진행하면서 누적됨)
         total_return = (capital - initial_capital) / initial_capital
-        win_rate = len([t for t in trades if t['pnl_net'] > 0]) / len(trades) if trades else 0
-        
-        # MDD 계산
-        peak = initial_capital
-        max_dd = 0
-        for eq in equity_curve:
-            if eq > peak: peak = eq
-            dd = (peak - eq) / peak
-            if dd > max_dd: max_dd = dd
             
         return {
             'total_return': total_return,
-            'win_rate': win_rate,
-            'max_drawdown': max_dd,
+            'win_rate': stats.win_rate,
+            'max_drawdown': stats.max_dd,
             'trades': trades,
-            'final_capital': capital
+            'final_capital': capital,
+            'stats': stats
         }
 
 def _interval_to_ms(interval: str) -> int:
@@ -309,64 +305,18 @@ def _interval_to_ms(interval: str) -> int:
     raise ValueError(f"Unsupported interval: {interval}")
 
 def fetch_klines(symbol: str, interval: str, start_ms: int, end_ms: int, limit: int = 1000) -> pd.DataFrame:
-    """Bybit V5 Market API를 사용하여 클라인 데이터 조회"""
-    url = "https://api.bybit.com/v5/market/kline"
-    window = _interval_to_ms(interval) * limit
-    session = requests.Session()
-    rows_by_time: Dict[int, List[str]] = {}
-    current_start = start_ms
-    
-    while current_start < end_ms:
-        current_end = min(current_start + window - 1, end_ms)
-        params = {
-            "category": "linear",
-            "symbol": symbol,
-            "interval": interval,
-            "start": current_start,
-            "end": current_end,
-            "limit": limit,
-        }
-        try:
-            resp = session.get(url, params=params, timeout=10)
-            data = resp.json()
-            if data.get("retCode") != 0:
-                logger.error(f"Bybit API Error: {data.get('retMsg')}")
-                break
-            
-            rows = data.get("result", {}).get("list", [])
-            if not rows:
-                break
-                
-            for r in rows:
-                ts = int(r[0])
-                if ts not in rows_by_time:
-                    rows_by_time[ts] = r
-            
-            if current_end >= end_ms:
-                break
-            current_start = current_end + 1
-            time.sleep(0.1)
-        except Exception as e:
-            logger.error(f"Error fetching klines: {e}")
-            break
-            
-    if not rows_by_time:
+    """Bybit V5 Market API를 사용하여 클라인 데이터 조회 (구간 병렬 다운로드 + 로컬 아카이브 재사용)"""
+    downloader = KlineDownloader.for_bybit(symbol, interval, _interval_to_ms(interval), limit=limit)
+    try:
+        raw = downloader.download(start_ms, end_ms)
+    except Exception as e:
+        logger.error(f"Error fetching klines: {e}")
+        raw = downloader.load(start_ms, end_ms)
+
+    if raw.empty:
         return pd.DataFrame()
-        
-    timestamps = sorted(rows_by_time.keys())
-    records = []
-    for ts in timestamps:
-        r = rows_by_time[ts]
-        records.append({
-            "time": datetime.fromtimestamp(ts / 1000, tz=timezone.utc),
-            "open": float(r[1]),
-            "high": float(r[2]),
-            "low": float(r[3]),
-            "close": float(r[4]),
-            "volume": float(r[5]),
-            "turnover": float(r[6]),
-        })
-        
-    df = pd.DataFrame(records)
-    df.set_index("time", inplace=True)
+
+    df = raw.drop(columns=["timestamp"])
+    df.index = pd.to_datetime(raw["timestamp"], unit="ms", utc=True)
+    df.index.name = "time"
     return df
@@ -0,0 +1,257 @@
+"""
+거래 기록 저장소 (SQLite)
+- 봇이 청산할 때마다 한 행 추가, 대시보드는 SQL로 필요한 만큼만 조회
+- exit_time 인덱스로 최근 N건 / 기간 조회
+- 누적 손익(cum_pnl)은 기록 시점에 계산해 저장 → 성과 차트 조회에 전체 재계산 불필요
+- 승/패, 평균/분산, 최대 수익/손실, 연승/연패, 월별 통계는 PerfStats로 누적해 perf_state 한 행에 체크포인트 → 통계 API가 O(1)
+- 기존 results/trades.csv, compound_events.csv는 처음 열 때 가져오고, 이후에는 추가된 부분만
+  (파일 크기/mtime이 그대로면 열지 않음, 바뀌었으면 마지막으로 읽은 바이트 위치부터 새 행만 파싱)
+- WAL 모드: 봇이 쓰는 중에도 대시보드 읽기가 막히지 않음
+
+사용:
+    store = TradeStore()
+    store.record_trade({'entry_time': ..., 'exit_time': ..., 'side': 'long', 'pnl_net': 1.2, ...})
+    store.summary(); store.recent(10); store.performance(since='2025-01-01')
+"""
+import io
+import os
+import csv
+import sys
+import json
+import math
+import sqlite3
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.perf_stats import PerfStats
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, 'results')
+DEFAULT_DB = os.path.join(RESULTS_DIR, 'trades.db')
+
+TRADE_COLUMNS = ('entry_time', 'exit_time', 'side', 'entry_price', 'exit_price', 'qty', 'pnl', 'pnl_net', 'reason')
+COMPOUND_COLUMNS = ('timestamp', 'balance_before', 'balance_after', 'profit_added')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry_time TEXT, exit_time TEXT, side TEXT,
+    entry_price REAL, exit_price REAL, qty REAL,
+    pnl REAL, pnl_net REAL, reason TEXT,
+    cum_pnl REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trades_exit_time ON trades(exit_time);
+CREATE TABLE IF NOT EXISTS compound_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT, balance_before REAL, balance_after REAL, profit_added REAL
+);
+CREATE INDEX IF NOT EXISTS idx_compound_ts ON compound_events(timestamp);
+CREATE TABLE IF NOT EXISTS perf_state (id INTEGER PRIMARY KEY CHECK (id = 1), state TEXT);
+CREATE TABLE IF NOT EXISTS imports (source TEXT PRIMARY KEY, rows INTEGER,
+                                    size INTEGER, mtime INTEGER, byte_offset INTEGER, header TEXT);
+"""
+
+IMPORT_COLUMNS = (('size', 'INTEGER'), ('mtime', 'INTEGER'), ('byte_offset', 'INTEGER'), ('header', 'TEXT'))
+
+
+def _num(value):
+    try:
+        value = float(value)
+        return 0.0 if math.isnan(value) else value
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TradeStore:
+    def __init__(self, path=DEFAULT_DB, import_dir=RESULTS_DIR):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            # 이전 형식 DB (imports에 rows만 있음) → 위치 컬럼 추가, 다음 가져오기에서 한 번 전체를 읽고 채움
+            existing = {r['name'] for r in self.conn.execute("PRAGMA table_info(imports)")}
+            for col, col_type in IMPORT_COLUMNS:
+                if col not in existing:
+                    self.conn.execute(f"ALTER TABLE imports ADD COLUMN {col} {col_type}")
+        with self.lock, self.conn:
+            if self.conn.execute("SELECT 1 FROM perf_state WHERE id = 1").fetchone() is None:
+                self._rebuild_perf()
+        if import_dir:
+            self.import_csv(os.path.join(import_dir, 'trades.csv'), 'trades')
+            self.import_csv(os.path.join(import_dir, 'compound_events.csv'), 'compound_events')
+
+    # ------------------------------------------------------------------
+    # 기록 (봇)
+    # ------------------------------------------------------------------
+    def record_trade(self, trade):
+        with self.lock, self.conn:
+            self._insert_trade(trade)
+
+    def _insert_trade(self, trade):
+        # lock + 트랜잭션 안에서 호출: 거래 행과 누적 통계를 함께 갱신
+        perf = self._load_perf()
+        pnl = _num(trade.get('pnl_net') or trade.get('pnl'))
+        exit_time = str(trade.get('exit_time', ''))
+        perf.add_trade(pnl, ts=exit_time or None)
+        values = [str(trade.get(c, '')) if c in ('entry_time', 'exit_time', 'side', 'reason') else _num(trade.get(c))
+                  for c in TRADE_COLUMNS]
+        values[TRADE_COLUMNS.index('pnl_net')] = pnl
+        self.conn.execute(f"INSERT INTO trades ({', '.join(TRADE_COLUMNS)}, cum_pnl) VALUES ({', '.join('?' * len(TRADE_COLUMNS))}, ?)",
+                          values + [perf.total])
+        self._save_perf(perf)
+
+    def _load_perf(self):
+        row = self.conn.execute("SELECT state FROM perf_state WHERE id = 1").fetchone()
+        if row is None:
+            return PerfStats(period='month')
+        return PerfStats.from_dict(json.loads(row['state']))
+
+    def _save_perf(self, perf):
+        self.conn.execute("INSERT OR REPLACE INTO perf_state VALUES (1, ?)", (json.dumps(perf.to_dict()),))
+
+    def _rebuild_perf(self):
+        """체크포인트가 없으면 (이전 형식 DB) 거래 행을 한 번 재생해 만듦"""
+        perf = PerfStats(period='month')
+        for row in self.conn.execute("SELECT exit_time, pnl_net FROM trades ORDER BY id"):
+            perf.add_trade(row['pnl_net'] or 0.0, ts=row['exit_time'] or None)
+        self._save_perf(perf)
+        self.conn.execute("DROP TABLE IF EXISTS trade_stats")
+
+    def record_compound(self, event):
+        with self.lock, self.conn:
+            self.conn.execute(f"INSERT INTO compound_events ({', '.join(COMPOUND_COLUMNS)}) VALUES (?, ?, ?, ?)",
+                              [str(event.get('timestamp', ''))] + [_num(event.get(c)) for c in COMPOUND_COLUMNS[1:]])
+
+    def import_csv(self, csv_path, table):
+        """CSV에 새로 추가된 행만 가져옴 (크기/mtime이 같으면 파일을 열지 않음)"""
+        try:
+            st = os.stat(csv_path)
+        except OSError:
+            return 0
+        source = f"{table}:{os.path.abspath(csv_path)}"
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT rows, size, mtime, byte_offset, header FROM imports WHERE source = ?",
+                                    (source,)).fetchone()
+            if row and row['size'] == st.st_size and row['mtime'] == st.st_mtime_ns:
+                return 0
+            done = row['rows'] if row else 0
+            offset = row['byte_offset'] if row else None
+            header = json.loads(row['header']) if row and row['header'] else None
+            with open(csv_path, 'rb') as f:
+                if offset and header and st.st_size >= offset:
+                    f.seek(offset)  # 이어서 추가된 부분만
+                    skip = 0
+                else:
+                    # 처음이거나 이전 형식 기록 / 파일이 다시 쓰임 → 전체를 읽고 이미 가져온 행 수만큼 건너뜀
+                    offset, header, skip = 0, None, done
+                data = f.read()
+            end = data.rfind(b'\n') + 1  # 아직 쓰는 중인 마지막 줄은 다음에
+            reader = csv.DictReader(io.StringIO(data[:end].decode('utf-8'), newline=''), fieldnames=header)
+            rows = list(reader)
+            new = rows[skip:]
+            for r in new:
+                if table == 'trades':
+                    self._insert_trade(r)
+                else:
+                    self.conn.execute(f"INSERT INTO compound_events ({', '.join(COMPOUND_COLUMNS)}) VALUES (?, ?, ?, ?)",
+                                      [r.get('timestamp', '')] + [_num(r.get(c)) for c in COMPOUND_COLUMNS[1:]])
+            total = done + len(new) if skip == 0 else len(rows)
+            self.conn.execute("INSERT OR REPLACE INTO imports (source, rows, size, mtime, byte_offset, header) "
+                              "VALUES (?, ?, ?, ?, ?, ?)",
+                              (source, total, st.st_size, st.st_mtime_ns, offset + end,
+                               json.dumps(reader.fieldnames) if reader.fieldnames else None))
+        return len(new)
+
+    # ------------------------------------------------------------------
+    # 조회 (대시보드)
+    # ------------------------------------------------------------------
+    def _query(self, sql, args=()):
+        with self.lock:
+            return [dict(r) for r in self.conn.execute(sql, args).fetchall()]
+
+    def perf(self):
+        """누적 통계 (PerfStats) - 다른 봇 통계와 merge 가능"""
+        with self.lock:
+            return self._load_perf()
+
+    def summary(self, recent=10):
+        s = self.perf().summary()
+        return {
+            'total_trades': s['total_trades'],
+            'wins': s['wins'],
+            'losses': s['losses'],
+            'win_rate': s['win_rate'],
+            'total_pnl': s['total_pnl'],
+            'avg_pnl': s['avg_pnl'],
+            'recent_trades': self.recent(recent),
+        }
+
+    def detailed_stats(self):
+        perf = self.perf()
+        s = perf.summary()
+        return {
+            'max_profit': s['max_profit'],
+            'max_loss': s['max_loss'],
+            'avg_profit': s['avg_pnl'],
+            'sharpe_ratio': s['sharpe_ratio'],
+            'max_win_streak': s['max_win_streak'],
+            'max_loss_streak': s['max_loss_streak'],
+            'max_drawdown_pnl': s['max_drawdown_pnl'],
+            'monthly': perf.periods(),
+        }
+
+    def recent(self, n=10):
+        rows = self._query(f"SELECT {', '.join(TRADE_COLUMNS)} FROM trades ORDER BY id DESC LIMIT ?", (n,))
+        return [{**r, 'reason': r['reason'] or '일반'} for r in rows]
+
+    def trades_between(self, start=None, end=None, limit=None):
+        sql = f"SELECT {', '.join(TRADE_COLUMNS)}, cum_pnl FROM trades WHERE 1 = 1"
+        args = []
+        if start:
+            sql += " AND exit_time >= ?"
+            args.append(str(start))
+        if end:
+            sql += " AND exit_time <= ?"
+            args.append(str(end))
+        sql += " ORDER BY exit_time"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return self._query(sql, args)
+
+    def performance(self, since=None, limit=None):
+        """성과 차트용 (exit_time, 누적 손익, 거래 손익)"""
+        sql = "SELECT exit_time, cum_pnl, pnl_net FROM trades"
+        args = []
+        if since:
+            sql += " WHERE exit_time >= ?"
+            args.append(str(since))
+        if limit:
+            # 최근 limit건 (시간 오름차순으로 반환)
+            sql = f"SELECT * FROM ({sql} ORDER BY exit_time DESC LIMIT ?) ORDER BY exit_time"
+            args.append(int(limit))
+        else:
+            sql += " ORDER BY exit_time"
+        return [{'timestamp': r['exit_time'], 'cumulative_pnl': r['cum_pnl'], 'trade_pnl': r['pnl_net']}
+                for r in self._query(sql, args)]
+
+    def compound_summary(self, recent=5):
+        agg = self._query("SELECT COUNT(*) AS n, COALESCE(SUM(profit_added), 0) AS profit FROM compound_events")[0]
+        if not agg['n']:
+            return {'total_compounds': 0, 'final_balance': 0, 'total_profit': 0, 'recent_compounds': []}
+        rows = self._query(f"SELECT {', '.join(COMPOUND_COLUMNS)} FROM compound_events ORDER BY id DESC LIMIT ?", (recent,))
+        return {
+            'total_compounds': agg['n'],
+            'final_balance': round(rows[0]['balance_after'], 2),
+            'total_profit': round(agg['profit'], 2),
+            'recent_compounds': rows,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -7,18 +7,24 @@ Flask를 사용한 웹 기반 모니터링 및 관리
 import os
 import sys
 import json
+import threading
 import subprocess
-import psutil
-from datetime import datetime
+import requests
+from datetime import datetime, timedelta
 from pathlib import Path
 from flask import Flask, render_template, jsonify, request
-import pandas as pd
 
 # 현재 디렉토리를 Python 경로에 추가
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
+sys.path.append(os.path.dirname(current_dir))
 
 import config as cfg
+from bots.rate_limiter import acquire, DASHBOARD
+from bots.response_cache import ResponseCache
+from bots.log_index import get_log_index
+from bots.process_registry import ProcessRegistry
+from trade_store import TradeStore
 
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False
@@ -27,6 +33,37 @@ app.config['JSON_AS_ASCII'] = False
 BOT_PROCESS = None
 PID_FILE = os.path.join(current_dir, 'bot.pid')
 TRADER_SCRIPT = 'live_trader_bybit.py'
+BOT_NAME = 'bot_1h'
+
+# 봇 PID/시작 시각/하트비트 (상태 조회 때 프로세스 목록을 뒤지지 않음)
+registry = ProcessRegistry()
+
+# 거래소 조회 응답 캐시 (탭/브라우저 수와 무관하게 키당 TTL마다 한 번만 거래소 호출)
+response_cache = ResponseCache('dashboard_1h')
+TTL_HISTORY = 5
+TTL_MARKET = 2
+TTL_POSITION = 2
+
+
+def cached_json(key, ttl, loader):
+    """캐시된 JSON 응답 (ETag 일치 시 304)"""
+    entry = response_cache.get(key, ttl, loader)
+    response = app.response_class(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = f'private, max-age={int(ttl)}'
+    return response.make_conditional(request)
+
+
+def bybit_public(path, params):
+    """Bybit 공개 API 조회 (실패 시 예외 → 캐시는 이전 응답 유지)"""
+    base_url = 'https://api-testnet.bybit.com' if getattr(cfg, 'USE_TESTNET', True) else 'https://api.bybit.com'
+    acquire('bybit', priority=DASHBOARD)
+    response = requests.get(f'{base_url}{path}', params=params, timeout=10)
+    response.raise_for_status()
+    result = response.json()
+    if result.get('retCode') != 0 or not result.get('result', {}).get('list'):
+        raise RuntimeError(f"Bybit 응답 오류: {result.get('retCode')} {result.get('retMsg')}")
+    return result['result']['list']
 
 class BotManager:
     """봇 관리 클래스"""
@@ -37,6 +74,19 @@ class BotManager:
         self.trades_file = os.path.join(self.results_dir, cfg.TRADES_LOG_FILE)
         self.compound_file = os.path.join(self.results_dir, 'compound_events.csv')
         self.status_file = os.path.join(current_dir, 'trading_status.json')
+        # 거래/복리 기록은 SQLite에서 조회 (기존 CSV는 처음 한 번 가져옴)
+        self.store = TradeStore(import_dir=self.results_dir)
+        self.client = None
+        self.client_lock = threading.Lock()
+
+    def get_client(self):
+        """포지션 조회용 BybitClient (한 번만 생성해 재사용)"""
+        with self.client_lock:
+            if self.client is None:
+                from bybit_client import BybitClient
+                self.client = BybitClient(cfg.BYBIT_API_KEY, cfg.BYBIT_API_SECRET, testnet=cfg.USE_TESTNET,
+                                          priority=DASHBOARD)
+            return self.client
     
     def get_trading_status(self):
         """트레이딩 상세 상태 조회 (잔고, 포지션, 현재가 등)"""
@@ -50,42 +100,23 @@ class BotManager:
 
     def get_bot_status(self):
         """봇 상태 조회"""
-        # PID 파일로 상태 확인
-        if os.path.exists(PID_FILE):
-            try:
-                with open(PID_FILE, 'r') as f:
-                    pid = int(f.read().strip())
-                
-                # 프로세스 존재 확인
-                if psutil.pid_exists(pid):
-                    proc = psutil.Process(pid)
-                    if proc.is_running():
-                        # 프로세스가 우리가 실행한 스크립트인지 확인
-                        cmdline = proc.cmdline()
-                        if any(TRADER_SCRIPT in cmd for cmd in cmdline):
-                            return {
-                                'status': 'running',
-                                'message': '봇 실행 중',
-                                'is_running': True,
-                                'pid': pid,
-                                'uptime': str(datetime.now() - datetime.fromtimestamp(proc.create_time())).split('.')[0]
-                            }
-            except Exception as e:
-                print(f"PID 확인 오류: {e}")
-        
-        # PID 파일이 없거나 유효하지 않으면 프로세스 직접 확인
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                cmdline = proc.info['cmdline'] or []
-                if any(TRADER_SCRIPT in cmd for cmd in cmdline):
-                    return {
-                        'status': 'running',
-                        'message': '봇 실행 중 (PID 파일 없음)',
-                        'is_running': True,
-                        'pid': proc.info['pid']
-                    }
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
+        # 레지스트리 항목(없으면 PID 파일)으로 확인
+        proc = registry.status(BOT_NAME, pid_file=PID_FILE)
+        if proc['running']:
+            status = {
+                'status': 'running',
+                'message': '봇 실행 중' if proc.get('source') != 'pid_file' else '봇 실행 중 (레지스트리 없음)',
+                'is_running': True,
+                'pid': proc['pid'],
+            }
+            if proc.get('started'):
+                status['uptime'] = str(timedelta(seconds=proc['uptime']))
+            if proc.get('heartbeat_age') is not None:
+                status['heartbeat_age'] = proc['heartbeat_age']
+            if proc['state'] == 'stalled':
+                status['status'] = 'stalled'
+                status['message'] = f"봇 응답 없음 (마지막 하트비트 {proc['heartbeat_age']:.0f}초 전)"
+            return status
         
         # 로그 파일로 최근 활동 확인
         if os.path.exists(self.log_file):
@@ -138,64 +169,10 @@ class BotManager:
     
     def get_trade_stats(self):
         """거래 통계 조회"""
-        if not os.path.exists(self.trades_file):
-            return {
-                'total_trades': 0,
-                'wins': 0,
-                'losses': 0,
-                'win_rate': 0,
-                'total_pnl': 0,
-                'avg_pnl': 0,
-                'recent_trades': []
-            }
-        
         try:
-            df = pd.read_csv(self.trades_file)
-            
-            if len(df) == 0:
-                return {
-                    'total_trades': 0,
-                    'wins': 0,
-                    'losses': 0,
-                    'win_rate': 0,
-                    'total_pnl': 0,
-                    'avg_pnl': 0,
-                    'recent_trades': []
-                }
-            
-            wins = len(df[df['pnl_net'] > 0])
-            losses = len(df[df['pnl_net'] <= 0])
-            win_rate = (wins / len(df) * 100) if len(df) > 0 else 0
-            total_pnl = float(df['pnl_net'].sum())
-            avg_pnl = float(df['pnl_net'].mean())
-            
-            # 최근 거래 (안전하게 처리)
-            recent_trades = []
-            try:
-                for idx, row in df.tail(10).iloc[::-1].iterrows():
-                    recent_trades.append({
-                        'entry_time': str(row.get('entry_time', '')),
-                        'exit_time': str(row.get('exit_time', '')),
-                        'side': str(row.get('side', 'unknown')),
-                        'entry_price': float(row.get('entry_price', 0)),
-                        'exit_price': float(row.get('exit_price', 0)),
-                        'pnl': float(row.get('pnl', 0)),
-                        'pnl_net': float(row.get('pnl_net', 0)),
-                        'reason': str(row.get('reason', '일반'))
-                    })
-            except Exception as e:
-                print(f"최근 거래 처리 오류: {e}")
-                recent_trades = []
-            
-            return {
-                'total_trades': len(df),
-                'wins': wins,
-                'losses': losses,
-                'win_rate': round(win_rate, 2),
-                'total_pnl': round(total_pnl, 2),
-                'avg_pnl': round(avg_pnl, 4),
-                'recent_trades': recent_trades
-            }
+            # 새로 추가된 CSV 행이 있으면 가져옴 (파일이 그대로면 stat 한 번, 바뀌었으면 추가된 부분만 파싱)
+            self.store.import_csv(self.trades_file, 'trades')
+            return self.store.summary(recent=10)
         except Exception as e:
             print(f"거래 통계 조회 오류: {e}")
             return {
@@ -211,44 +188,9 @@ class BotManager:
     
     def get_compound_stats(self):
         """복리 통계 조회"""
-        if not os.path.exists(self.compound_file):
-            return {
-                'total_compounds': 0,
-                'final_balance': 0,
-                'total_profit': 0,
-                'recent_compounds': []
-            }
-        
         try:
-            df = pd.read_csv(self.compound_file)
-            
-            if len(df) == 0:
-                return {
-                    'total_compounds': 0,
-                    'final_balance': 0,
-                    'total_profit': 0,
-                    'recent_compounds': []
-                }
-            
-            final_balance = float(df['balance_after'].iloc[-1])
-            total_profit = float(df['profit_added'].sum())
-            
-            # 최근 복리
-            recent_compounds = []
-            for idx, row in df.tail(5).iloc[::-1].iterrows():
-                recent_compounds.append({
-                    'timestamp': str(row['timestamp']),
-                    'balance_before': float(row['balance_before']),
-                    'balance_after': float(row['balance_after']),
-                    'profit_added': float(row['profit_added'])
-                })
-            
-            return {
-                'total_compounds': len(df),
-                'final_balance': round(final_balance, 2),
-                'total_profit': round(total_profit, 2),
-                'recent_compounds': recent_compounds
-            }
+            self.store.import_csv(self.compound_file, 'compound_events')
+            return self.store.compound_summary(recent=5)
         except Exception as e:
             return {
                 'error': str(e),
@@ -266,16 +208,13 @@ class BotManager:
             # 로그 파일 경로
             log_file = self.log_file
             
-            # 봇 프로세스 시작 (nohup으로 백그라운드 실행)
+            # 봇 프로세스 시작 (새 세션으로 백그라운드 실행, 출력은 로그 파일에 추가)
+            # 레지스트리 항목은 여기서 기록하고 봇이 뜨면 같은 항목에 하트비트를 남김
             if os.name == 'nt':  # Windows
-                subprocess.Popen(['python', TRADER_SCRIPT], 
-                               cwd=current_dir,
-                               creationflags=subprocess.CREATE_NEW_CONSOLE)
+                registry.launch(BOT_NAME, ['python', TRADER_SCRIPT], cwd=current_dir,
+                                creationflags=subprocess.CREATE_NEW_CONSOLE)
             else:  # Linux/Mac
-                # nohup으로 백그라운드 실행
-                # PID 파일은 live_trader_bybit.py 내부에서 생성함
-                cmd = f'cd "{current_dir}" && nohup python3 {TRADER_SCRIPT} >> "{log_file}" 2>&1 &'
-                subprocess.Popen(cmd, shell=True)
+                registry.launch(BOT_NAME, ['python3', TRADER_SCRIPT], cwd=current_dir, log_file=log_file)
             
             import time
             time.sleep(2)
@@ -297,24 +236,8 @@ class BotManager:
             if not status['is_running']:
                 return {'success': False, 'message': '실행 중인 봇을 찾을 수 없습니다'}
             
-            pid = status.get('pid')
-            killed = False
-            
-            if pid:
-                try:
-                    proc = psutil.Process(pid)
-                    proc.terminate()
-                    try:
-                        proc.wait(timeout=5)
-                    except psutil.TimeoutExpired:
-                        proc.kill()
-                    killed = True
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            
-            # 혹시 PID 파일이 남아있다면 삭제 (실제로는 봇 내부의 finally에서 삭제하지만)
-            if os.path.exists(PID_FILE):
-                os.remove(PID_FILE)
+            # SIGTERM 후 5초 대기 (안 끝나면 SIGKILL), 레지스트리 항목/PID 파일 정리
+            killed = registry.stop(BOT_NAME, timeout=5, pid_file=PID_FILE)
             
             if killed:
                 return {'success': True, 'message': '봇이 중지되었습니다'}
@@ -372,6 +295,24 @@ def api_logs():
     logs = bot_manager.get_latest_logs(lines)
     return jsonify({'logs': logs})
 
+@app.route('/api/logs/search')
+def api_logs_search():
+    """로그 검색 API (?start=&end=&level=&keyword=&limit=, 시간 인덱스로 해당 구간만 읽음)"""
+    if not os.path.exists(bot_manager.log_file):
+        return jsonify({'logs': []})
+    try:
+        logs = get_log_index(bot_manager.log_file).search(
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            level=request.args.get('level'),
+            keyword=request.args.get('keyword'),
+            limit=min(request.args.get('limit', 500, type=int), 5000),
+            newest_first=request.args.get('newest_first', '').lower() in ('1', 'true'),
+        )
+        return jsonify({'logs': logs, 'count': len(logs)})
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
 @app.route('/api/trades')
 def api_trades():
     """거래 통계 API"""
@@ -428,155 +369,72 @@ def api_bot_restart():
 
 @app.route('/api/performance-history')
 def api_performance_history():
-    """성과 히스토리 API (차트용)"""
+    """성과 히스토리 API (차트용, ?since=ISO시각 / ?limit=N 으로 범위 제한 가능)"""
     try:
-        if not os.path.exists(bot_manager.trades_file):
-            return jsonify([])
-        
-        df = pd.read_csv(bot_manager.trades_file)
-        if len(df) == 0:
-            return jsonify([])
-        
-        # 누적 수익률 계산
-        df['cumulative_pnl'] = df['pnl_net'].cumsum()
-        df['timestamp'] = pd.to_datetime(df['exit_time'])
-        
-        # 차트용 데이터 포맷
-        performance_data = []
-        for idx, row in df.iterrows():
-            performance_data.append({
-                'timestamp': row['timestamp'].isoformat(),
-                'cumulative_pnl': float(row['cumulative_pnl']),
-                'trade_pnl': float(row['pnl_net'])
-            })
-        
-        return jsonify(performance_data)
+        since = request.args.get('since')
+        limit = request.args.get('limit', type=int)
+        return jsonify(bot_manager.store.performance(since=since, limit=limit))
     except Exception as e:
         return jsonify({'error': str(e)})
 
 @app.route('/api/history')
 def api_history():
-    """차트 히스토리 데이터 API - Bybit API 연동"""
+    """차트 히스토리 데이터 API - Bybit API 연동 (캐시)"""
+    timeframe = request.args.get('timeframe', '15m')
+    limit = min(request.args.get('limit', 200, type=int), 200)
+    symbol = getattr(cfg, 'SYMBOL', 'BTCUSDT')
+    
+    timeframe_map = {'1m': '1', '5m': '5', '15m': '15', '30m': '30', '1h': '60', '4h': '240', '1d': 'D'}
+    interval = timeframe_map.get(timeframe, '15')
+    
+    def load():
+        klines = bybit_public('/v5/market/kline', {
+            'category': 'linear',
+            'symbol': symbol,
+            'interval': interval,
+            'limit': limit
+        })
+        return [{
+            'time': int(kline[0]) // 1000,
+            'open': float(kline[1]),
+            'high': float(kline[2]),
+            'low': float(kline[3]),
+            'close': float(kline[4])
+        } for kline in reversed(klines)]
+    
     try:
-        import requests
-        import time
-        
-        timeframe = request.args.get('timeframe', '15m')
-        limit = request.args.get('limit', 200, type=int)
-        symbol = getattr(cfg, 'SYMBOL', 'BTCUSDT')
-        
-        timeframe_map = {'1m': '1', '5m': '5', '15m': '15', '30m': '30', '1h': '60', '4h': '240', '1d': 'D'}
-        interval = timeframe_map.get(timeframe, '15')
-        
-        try:
-            use_testnet = getattr(cfg, 'USE_TESTNET', True)
-            base_url = 'https://api-testnet.bybit.com' if use_testnet else 'https://api.bybit.com'
-            
-            url = f'{base_url}/v5/market/kline'
-            params = {
-                'category': 'linear',
-                'symbol': symbol,
-                'interval': interval,
-                'limit': min(limit, 200)
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('retCode') == 0 and result.get('result', {}).get('list'):
-                    klines = result['result']['list']
-                    data = []
-                    for kline in reversed(klines):
-                        data.append({
-                            'time': int(kline[0]) // 1000,
-                            'open': float(kline[1]),
-                            'high': float(kline[2]),
-                            'low': float(kline[3]),
-                            'close': float(kline[4])
-                        })
-                    return jsonify(data)
-        except Exception as api_error:
-            print(f"Bybit API 호출 실패: {api_error}")
-        
+        return cached_json(('history', symbol, interval, limit), TTL_HISTORY, load)
+    except Exception as api_error:
+        print(f"Bybit API 호출 실패: {api_error}")
         return jsonify([])
-    except Exception as e:
-        return jsonify({'error': str(e)})
 
 @app.route('/api/detailed-stats')
 def api_detailed_stats():
-    """상세 통계 API"""
+    """상세 통계 API (누적 통계 행에서 바로 계산)"""
     try:
-        if not os.path.exists(bot_manager.trades_file):
-            return jsonify({'max_profit': 0, 'max_loss': 0, 'avg_profit': 0, 'sharpe_ratio': 0, 'max_win_streak': 0, 'max_loss_streak': 0})
-        
-        df = pd.read_csv(bot_manager.trades_file)
-        if len(df) == 0:
-            return jsonify({'max_profit': 0, 'max_loss': 0, 'avg_profit': 0, 'sharpe_ratio': 0, 'max_win_streak': 0, 'max_loss_streak': 0})
-        
-        profits = df[df['pnl_net'] > 0]['pnl_net']
-        losses = df[df['pnl_net'] <= 0]['pnl_net']
-        
-        max_profit = float(profits.max()) if len(profits) > 0 else 0
-        max_loss = float(losses.min()) if len(losses) > 0 else 0
-        avg_profit = float(df['pnl_net'].mean())
-        
-        returns = df['pnl_net']
-        sharpe_ratio = float(returns.mean() / returns.std()) if returns.std() > 0 else 0
-        
-        win_streak = 0
-        loss_streak = 0
-        max_win_streak = 0
-        max_loss_streak = 0
-        
-        for pnl in df['pnl_net']:
-            if pnl > 0:
-                win_streak += 1
-                loss_streak = 0
-                max_win_streak = max(max_win_streak, win_streak)
-            else:
-                loss_streak += 1
-                win_streak = 0
-                max_loss_streak = max(max_loss_streak, loss_streak)
-        
-        return jsonify({
-            'max_profit': round(max_profit, 2),
-            'max_loss': round(max_loss, 2),
-            'avg_profit': round(avg_profit, 4),
-            'sharpe_ratio': round(sharpe_ratio, 2),
-            'max_win_streak': max_win_streak,
-            'max_loss_streak': max_loss_streak
-        })
+        return jsonify(bot_manager.store.detailed_stats())
     except Exception as e:
         return jsonify({'error': str(e)})
 
 @app.route('/api/market-data')
 def api_market_data():
-    """시장 데이터 API"""
+    """시장 데이터 API (캐시)"""
+    symbol = getattr(cfg, 'SYMBOL', 'BTCUSDT')
+    
+    def load():
+        ticker = bybit_public('/v5/market/tickers', {'category': 'linear', 'symbol': symbol})[0]
+        return {
+            'symbol': symbol,
+            'current_price': round(float(ticker.get('lastPrice', 0)), 2),
+            'price_change_24h': round(float(ticker.get('price24hPcnt', 0)) * 100, 2),
+            'volume_24h': round(float(ticker.get('volume24h', 0)), 2),
+            'high_24h': float(ticker.get('highPrice24h', 0)),
+            'low_24h': float(ticker.get('lowPrice24h', 0)),
+            'source': 'bybit'
+        }
+    
     try:
-        import requests
-        symbol = getattr(cfg, 'SYMBOL', 'BTCUSDT')
-        use_testnet = getattr(cfg, 'USE_TESTNET', True)
-        base_url = 'https://api-testnet.bybit.com' if use_testnet else 'https://api.bybit.com'
-        
-        url = f'{base_url}/v5/market/tickers'
-        params = {'category': 'linear', 'symbol': symbol}
-        response = requests.get(url, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('retCode') == 0 and result.get('result', {}).get('list'):
-                ticker = result['result']['list'][0]
-                return jsonify({
-                    'symbol': symbol,
-                    'current_price': round(float(ticker.get('lastPrice', 0)), 2),
-                    'price_change_24h': round(float(ticker.get('price24hPcnt', 0)) * 100, 2),
-                    'volume_24h': round(float(ticker.get('volume24h', 0)), 2),
-                    'high_24h': float(ticker.get('highPrice24h', 0)),
-                    'low_24h': float(ticker.get('lowPrice24h', 0)),
-                    'source': 'bybit'
-                })
-        return jsonify({'error': 'Failed to fetch market data'})
+        return cached_json(('market', symbol), TTL_MARKET, load)
     except Exception as e:
         return jsonify({'error': str(e)})
 
@@ -598,15 +456,12 @@ def api_config():
 
 @app.route('/api/position')
 def api_position():
-    """현재 포지션 정보 API"""
-    try:
-        from bybit_client import BybitClient
-        client = BybitClient(cfg.BYBIT_API_KEY, cfg.BYBIT_API_SECRET, testnet=cfg.USE_TESTNET)
-        positions = client.get_positions(cfg.SYMBOL)
-        
+    """현재 포지션 정보 API (캐시, 클라이언트 재사용)"""
+    def load():
+        positions = bot_manager.get_client().get_positions(cfg.SYMBOL)
         if positions and float(positions[0]['size']) > 0:
             pos = positions[0]
-            return jsonify({
+            return {
                 'has_position': True,
                 'symbol': pos.get('symbol'),
                 'side': pos.get('side'),
@@ -616,11 +471,19 @@ def api_position():
                 'unrealized_pnl': float(pos.get('unrealisedPnl', 0)),
                 'leverage': pos.get('leverage'),
                 'liq_price': float(pos.get('liqPrice', 0)) if pos.get('liqPrice') else None
-            })
-        return jsonify({'has_position': False, 'message': '현재 포지션 없음'})
+            }
+        return {'has_position': False, 'message': '현재 포지션 없음'}
+    
+    try:
+        return cached_json(('position', cfg.SYMBOL), TTL_POSITION, load)
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/cache')
+def api_cache():
+    """응답 캐시 적중률 / 합쳐진 요청 수"""
+    return jsonify(response_cache.status())
+
 def main():
     """메인 함수"""
     print("=" * 70)
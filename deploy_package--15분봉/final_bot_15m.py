@@ -13,11 +13,9 @@
 import ccxt
 import pandas as pd
 import numpy as np
-import joblib
 import os
 import time
 import logging
-import json
 import sys
 from datetime import datetime
 from dotenv import load_dotenv
@@ -36,9 +34,12 @@ logging.basicConfig(
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
 load_dotenv(dotenv_path=env_path)
 
-import schedule
-import subprocess
-import threading
+# bots 공용 모듈 임포트를 위한 경로 추가
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.job_scheduler import JobScheduler, JobSpec
+from bots.model_store import load_model_bundle, model_mtime
+from bots.rate_limiter import wrap_exchange
+from bots.state_journal import StateJournal
 
 class FinalBot15m:
     def __init__(self):
@@ -55,12 +56,27 @@ class FinalBot15m:
         # 거래소 초기화
         self.api_key = os.getenv('BINANCE_API_KEY_15M') or os.getenv('BINANCE_API_KEY')
         self.secret = os.getenv('BINANCE_SECRET_15M') or os.getenv('BINANCE_SECRET')
-        self.exchange = ccxt.binance({
+        self.exchange = wrap_exchange(ccxt.binance({
             'apiKey': self.api_key,
             'secret': self.secret,
             'enableRateLimit': True,
             'options': {'defaultType': 'future'}
-        })
+        }))
+
+        # 포지션/리스크 상태 (재시작 시 load_state()가 저널에서 복구)
+        self.position = 0
+        self.entry_price = 0
+        self.sl_price = 0
+        self.max_price = 0
+        self.min_price = 0
+        self.consecutive_losses = 0
+        self.rest_until = 0
+        self.trades = []
+
+        # 상태는 이벤트 저널 + 스냅샷으로 저장 (매 루프 전체 JSON 재작성 대신)
+        self.state_file = 'bot_15m_state.json'
+        self.journal = StateJournal(self.state_file, limits={'trades': 50})
+        self.load_state()
         
         # 재학습 스케줄러 시작
         self.start_scheduler()
@@ -68,19 +84,14 @@ class FinalBot15m:
         # ... (기존 설정 유지)
 
     def start_scheduler(self):
-        def job():
-            logging.info("⏰ 00:00 정기 재학습 시작...")
-            subprocess.Popen([sys.executable, "retrain.py"])
-            
-        schedule.every().day.at("00:00").do(job)
-        
-        def run_schedule():
-            while True:
-                schedule.run_pending()
-                time.sleep(60)
-                
-        t = threading.Thread(target=run_schedule, daemon=True)
-        t.start()
+        if os.getenv('CENTRAL_JOB_SCHEDULER') == '1':
+            logging.info("📅 재학습은 통합 매니저의 중앙 스케줄러가 담당합니다")
+            return
+
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.job_scheduler = JobScheduler(timeframes=(self.timeframe,))
+        self.job_scheduler.register(JobSpec("retrain_15m", "retrain.py", base_dir, at="00:00"))
+        self.job_scheduler.start()
         logging.info("📅 자동 재학습 스케줄러 가동 (매일 00:00)")
 
     def check_model_reload(self):
@@ -88,7 +99,7 @@ class FinalBot15m:
         try:
             base_dir = os.path.dirname(os.path.abspath(__file__))
             path = os.path.join(base_dir, 'lgbm_short.pkl')
-            mtime = os.path.getmtime(path)
+            mtime = model_mtime(path)
             if mtime > self.model_ts:
                 logging.info("🔄 새로운 모델 파일 감지! 다시 로드합니다.")
                 self.load_models()
@@ -101,11 +112,11 @@ class FinalBot15m:
             
             # 수정 시간 기록
             if os.path.exists(short_path):
-                self.model_ts = os.path.getmtime(short_path)
+                self.model_ts = model_mtime(short_path)
             
-            self.short_model_data = joblib.load(short_path)
-            self.long_model_data = joblib.load(os.path.join(base_dir, 'lgbm_long.pkl'))
-            self.regime_model_data = joblib.load(os.path.join(base_dir, 'lgbm_regime.pkl'))
+            self.short_model_data = load_model_bundle(short_path)
+            self.long_model_data = load_model_bundle(os.path.join(base_dir, 'lgbm_long.pkl'))
+            self.regime_model_data = load_model_bundle(os.path.join(base_dir, 'lgbm_regime.pkl'))
             
             self.short_model = self.short_model_data['model']
             self.long_model = self.long_model_data['model']
@@ -173,22 +184,20 @@ class FinalBot15m:
             return None
 
     def save_state(self):
-        state = {
+        """전체 상태 스냅샷 (진입/SL 변경/청산은 발생 시점에 저널로 기록됨)"""
+        self.journal.record('sync', set={
             'balance': self.balance,
             'position': self.position,
             'entry_price': self.entry_price,
             'sl_price': self.sl_price,
             'consecutive_losses': self.consecutive_losses,
-            'trades': self.trades[-50:]
-        }
-        with open(self.state_file, 'w') as f:
-            json.dump(state, f, indent=2, default=str)
+        })
+        self.journal.snapshot()
 
     def load_state(self):
-        if os.path.exists(self.state_file):
+        if os.path.exists(self.state_file) or os.path.exists(self.journal.journal_path):
             try:
-                with open(self.state_file, 'r') as f:
-                    state = json.load(f)
+                state = self.journal.load()
                 self.balance = state.get('balance', 100000)
                 self.position = state.get('position', 0)
                 self.entry_price = state.get('entry_price', 0)
@@ -237,9 +246,8 @@ class FinalBot15m:
                 elif self.position == 0:
                     self.check_entry(df, row)
                 
-                # 상태 출력
+                # 상태 출력 (상태 저장은 이벤트마다 저널에 기록)
                 self.print_status(price)
-                self.save_state()
                 
                 # 15분 대기 (실제로는 더 자주 체크해야 TS가 정확하지만 Paper Trading이므로)
                 # 정밀한 TS를 위해서는 1분마다 체크 권장
@@ -266,6 +274,7 @@ class FinalBot15m:
                     if new_sl > self.sl_price:
                         self.sl_price = new_sl
                         logging.info(f"📈 TS 발동: SL 상향 -> {self.sl_price:,.2f}")
+                        self.journal.record('amend_sl', set={'sl_price': self.sl_price})
             else:
                 if low < self.min_price: self.min_price = low
                 # Activation 체크
@@ -274,6 +283,7 @@ class FinalBot15m:
                     if new_sl < self.sl_price:
                         self.sl_price = new_sl
                         logging.info(f"📉 TS 발동: SL 하향 -> {self.sl_price:,.2f}")
+                        self.journal.record('amend_sl', set={'sl_price': self.sl_price})
 
         # 청산 체크
         if is_long:
@@ -301,6 +311,9 @@ class FinalBot15m:
             self.position = 0
             self.max_price = 0
             self.min_price = 0
+            self.journal.record('close', set={'position': 0, 'balance': self.balance,
+                                              'consecutive_losses': self.consecutive_losses},
+                                push={'trades': self.trades[-1]})
 
     def check_entry(self, df, row):
         # Regime 예측
@@ -347,6 +360,8 @@ class FinalBot15m:
                 
             logging.info(f"🚀 진입: {signal.upper()} (확률: {prob:.1%}, 레버리지: {leverage}x)")
             logging.info(f"   가격: {price:,.2f}, SL: {self.sl_price:,.2f}")
+            self.journal.record('open', set={'position': self.position, 'entry_price': self.entry_price,
+                                             'sl_price': self.sl_price})
 
     def print_status(self, price):
         pass # 로그가 너무 많아지므로 생략하거나 필요시 구현
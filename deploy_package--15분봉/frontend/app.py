@@ -1,10 +1,17 @@
 from flask import Flask, jsonify, render_template, request
 import os
 import json
-import time
 import subprocess
-import signal
+import sys
 import ccxt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from bots.rate_limiter import wrap_exchange, DASHBOARD
+from bots.exchange_metadata import metadata
+from bots.state_journal import read_state
+from bots.process_registry import ProcessRegistry
+from bots.account_snapshot import start_account_snapshot, read_snapshot
+
 app = Flask(__name__)
 
 # Base directory where main.py is located (one level up)
@@ -13,97 +20,74 @@ LOG_FILE = os.path.join(BASE_DIR, 'bot.log')
 STATE_FILE = os.path.join(BASE_DIR, 'paper_trade_state.json')
 PID_FILE = os.path.join(BASE_DIR, 'bot.pid')
 MAIN_SCRIPT = os.path.join(BASE_DIR, 'main.py')
+BOT_NAME = 'bot_15m'
 
-cached_balance = {
-    "balance": 0.0,
-    "currency": "USDT",
-    "timestamp": 0
-}
+# 봇 PID/하트비트 (main.py가 같은 이름으로 등록)
+registry = ProcessRegistry()
 
-def get_real_balance():
-    global cached_balance
-    if time.time() - cached_balance['timestamp'] < 10:
-        return cached_balance
-    
-    try:
-        # Load .env manually if exists (simple parsing)
-        env_path = os.path.join(BASE_DIR, '.env')
-        if os.path.exists(env_path):
-            with open(env_path, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if '=' in line and not line.startswith('#'):
-                        key, val = line.split('=', 1)
-                        # Remove quotes if present
-                        val = val.strip('\'"')
-                        os.environ[key] = val
-
-        # Try to get keys from env
-        api_key = os.getenv('BYBIT_API_KEY', '')
-        api_secret = os.getenv('BYBIT_API_SECRET', '')
-        
-        # Fallback to config.json if not in env
-        if not api_key:
-            config_path = os.path.join(BASE_DIR, 'config.json')
-            if os.path.exists(config_path):
-                 with open(config_path, 'r') as f:
-                    config = json.load(f)
-                    exch_conf = config.get('exchange', {})
-                    k = exch_conf.get('api_key')
-                    if k and k != 'ENV_VAR':
-                        api_key = k
-                        api_secret = exch_conf.get('api_secret')
-
-        if api_key and api_secret and api_key != 'ENV_VAR':
-            exchange = ccxt.bybit({
-                'apiKey': api_key,
-                'secret': api_secret,
-                'options': {'defaultType': 'future'},
-            })
-            balance_data = exchange.fetch_balance()
-            usdt = balance_data['total'].get('USDT', 0.0)
-            
-            cached_balance = {
-                "balance": float(usdt),
-                "currency": "USDT",
-                "timestamp": time.time()
-            }
-        else:
-            cached_balance["currency"] = "USDT" # Default to USDT even if no keys
-            
-    except Exception as e:
-        print(f"Error fetching balance: {e}")
+# main.py와 같은 계정 이름 → 봇이 실행 중이면 봇이 생산하고 대시보드는 읽기만 함
+ACCOUNT_NAME = 'bybit_15m'
+
+def make_exchange():
+    """스냅샷 생산자용 거래소 (키가 없으면 None → 다음 주기에 다시 확인)"""
+    # Load .env manually if exists (simple parsing)
+    env_path = os.path.join(BASE_DIR, '.env')
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if '=' in line and not line.startswith('#'):
+                    key, val = line.split('=', 1)
+                    # Remove quotes if present
+                    val = val.strip('\'"')
+                    os.environ[key] = val
+
+    # Try to get keys from env
+    api_key = os.getenv('BYBIT_API_KEY', '')
+    api_secret = os.getenv('BYBIT_API_SECRET', '')
     
-    return cached_balance
+    # Fallback to config.json if not in env
+    if not api_key:
+        config_path = os.path.join(BASE_DIR, 'config.json')
+        if os.path.exists(config_path):
+             with open(config_path, 'r') as f:
+                config = json.load(f)
+                exch_conf = config.get('exchange', {})
+                k = exch_conf.get('api_key')
+                if k and k != 'ENV_VAR':
+                    api_key = k
+                    api_secret = exch_conf.get('api_secret')
+
+    if not (api_key and api_secret and api_key != 'ENV_VAR'):
+        return None
+    exchange = wrap_exchange(ccxt.bybit({
+        'apiKey': api_key,
+        'secret': api_secret,
+        'options': {'defaultType': 'future'},
+    }), priority=DASHBOARD)
+    # 마켓 목록은 캐시에서 주입 (load_markets 재호출 방지)
+    metadata.prime_markets(exchange)
+    return exchange
+
+start_account_snapshot(ACCOUNT_NAME, make_exchange, interval=10)
+
+def get_real_balance():
+    # 공용 스냅샷 읽기만 (요청마다 .env 파싱/거래소 생성/fetch_balance 없음)
+    snap = read_snapshot(ACCOUNT_NAME)
+    if snap is None:
+        return {"balance": 0.0, "currency": "USDT", "timestamp": 0}
+    return {
+        "balance": snap['balance'],
+        "currency": snap['currency'],
+        "timestamp": snap['ts'],
+        "stale": snap['stale'],
+        "error": snap['error'],
+    }
 
 def is_bot_running():
-    # 1. Check PID file
-    if os.path.exists(PID_FILE):
-        try:
-            with open(PID_FILE, 'r') as f:
-                pid = int(f.read().strip())
-            # Check if process exists
-            os.kill(pid, 0)
-            return True, pid
-        except (OSError, ValueError):
-            # PID file exists but process doesn't, or invalid content
-            pass
-            
-    # 2. Check for any running main.py process using pgrep
-    # This catches orphaned processes
-    try:
-        # Find process IDs for "python3 main.py"
-        # -f matches full command line
-        result = subprocess.check_output(['pgrep', '-f', 'python3.*main.py'])
-        pids = [int(p) for p in result.split()]
-        if pids:
-            # If we found one, return the first one
-            return True, pids[0]
-    except subprocess.CalledProcessError:
-        # No process found
-        pass
-        
-    return False, None
+    # 레지스트리 항목(없으면 PID 파일)만 확인 - /api/status 폴링마다 pgrep 하지 않음
+    status = registry.status(BOT_NAME, pid_file=PID_FILE)
+    return status['running'], status['pid']
 
 @app.route('/')
 def index():
@@ -118,8 +102,7 @@ def get_status():
     trade_data = {}
     if os.path.exists(STATE_FILE):
         try:
-            with open(STATE_FILE, 'r') as f:
-                trade_data = json.load(f)
+            trade_data = read_state(STATE_FILE)  # 스냅샷 + 저널 꼬리
         except:
             trade_data = {"error": "Failed to load state"}
     
@@ -144,9 +127,8 @@ def control_bot():
         
         # Start bot in background
         try:
-            # Using nohup via subprocess to ensure it keeps running
-            # We don't need to capture output here as main.py writes to bot.log
-            subprocess.Popen(['python3', MAIN_SCRIPT], cwd=BASE_DIR)
+            # New session so it keeps running; main.py writes to bot.log itself
+            registry.launch(BOT_NAME, ['python3', MAIN_SCRIPT], cwd=BASE_DIR)
             return jsonify({"status": "success", "message": "Bot started"})
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)}), 500
@@ -164,11 +146,10 @@ def control_bot():
             return jsonify({"status": "error", "message": "Bot is not running (checked)"}), 400
             
         try:
-            # 1. Kill specific PID if known
-            if pid:
-                os.kill(pid, signal.SIGTERM)
+            # 1. SIGTERM + wait (SIGKILL on timeout), registry entry/PID file cleanup
+            registry.stop(BOT_NAME, pid_file=PID_FILE)
             
-            # 2. Force kill all main.py instances to be safe
+            # 2. Force kill orphaned main.py instances (explicit stop only)
             subprocess.run(['pkill', '-f', 'python3.*main.py'])
             
             # Clean up PID file
@@ -1,16 +1,20 @@
 import ccxt
 import json
-import time
-import schedule
 import pandas as pd
 import os
 import sys
 import logging
-from datetime import datetime
+import threading
 
 # BaseBot 임포트를 위한 경로 추가
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from bots.base_bot import BaseBot
+from bots.rate_limiter import wrap_exchange
+from bots.market_stream import get_market_stream
+from bots.tick_triggers import TriggerBook, Trigger
+from bots.log_setup import setup_logging
+from bots.process_registry import register, unregister, beat
+from bots.account_snapshot import start_account_snapshot, read_snapshot
 
 # Define Base Directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -50,24 +54,14 @@ class ColoredFormatter(logging.Formatter):
         return msg
 
 # Configure Logging
-# Remove all existing handlers to prevent duplicates or old configs
-# for handler in logging.root.handlers[:]:
-#     logging.root.removeHandler(handler)
-
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-# 1. File Handler (NO Color - Plain Text)
-file_handler = logging.FileHandler(os.path.join(BASE_DIR, "bot.log"))
-file_formatter = logging.Formatter('%(asctime)s - %(message)s')
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
-
-# 2. Console Handler (Colored) - Commented out for now
-# console_handler = logging.StreamHandler()
-# console_formatter = ColoredFormatter(f'{Colors.CYAN}%(asctime)s{Colors.RESET} - %(message)s')
-# console_handler.setFormatter(console_formatter)
-# logger.addHandler(console_handler)
+# File: plain text bot.log + bot.jsonl, written in batches by the shared writer thread.
+# bot.log uses the shared '%(asctime)s - %(levelname)s - %(message)s' format so the
+# dashboard log search can filter by level (the level is not colored on the console).
+# Console (colored) is off for now; console=True enables it and ColoredFormatter
+# then runs on the writer thread, not in the bot loop.
+logger = setup_logging(None, os.path.join(BASE_DIR, "bot.log"), bot='Bot_15M', symbol='BTC/USDT',
+                       console=False,
+                       console_formatter=ColoredFormatter(f'{Colors.CYAN}%(asctime)s{Colors.RESET} - %(message)s'))
 
 def load_env(filepath=None):
     """Simple .env loader to avoid dependencies"""
@@ -89,9 +83,54 @@ def load_env(filepath=None):
     except FileNotFoundError:
         logging.error(".env file not found")
 
+# 손절/익절은 체결가 틱으로 판정 (레벨은 진입 때 이미 정해짐, 스트림이 끊기면 check_intrabar가 대신 확인)
+exit_triggers = TriggerBook('b15m')
+trade_lock = threading.RLock()  # 틱 스레드와 봉 마감 루프가 같은 PaperTrader를 다룸
+_armed_position = None
+
+
+def arm_exit_triggers(paper_trader, symbol):
+    """열린 모의 포지션의 SL/TP를 틱 트리거로 장전 (포지션이 바뀔 때만)"""
+    global _armed_position
+    pos = paper_trader.position
+    key = (pos['entry_time'], pos['stop_loss'], pos['take_profit']) if pos else None
+    if key == _armed_position:
+        return
+    exit_triggers.disarm(symbol, group='exit')
+    _armed_position = key
+    if pos is None:
+        return
+
+    def on_exit(trigger, price, event):
+        with trade_lock:
+            if paper_trader.position is not None and paper_trader.position['entry_time'] == pos['entry_time']:
+                paper_trader.close_position(trigger.level, trigger.name)
+
+    is_long = str(pos['side']).lower() in ('buy', 'long')
+    exit_triggers.arm(Trigger('stop_loss', symbol, 'below' if is_long else 'above', pos['stop_loss'],
+                              on_exit, group='exit'))
+    exit_triggers.arm(Trigger('take_profit', symbol, 'above' if is_long else 'below', pos['take_profit'],
+                              on_exit, group='exit'))
+
+
+def check_intrabar(exchange, symbol, paper_trader=None):
+    """봉 사이 점검: 캔들/지표 없이 현재가로 페이퍼 포지션 SL/TP만 확인 (스트림이 살아 있으면 트리거가 먼저 처리)"""
+    beat('bot_15m')
+    if not paper_trader or not paper_trader.position:
+        return
+    stream = get_market_stream()
+    price = stream.last_price(symbol, max_age=5) if stream else None
+    if price is None:
+        price = exchange.fetch_ticker(symbol)['last']
+    with trade_lock:
+        paper_trader.update(price)
+        arm_exit_triggers(paper_trader, symbol)  # 청산됐으면 트리거 해제
+
+
 def run_bot(exchange, analyzer, strategy, config, paper_trader=None, dashboard=None):
     # logging.info("Scanning market...\") # Reduced log noise
     
+    beat('bot_15m')
     try:
         from datetime import datetime
         if dashboard:
@@ -126,7 +165,8 @@ def run_bot(exchange, analyzer, strategy, config, paper_trader=None, dashboard=N
         
         # Update Paper Trader Positions (Check SL/TP)
         if paper_trader:
-            paper_trader.update(curr_price)
+            with trade_lock:
+                paper_trader.update(curr_price)
         
         # 3. Check Signal
         signal = strategy.check_entry(df)
@@ -148,22 +188,28 @@ def run_bot(exchange, analyzer, strategy, config, paper_trader=None, dashboard=N
                 pass
             elif paper_trader:
                 # Execute Paper Trade
-                paper_trader.open_position(signal, curr_price, sl, tp)
+                with trade_lock:
+                    paper_trader.open_position(signal, curr_price, sl, tp)
             else:
                 logging.info("Dry Run - No trade")
         else:
-            logging.info(f"{log_msg} | No signal")
+            logging.info(f"{log_msg} | No signal", extra={'throttle': 'status'})
+
+        if paper_trader:
+            with trade_lock:
+                arm_exit_triggers(paper_trader, config['exchange']['symbol'])
             
         # 대시보드 업데이트
         if dashboard:
             balance = 0
             if paper_trader:
                 balance = paper_trader.balance
+                dashboard.perf = paper_trader.perf
             else:
-                try:
-                    balance_data = exchange.fetch_balance()
-                    balance = balance_data['total'].get('USDT', 0.0)
-                except: pass
+                # 실계좌 잔고는 스냅샷 생산자가 주기적으로 조회한 값 사용 (루프마다 fetch_balance 하지 않음)
+                snap = read_snapshot('bybit_15m')
+                if snap:
+                    balance = snap['balance']
             
             dashboard.current_balance = balance
             dashboard.status = "실행 중" if not signal else f"{signal} 시그널"
@@ -193,32 +239,20 @@ def run_bot(exchange, analyzer, strategy, config, paper_trader=None, dashboard=N
 from bots.trading_bot import TradingBot
 dashboard = TradingBot(name="Bot_15M", interval="15m")
 
-def main():
-    # Write PID to file
-    pid = os.getpid()
-    pid_file = os.path.join(BASE_DIR, 'bot.pid')
-    with open(pid_file, 'w') as f:
-        f.write(str(pid))
-        
-    def cleanup_pid():
-        if os.path.exists(pid_file):
-            os.remove(pid_file)
-            
-    import atexit
-    atexit.register(cleanup_pid)
-        
+def setup():
+    """설정/거래소/모듈 초기화 → 봇 컨텍스트 (설정 파일이 없거나 거래소 초기화에 실패하면 예외)"""
     print("Starting High Profit Bot (Survival Mode 163x)...")
     
     # Load environment variables
     load_env()
 
+    config_path = os.path.join(BASE_DIR, 'config.json')
     try:
-        config_path = os.path.join(BASE_DIR, 'config.json')
         with open(config_path, 'r') as f:
             config = json.load(f)
     except FileNotFoundError:
         print(f"Config file not found at {config_path}!")
-        return
+        raise
 
     # Initialize Exchange
     exchange_config = {
@@ -229,10 +263,10 @@ def main():
     }
     
     try:
-        exchange = getattr(ccxt, config['exchange']['name'])(exchange_config)
+        exchange = wrap_exchange(getattr(ccxt, config['exchange']['name'])(exchange_config))
     except Exception as e:
         logging.error(f"Failed to initialize exchange: {e}")
-        return
+        raise
 
     # Init Modules
     analyzer = MarketAnalyzer(exchange, config)
@@ -243,6 +277,9 @@ def main():
     if config['system']['dry_run']:
         logging.info("Initializing Paper Trader...")
         paper_trader = PaperTrader(config)
+        stream = get_market_stream()
+        if stream:
+            exit_triggers.attach(stream, config['exchange']['symbol'])
     
     logging.info(f"Loaded Configuration:")
     logging.info(f"Leverage: {config['exchange']['leverage']}x")
@@ -250,38 +287,44 @@ def main():
     logging.info(f"Strategy: {config['strategy']['name']} (RSI2 + Trend Filter)")
     logging.info("-" * 50)
 
-    global dashboard
     dashboard.status = "초기화 중"
-    dashboard.is_running = True
 
-    # Schedule Job
-    # Run every 10 seconds
-    schedule.every(10).seconds.do(run_bot, exchange, analyzer, strategy, config, paper_trader, dashboard)
-    
-    # Run once immediately
-    run_bot(exchange, analyzer, strategy, config, paper_trader, dashboard)
-    
-    # Initial Real Balance Fetch
-    fetch_and_save_real_balance(exchange)
+    # 실계좌 잔고/포지션 스냅샷 (대시보드와 같은 이름 → 둘 중 하나만 조회, 대시보드는 파일을 읽음)
+    start_account_snapshot('bybit_15m', lambda: exchange, symbols=[config['exchange']['symbol']], interval=10)
 
+    return {'exchange': exchange, 'analyzer': analyzer, 'strategy': strategy, 'config': config,
+            'paper_trader': paper_trader, 'symbol': config['exchange']['symbol']}
+
+def step(ctx):
+    """봉 마감마다 한 번 (분석/주문)"""
+    run_bot(ctx['exchange'], ctx['analyzer'], ctx['strategy'], ctx['config'], ctx['paper_trader'], dashboard)
+
+def intrabar(ctx):
+    """봉 사이 점검 (현재가로 SL/TP)"""
+    check_intrabar(ctx['exchange'], ctx['symbol'], ctx['paper_trader'])
+
+def main():
+    # 레지스트리 등록 (bot.pid도 기록, 종료 시 정리) - 봉 사이 점검이 10초 주기라 하트비트 간격도 10초
+    register('bot_15m', interval=10, pid_file=os.path.join(BASE_DIR, 'bot.pid'))
+    try:
+        ctx = setup()
+    except Exception:
+        unregister('bot_15m')
+        return
+
+    dashboard.is_running = True
+
+    # 봉 마감(서버 시각 기준 + settle)마다 분석 한 번, 그 사이에는 현재가로 SL/TP만 확인
+    clock = dashboard.clock
     while dashboard.is_running:
-        schedule.run_pending()
-        time.sleep(1)
+        step(ctx)
+        clock.wait(lambda: dashboard.is_running,
+                   on_idle=lambda: intrabar(ctx),
+                   idle_interval=dashboard.intrabar_interval)
         
     logging.info("15M Bot Stopped.")
     dashboard.status = "Stopped"
-
-def fetch_and_save_real_balance(exchange):
-    try:
-        balance_data = exchange.fetch_balance()
-        usdt_balance = balance_data['total'].get('USDT', 0.0)
-        
-        real_balance_file = os.path.join(BASE_DIR, 'real_balance.json')
-        with open(real_balance_file, 'w') as f:
-            json.dump({"balance": usdt_balance, "currency": "USDT", "updated_at": datetime.now().isoformat()}, f)
-            
-    except Exception as e:
-        logging.error(f"Failed to fetch real balance: {e}")
+    unregister('bot_15m')
 
 if __name__ == "__main__":
     main()
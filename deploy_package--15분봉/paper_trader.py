@@ -1,8 +1,12 @@
-import json
 import os
+import sys
 import time
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.state_journal import StateJournal
+from bots.perf_stats import PerfStats
+
 class PaperTrader:
     def __init__(self, config, state_file='paper_trade_state.json'):
         self.config = config
@@ -10,29 +14,32 @@ class PaperTrader:
         self.balance = 100.0 # Default starting balance
         self.position = None
         self.trade_history = []
+        self.perf = PerfStats(period='month')
+        # 상태 파일은 스냅샷, 변경은 저널에 한 줄씩 추가 (거래 이력이 늘어도 저장 비용 일정)
+        self.journal = StateJournal(state_file, initial={'balance': 100.0, 'position': None, 'trade_history': []})
         self.load_state()
 
     def load_state(self):
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, 'r') as f:
-                    data = json.load(f)
-                    self.balance = data.get('balance', 100.0)
-                    self.position = data.get('position', None)
-                    self.trade_history = data.get('trade_history', [])
-                print(f"Paper Trader Loaded: Balance=${self.balance:.2f}, Position={self.position}")
-            except Exception as e:
-                print(f"Error loading paper trade state: {e}")
+        try:
+            data = self.journal.load()
+            self.balance = data.get('balance', 100.0)
+            self.position = data.get('position', None)
+            self.trade_history = data.get('trade_history', [])
+            if data.get('perf'):
+                self.perf = PerfStats.from_dict(data['perf'])
+            elif self.trade_history:
+                # 이전 상태 파일: 남아 있는 거래 이력으로 통계 초기화
+                for t in self.trade_history:
+                    self.perf.add_trade(t.get('pnl', 0), ts=t.get('exit_time'))
+                    self.perf.add_equity(t.get('balance_after', self.balance), ts=t.get('exit_time'))
+            print(f"Paper Trader Loaded: Balance=${self.balance:.2f}, Position={self.position}")
+        except Exception as e:
+            print(f"Error loading paper trade state: {e}")
 
     def save_state(self):
-        data = {
-            'balance': self.balance,
-            'position': self.position,
-            'trade_history': self.trade_history
-        }
+        """전체 상태 스냅샷 (평소에는 이벤트 단위로 저널에 기록됨)"""
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(data, f, indent=4)
+            self.journal.snapshot()
         except Exception as e:
             print(f"Error saving paper trade state: {e}")
 
@@ -73,7 +80,7 @@ class PaperTrader:
         }
         
         print(f"Paper Trade OPEN: {signal.upper()} @ {price} | Size: {size:.4f} | Risk: ${risk_amount:.2f}")
-        self.save_state()
+        self.journal.record('open', set={'position': self.position})
 
     def close_position(self, price, reason):
         if self.position is None:
@@ -111,9 +118,12 @@ class PaperTrader:
         
         self.trade_history.append(trade_record)
         self.position = None
+        self.perf.add_trade(net_pnl, ts=trade_record['exit_time'])
+        self.perf.add_equity(self.balance, ts=trade_record['exit_time'])
         
         print(f"Paper Trade CLOSE: {reason} @ {price} | PnL: ${net_pnl:.2f} | New Balance: ${self.balance:.2f}")
-        self.save_state()
+        self.journal.record('close', set={'position': None, 'balance': self.balance, 'perf': self.perf.to_dict()},
+                            push={'trade_history': trade_record})
 
     def update(self, current_price, current_rsi=None):
         """Check TP/SL or other exit conditions"""
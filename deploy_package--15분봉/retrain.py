@@ -12,6 +12,10 @@ import sys
 from datetime import datetime
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.model_store import export_compact
+from bots.kline_downloader import KlineDownloader, merge_klines
+
 load_dotenv()
 
 def fetch_and_train():
@@ -28,12 +32,6 @@ def fetch_and_train():
             'options': {'defaultType': 'future'}
         })
         
-        # 최근 100일치 15분봉 데이터 (약 9600개) - 충분함
-        ohlcv = exchange.fetch_ohlcv('BTC/USDT', '15m', limit=1000) 
-        # 더 많은 데이터가 필요하면 반복 호출해야 함. 여기서는 간략히 1000개로 예시.
-        # 실제 성능 유지를 위해선 최소 1년치가 좋으므로, 기존 csv가 있다면 병합하거나 fetch_ohlcv를 반복해야 함.
-        # 여기서는 기존 5년치 csv가 있다고 가정하고, 없으면 새로 받음.
-        
         # 데이터 로드 전략:
         # 1. 기존 'latest_data.csv'가 있으면 로드
         # 2. 거래소에서 최근 데이터 가져와서 병합
@@ -55,25 +53,13 @@ def fetch_and_train():
             print("   기존 데이터 없음, 새로 다운로드...")
 
         # 최신 데이터 Fetch Loop
-        all_ohlcv = []
-        while True:
-            ohlcv = exchange.fetch_ohlcv('BTC/USDT', '15m', since=since, limit=1000)
-            if not ohlcv: break
-            last_timestamp = ohlcv[-1][0]
-            if last_timestamp == since: break
-            since = last_timestamp + 1
-            all_ohlcv.extend(ohlcv)
-            print(f"   다운로드 중... {len(all_ohlcv)}건 추가")
-            if len(ohlcv) < 1000: break
-            
-        if all_ohlcv:
-            df_new = pd.DataFrame(all_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+        # 구간 병렬 다운로드 (중단되면 로컬 아카이브에서 이어받음)
+        df_new = KlineDownloader.for_ccxt(exchange, 'BTC/USDT', '15m').download(since)
+        print(f"   다운로드 완료: {len(df_new)}건")
+        if not df_new.empty:
             df_new['datetime'] = pd.to_datetime(df_new['timestamp'], unit='ms')
-            
-            if not df_old.empty:
-                df = pd.concat([df_old, df_new]).drop_duplicates(subset='timestamp').reset_index(drop=True)
-            else:
-                df = df_new
+            # 겹치는 꼬리(마지막 봉)만 새 데이터로 교체
+            df = merge_klines(df_old, df_new)
         else:
             df = df_old
             
@@ -157,16 +143,19 @@ def train_models(df):
     model_s = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.05, random_state=42)
     model_s.fit(X_s, y_s)
     joblib.dump({'model': model_s, 'features': feature_cols}, 'lgbm_short.pkl')
+    export_compact(model_s, feature_cols, 'lgbm_short.pkl', sample=X_s.tail(2000))
     
     X_l, y_l = create_data('long')
     model_l = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.05, random_state=42)
     model_l.fit(X_l, y_l)
     joblib.dump({'model': model_l, 'features': feature_cols}, 'lgbm_long.pkl')
+    export_compact(model_l, feature_cols, 'lgbm_long.pkl', sample=X_l.tail(2000))
     
     X_r, y_r = create_data('regime')
     model_r = xgb.XGBClassifier(n_estimators=100, max_depth=6, learning_rate=0.05, num_class=3, objective='multi:softmax', random_state=42)
     model_r.fit(X_r, y_r)
     joblib.dump({'model': model_r, 'features': feature_cols}, 'lgbm_regime.pkl')
+    export_compact(model_r, feature_cols, 'lgbm_regime.pkl', sample=X_r.tail(2000))
     
     print(f"✅ 모델 업데이트 완료: {datetime.now()}")
 
@@ -1,8 +1,11 @@
-import joblib
 import pandas as pd
 import numpy as np
 import logging
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.model_store import load_model_bundle
 
 class Strategy:
     def __init__(self, config):
@@ -17,9 +20,9 @@ class Strategy:
     def load_models(self):
         try:
             base_dir = os.path.dirname(os.path.abspath(__file__))
-            self.short_model_data = joblib.load(os.path.join(base_dir, 'lgbm_short.pkl'))
-            self.long_model_data = joblib.load(os.path.join(base_dir, 'lgbm_long.pkl'))
-            self.regime_model_data = joblib.load(os.path.join(base_dir, 'lgbm_regime.pkl'))
+            self.short_model_data = load_model_bundle(os.path.join(base_dir, 'lgbm_short.pkl'))
+            self.long_model_data = load_model_bundle(os.path.join(base_dir, 'lgbm_long.pkl'))
+            self.regime_model_data = load_model_bundle(os.path.join(base_dir, 'lgbm_regime.pkl'))
             
             self.short_model = self.short_model_data['model']
             self.long_model = self.long_model_data['model']
@@ -6,13 +6,21 @@
 """
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
 import lightgbm as lgb
 import joblib
 import os
+import sys
 from strategy import add_indicators
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.parallel_trainer import SharedFeatureMatrix, ModelTask, train_parallel, valid_rows
+from bots.model_store import export_compact
+
+FEATURE_COLS = [
+    'rsi', 'rsi_change', 'dist_ema20', 'dist_ema60', 'dist_ema200', 
+    'atr', 'vol_change'
+]
+
 def load_and_prepare_data(data_path='btc_usdt_5m_5y.csv'):
     print(f"📊 데이터 로딩: {data_path}")
     df = pd.read_csv(data_path)
@@ -74,84 +82,76 @@ def load_and_prepare_data(data_path='btc_usdt_5m_5y.csv'):
     print(f"📈 총 캔들: {len(df_15m):,}개")
     return df_15m
 
-def create_training_data(df, target_type):
-    feature_cols = [
-        'rsi', 'rsi_change', 'dist_ema20', 'dist_ema60', 'dist_ema200', 
-        'atr', 'vol_change'
-    ]
-    
-    df = df.copy().dropna()
-    
+def make_labels(df, target_type):
+    """타입별 (신호 마스크, 타겟) 반환. regime은 신호 마스크 없음(None)"""
     if target_type == 'short':
         # Short 신호 조건 (약한 하락세)
-        df['signal'] = (df['close'] < df['ema_60']) & (df['rsi'] > 50)
+        signal = (df['close'] < df['ema_60']) & (df['rsi'] > 50)
         # 성공: 1시간 후 하락
-        df['target'] = (df['future_return'] < -0.005).astype(int)
+        target = (df['future_return'] < -0.005).astype(int)
+        return signal, target
         
     elif target_type == 'long':
         # Long 신호 조건 (약한 상승세)
-        df['signal'] = (df['close'] > df['ema_60']) & (df['rsi'] < 50)
+        signal = (df['close'] > df['ema_60']) & (df['rsi'] < 50)
         # 성공: 1시간 후 상승
-        df['target'] = (df['future_return'] > 0.005).astype(int)
+        target = (df['future_return'] > 0.005).astype(int)
+        return signal, target
         
-    elif target_type == 'regime':
-        # 0: SIDE, 1: BULL, 2: BEAR
-        df['target'] = 0
-        
-        # BULL
-        bull_mask = (df['close'] > df['ema_200']) & (df['ema_20'] > df['ema_60'])
-        df.loc[bull_mask, 'target'] = 1
-        
-        # BEAR
-        bear_mask = (df['close'] < df['ema_200']) & (df['ema_20'] < df['ema_60'])
-        df.loc[bear_mask, 'target'] = 2
-        
-        return df[feature_cols], df['target'], feature_cols
-
-    # 신호가 있는 데이터만 필터링 (Long/Short 경우)
-    data = df[df['signal']].copy()
-    return data[feature_cols], data['target'], feature_cols
-
-def train_lgbm(X, y, name, num_class=1):
-    print(f"\n🚀 {name} 모델 훈련...")
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # regime - 0: SIDE, 1: BULL, 2: BEAR
+    target = pd.Series(0, index=df.index)
+    
+    # BULL
+    bull_mask = (df['close'] > df['ema_200']) & (df['ema_20'] > df['ema_60'])
+    target[bull_mask] = 1
     
+    # BEAR
+    bear_mask = (df['close'] < df['ema_200']) & (df['ema_20'] < df['ema_60'])
+    target[bear_mask] = 2
+    return None, target
+
+def build_lgbm(num_class=1):
     if num_class > 1:
-        model = lgb.LGBMClassifier(
+        return lgb.LGBMClassifier(
             n_estimators=200, learning_rate=0.05, num_leaves=31,
             objective='multiclass', num_class=num_class, random_state=42
         )
-    else:
-        model = lgb.LGBMClassifier(
-            n_estimators=200, learning_rate=0.05, num_leaves=31,
-            objective='binary', random_state=42
-        )
-        
-    model.fit(X_train, y_train)
-    score = model.score(X_test, y_test)
-    print(f"   정확도: {score*100:.1f}%")
-    return model, score
+    return lgb.LGBMClassifier(
+        n_estimators=200, learning_rate=0.05, num_leaves=31,
+        objective='binary', random_state=42
+    )
 
 def main():
     df = load_and_prepare_data()
     
-    # 1. Short Model
-    X_s, y_s, feats_s = create_training_data(df, 'short')
-    model_s, score_s = train_lgbm(X_s, y_s, "Short")
+    # 기존과 동일하게 NaN이 있는 행 전체 제외, 행 위치만 골라서 공유 행렬 사용
+    complete = df.notna().all(axis=1).to_numpy()
+    tasks = []
+    for name, target_type, num_class in [("Short", 'short', 1), ("Long", 'long', 1), ("Regime", 'regime', 3)]:
+        signal, target = make_labels(df, target_type)
+        mask = complete if signal is None else complete & signal.to_numpy()
+        rows = valid_rows(df, FEATURE_COLS, mask)
+        tasks.append(ModelTask(name, build_lgbm(num_class), FEATURE_COLS, rows, target.to_numpy()[rows]))
+    
+    # 압축 모델 검증용 샘플 (최근 구간)
+    samples = {t.name: df[FEATURE_COLS].iloc[t.rows[-2000:]] for t in tasks}
     
-    # 2. Long Model
-    X_l, y_l, feats_l = create_training_data(df, 'long')
-    model_l, score_l = train_lgbm(X_l, y_l, "Long")
+    with SharedFeatureMatrix(df, FEATURE_COLS) as matrix:
+        del df
+        results = train_parallel(matrix, tasks)
     
-    # 3. Regime Model
-    X_r, y_r, feats_r = create_training_data(df, 'regime')
-    model_r, score_r = train_lgbm(X_r, y_r, "Regime", num_class=3)
+    model_s, score_s, feats_s = results["Short"].model, results["Short"].accuracy, results["Short"].features
+    model_l, score_l, feats_l = results["Long"].model, results["Long"].accuracy, results["Long"].features
+    model_r, score_r, feats_r = results["Regime"].model, results["Regime"].accuracy, results["Regime"].features
     
     # 저장
     print("\n💾 모델 저장...")
     joblib.dump({'model': model_s, 'features': feats_s, 'acc': score_s}, 'lgbm_short.pkl')
     joblib.dump({'model': model_l, 'features': feats_l, 'acc': score_l}, 'lgbm_long.pkl')
     joblib.dump({'model': model_r, 'features': feats_r, 'acc': score_r}, 'lgbm_regime.pkl')
+    export_compact(model_s, feats_s, 'lgbm_short.pkl', score_s, sample=samples["Short"])
+    export_compact(model_l, feats_l, 'lgbm_long.pkl', score_l, sample=samples["Long"])
+    export_compact(model_r, feats_r, 'lgbm_regime.pkl', score_r, sample=samples["Regime"])
     print("✅ 완료")
 
 if __name__ == "__main__":
@@ -2,12 +2,14 @@ import ccxt
 import pandas as pd
 import json
 import os
-import time
+import sys
 import logging
-from datetime import datetime, timedelta
 from market_analyzer import MarketAnalyzer
 from strategy import Strategy
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bots.kline_downloader import KlineDownloader
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 
@@ -18,50 +20,23 @@ def fetch_historical_data(symbol, timeframe, start_date_str, end_date_str):
     since = exchange.parse8601(f"{start_date_str}T00:00:00Z")
     end_ts = exchange.parse8601(f"{end_date_str}T23:59:59Z")
     
-    all_ohlcv = []
     print(f"Fetching {symbol} Perpetual data from {start_date_str} to {end_date_str}...")
-    
-    while since < end_ts:
-        try:
-            ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=1000)
-            if not ohlcv:
-                break
-            all_ohlcv.extend(ohlcv)
-            since = ohlcv[-1][0] + 1
+    # 구간 병렬 다운로드 (이미 받은 구간은 로컬 아카이브에서 재사용)
+    df = KlineDownloader.for_ccxt(exchange, symbol, timeframe).download(since, end_ts)
             
-            current_date = datetime.fromtimestamp(ohlcv[-1][0]/1000).strftime('%Y-%m-%d')
-            print(f"  Fetched up to {current_date}... ({len(all_ohlcv)} bars)", end='\r')
-            
-            if ohlcv[-1][0] >= end_ts:
-                break
-            time.sleep(exchange.rateLimit / 1000)
-        except Exception as e:
-            print(f"\nError fetching data: {e}")
-            time.sleep(5)
-            continue
-            
-    print(f"\nTotal bars fetched: {len(all_ohlcv)}")
-    df = pd.DataFrame(all_ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    print(f"Total bars fetched: {len(df)}")
     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
     return df
 
 def run_continuous_backtest(start_year, end_year, symbol='BTC/USDT', timeframe='15m'):
     print(f"\n=== Running Continuous Backtest from {start_year} to {end_year} [{timeframe}] ===")
     
-    # 1. Fetch Data for all years
-    all_df = []
-    for year in range(start_year, end_year + 1):
-        start_date = f"{year}-01-01"
-        end_date = f"{year}-12-31"
-        df = fetch_historical_data(symbol, timeframe, start_date, end_date)
-        if not df.empty:
-            all_df.append(df)
+    # 1. Fetch Data for all years (한 번에 요청 → 구간 단위로 병렬 다운로드, 겹침 없음)
+    df = fetch_historical_data(symbol, timeframe, f"{start_year}-01-01", f"{end_year}-12-31")
     
-    if not all_df:
+    if df.empty:
         print("No data found.")
         return None
-        
-    df = pd.concat(all_df).drop_duplicates(subset='timestamp').sort_values('timestamp').reset_index(drop=True)
     
     # 2. Setup
     try:
@@ -0,0 +1,159 @@
+"""
+로컬 Bybit V5 공개 API 대역 서버 (테스트용)
+- /v5/public/linear : WebSocket (subscribe/ping 응답, 테스트에서 push()로 메시지 전송, drop()으로 끊기)
+- /v5/market/kline  : REST 캔들 (bars에 넣어둔 봉을 Bybit 형식 그대로 최신순 반환)
+- /v5/market/tickers, /v5/position/list : tickers / positions에 넣어둔 값 반환 (delay로 응답 지연)
+별도 스레드의 asyncio 루프에서 127.0.0.1 임의 포트로 실행
+"""
+import json
+import asyncio
+import threading
+
+from aiohttp import web, WSMsgType
+
+
+class BybitStub:
+    def __init__(self):
+        self.bars = {}              # (symbol, interval 코드) -> {start_ms: [o, h, l, c, v]}
+        self.subscriptions = []     # 받은 subscribe args (순서대로, 재연결 시 중복 포함)
+        self.kline_requests = []    # 받은 REST 캔들 요청 파라미터
+        self.tickers = {}           # symbol -> lastPrice
+        self.positions = []         # /v5/position/list 응답 list
+        self.signed = []            # 서명 헤더가 붙은 요청 경로
+        self.delay = 0.0            # REST 응답 지연 (초)
+        self.connections = 0
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+        self.runner = None
+        self.port = None
+
+    @property
+    def ws_url(self):
+        return f"ws://127.0.0.1:{self.port}/v5/public/linear"
+
+    @property
+    def rest_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    # ------------------------------------------------------------------
+    # 테스트 측 API
+    # ------------------------------------------------------------------
+    def add_bar(self, symbol, interval, start, close, volume=1.0):
+        with self.lock:
+            self.bars.setdefault((symbol, interval), {})[start] = [close, close, close, close, volume]
+
+    def push(self, msg):
+        """연결된 모든 클라이언트에 메시지 전송"""
+        self._call(self._broadcast(json.dumps(msg)))
+
+    def drop(self):
+        """서버 쪽에서 모든 연결 끊기 (재연결 확인용)"""
+        self._call(self._close_all())
+
+    def topics(self):
+        with self.lock:
+            return list(self.subscriptions)
+
+    # ------------------------------------------------------------------
+    # 실행
+    # ------------------------------------------------------------------
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), daemon=True, name="BybitStub")
+        self.thread.start()
+        if not ready.wait(5):
+            raise RuntimeError("stub server did not start")
+        return self
+
+    def stop(self):
+        self._call(self._shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._serve())
+        ready.set()
+        self.loop.run_forever()
+
+    def _call(self, coro):
+        asyncio.run_coroutine_threadsafe(coro, self.loop).result(5)
+
+    async def _serve(self):
+        app = web.Application()
+        app.router.add_get('/v5/public/linear', self._ws)
+        app.router.add_get('/v5/market/kline', self._kline)
+        app.router.add_get('/v5/market/tickers', self._tickers)
+        app.router.add_get('/v5/position/list', self._positions)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def _shutdown(self):
+        await self._close_all()
+        await self.runner.cleanup()
+
+    async def _broadcast(self, data):
+        for ws in list(self.clients):
+            await ws.send_str(data)
+
+    async def _close_all(self):
+        for ws in list(self.clients):
+            await ws.close()
+
+    # ------------------------------------------------------------------
+    # 핸들러
+    # ------------------------------------------------------------------
+    async def _ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self.clients.add(ws)
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                req = json.loads(msg.data)
+                if req.get('op') == 'subscribe':
+                    with self.lock:
+                        self.subscriptions.extend(req.get('args', []))
+                    await ws.send_str(json.dumps({'success': True, 'op': 'subscribe'}))
+                elif req.get('op') == 'ping':
+                    await ws.send_str(json.dumps({'success': True, 'ret_msg': 'pong', 'op': 'ping'}))
+        finally:
+            self.clients.discard(ws)
+        return ws
+
+    async def _kline(self, request):
+        await asyncio.sleep(self.delay)
+        q = request.query
+        start = int(q.get('start', 0))
+        limit = int(q.get('limit', 200))
+        with self.lock:
+            self.kline_requests.append(dict(q))
+            bars = self.bars.get((q['symbol'], q['interval']), {})
+            rows = [[str(s)] + [str(x) for x in bars[s]] + ['0'] for s in sorted(bars) if s >= start]
+        rows = rows[:limit][::-1]  # Bybit은 최신순
+        return web.json_response({'retCode': 0, 'retMsg': 'OK',
+                                  'result': {'category': 'linear', 'symbol': q['symbol'], 'list': rows}})
+
+    async def _tickers(self, request):
+        await asyncio.sleep(self.delay)
+        symbol = request.query['symbol']
+        with self.lock:
+            rows = [{'symbol': symbol, 'lastPrice': str(self.tickers[symbol])}] if symbol in self.tickers else []
+        return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': {'category': 'linear', 'list': rows}})
+
+    async def _positions(self, request):
+        await asyncio.sleep(self.delay)
+        if 'X-BAPI-SIGN' not in request.headers:
+            return web.json_response({'retCode': 10003, 'retMsg': 'API key is invalid.'})
+        with self.lock:
+            self.signed.append(request.path)
+            rows = list(self.positions)
+        return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': {'category': 'linear', 'list': rows}})
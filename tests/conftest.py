@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 실제 봇들이 쓰는 레이트 리밋 상태 파일과 섞이지 않도록 (bots 임포트 전에 설정)
+os.environ.setdefault('RATE_LIMIT_DIR', tempfile.mkdtemp(prefix='bot_rate_limits_test_'))
+os.environ.setdefault('MARKET_STREAM', '0')
+
+
+def wait_for(cond, timeout=5.0, interval=0.02):
+    """cond()가 참이 될 때까지 대기 (시간 초과면 False)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(interval)
+    return bool(cond())
+
+
+@pytest.fixture
+def bybit_stub():
+    """로컬 Bybit WebSocket/REST 대역 서버"""
+    pytest.importorskip('aiohttp')
+    from bybit_stub import BybitStub
+    stub = BybitStub().start()
+    yield stub
+    stub.stop()
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'bybit_bot_usb(1시간-통합)'))
+from async_bybit_client import AsyncBybitClient  # noqa: E402
+
+STEP = 3_600_000
+
+
+def run_cycle(stub, api_key='key', **kwargs):
+    async def cycle():
+        client = AsyncBybitClient(api_key, 'secret', testnet=False)
+        client.base_url = stub.rest_url
+        async with client:
+            return await client.fetch_cycle('BTCUSDT', '60', **kwargs)
+    return asyncio.run(cycle())
+
+
+def test_fetch_cycle_returns_klines_ticker_and_positions(bybit_stub):
+    for i in range(3):
+        bybit_stub.add_bar('BTCUSDT', '60', i * STEP, 100.0 + i)
+    bybit_stub.tickers['BTCUSDT'] = 102.5
+    bybit_stub.positions = [{'symbol': 'BTCUSDT', 'side': 'Buy', 'size': '0.01', 'liqPrice': '80'}]
+
+    cycle = run_cycle(bybit_stub, limit=10)
+    assert [int(k[0]) for k in cycle['klines']] == [2 * STEP, STEP, 0]   # 최신순 그대로
+    assert cycle['ticker']['lastPrice'] == '102.5'
+    assert cycle['positions'][0]['size'] == '0.01'
+    assert bybit_stub.signed == ['/v5/position/list']
+
+
+def test_fetch_cycle_runs_requests_concurrently(bybit_stub):
+    bybit_stub.add_bar('BTCUSDT', '60', 0, 100.0)
+    bybit_stub.tickers['BTCUSDT'] = 100.0
+    bybit_stub.delay = 0.3
+
+    started = time.perf_counter()
+    cycle = run_cycle(bybit_stub)
+    assert time.perf_counter() - started < 0.75    # 순차라면 0.9초 이상
+    assert cycle['klines'] and cycle['ticker'] and cycle['positions'] == []
+
+
+def test_cycle_without_ticker_or_positions(bybit_stub):
+    bybit_stub.add_bar('BTCUSDT', '60', 0, 100.0)
+    cycle = run_cycle(bybit_stub, api_key='', with_positions=False)
+    assert cycle['ticker'] == {} and cycle['positions'] is None
+    assert len(cycle['klines']) == 1
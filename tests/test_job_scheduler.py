@@ -0,0 +1,66 @@
+import time
+
+from bots.job_scheduler import JobScheduler, JobSpec
+from conftest import wait_for
+
+
+def make_job(tmp_path, name, body, **kwargs):
+    (tmp_path / f"{name}.py").write_text(body)
+    kwargs.setdefault('nice', 0)
+    return JobSpec(name, f"{name}.py", str(tmp_path), **kwargs)
+
+
+def finished(scheduler, name):
+    scheduler._reap()
+    return any(r.name == name for r in scheduler.history)
+
+
+def test_max_concurrent_queues_extra_jobs(tmp_path):
+    scheduler = JobScheduler(max_concurrent=1, timeframes=(), log_dir=str(tmp_path / 'logs'))
+    scheduler.register(make_job(tmp_path, 'first', "import time; time.sleep(0.5)"))
+    scheduler.register(make_job(tmp_path, 'second', "print('done')"))
+    assert scheduler.submit('first') and scheduler.submit('second')
+    assert not scheduler.submit('first')        # 이미 대기 중
+
+    scheduler._dispatch()
+    status = scheduler.status()
+    assert [r['name'] for r in status['running']] == ['first']
+    assert [r['name'] for r in status['queued']] == ['second']
+
+    assert wait_for(lambda: finished(scheduler, 'first'))
+    scheduler._dispatch()
+    assert wait_for(lambda: finished(scheduler, 'second'))
+    history = {r['name']: r for r in scheduler.status()['history']}
+    assert history['first']['status'] == history['second']['status'] == 'success'
+    assert 'done' in (tmp_path / 'logs' / 'second.log').read_text()
+
+
+def test_bar_guard_defers_dispatch(tmp_path):
+    # 5분봉 전체를 보호 구간으로 → 큐에 넣어도 시작하지 않음
+    scheduler = JobScheduler(timeframes=('5m',), guard_before=300, guard_after=300)
+    scheduler.register(make_job(tmp_path, 'job', "pass"))
+    assert scheduler.in_bar_guard()
+    scheduler.submit('job')
+    scheduler._dispatch()
+    assert scheduler.running == {} and len(scheduler.queue) == 1
+
+    scheduler.guard_before = scheduler.guard_after = 0
+    assert not scheduler.in_bar_guard()
+    scheduler._dispatch()
+    assert wait_for(lambda: finished(scheduler, 'job'))
+    assert scheduler.history[-1].status == 'success'
+
+
+def test_timeout_kills_job(tmp_path):
+    scheduler = JobScheduler(timeframes=())
+    scheduler.register(make_job(tmp_path, 'hang', "import time; time.sleep(60)", timeout=0))
+    scheduler.submit('hang')
+    scheduler._dispatch()
+    proc = scheduler.running['hang'][0]
+
+    started = time.time()
+    assert wait_for(lambda: finished(scheduler, 'hang'))
+    assert time.time() - started < 5
+    run = scheduler.history[-1]
+    assert run.status == 'timeout' and run.returncode == -9
+    assert proc.poll() is not None
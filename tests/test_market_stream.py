@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from bots.market_stream import MarketStream, BarEvent  # noqa: E402
+from conftest import wait_for  # noqa: E402
+
+STEP = 60_000
+
+
+@pytest.fixture
+def base():
+    """5분 전 분봉 시작 시각 (base+5가 진행 중인 봉 → get_ohlcv 신선도 검사 통과)"""
+    return (int(time.time() * 1000) // STEP - 5) * STEP
+
+
+@pytest.fixture
+def make_stream(bybit_stub):
+    streams = []
+
+    def make(**kwargs):
+        stream = MarketStream(ws_url=bybit_stub.ws_url, rest_url=bybit_stub.rest_url, **kwargs)
+        streams.append(stream)
+        return stream
+
+    yield make
+    for stream in streams:
+        stream.stop()
+        if stream.thread is not None:
+            stream.thread.join(5)
+
+
+def kline_msg(start, close, confirm=True):
+    return {'topic': 'kline.1.BTCUSDT', 'type': 'snapshot', 'ts': start,
+            'data': [{'start': start, 'end': start + STEP - 1, 'interval': '1', 'open': str(close),
+                      'close': str(close), 'high': str(close), 'low': str(close), 'volume': '1',
+                      'confirm': confirm}]}
+
+
+def test_subscribe_sends_topics_and_loads_history(bybit_stub, make_stream, base):
+    for i in range(5):
+        bybit_stub.add_bar('BTCUSDT', '1', base + i * STEP, 100.0 + i)
+    stream = make_stream()
+    stream.subscribe_kline('BTC/USDT', '1m', history=20)
+    stream.start()
+
+    assert wait_for(lambda: 'kline.1.BTCUSDT' in bybit_stub.topics())
+    assert wait_for(lambda: stream.stats['backfills'] >= 1)
+    ohlcv = stream.get_ohlcv('BTC/USDT', '1m', limit=5)
+    assert [row[0] for row in ohlcv] == [base + i * STEP for i in range(5)]
+    assert ohlcv[-1][4] == 104.0
+
+    # 실행 중에 추가한 구독은 바로 전송
+    ticks = []
+    stream.subscribe_ticker('BTC/USDT', ticks.append)
+    assert wait_for(lambda: 'tickers.BTCUSDT' in bybit_stub.topics())
+    bybit_stub.push({'topic': 'tickers.BTCUSDT', 'type': 'snapshot', 'cs': 1, 'ts': base,
+                     'data': {'symbol': 'BTCUSDT', 'lastPrice': '105.5'}})
+    assert wait_for(lambda: ticks)
+    assert ticks[0].price == 105.5
+    assert stream.last_price('BTC/USDT', max_age=5) == 105.5
+
+
+def test_reconnect_resubscribes(bybit_stub, make_stream, base):
+    bybit_stub.add_bar('BTCUSDT', '1', base, 100.0)
+    stream = make_stream()
+    stream.subscribe_kline('BTCUSDT', '1m', history=20)
+    stream.subscribe_ticker('BTCUSDT')
+    stream.start()
+    assert wait_for(lambda: bybit_stub.connections == 1 and stream.stats['backfills'] >= 1)
+    requests_before = len(bybit_stub.kline_requests)
+
+    bybit_stub.drop()
+    assert wait_for(lambda: bybit_stub.connections == 2 and stream.stats['connected'], timeout=10)
+    assert stream.stats['reconnects'] == 1
+    topics = bybit_stub.topics()
+    assert topics.count('kline.1.BTCUSDT') == 2
+    assert topics.count('tickers.BTCUSDT') == 2
+    # 재연결 직후 끊긴 동안의 캔들을 REST로 보충 (마지막 봉부터)
+    assert wait_for(lambda: len(bybit_stub.kline_requests) > requests_before)
+    assert int(bybit_stub.kline_requests[-1]['start']) == base
+
+
+def test_gap_is_backfilled_from_rest(bybit_stub, make_stream, base):
+    for i in range(3):
+        bybit_stub.add_bar('BTCUSDT', '1', base + i * STEP, 100.0 + i)
+    bars = []
+    stream = make_stream()
+    stream.subscribe_kline('BTCUSDT', '1m', bars.append, history=20)
+    stream.start()
+    assert wait_for(lambda: stream.stats['backfills'] >= 1)
+
+    # 웹소켓으로는 base+3, base+4를 못 받은 상황: REST에만 있음
+    bybit_stub.add_bar('BTCUSDT', '1', base + 3 * STEP, 103.0)
+    bybit_stub.add_bar('BTCUSDT', '1', base + 4 * STEP, 104.0)
+    bybit_stub.push(kline_msg(base + 5 * STEP, 105.0, confirm=False))
+
+    assert wait_for(lambda: stream.stats['backfills'] >= 2)
+    assert stream.stats['gaps'] == 1
+    assert int(bybit_stub.kline_requests[-1]['start']) == base + 2 * STEP
+    ohlcv = stream.get_ohlcv('BTCUSDT', '1m', limit=6)
+    assert [row[0] for row in ohlcv] == [base + i * STEP for i in range(6)]
+    assert [row[4] for row in ohlcv] == [100.0, 101.0, 102.0, 103.0, 104.0, 105.0]
+    # 콜백은 실시간 봉만 받음 (보충된 봉은 전달하지 않음)
+    assert len(bars) == 1 and isinstance(bars[0], BarEvent)
+    assert bars[0].start == base + 5 * STEP and not bars[0].backfill and not bars[0].confirm
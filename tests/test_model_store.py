@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from bots.model_store import export_compact, load_compact, load_model_bundle, _with_missing_cases
+
+FEATURES = ['f0', 'f1', 'f2', 'f3']
+
+
+def training_data(n=600, seed=0):
+    """NaN / 0이 섞인 학습 데이터 (결측 분기가 생기도록)"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(FEATURES)))
+    y = ((X[:, 0] + 0.5 * X[:, 1] - 0.3 * X[:, 2]) > 0).astype(int)
+    X[rng.random(X.shape) < 0.15] = np.nan
+    X[rng.random(X.shape) < 0.10] = 0.0
+    return X, y
+
+
+def assert_parity(model, X, path, tol=1e-6):
+    assert export_compact(model, FEATURES, str(path), sample=X[:200])
+    compact = load_compact(str(path))
+    sample = _with_missing_cases(X[200:400])
+    expected = model.predict_proba(sample)[:, 1]
+    assert np.max(np.abs(compact.predict_proba(sample)[:, 1] - expected)) < tol
+    assert load_model_bundle(str(path))['format'] == 'compact'
+
+
+@pytest.mark.parametrize('zero_as_missing', [False, True])
+def test_lightgbm_missing_value_parity(tmp_path, zero_as_missing):
+    lgb = pytest.importorskip('lightgbm')
+    X, y = training_data()
+    model = lgb.LGBMClassifier(n_estimators=30, num_leaves=8, min_child_samples=5,
+                               zero_as_missing=zero_as_missing, verbose=-1)
+    model.fit(X, y)
+    path = tmp_path / 'lgbm.pkl'
+    path.write_bytes(b'')
+    assert_parity(model, X, path)
+
+
+def test_lightgbm_without_missing_values(tmp_path):
+    lgb = pytest.importorskip('lightgbm')
+    X, y = training_data()
+    model = lgb.LGBMClassifier(n_estimators=20, num_leaves=8, use_missing=False, verbose=-1)
+    model.fit(np.nan_to_num(X), y)
+    path = tmp_path / 'lgbm_plain.pkl'
+    path.write_bytes(b'')
+    assert_parity(model, np.nan_to_num(X), path)
+
+
+def test_lightgbm_categorical_split_is_refused(tmp_path):
+    lgb = pytest.importorskip('lightgbm')
+    rng = np.random.default_rng(1)
+    X = np.column_stack([rng.integers(0, 6, 500), rng.normal(size=(500, 3))]).astype(float)
+    y = (np.isin(X[:, 0], [1, 4]) ^ (X[:, 1] > 1)).astype(int)
+    model = lgb.LGBMClassifier(n_estimators=10, num_leaves=8, min_child_samples=5, verbose=-1)
+    model.fit(X, y, categorical_feature=[0])
+    assert not export_compact(model, FEATURES, str(tmp_path / 'cat.pkl'), sample=X[:100])
+    assert not (tmp_path / 'cat.trees.json').exists()
+
+
+def test_xgboost_missing_value_parity(tmp_path):
+    xgb = pytest.importorskip('xgboost')
+    X, y = training_data(seed=3)
+    model = xgb.XGBClassifier(n_estimators=30, max_depth=4, tree_method='hist')
+    model.fit(X, y)
+    path = tmp_path / 'xgb.pkl'
+    path.write_bytes(b'')
+    assert_parity(model, X, path)
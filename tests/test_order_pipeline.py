@@ -0,0 +1,168 @@
+import threading
+
+import pytest
+
+pytest.importorskip('aiohttp')  # bots.market_stream (normalize_symbol)
+
+from bots.order_pipeline import OrderPipeline, OrderIntent  # noqa: E402
+
+SYMBOL = 'BTC/USDT'
+
+
+class FakeExchange:
+    """bybit처럼 동작하는 주문 API (호출 기록 + 오류 주입)"""
+
+    id = 'bybit'
+    apiKey = None
+
+    def __init__(self, errors=(), status='closed', filled=0.01):
+        self.errors = list(errors)
+        self.status = status
+        self.filled = filled
+        self.sent = []              # create_order에 넘어온 clientOrderId
+        self.orders = {}            # clientOrderId -> 주문 (실제로 접수된 것)
+        self.lookups = []
+        self.gate = None
+        self.lock = threading.Lock()
+
+    def _order(self, cid):
+        return {'id': f"x-{cid}", 'clientOrderId': cid, 'status': self.status,
+                'filled': self.filled if self.status == 'closed' else 0, 'average': 100.0}
+
+    def create_order(self, symbol, order_type, side, amount, price, params):
+        if self.gate is not None:
+            self.gate.wait(5)
+        cid = params['clientOrderId']
+        with self.lock:
+            self.sent.append(cid)
+            error = self.errors.pop(0) if self.errors else None
+            if error is not None and error.accepted:
+                self.orders[cid] = self._order(cid)   # 접수는 됐지만 응답을 못 받음
+            if error is not None:
+                raise error.exc
+            self.orders[cid] = self._order(cid)
+        return {'id': self.orders[cid]['id']}
+
+    def fetch_order(self, oid, symbol):
+        with self.lock:
+            return next(o for o in self.orders.values() if o['id'] == oid)
+
+    def fetch_open_orders(self, symbol, params=None):
+        self.lookups.append(('open', params))
+        with self.lock:
+            return [o for o in self.orders.values() if o['status'] == 'open']
+
+    def fetch_closed_orders(self, symbol, params=None):
+        self.lookups.append(('closed', params))
+        with self.lock:
+            return [o for o in self.orders.values() if o['status'] != 'open']
+
+
+class Err:
+    def __init__(self, exc, accepted=False):
+        self.exc = exc
+        self.accepted = accepted
+
+
+@pytest.fixture
+def make_pipeline():
+    pipelines = []
+
+    def make(exchange, **kwargs):
+        kwargs.setdefault('poll_interval', 0.02)
+        pipeline = OrderPipeline(exchange, name='t', **kwargs)
+        pipelines.append(pipeline)
+        return pipeline
+
+    yield make
+    for pipeline in pipelines:
+        pipeline.stop()
+
+
+def test_order_is_confirmed_by_polling(make_pipeline):
+    ex = FakeExchange()
+    pipeline = make_pipeline(ex)
+    result = pipeline.submit(OrderIntent(SYMBOL, 'buy', 0.01)).result(5)
+    assert result.status == 'filled'
+    assert result.filled == 0.01 and result.average == 100.0
+    assert result.order_id == f"x-{result.client_id}"
+    assert pipeline.pending() == []
+
+
+def test_same_key_is_not_submitted_twice(make_pipeline):
+    ex = FakeExchange()
+    ex.gate = threading.Event()
+    pipeline = make_pipeline(ex)
+    first = pipeline.submit(OrderIntent(SYMBOL, 'buy', 0.01, key='entry'))
+    second = pipeline.submit(OrderIntent(SYMBOL, 'buy', 0.01, key='entry'))
+    assert second is first
+    assert len(pipeline.pending(SYMBOL)) == 1
+    ex.gate.set()
+    assert first.result(5).status == 'filled'
+    assert len(ex.sent) == 1
+
+    # 끝난 뒤에는 같은 key로 새 주문 가능
+    third = pipeline.submit(OrderIntent(SYMBOL, 'buy', 0.01, key='entry'))
+    assert third is not first
+    assert third.result(5).status == 'filled'
+
+
+def test_transient_error_resends_with_same_client_id(make_pipeline):
+    ex = FakeExchange(errors=[Err(TimeoutError('read timeout'))])
+    pipeline = make_pipeline(ex)
+    result = pipeline.submit(OrderIntent(SYMBOL, 'sell', 0.02)).result(5)
+    assert result.status == 'filled'
+    assert len(ex.sent) == 2 and ex.sent[0] == ex.sent[1] == result.client_id
+
+
+def test_duplicate_rejection_is_reconciled_by_client_id(make_pipeline):
+    # 첫 전송은 접수됐지만 응답 유실 → 재전송은 중복으로 거절 → 거래소 주문 ID 없이 clientOrderId로 조회
+    ex = FakeExchange(errors=[Err(TimeoutError('read timeout'), accepted=True),
+                              Err(Exception('bybit {"retCode":110072,"retMsg":"OrderLinkedID is duplicate"}'))])
+    pipeline = make_pipeline(ex)
+    result = pipeline.submit(OrderIntent(SYMBOL, 'buy', 0.01)).result(5)
+    assert result.status == 'filled'
+    assert result.order_id == f"x-{result.client_id}"
+    assert ('open', {'orderLinkId': result.client_id}) in ex.lookups
+    assert len(ex.orders) == 1
+
+
+def test_rejected_order_fails_without_retry(make_pipeline):
+    ex = FakeExchange(errors=[Err(ValueError('insufficient balance'))])
+    pipeline = make_pipeline(ex)
+    result = pipeline.submit(OrderIntent(SYMBOL, 'buy', 1.0)).result(5)
+    assert result.status == 'rejected'
+    assert 'insufficient' in result.error
+    assert len(ex.sent) == 1
+
+
+def test_unfilled_order_times_out(make_pipeline):
+    ex = FakeExchange(status='open')
+    pipeline = make_pipeline(ex, fill_timeout=0.2)
+    result = pipeline.submit(OrderIntent(SYMBOL, 'buy', 0.01, order_type='limit', price=90.0)).result(5)
+    assert result.status == 'timeout'
+    assert pipeline.pending() == []
+
+
+class FlakyAccount:
+    """is_live()가 처음 몇 번 예외를 내는 계정 스트림"""
+
+    def __init__(self, failures=2):
+        self.failures = failures
+
+    def subscribe(self, kind, callback):
+        pass
+
+    def is_live(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('stream state unavailable')
+        return False
+
+
+def test_watcher_survives_errors_while_checking(make_pipeline):
+    ex = FakeExchange()
+    pipeline = make_pipeline(ex, account=FlakyAccount())
+    result = pipeline.submit(OrderIntent(SYMBOL, 'buy', 0.01)).result(5)
+    assert result.status == 'filled'
+    assert 'acknowledged' in result.timings
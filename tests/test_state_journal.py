@@ -0,0 +1,65 @@
+import json
+
+from bots.state_journal import StateJournal, read_state
+
+INITIAL = {'balance': 100.0, 'position': None, 'trade_history': []}
+
+
+def make(path, **kwargs):
+    return StateJournal(str(path), initial=INITIAL, limits={'trade_history': 3}, **kwargs)
+
+
+def test_replay_restores_state(tmp_path):
+    path = tmp_path / 'state.json'
+    journal = make(path)
+    journal.load()
+    journal.record('open', set={'position': {'side': 'long', 'entry': 100.0}})
+    for i in range(5):
+        journal.record('close', set={'balance': 100.0 + i, 'position': None}, push={'trade_history': {'n': i}})
+    expected = journal.state
+
+    restored = make(path).load()
+    assert restored == expected
+    assert restored['balance'] == 104.0
+    assert [t['n'] for t in restored['trade_history']] == [2, 3, 4]     # limits 적용
+    assert read_state(str(path), INITIAL, {'trade_history': 3}) == expected
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / 'state.json'
+    journal = make(path)
+    journal.record('close', set={'balance': 101.0})
+    journal.file.write('{"seq": 2, "set": {"bal')   # 쓰는 중에 죽은 경우
+    journal.file.flush()
+
+    restored = make(path)
+    assert restored.load()['balance'] == 101.0
+    restored.record('close', set={'balance': 102.0})
+    assert make(path).load()['balance'] == 102.0
+
+
+def test_snapshot_compacts_journal(tmp_path):
+    path = tmp_path / 'state.json'
+    journal = make(path, snapshot_every=3)
+    for i in range(7):
+        journal.record('tick', set={'balance': float(i)})
+    assert journal.stats['snapshots'] >= 2
+    assert len((tmp_path / 'state.json.journal').read_text().splitlines()) == 1
+    assert json.loads(path.read_text())['_seq'] == 6
+    assert make(path).load()['balance'] == 6.0
+
+
+def test_corrupt_snapshot_is_kept_and_journal_replayed(tmp_path):
+    path = tmp_path / 'state.json'
+    journal = make(path)
+    journal.load()
+    journal.record('close', set={'balance': 99.0})
+    journal.record('close', set={'balance': 98.5})
+    path.write_text('{"balance": 12')               # 손상된 스냅샷
+
+    restored = make(path).load()
+    assert restored['balance'] == 98.5
+    corrupt = list(tmp_path.glob('state.json.corrupt-*'))
+    assert len(corrupt) == 1 and corrupt[0].read_text() == '{"balance": 12'
+    # 복구한 상태로 새 스냅샷을 씀
+    assert json.loads(path.read_text())['balance'] == 98.5
@@ -0,0 +1,154 @@
+import threading
+
+import pytest
+
+pytest.importorskip('aiohttp')  # bots.market_stream (normalize_symbol)
+
+from bots.stop_manager import StopManager  # noqa: E402
+from conftest import wait_for  # noqa: E402
+
+SYMBOL = 'BTC/USDT'
+
+
+class FakeOrdersExchange:
+    """조건부 주문 방식 거래소 (create/cancel 기록, gate로 전송 중 상태를 붙잡을 수 있음)"""
+
+    id = 'binance'
+
+    def __init__(self, fail_times=0):
+        self.created = []
+        self.canceled = []
+        self.fail_times = fail_times
+        self.gate = None
+        self.entered = threading.Event()
+        self.lock = threading.Lock()
+
+    def create_order(self, symbol, order_type, side, amount, price, params):
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        with self.lock:
+            if self.fail_times:
+                self.fail_times -= 1
+                raise ConnectionError('temporary')
+            oid = f"o{len(self.created) + 1}"
+            self.created.append((oid, order_type, side, params['stopPrice']))
+        return {'id': oid}
+
+    def cancel_order(self, oid, symbol):
+        with self.lock:
+            self.canceled.append(oid)
+
+
+class FakeBybitClient:
+    """BybitClient.set_trading_stop 호출 기록"""
+
+    def __init__(self):
+        self.calls = []
+
+    def set_trading_stop(self, symbol, side, stop_loss=None, take_profit=None, trailing_stop=None,
+                         active_price=None):
+        self.calls.append((symbol, side, stop_loss, take_profit, trailing_stop))
+        return {'retCode': 0}
+
+
+@pytest.fixture
+def make_manager():
+    managers = []
+
+    def make(exchange, **kwargs):
+        kwargs.setdefault('min_interval', 0.01)
+        manager = StopManager(exchange, name='test', **kwargs)
+        manager.filters[SYMBOL] = None  # 틱 크기 조회 생략 (반올림 없이)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.stop()
+
+
+def test_update_places_and_replaces_only_changed_orders(make_manager):
+    ex = FakeOrdersExchange()
+    stops = make_manager(ex)
+    stops.update(SYMBOL, 'long', stop_loss=95.0, take_profit=120.0)
+    assert wait_for(lambda: stops.stats['sent'] == 1)
+    assert [(t, s, p) for _, t, s, p in ex.created] == [('STOP_MARKET', 'sell', 95.0),
+                                                       ('TAKE_PROFIT_MARKET', 'sell', 120.0)]
+
+    stops.update(SYMBOL, 'long', stop_loss=95.0)
+    assert stops.stats['unchanged'] == 1
+
+    stops.update(SYMBOL, 'long', stop_loss=97.0)
+    assert wait_for(lambda: stops.stats['sent'] == 2)
+    assert ex.canceled == ['o1']                     # 익절 주문은 그대로
+    assert ex.created[-1][1:] == ('STOP_MARKET', 'sell', 97.0)
+    assert stops.current(SYMBOL).stop_loss == 97.0
+
+
+def test_clear_cancels_placed_orders(make_manager):
+    ex = FakeOrdersExchange()
+    stops = make_manager(ex)
+    stops.update(SYMBOL, 'short', stop_loss=105.0)
+    assert wait_for(lambda: stops.stats['sent'] == 1)
+
+    stops.clear(SYMBOL)
+    assert ex.canceled == ['o1']
+    assert stops.current(SYMBOL) is None
+    assert stops.status()['pending'] == []
+
+
+def test_clear_during_send_discards_and_undoes(make_manager):
+    ex = FakeOrdersExchange()
+    ex.gate = threading.Event()
+    stops = make_manager(ex)
+    stops.update(SYMBOL, 'long', stop_loss=95.0)
+    assert ex.entered.wait(5)                        # worker가 전송 중
+
+    stops.clear(SYMBOL)
+    ex.gate.set()
+    assert wait_for(lambda: stops.stats['discarded'] == 1)
+    assert wait_for(lambda: ex.canceled == ['o1'])   # 청산 뒤 생성된 주문은 되돌림
+    assert stops.current(SYMBOL) is None
+    assert stops.stats['sent'] == 0
+
+
+def test_failed_send_is_retried_and_resynced(make_manager):
+    ex = FakeOrdersExchange(fail_times=2)
+    stops = make_manager(ex)
+    stops.update(SYMBOL, 'long', stop_loss=95.0)
+    assert wait_for(lambda: stops.stats['sent'] == 1)
+    assert stops.stats['errors'] == 2
+    assert stops.current(SYMBOL).stop_loss == 95.0
+
+    # 청산 후 새 포지션: 새 세대로 다시 설정
+    stops.clear(SYMBOL)
+    stops.update(SYMBOL, 'short', stop_loss=110.0)
+    assert wait_for(lambda: stops.stats['sent'] == 2)
+    assert ex.created[-1][1:] == ('STOP_MARKET', 'buy', 110.0)
+    assert stops.stats['discarded'] == 0
+
+
+def test_failed_retry_after_clear_is_dropped(make_manager):
+    ex = FakeOrdersExchange(fail_times=1)
+    ex.gate = threading.Event()
+    stops = make_manager(ex, retries=5)
+    stops.update(SYMBOL, 'long', stop_loss=95.0)
+    assert ex.entered.wait(5)
+
+    stops.clear(SYMBOL)
+    ex.gate.set()
+    assert wait_for(lambda: stops.stats['discarded'] == 1)
+    assert stops.status()['pending'] == []           # 재시도하지 않음
+    assert ex.created == []
+
+
+def test_bybit_client_clear_resets_position_stops(make_manager):
+    client = FakeBybitClient()
+    stops = make_manager(client)
+    stops.update(SYMBOL, 'long', stop_loss=95.0, trailing=50.0)
+    assert wait_for(lambda: stops.stats['sent'] == 1)
+    assert client.calls == [('BTCUSDT', 'long', 95.0, None, 50.0)]
+
+    stops.clear(SYMBOL)
+    assert client.calls[-1] == ('BTCUSDT', 'long', 0.0, 0.0, 0.0)